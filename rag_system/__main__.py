@@ -0,0 +1,8 @@
+"""
+支持 python -m rag_system 运行命令行工具
+"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
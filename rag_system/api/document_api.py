@@ -2,14 +2,16 @@
 文档管理API接口
 实现任务5.2：文档列表查询API和文档删除功能
 """
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from ..services.document_service import DocumentService
 from ..models.document import DocumentInfo, DocumentStatus
-from ..utils.exceptions import DocumentError, ProcessingError
+from ..utils.exceptions import DocumentError, ProcessingError, FileTooLargeError
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +43,28 @@ class DocumentUploadResponse(BaseModel):
     filename: str
     file_size: int
     status: str
+    job_id: Optional[str] = None
+
+
+class IngestionJobResponse(BaseModel):
+    """入库任务响应模型"""
+    id: str
+    document_id: str
+    status: str
+    progress: float
+    stage: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    next_run_at: str
+    created_at: str
+    updated_at: str
+
+
+class IngestionJobListResponse(BaseModel):
+    """入库任务列表响应模型"""
+    jobs: List[IngestionJobResponse]
+    stats: Dict[str, Any]
 
 
 class DocumentStatsResponse(BaseModel):
@@ -55,9 +79,8 @@ class DocumentStatsResponse(BaseModel):
     supported_formats: List[str]
 
 
-# 依赖注入：获取文档服务实例
-async def get_document_service() -> DocumentService:
-    """获取文档服务实例"""
+def get_document_service_config() -> Dict[str, Any]:
+    """从配置文件构建文档服务配置"""
     # 从配置文件加载实际配置
     from ..config.loader import ConfigLoader
     import os
@@ -72,11 +95,16 @@ async def get_document_service() -> DocumentService:
     
     doc_processing = raw_config.get('document_processing', {})
     
-    config = {
+    return {
         'storage_dir': './documents',
         'vector_store_type': app_config.vector_store.type,
         'vector_store_path': app_config.vector_store.persist_directory,
         'collection_name': app_config.vector_store.collection_name,
+        'vector_write_batch_size': app_config.vector_store.write_batch_size,
+        'vector_max_inflight_writes': app_config.vector_store.max_inflight_writes,
+        'vector_write_workers': app_config.vector_store.write_workers,
+        'vector_write_retries': app_config.vector_store.write_retries,
+        'vector_write_retry_delay': app_config.vector_store.write_retry_delay,
         'embedding_provider': app_config.embeddings.provider,
         'embedding_model': app_config.embeddings.model,
         'embedding_api_key': os.getenv('SILICONFLOW_API_KEY'),
@@ -86,9 +114,40 @@ async def get_document_service() -> DocumentService:
         'chunk_overlap': doc_processing.get('chunk_overlap', app_config.embeddings.chunk_overlap),
         'min_chunk_size': doc_processing.get('min_chunk_size', 100),
         'max_chunk_size': doc_processing.get('max_chunk_size', 2000),
+        'semantic_split': doc_processing.get('semantic_split', False),
+        'semantic_split_mode': doc_processing.get('semantic_split_mode', 'rules'),
+        'semantic_breakpoint_percentile': doc_processing.get('semantic_breakpoint_percentile', 90),
+        'semantic_window_size': doc_processing.get('semantic_window_size', 2),
+        'semantic_embedding_batch_size': doc_processing.get('semantic_embedding_batch_size', 256),
+        'embedding_cache_max_mb': doc_processing.get('embedding_cache_max_mb'),
+        'chunk_adjacency_enabled': doc_processing.get('chunk_adjacency_enabled', True),
+        'embedding_max_tokens': doc_processing.get('embedding_max_tokens'),
+        'max_chunk_tokens': doc_processing.get('max_chunk_tokens'),
+        'chunk_token_safety_margin': doc_processing.get('chunk_token_safety_margin', 0.9),
+        'process_pool_workers': doc_processing.get('process_pool_workers', 2),
+        'process_pool_max_tasks_per_child': doc_processing.get('process_pool_max_tasks_per_child', 50),
+        'process_pool_memory_limit_mb': doc_processing.get('process_pool_memory_limit_mb'),
+        'pdf_pages_per_task': doc_processing.get('pdf_pages_per_task', 25),
+        'pdf_page_timeout': doc_processing.get('pdf_page_timeout', 30),
+        'pipeline_batch_size': doc_processing.get('pipeline_batch_size', 32),
+        'pipeline_queue_size': doc_processing.get('pipeline_queue_size', 2),
+        'text_cache_enabled': doc_processing.get('text_cache_enabled', True),
+        'text_cache_dir': doc_processing.get('text_cache_dir'),
+        'text_cache_max_size_mb': doc_processing.get('text_cache_max_size_mb', 1024),
+        'text_cache_preprocessed': doc_processing.get('text_cache_preprocessed', True),
+        'max_file_size': doc_processing.get('max_file_size', 50 * 1024 * 1024),
+        'batch_upload_concurrency': doc_processing.get('batch_upload_concurrency', 8),
+        'delete_batch_size': doc_processing.get('delete_batch_size', 500),
+        'delete_file_workers': doc_processing.get('delete_file_workers', 16),
+        'max_concurrent_processing': doc_processing.get('max_concurrent_processing', 4),
         'database_url': app_config.database.url
     }
-    
+
+
+# 依赖注入：获取文档服务实例
+async def get_document_service() -> DocumentService:
+    """获取文档服务实例"""
+    config = get_document_service_config()
     service = DocumentService(config)
     await service.initialize()
     return service
@@ -131,19 +190,7 @@ async def upload_document(
                 detail=f"不支持的文件格式。支持的格式: {', '.join(allowed_extensions)}"
             )
         
-        # 检查文件大小（限制为50MB）
-        max_file_size = 50 * 1024 * 1024  # 50MB
-        file_content = await file.read()
-        if len(file_content) > max_file_size:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="文件大小超过限制（50MB）"
-            )
-        
-        # 重置文件指针
-        await file.seek(0)
-        
-        # 调用文档服务上传文档
+        # 调用文档服务上传文档（流式写入，超过大小限制时中止）
         document_info = await document_service.upload_document(file)
         
         logger.info(f"文档上传成功: {document_info.id}")
@@ -153,13 +200,20 @@ async def upload_document(
         
         return DocumentUploadResponse(
             success=True,
-            message="文档上传成功",
+            message="文档上传成功，已加入处理队列" if document_info.job_id else "文档上传成功",
             document_id=document_info.id,
             filename=document_info.filename,
             file_size=document_info.file_size,
-            status=status_value
+            status=status_value,
+            job_id=document_info.job_id
         )
         
+    except FileTooLargeError as e:
+        logger.warning(f"文档上传被拒绝: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except DocumentError as e:
         logger.error(f"文档上传失败: {str(e)}")
         raise HTTPException(
@@ -248,6 +302,101 @@ async def list_documents(
         )
 
 
+def _get_running_ingestion_queue():
+    """获取运行中的入库队列，未启用时返回503"""
+    from ..services.ingestion_queue import get_ingestion_queue
+    
+    queue = get_ingestion_queue()
+    if queue is None or not queue.is_running:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="后台入库队列未启用"
+        )
+    return queue
+
+
+def _to_job_response(job: Dict[str, Any]) -> IngestionJobResponse:
+    """将任务记录转换为响应模型"""
+    return IngestionJobResponse(**{k: v for k, v in job.items() if k in IngestionJobResponse.model_fields})
+
+
+@router.get("/jobs", response_model=IngestionJobListResponse)
+async def list_ingestion_jobs(
+    status_filter: Optional[str] = None,
+    limit: int = 100
+) -> IngestionJobListResponse:
+    """
+    获取入库任务列表和队列统计
+    
+    Args:
+        status_filter: 可选的状态过滤器 (pending, running, succeeded, failed)
+        limit: 返回的最大任务数
+        
+    Returns:
+        入库任务列表响应
+    """
+    from ..services.ingestion_queue import JobStatus
+    
+    queue = _get_running_ingestion_queue()
+    if status_filter:
+        try:
+            JobStatus(status_filter.lower())
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的状态过滤器: {status_filter}. 支持的状态: pending, running, succeeded, failed"
+            )
+        status_filter = status_filter.lower()
+    
+    jobs = await queue.list_jobs(status_filter, limit)
+    return IngestionJobListResponse(
+        jobs=[_to_job_response(job) for job in jobs],
+        stats=await queue.get_stats()
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str) -> IngestionJobResponse:
+    """
+    获取入库任务状态和进度
+    
+    Args:
+        job_id: 任务ID
+        
+    Returns:
+        任务状态
+    """
+    queue = _get_running_ingestion_queue()
+    job = await queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"入库任务不存在: {job_id}"
+        )
+    return _to_job_response(job)
+
+
+@router.get("/{document_id}/ingestion", response_model=IngestionJobResponse)
+async def get_document_ingestion_job(document_id: str) -> IngestionJobResponse:
+    """
+    获取文档最近的入库任务状态和进度
+    
+    Args:
+        document_id: 文档ID
+        
+    Returns:
+        任务状态
+    """
+    queue = _get_running_ingestion_queue()
+    job = await queue.get_document_job(document_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"文档没有入库任务: {document_id}"
+        )
+    return _to_job_response(job)
+
+
 @router.get("/{document_id}", response_model=DocumentInfo)
 async def get_document(
     document_id: str,
@@ -433,77 +582,98 @@ async def get_supported_formats() -> Dict[str, Any]:
 @router.post("/batch-upload", response_model=List[DocumentUploadResponse])
 async def batch_upload_documents(
     files: List[UploadFile] = File(...),
+    stream: bool = Query(False, description="按完成顺序逐行返回每个文件的结果（NDJSON）"),
     document_service: DocumentService = Depends(get_document_service)
-) -> List[DocumentUploadResponse]:
+):
     """
     批量上传文档
     
+    各文件并发保存和处理：批次内同时进行的上传数受 batch_upload_concurrency 限制，
+    文档处理受全局处理并发上限限制（或交由入库队列处理）
+    
     Args:
         files: 上传的文件列表
+        stream: 为True时按完成顺序流式返回结果
         document_service: 文档服务实例
         
     Returns:
-        上传结果列表
+        上传结果列表（与文件顺序一致），或逐行输出的流式结果
     """
-    results = []
+    semaphore = asyncio.Semaphore(document_service.batch_upload_concurrency)
     
-    for file in files:
-        try:
-            logger.info(f"批量上传处理文件: {file.filename}")
-            
-            # 验证文件
-            if not file.filename:
-                results.append(DocumentUploadResponse(
-                    success=False,
-                    message="文件名不能为空",
-                    document_id="",
-                    filename=file.filename or "unknown",
-                    file_size=0,
-                    status="error"
-                ))
-                continue
-            
-            # 检查文件扩展名
-            allowed_extensions = ['.pdf', '.txt', '.docx', '.md']
-            file_extension = file.filename.lower().split('.')[-1] if '.' in file.filename else ''
-            if f'.{file_extension}' not in allowed_extensions:
-                results.append(DocumentUploadResponse(
-                    success=False,
-                    message=f"不支持的文件格式: {file_extension}",
-                    document_id="",
-                    filename=file.filename,
-                    file_size=0,
-                    status="error"
-                ))
-                continue
-            
-            # 上传文档
-            document_info = await document_service.upload_document(file)
-            
-            # 安全地获取状态值
-            status_value = document_info.status.value if hasattr(document_info.status, 'value') else str(document_info.status)
-            
-            results.append(DocumentUploadResponse(
-                success=True,
-                message="文档上传成功",
-                document_id=document_info.id,
-                filename=document_info.filename,
-                file_size=document_info.file_size,
-                status=status_value
-            ))
-            
-        except Exception as e:
-            logger.error(f"批量上传文件失败 {file.filename}: {str(e)}")
-            results.append(DocumentUploadResponse(
+    async def upload(file: UploadFile) -> DocumentUploadResponse:
+        async with semaphore:
+            return await _upload_batch_file(file, document_service)
+    
+    tasks = [asyncio.create_task(upload(file)) for file in files]
+    
+    if stream:
+        async def stream_results():
+            # 客户端断开时不取消上传：文件已完整接收，继续完成入库
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                yield result.model_dump_json() + "\n"
+        
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    return list(await asyncio.gather(*tasks))
+
+
+async def _upload_batch_file(file: UploadFile, document_service: DocumentService) -> DocumentUploadResponse:
+    """上传批量中的单个文件，失败时返回失败结果而不抛出异常"""
+    try:
+        logger.info(f"批量上传处理文件: {file.filename}")
+        
+        # 验证文件
+        if not file.filename:
+            return DocumentUploadResponse(
                 success=False,
-                message=f"上传失败: {str(e)}",
+                message="文件名不能为空",
                 document_id="",
                 filename=file.filename or "unknown",
                 file_size=0,
                 status="error"
-            ))
-    
-    return results
+            )
+        
+        # 检查文件扩展名
+        allowed_extensions = ['.pdf', '.txt', '.docx', '.md']
+        file_extension = file.filename.lower().split('.')[-1] if '.' in file.filename else ''
+        if f'.{file_extension}' not in allowed_extensions:
+            return DocumentUploadResponse(
+                success=False,
+                message=f"不支持的文件格式: {file_extension}",
+                document_id="",
+                filename=file.filename,
+                file_size=0,
+                status="error"
+            )
+        
+        # 上传文档
+        document_info = await document_service.upload_document(file)
+        
+        # 安全地获取状态值
+        status_value = document_info.status.value if hasattr(document_info.status, 'value') else str(document_info.status)
+        
+        return DocumentUploadResponse(
+            success=True,
+            message="文档上传成功，已加入处理队列" if document_info.job_id else "文档上传成功",
+            document_id=document_info.id,
+            filename=document_info.filename,
+            file_size=document_info.file_size,
+            status=status_value,
+            job_id=document_info.job_id
+        )
+        
+    except Exception as e:
+        logger.error(f"批量上传文件失败 {file.filename}: {str(e)}")
+        return DocumentUploadResponse(
+            success=False,
+            message=f"上传失败: {str(e)}",
+            document_id="",
+            filename=file.filename or "unknown",
+            file_size=0,
+            status="error"
+        )
 
 
 @router.get("/stats/summary", response_model=DocumentStatsResponse)
@@ -582,9 +752,9 @@ async def delete_all_documents(
         logger.warning("开始删除所有文档")
         
         # 获取所有文档
-        documents = await document_service.list_documents()
+        document_ids = await document_service.list_document_ids()
         
-        if not documents:
+        if not document_ids:
             return {
                 "success": True,
                 "message": "没有文档需要删除",
@@ -592,23 +762,14 @@ async def delete_all_documents(
                 "failed_count": 0
             }
         
-        # 批量删除
-        deleted_count = 0
-        failed_count = 0
-        failed_documents = []
+        # 批量删除：向量按批删除，文件并行删除，数据库记录一个事务删除
+        async def report_progress(value: float, stage: str) -> None:
+            logger.info(f"批量删除进度: {value:.0%} ({stage})")
         
-        for document in documents:
-            try:
-                success = await document_service.delete_document(document.id)
-                if success:
-                    deleted_count += 1
-                else:
-                    failed_count += 1
-                    failed_documents.append(document.filename)
-            except Exception as e:
-                failed_count += 1
-                failed_documents.append(f"{document.filename} (错误: {str(e)})")
-                logger.error(f"删除文档失败: {document.filename}, 错误: {str(e)}")
+        summary = await document_service.delete_documents(document_ids, report_progress=report_progress)
+        deleted_count = summary["deleted_count"]
+        failed_count = summary["failed_count"]
+        failed_documents = summary["failed_documents"]
         
         logger.warning(f"批量删除完成: 成功 {deleted_count}, 失败 {failed_count}")
         
@@ -226,13 +226,84 @@ async def startup_event():
     logger.info("📊 监控API路由已加载")
     logger.info("💬 会话API路由已加载")
     logger.info("🔧 模型管理API路由已加载")
+
+    # 后台恢复进程内缓存快照，不阻塞启动
+    snapshot_path = os.getenv("CACHE_SNAPSHOT_PATH")
+    if snapshot_path:
+        try:
+            from .qa_api import get_qa_service_config
+            from ..utils.cache_snapshot import compute_cache_fingerprint, restore_cache_snapshot_in_background
+
+            app.state.cache_fingerprint = compute_cache_fingerprint(get_qa_service_config())
+            app.state.cache_snapshot_task = restore_cache_snapshot_in_background(
+                snapshot_path, app.state.cache_fingerprint
+            )
+            logger.info(f"💾 正在后台恢复缓存快照: {snapshot_path}")
+        except Exception as e:
+            logger.warning(f"⚠️ 缓存快照恢复失败: {e}")
+
+    # 后台文档入库队列
+    if os.getenv("INGESTION_QUEUE_ENABLED", "false").lower() == "true":
+        try:
+            from .document_api import get_document_service_config
+            from ..services.ingestion_queue import start_global_ingestion_queue
+
+            config = get_document_service_config()
+            config['ingestion_workers'] = int(os.getenv("INGESTION_WORKERS", "2"))
+            await start_global_ingestion_queue(config)
+            logger.info("📥 文档入库队列已启动")
+        except Exception as e:
+            logger.warning(f"⚠️ 文档入库队列启动失败，上传将在请求内处理: {e}")
+
+    # 基于问答历史的缓存预热（需要Redis缓存）
+    if os.getenv("CACHE_WARMUP_ENABLED", "false").lower() == "true":
+        try:
+            from .qa_api import get_qa_service_config
+            from ..services.cache_warmup import start_global_cache_warmup
+
+            await start_global_cache_warmup(get_qa_service_config())
+            logger.info("🔥 缓存预热任务已启动")
+        except Exception as e:
+            logger.warning(f"⚠️ 缓存预热任务启动失败: {e}")
+
     logger.info("✅ RAG Knowledge QA System API 启动完成")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
     logger.info("🛑 RAG Knowledge QA System API 正在关闭...")
-    
+
+    try:
+        from ..services.ingestion_queue import stop_global_ingestion_queue
+        await stop_global_ingestion_queue()
+    except Exception as e:
+        logger.warning(f"⚠️ 停止文档入库队列失败: {e}")
+
+    try:
+        from ..document_processing.process_pool import shutdown_document_process_pool
+        shutdown_document_process_pool(wait=False)
+    except Exception as e:
+        logger.warning(f"⚠️ 关闭文档处理进程池失败: {e}")
+
+    try:
+        from ..services.cache_warmup import stop_global_cache_warmup
+        await stop_global_cache_warmup()
+    except Exception as e:
+        logger.warning(f"⚠️ 停止缓存预热任务失败: {e}")
+
+    # 保存进程内缓存快照，供下次启动恢复
+    snapshot_path = os.getenv("CACHE_SNAPSHOT_PATH")
+    if snapshot_path and getattr(app.state, 'cache_fingerprint', None):
+        try:
+            from ..utils.cache_snapshot import save_cache_snapshot
+
+            # 等待恢复完成，避免未恢复的条目丢失
+            restore_task = getattr(app.state, 'cache_snapshot_task', None)
+            if restore_task is not None:
+                await restore_task
+            save_cache_snapshot(snapshot_path, app.state.cache_fingerprint)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存缓存快照失败: {e}")
 
     logger.info("✅ RAG Knowledge QA System API 已关闭")
 
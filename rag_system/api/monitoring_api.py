@@ -13,6 +13,7 @@ from ..utils.monitoring import (
     HealthStatus, PerformanceMetrics, ServiceMetrics
 )
 from ..utils.exceptions import RAGSystemError, ErrorCode
+from ..utils.executors import get_executor_stats
 from ..config.loader import ConfigLoader
 
 logger = logging.getLogger(__name__)
@@ -364,6 +365,28 @@ async def get_service_metrics(service: str) -> Dict[str, Any]:
         )
 
 
+@router.get("/executors")
+async def get_executors_metrics() -> Dict[str, Any]:
+    """
+    获取各负载线程池（向量检索、向量写入、重排序、文本提取）的队列深度和排队等待时间
+    
+    Returns:
+        线程池统计信息
+    """
+    try:
+        return {
+            'timestamp': datetime.utcnow().isoformat(),
+            **get_executor_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"获取线程池统计失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取线程池统计失败: {str(e)}"
+        )
+
+
 @router.get("/alerts", response_model=AlertResponse)
 async def get_alerts(
     minutes: int = Query(60, description="获取最近N分钟的告警", ge=1, le=1440)
@@ -81,9 +81,8 @@ class QAStatsResponse(BaseModel):
     average_confidence_score: float
 
 
-# 依赖注入：获取QA服务实例
-async def get_qa_service() -> QAService:
-    """获取QA服务实例"""
+def get_qa_service_config() -> Dict[str, Any]:
+    """从配置文件构建QA服务配置"""
     # 从配置文件加载实际配置
     from ..config.loader import ConfigLoader
     import os
@@ -91,7 +90,7 @@ async def get_qa_service() -> QAService:
     config_loader = ConfigLoader()
     app_config = config_loader.load_config()
     
-    config = {
+    return {
         'vector_store_type': app_config.vector_store.type,
         'vector_store_path': app_config.vector_store.persist_directory,
         'collection_name': app_config.vector_store.collection_name,
@@ -109,9 +108,21 @@ async def get_qa_service() -> QAService:
         'llm_max_tokens': app_config.llm.max_tokens,
         'similarity_threshold': app_config.retrieval.similarity_threshold,
         'retrieval_top_k': app_config.retrieval.top_k,
+        # 检索缓存：缓存预热写入的键与问答检索读取的键一致，需要同时启用
+        'enable_cache': app_config.retrieval.enable_cache,
         'no_answer_threshold': 0.6,  # Reasonable threshold for cosine similarity
+        # 与文档服务的存储目录一致，读取入库时记录的文本块邻接表
+        'enable_context_expansion': True,
+        'context_expansion_window': 1,
+        'chunk_adjacency_dir': './documents/.chunk_adjacency',
         'database_url': app_config.database.url
     }
+
+
+# 依赖注入：获取QA服务实例
+async def get_qa_service() -> QAService:
+    """获取QA服务实例"""
+    config = get_qa_service_config()
     service = QAService(config)
     await service.initialize()
     return service
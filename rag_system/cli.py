@@ -0,0 +1,127 @@
+"""
+命令行入口
+
+用法:
+    rag_system ingest <目录> [--manifest 清单路径] [--concurrency 并发数]
+    python -m rag_system ingest <目录>
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .services.bulk_ingestion import BulkIngestionStats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="rag_system", description="RAG知识库问答系统命令行工具")
+    parser.add_argument("--log-level", default="INFO", help="日志级别（默认INFO）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    ingest = subparsers.add_parser("ingest", help="批量入库目录中的文档（PDF/DOCX/MD/TXT）")
+    ingest.add_argument("directory", help="文档目录，递归处理子目录")
+    ingest.add_argument("--manifest", help="进度清单路径，默认为目录下的 .rag_ingest_manifest.jsonl")
+    ingest.add_argument("--concurrency", type=int, default=4, help="同时处理的文档数（默认4）")
+    ingest.add_argument("--batch-size", type=int, default=100, help="每批登记的文档记录数（默认100）")
+    ingest.add_argument("--process-workers", type=int, help="文本提取进程数，默认使用配置文件")
+    ingest.add_argument("--pipeline-batch-size", type=int,
+                        help="文本块攒够多少个后送入向量化和写入流水线，默认使用配置文件")
+    
+    return parser
+
+
+def format_report(stats: BulkIngestionStats) -> str:
+    """格式化入库统计报告"""
+    lines = [
+        "批量入库完成",
+        f"  文件总数:   {stats.total_files}",
+        f"  已跳过:     {stats.skipped}（之前已完成）",
+        f"  入库成功:   {stats.completed}",
+        f"  重复文档:   {stats.duplicates}",
+        f"  失败:       {stats.failed}",
+        f"  文本块:     {stats.chunks}",
+        f"  向量:       {stats.embeddings}",
+        f"  耗时:       {stats.elapsed:.1f}秒",
+        f"  吞吐量:     {stats.documents_per_second:.2f} 文档/秒, "
+        f"{stats.chunks_per_second:.1f} 文本块/秒, {stats.embeddings_per_second:.1f} 向量/秒",
+    ]
+    return "\n".join(lines)
+
+
+@asynccontextmanager
+async def open_document_service(config: Dict[str, Any]) -> AsyncIterator[Any]:
+    """
+    创建命令行入库使用的文档服务
+    
+    文档记录直接使用 database_url 上的SQLAlchemy会话（不存在的表自动创建），
+    只初始化文档处理器和向量存储
+    """
+    from .services.document_service import DocumentService
+    
+    document_service = DocumentService(config)
+    await document_service.initialize_with_session()
+    try:
+        yield document_service
+    finally:
+        await document_service.cleanup()
+
+
+def build_ingest_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """文档服务配置，命令行参数覆盖配置文件"""
+    from .api.document_api import get_document_service_config
+    
+    config = get_document_service_config()
+    if args.process_workers is not None:
+        config['process_pool_workers'] = args.process_workers
+    if args.pipeline_batch_size is not None:
+        config['pipeline_batch_size'] = args.pipeline_batch_size
+    return config
+
+
+async def run_ingest(args: argparse.Namespace) -> int:
+    """执行批量入库，有失败的文件时返回1"""
+    from .services.bulk_ingestion import BulkIngestionService
+    
+    config = build_ingest_config(args)
+    
+    async with open_document_service(config) as document_service:
+        bulk_service = BulkIngestionService(document_service, {
+            'bulk_concurrency': args.concurrency,
+            'bulk_register_batch_size': args.batch_size,
+            'upload_chunk_size': config.get('upload_chunk_size', 1024 * 1024)
+        })
+        stats = await bulk_service.ingest_directory(args.directory, args.manifest)
+    
+    print(format_report(stats))
+    if stats.failed:
+        manifest = args.manifest or f"{args.directory}/{BulkIngestionService.MANIFEST_NAME}"
+        print(f"有 {stats.failed} 个文件入库失败，详见清单 {manifest}，重新运行将重试这些文件")
+    return 1 if stats.failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行主函数"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    if args.command == "ingest":
+        try:
+            return asyncio.run(run_ingest(args))
+        except KeyboardInterrupt:
+            print("已中断，重新运行相同命令将从清单记录处继续")
+            return 130
+    
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
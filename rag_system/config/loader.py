@@ -368,7 +368,12 @@ class ConfigLoader:
         return VectorStoreConfig(
             type=store_type,
             persist_directory=persist_dir,
-            collection_name=collection_name
+            collection_name=collection_name,
+            write_batch_size=data.get("write_batch_size", 500),
+            max_inflight_writes=data.get("max_inflight_writes", 2),
+            write_workers=data.get("write_workers", 2),
+            write_retries=data.get("write_retries", 2),
+            write_retry_delay=data.get("write_retry_delay", 0.5)
         )
     
     def _create_embeddings_config(self, data: Dict[str, Any]) -> EmbeddingsConfig:
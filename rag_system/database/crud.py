@@ -2,15 +2,18 @@
 数据库CRUD操作
 """
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
+from sqlalchemy import desc, and_, or_, func, bindparam
 
 from ..models.document import DocumentInfo, DocumentStatus as ModelDocumentStatus
 from ..models.qa import QAPair, Session as ModelSession
 from ..utils.exceptions import DocumentError, SessionError
 from .models import DocumentModel, QAPairModel, SessionModel, DocumentStatus
 
+# IN 查询每批的ID数（SQLite 旧版本单条语句最多999个参数）
+_IN_CLAUSE_BATCH_SIZE = 500
+
 
 class BaseCRUD:
     """基础CRUD操作类"""
@@ -25,23 +28,7 @@ class DocumentCRUD(BaseCRUD):
     def create_document(self, document_info: DocumentInfo) -> DocumentModel:
         """创建文档记录"""
         try:
-            # 转换状态枚举
-            status_mapping = {
-                ModelDocumentStatus.PROCESSING: DocumentStatus.PROCESSING,
-                ModelDocumentStatus.READY: DocumentStatus.READY,
-                ModelDocumentStatus.ERROR: DocumentStatus.ERROR
-            }
-            
-            db_document = DocumentModel(
-                id=document_info.id,
-                filename=document_info.filename,
-                file_type=document_info.file_type,
-                file_size=document_info.file_size,
-                upload_time=document_info.upload_time,
-                status=status_mapping[document_info.status],
-                chunk_count=document_info.chunk_count,
-                error_message=document_info.error_message
-            )
+            db_document = self._build_document_model(document_info)
             
             self.session.add(db_document)
             self.session.commit()
@@ -53,6 +40,42 @@ class DocumentCRUD(BaseCRUD):
             self.session.rollback()
             raise DocumentError(f"创建文档记录失败: {str(e)}")
     
+    def create_documents(self, documents: List[DocumentInfo]) -> int:
+        """批量创建文档记录，在一个事务中提交"""
+        if not documents:
+            return 0
+        
+        try:
+            self.session.add_all([self._build_document_model(doc) for doc in documents])
+            self.session.commit()
+            return len(documents)
+            
+        except Exception as e:
+            self.session.rollback()
+            raise DocumentError(f"批量创建文档记录失败: {str(e)}")
+    
+    def _build_document_model(self, document_info: DocumentInfo) -> DocumentModel:
+        """将文档信息转换为数据库模型"""
+        # 转换状态枚举
+        status_mapping = {
+            ModelDocumentStatus.PROCESSING: DocumentStatus.PROCESSING,
+            ModelDocumentStatus.READY: DocumentStatus.READY,
+            ModelDocumentStatus.ERROR: DocumentStatus.ERROR
+        }
+        
+        return DocumentModel(
+            id=document_info.id,
+            filename=document_info.filename,
+            file_type=document_info.file_type,
+            file_size=document_info.file_size,
+            upload_time=document_info.upload_time,
+            status=status_mapping[document_info.status],
+            chunk_count=document_info.chunk_count,
+            error_message=document_info.error_message,
+            content_hash=document_info.content_hash,
+            alias_of=document_info.alias_of
+        )
+    
     def get_document(self, doc_id: str) -> Optional[DocumentModel]:
         """获取文档记录"""
         try:
@@ -62,6 +85,41 @@ class DocumentCRUD(BaseCRUD):
         except Exception as e:
             raise DocumentError(f"获取文档记录失败: {str(e)}")
     
+    def get_document_by_hash(self, content_hash: str) -> Optional[DocumentModel]:
+        """按内容哈希获取已入库的原文档（不含别名）"""
+        try:
+            return self.session.query(DocumentModel).filter(
+                DocumentModel.content_hash == content_hash,
+                DocumentModel.alias_of.is_(None),
+                DocumentModel.status == DocumentStatus.READY
+            ).order_by(DocumentModel.upload_time).first()
+        except Exception as e:
+            raise DocumentError(f"按内容哈希获取文档失败: {str(e)}")
+    
+    def get_document_aliases(self, doc_id: str) -> List[DocumentModel]:
+        """获取指向指定文档的别名记录"""
+        try:
+            return self.session.query(DocumentModel).filter(
+                DocumentModel.alias_of == doc_id
+            ).order_by(DocumentModel.upload_time).all()
+        except Exception as e:
+            raise DocumentError(f"获取文档别名失败: {str(e)}")
+    
+    def update_document_alias(self, doc_id: str, alias_of: Optional[str]) -> bool:
+        """更新文档的别名指向"""
+        try:
+            document = self.get_document(doc_id)
+            if not document:
+                return False
+            
+            document.alias_of = alias_of
+            self.session.commit()
+            return True
+            
+        except Exception as e:
+            self.session.rollback()
+            raise DocumentError(f"更新文档别名失败: {str(e)}")
+    
     def get_documents(self, limit: int = 100, offset: int = 0) -> List[DocumentModel]:
         """获取文档列表"""
         try:
@@ -120,6 +178,68 @@ class DocumentCRUD(BaseCRUD):
             self.session.rollback()
             raise DocumentError(f"删除文档记录失败: {str(e)}")
     
+    def get_document_ids(self) -> List[str]:
+        """获取全部文档ID"""
+        try:
+            return [row[0] for row in self.session.query(DocumentModel.id).all()]
+        except Exception as e:
+            raise DocumentError(f"获取文档ID列表失败: {str(e)}")
+    
+    def get_documents_by_ids(self, doc_ids: List[str]) -> List[DocumentModel]:
+        """按ID批量获取文档记录，不存在的ID忽略"""
+        try:
+            documents = []
+            for i in range(0, len(doc_ids), _IN_CLAUSE_BATCH_SIZE):
+                batch = doc_ids[i:i + _IN_CLAUSE_BATCH_SIZE]
+                documents.extend(
+                    self.session.query(DocumentModel).filter(DocumentModel.id.in_(batch)).all()
+                )
+            return documents
+        except Exception as e:
+            raise DocumentError(f"批量获取文档记录失败: {str(e)}")
+    
+    def get_aliases_of_documents(self, doc_ids: List[str]) -> List[DocumentModel]:
+        """批量获取指向指定文档的别名记录"""
+        try:
+            aliases = []
+            for i in range(0, len(doc_ids), _IN_CLAUSE_BATCH_SIZE):
+                batch = doc_ids[i:i + _IN_CLAUSE_BATCH_SIZE]
+                aliases.extend(
+                    self.session.query(DocumentModel).filter(DocumentModel.alias_of.in_(batch)).all()
+                )
+            return sorted(aliases, key=lambda alias: alias.upload_time)
+        except Exception as e:
+            raise DocumentError(f"批量获取文档别名失败: {str(e)}")
+    
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        批量删除文档记录及其问答记录，在一个事务中提交
+        
+        Returns:
+            删除的文档记录数
+        """
+        if not doc_ids:
+            return 0
+        
+        params = [{"doc_id": doc_id} for doc_id in dict.fromkeys(doc_ids)]
+        documents = DocumentModel.__table__
+        qa_pairs = QAPairModel.__table__
+        try:
+            # 批量语句不经过ORM级联，问答记录需要单独删除
+            self.session.execute(
+                qa_pairs.delete().where(qa_pairs.c.document_id == bindparam("doc_id")), params
+            )
+            result = self.session.execute(
+                documents.delete().where(documents.c.id == bindparam("doc_id")), params
+            )
+            self.session.commit()
+            self.session.expire_all()
+            return result.rowcount
+            
+        except Exception as e:
+            self.session.rollback()
+            raise DocumentError(f"批量删除文档记录失败: {str(e)}")
+    
     def count_documents(self) -> int:
         """统计文档数量"""
         try:
@@ -383,6 +503,22 @@ class QAPairCRUD(BaseCRUD):
         except Exception as e:
             raise SessionError(f"获取最近问答对失败: {str(e)}")
     
+    def get_frequent_questions(self, since: Optional[datetime] = None, limit: int = 50) -> List[Tuple[str, int]]:
+        """获取最常被提问的问题，按提问次数降序"""
+        try:
+            frequency = func.count(QAPairModel.id).label('frequency')
+            query = self.session.query(QAPairModel.question, frequency)
+            if since is not None:
+                query = query.filter(QAPairModel.timestamp >= since)
+            
+            rows = query.group_by(QAPairModel.question).order_by(
+                desc(frequency),
+                desc(func.max(QAPairModel.timestamp))
+            ).limit(limit).all()
+            return [(row.question, row.frequency) for row in rows]
+        except Exception as e:
+            raise SessionError(f"获取高频问题失败: {str(e)}")
+    
     def search_qa_pairs(self, query: str, limit: int = 20) -> List[QAPairModel]:
         """搜索问答对"""
         try:
@@ -116,6 +116,81 @@ class AddUserIdMigration(Migration):
         logger.warning("SQLite不支持删除列，回滚跳过")
 
 
+class AddDocumentContentHashMigration(Migration):
+    """添加内容哈希字段到文档表"""
+    
+    def __init__(self):
+        super().__init__("003", "添加内容哈希字段到文档表")
+    
+    def up(self, session: Session) -> None:
+        """添加content_hash字段"""
+        logger.info("执行迁移：添加文档内容哈希字段")
+        
+        # 检查字段是否已存在
+        result = session.execute(text("""
+            SELECT COUNT(*) as count FROM pragma_table_info('documents') 
+            WHERE name = 'content_hash'
+        """))
+        
+        if result.scalar() == 0:
+            session.execute(text("""
+                ALTER TABLE documents ADD COLUMN content_hash VARCHAR(64)
+            """))
+            
+            # 创建索引，供按内容去重和增量重建索引查询
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_documents_content_hash 
+                ON documents(content_hash)
+            """))
+            
+            session.commit()
+            logger.info("文档内容哈希字段添加完成")
+        else:
+            logger.info("文档内容哈希字段已存在，跳过迁移")
+    
+    def down(self, session: Session) -> None:
+        """移除content_hash字段"""
+        logger.info("回滚迁移：移除文档内容哈希字段")
+        logger.warning("SQLite不支持删除列，回滚跳过")
+
+
+class AddDocumentAliasMigration(Migration):
+    """添加别名字段到文档表"""
+    
+    def __init__(self):
+        super().__init__("004", "添加别名字段到文档表")
+    
+    def up(self, session: Session) -> None:
+        """添加alias_of字段"""
+        logger.info("执行迁移：添加文档别名字段")
+        
+        # 检查字段是否已存在
+        result = session.execute(text("""
+            SELECT COUNT(*) as count FROM pragma_table_info('documents') 
+            WHERE name = 'alias_of'
+        """))
+        
+        if result.scalar() == 0:
+            session.execute(text("""
+                ALTER TABLE documents ADD COLUMN alias_of VARCHAR(36)
+            """))
+            
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_documents_alias_of 
+                ON documents(alias_of)
+            """))
+            
+            session.commit()
+            logger.info("文档别名字段添加完成")
+        else:
+            logger.info("文档别名字段已存在，跳过迁移")
+    
+    def down(self, session: Session) -> None:
+        """移除alias_of字段"""
+        logger.info("回滚迁移：移除文档别名字段")
+        logger.warning("SQLite不支持删除列，回滚跳过")
+
+
 class MigrationManager:
     """迁移管理器"""
     
@@ -123,7 +198,9 @@ class MigrationManager:
         self.db_manager = db_manager
         self.migrations: List[Migration] = [
             InitialMigration(),
-            AddUserIdMigration()
+            AddUserIdMigration(),
+            AddDocumentContentHashMigration(),
+            AddDocumentAliasMigration()
         ]
     
     def create_migration_table(self) -> None:
@@ -32,6 +32,8 @@ class DocumentModel(Base):
     status = Column(SQLEnum(DocumentStatus), default=DocumentStatus.PROCESSING, nullable=False)
     chunk_count = Column(Integer, default=0, nullable=False)
     error_message = Column(Text, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
+    alias_of = Column(String(36), nullable=True, index=True)  # 内容重复时指向原文档
     
     # 关联的问答对
     qa_pairs = relationship("QAPairModel", back_populates="document", cascade="all, delete-orphan")
@@ -46,7 +48,9 @@ class DocumentModel(Base):
             "upload_time": self.upload_time.isoformat() if self.upload_time else None,
             "status": self.status.value if self.status else None,
             "chunk_count": self.chunk_count,
-            "error_message": self.error_message
+            "error_message": self.error_message,
+            "content_hash": self.content_hash,
+            "alias_of": self.alias_of
         }
 
 
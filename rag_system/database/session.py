@@ -0,0 +1,47 @@
+"""
+同步SQLAlchemy会话
+
+CRUD类（DocumentCRUD、QAPairCRUD等）基于同步SQLAlchemy会话，
+命令行入库、后台入库队列和缓存预热按 database_url 各自创建引擎和会话
+"""
+import logging
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseSession:
+    """database_url 上的SQLAlchemy引擎和会话，不存在的表自动创建"""
+
+    def __init__(self, database_url: str, echo: bool = False, create_directory: bool = True):
+        """
+        Args:
+            database_url: 数据库URL
+            echo: 是否输出SQL日志
+            create_directory: SQLite数据库文件所在目录不存在时是否创建
+        """
+        url = make_url(database_url)
+        if (create_directory and url.get_backend_name() == 'sqlite'
+                and url.database and url.database != ':memory:'):
+            Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+
+        self.engine = create_engine(url, echo=echo)
+        try:
+            Base.metadata.create_all(self.engine)
+            self.session = sessionmaker(bind=self.engine)()
+        except Exception:
+            self.engine.dispose()
+            raise
+
+    def close(self) -> None:
+        """关闭会话并释放连接池"""
+        try:
+            self.session.close()
+        finally:
+            self.engine.dispose()
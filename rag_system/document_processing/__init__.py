@@ -8,6 +8,9 @@ from .splitters import (
     StructureSplitter, HierarchicalSplitter, SemanticSplitter, SplitConfig
 )
 from .preprocessors import TextPreprocessor, PreprocessConfig
+from .semantic_chunker import EmbeddingSemanticSplitter
+from .text_cache import ExtractedTextCache
+from .token_estimator import TokenEstimator, get_token_estimator, get_token_budget
 
 __all__ = [
     "TextExtractorFactory",
@@ -18,7 +21,12 @@ __all__ = [
     "StructureSplitter",
     "HierarchicalSplitter", 
     "SemanticSplitter",
+    "EmbeddingSemanticSplitter",
     "SplitConfig",
     "TextPreprocessor",
-    "PreprocessConfig"
+    "PreprocessConfig",
+    "ExtractedTextCache",
+    "TokenEstimator",
+    "get_token_estimator",
+    "get_token_budget"
 ]
\ No newline at end of file
@@ -3,10 +3,14 @@
 """
 import logging
 import mimetypes
+import signal
+import threading
+import zipfile
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import re
+from xml.etree import ElementTree
 
 from ..utils.exceptions import DocumentError
 
@@ -15,7 +19,10 @@ logger = logging.getLogger(__name__)
 
 class BaseTextExtractor(ABC):
     """文本提取器基类"""
-    
+
+    # 提取逻辑变化（输出文本不同）时递增，使提取文本缓存失效
+    version = "1"
+
     @abstractmethod
     def extract(self, file_path: Union[str, Path]) -> str:
         """提取文本内容"""
@@ -140,6 +147,10 @@ class MarkdownExtractor(BaseTextExtractor):
         return ['.md', '.markdown']
 
 
+class _PageTimeout(Exception):
+    """单页提取超时"""
+
+
 class PDFExtractor(BaseTextExtractor):
     """PDF文件提取器"""
     
@@ -158,36 +169,93 @@ class PDFExtractor(BaseTextExtractor):
             except ImportError:
                 raise DocumentError("PDF处理需要安装PyPDF2或pypdf: pip install PyPDF2")
     
-    def extract(self, file_path: Union[str, Path]) -> str:
-        """提取PDF文件内容"""
+    def get_page_count(self, file_path: Union[str, Path]) -> int:
+        """获取PDF页数"""
         self.validate_file(file_path)
         
         try:
             with open(file_path, 'rb') as file:
-                pdf_reader = self.PyPDF2.PdfReader(file)
-                
-                if len(pdf_reader.pages) == 0:
-                    raise DocumentError("PDF文件没有页面")
-                
-                text_content = []
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text.strip():
-                            text_content.append(page_text)
-                        logger.debug(f"提取PDF第{page_num + 1}页内容")
-                    except Exception as e:
-                        logger.warning(f"提取PDF第{page_num + 1}页失败: {str(e)}")
-                        continue
-                
-                if not text_content:
-                    raise DocumentError("PDF文件中没有可提取的文本内容")
-                
-                full_text = '\n\n'.join(text_content)
-                logger.info(f"成功提取PDF文件: {file_path}, 页数: {len(pdf_reader.pages)}")
-                return full_text.strip()
+                return len(self.PyPDF2.PdfReader(file).pages)
+        except Exception as e:
+            logger.error(f"读取PDF页数失败: {file_path}, 错误: {str(e)}")
+            raise DocumentError(f"读取PDF文件失败: {str(e)}")
+    
+    def iter_pages(self, file_path: Union[str, Path], start: int = 0, end: Optional[int] = None,
+                   page_timeout: Optional[float] = None,
+                   skipped: Optional[List[int]] = None) -> Iterator[Tuple[int, str]]:
+        """
+        按页顺序提取PDF文本
+        
+        Args:
+            file_path: 文件路径
+            start: 起始页索引（从0开始，包含）
+            end: 结束页索引（不包含），None表示到最后一页
+            page_timeout: 单页提取超时（秒），超时的页面被跳过
+            skipped: 可选的列表，超时或提取失败而被跳过的页码追加到其中
+            
+        Yields:
+            (页码（从1开始）, 页面文本)，跳过没有文本的页面
+        """
+        self.validate_file(file_path)
+        
+        with open(file_path, 'rb') as file:
+            pdf_reader = self.PyPDF2.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            end = page_count if end is None else min(end, page_count)
+            
+            for page_index in range(start, end):
+                try:
+                    page_text = self._extract_page_text(pdf_reader.pages[page_index], page_timeout)
+                except _PageTimeout:
+                    logger.warning(f"提取PDF第{page_index + 1}页超时（{page_timeout}秒），已跳过")
+                    if skipped is not None:
+                        skipped.append(page_index + 1)
+                    continue
+                except Exception as e:
+                    logger.warning(f"提取PDF第{page_index + 1}页失败: {str(e)}")
+                    if skipped is not None:
+                        skipped.append(page_index + 1)
+                    continue
                 
+                logger.debug(f"提取PDF第{page_index + 1}页内容")
+                if page_text and page_text.strip():
+                    yield page_index + 1, page_text.strip()
+    
+    def _extract_page_text(self, page, page_timeout: Optional[float]) -> str:
+        """提取单页文本，在主线程中支持超时中断"""
+        if (not page_timeout or not hasattr(signal, 'SIGALRM')
+                or threading.current_thread() is not threading.main_thread()):
+            return page.extract_text()
+        
+        def _on_timeout(signum, frame):
+            raise _PageTimeout()
+        
+        previous_handler = signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, page_timeout)
+        try:
+            return page.extract_text()
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    def extract(self, file_path: Union[str, Path]) -> str:
+        """提取PDF文件内容"""
+        self.validate_file(file_path)
+        
+        try:
+            page_count = self.get_page_count(file_path)
+            if page_count == 0:
+                raise DocumentError("PDF文件没有页面")
+            
+            text_content = [page_text for _, page_text in self.iter_pages(file_path)]
+            
+            if not text_content:
+                raise DocumentError("PDF文件中没有可提取的文本内容")
+            
+            full_text = '\n\n'.join(text_content)
+            logger.info(f"成功提取PDF文件: {file_path}, 页数: {page_count}")
+            return full_text.strip()
+            
         except Exception as e:
             logger.error(f"提取PDF文件失败: {file_path}, 错误: {str(e)}")
             raise DocumentError(f"提取PDF文件失败: {str(e)}")
@@ -197,50 +265,125 @@ class PDFExtractor(BaseTextExtractor):
 
 
 class DocxExtractor(BaseTextExtractor):
-    """DOCX文件提取器"""
+    """
+    DOCX文件提取器
     
-    def __init__(self):
-        self._check_dependencies()
+    用增量XML解析器流式读取 word/document.xml，按文档顺序逐段产出段落和表格行文本，
+    不构建完整的对象模型，处理完的元素立即释放，内存占用与文档大小基本无关
+    """
     
-    def _check_dependencies(self):
-        """检查依赖库"""
+    # 2: 流式解析，表格文本保留在原始位置
+    version = "2"
+    
+    _DOCUMENT_PART = 'word/document.xml'
+    _W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    _PARAGRAPH = _W + 'p'
+    _TEXT = _W + 't'
+    _TAB = _W + 'tab'
+    _BREAKS = (_W + 'br', _W + 'cr')
+    _TABLE = _W + 'tbl'
+    _ROW = _W + 'tr'
+    _CELL = _W + 'tc'
+    _BODY = _W + 'body'
+    
+    def iter_blocks(self, file_path: Union[str, Path]) -> Iterator[str]:
+        """
+        按文档顺序逐个产出段落文本和表格行文本（单元格以 | 分隔）
+        
+        文本框等嵌套在段落中的段落单独产出；嵌套表格的行并入外层单元格
+        """
+        self.validate_file(file_path)
+        
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open(self._get_document_part(archive)) as document_xml:
+                yield from self._iter_xml_blocks(document_xml)
+    
+    def _get_document_part(self, archive: zipfile.ZipFile) -> str:
+        """从包关系中查找正文部件，默认为 word/document.xml"""
         try:
-            import docx
-            self.docx = docx
-        except ImportError:
-            raise DocumentError("DOCX处理需要安装python-docx: pip install python-docx")
+            rels = ElementTree.fromstring(archive.read('_rels/.rels'))
+        except (KeyError, ElementTree.ParseError):
+            return self._DOCUMENT_PART
+        for rel in rels:
+            if rel.get('Type', '').endswith('/officeDocument') and rel.get('Target'):
+                return rel.get('Target').lstrip('/')
+        return self._DOCUMENT_PART
+    
+    def _iter_xml_blocks(self, document_xml) -> Iterator[str]:
+        paragraphs: List[List[str]] = []  # 正在读取的段落（文本框中的段落会嵌套）
+        tables: List[List[List[List[str]]]] = []  # 表格 -> 单元格列表 -> 段落文本
+        body = None
+        depth = 0
+        
+        for event, elem in ElementTree.iterparse(document_xml, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                depth += 1
+                if tag == self._PARAGRAPH:
+                    paragraphs.append([])
+                elif tag == self._TABLE:
+                    tables.append([])
+                elif tag == self._ROW and tables:
+                    tables[-1].clear()
+                elif tag == self._CELL and tables:
+                    tables[-1].append([])
+                elif tag == self._BODY:
+                    body = elem
+                continue
+            
+            depth -= 1
+            if tag == self._TEXT:
+                if paragraphs and elem.text:
+                    paragraphs[-1].append(elem.text)
+            elif tag == self._TAB:
+                if paragraphs:
+                    paragraphs[-1].append('\t')
+            elif tag in self._BREAKS:
+                if paragraphs:
+                    paragraphs[-1].append('\n')
+            elif tag == self._PARAGRAPH:
+                text = ''.join(paragraphs.pop()).strip() if paragraphs else ''
+                if text:
+                    if tables and tables[-1]:
+                        tables[-1][-1].append(text)
+                    else:
+                        yield text
+            elif tag == self._ROW and tables:
+                cells = ['\n'.join(cell).strip() for cell in tables[-1]]
+                row_text = ' | '.join(cell for cell in cells if cell)
+                tables[-1].clear()
+                if row_text:
+                    if len(tables) > 1 and tables[-2]:
+                        # 嵌套表格的行并入外层单元格
+                        tables[-2][-1].append(row_text)
+                    else:
+                        yield row_text
+            elif tag == self._TABLE and tables:
+                tables.pop()
+            
+            # 段落和表格行读取后立即释放子元素，正文下的顶层元素处理完后从正文移除，
+            # 避免解析树随文档增长
+            if tag == self._PARAGRAPH or tag == self._ROW:
+                elem.clear()
+            if depth == 2 and body is not None:
+                body.clear()
     
     def extract(self, file_path: Union[str, Path]) -> str:
         """提取DOCX文件内容"""
         self.validate_file(file_path)
         
         try:
-            doc = self.docx.Document(file_path)
+            full_text = '\n\n'.join(self.iter_blocks(file_path))
             
-            text_content = []
-            
-            # 提取段落文本
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text_content.append(paragraph.text.strip())
-            
-            # 提取表格文本
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            row_text.append(cell.text.strip())
-                    if row_text:
-                        text_content.append(' | '.join(row_text))
-            
-            if not text_content:
+            if not full_text:
                 raise DocumentError("DOCX文件中没有可提取的文本内容")
             
-            full_text = '\n\n'.join(text_content)
             logger.info(f"成功提取DOCX文件: {file_path}")
-            return full_text.strip()
+            return full_text
             
+        except DocumentError as e:
+            logger.error(f"提取DOCX文件失败: {file_path}, 错误: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"提取DOCX文件失败: {file_path}, 错误: {str(e)}")
             raise DocumentError(f"提取DOCX文件失败: {str(e)}")
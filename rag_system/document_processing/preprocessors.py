@@ -3,12 +3,75 @@
 """
 import logging
 import re
+import unicodedata
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Optional, Set, Tuple
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# 预编译的清理规则，各预处理器与融合处理路径共用
+_BLANK_LINES = re.compile(r'\n\s*\n\s*\n+')
+_EXTRA_NEWLINES = re.compile(r'\n{3,}')
+_SPACE_RUN = re.compile(r'[ \t]{2,}|\t')
+_LINE_EDGE_SPACE = re.compile(r'[^\S\n]*\n[^\S\n]*')
+_SPECIAL_CHARS = re.compile(r'[^\w\s\u4e00-\u9fff.,!?;:()[\]{}"\'`~@#$%^&*+=|\\/<>-]')
+_URL = re.compile(r'https?://[^\s<>"{}|\\^`[\]]+|www\.[^\s<>"{}|\\^`[\]]+', re.IGNORECASE)
+_URL_HINT = re.compile(r'://|www\.', re.IGNORECASE)
+_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_PATTERNS = [
+    re.compile(r'\b\d{3}-\d{3}-\d{4}\b'),  # 123-456-7890
+    re.compile(r'\b\d{3}\.\d{3}\.\d{4}\b'),  # 123.456.7890
+    re.compile(r'\b\d{10}\b'),  # 1234567890
+    re.compile(r'\b\d{3}\s\d{3}\s\d{4}\b'),  # 123 456 7890
+    re.compile(r'\+\d{1,3}\s?\d{3,4}\s?\d{3,4}\s?\d{3,4}'),  # 国际格式
+]
+# 所有电话号码模式都至少包含连续3位数字
+_DIGIT_RUN = re.compile(r'\d{3}')
+_WORD = re.compile(r'\b\w+\b')
+
+# 控制字符（保留换行符和制表符）和零宽字符
+_REMOVED_CHARS = [
+    (chr(code), '')
+    for code in [*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F, 0x200B, 0x200C, 0x200D, 0xFEFF]
+]
+# 全角字符转半角
+_HALFWIDTH_CHARS = [(chr(code), chr(code - 0xFEE0)) for code in range(0xFF01, 0xFF5F)]
+_HALFWIDTH_CHARS.append(('\u3000', ' '))
+
+
+def _replace_chars(text: str, replacements: List[Tuple[str, str]]) -> str:
+    """逐字符替换，只处理文本中出现的字符
+
+    对含中文的文本，str.replace 比 str.translate 的逐字符查表快得多。
+    替换结果不会再成为其他待替换字符，因此与一次性映射结果相同。
+    """
+    for char, replacement in replacements:
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
+
+
+def _normalize_whitespace(text: str) -> str:
+    """合并空格、去除各行首尾空白并压缩空行
+
+    先去除行首尾空白，只含空白的行就变成连续换行符，再压缩连续换行即可，
+    结果与先压缩空行再逐行 strip 相同。
+    """
+    if '\t' in text or '  ' in text:
+        text = _SPACE_RUN.sub(' ', text)
+    text = _LINE_EDGE_SPACE.sub('\n', text)
+    if '\n\n\n' in text:
+        text = _EXTRA_NEWLINES.sub('\n\n', text)
+    
+    # 首行开头和末行结尾的空白（保留换行符）
+    start, end = 0, len(text)
+    while start < end and text[start] != '\n' and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1] != '\n' and text[end - 1].isspace():
+        end -= 1
+    return text[start:end]
+
 
 @dataclass
 class PreprocessConfig:
@@ -45,18 +108,8 @@ class WhitespaceNormalizer(BasePreprocessor):
         if not text:
             return text
         
-        # 先标准化段落分隔符
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        
-        # 将连续的空格和制表符统一为单个空格，但保留换行符
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # 移除行首行尾空白，但保留换行符结构
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines]
-        text = '\n'.join(lines)
-        
-        return text
+        # 标准化段落分隔符，合并连续的空格和制表符，移除行首行尾空白但保留换行符结构
+        return _normalize_whitespace(text)
 
 
 class SpecialCharCleaner(BasePreprocessor):
@@ -67,16 +120,13 @@ class SpecialCharCleaner(BasePreprocessor):
         if not text:
             return text
         
-        # 移除控制字符（保留换行符和制表符）
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
-        
-        # 移除零宽字符
-        text = re.sub(r'[\u200B-\u200D\uFEFF]', '', text)
+        # 移除控制字符（保留换行符和制表符）和零宽字符
+        text = _replace_chars(text, _REMOVED_CHARS)
         
         # 可选：移除其他特殊字符
         if self.config.remove_special_chars:
             # 保留基本标点符号，移除其他特殊字符
-            text = re.sub(r'[^\w\s\u4e00-\u9fff.,!?;:()[\]{}"\'`~@#$%^&*+=|\\/<>-]', '', text)
+            text = _SPECIAL_CHARS.sub('', text)
         
         return text
 
@@ -89,8 +139,6 @@ class UnicodeNormalizer(BasePreprocessor):
         if not text:
             return text
         
-        import unicodedata
-        
         # 标准化Unicode（NFC形式）
         text = unicodedata.normalize('NFC', text)
         
@@ -101,18 +149,7 @@ class UnicodeNormalizer(BasePreprocessor):
     
     def _convert_fullwidth_to_halfwidth(self, text: str) -> str:
         """转换全角字符为半角字符"""
-        result = []
-        for char in text:
-            code = ord(char)
-            # 全角字符范围
-            if 0xFF01 <= code <= 0xFF5E:
-                # 转换为对应的半角字符
-                result.append(chr(code - 0xFEE0))
-            elif code == 0x3000:  # 全角空格
-                result.append(' ')
-            else:
-                result.append(char)
-        return ''.join(result)
+        return _replace_chars(text, _HALFWIDTH_CHARS)
 
 
 class URLEmailCleaner(BasePreprocessor):
@@ -125,26 +162,16 @@ class URLEmailCleaner(BasePreprocessor):
         
         if self.config.remove_urls:
             # 移除URL
-            url_pattern = r'https?://[^\s<>"{}|\\^`[\]]+|www\.[^\s<>"{}|\\^`[\]]+'
-            text = re.sub(url_pattern, '', text, flags=re.IGNORECASE)
+            text = _URL.sub('', text)
         
         if self.config.remove_emails:
             # 移除邮箱地址
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            text = re.sub(email_pattern, '', text)
+            text = _EMAIL.sub('', text)
         
         if self.config.remove_phone_numbers:
             # 移除电话号码（简单模式）
-            phone_patterns = [
-                r'\b\d{3}-\d{3}-\d{4}\b',  # 123-456-7890
-                r'\b\d{3}\.\d{3}\.\d{4}\b',  # 123.456.7890
-                r'\b\d{10}\b',  # 1234567890
-                r'\b\d{3}\s\d{3}\s\d{4}\b',  # 123 456 7890
-                r'\+\d{1,3}\s?\d{3,4}\s?\d{3,4}\s?\d{3,4}',  # 国际格式
-            ]
-            
-            for pattern in phone_patterns:
-                text = re.sub(pattern, '', text)
+            for pattern in _PHONE_PATTERNS:
+                text = pattern.sub('', text)
         
         return text
 
@@ -152,19 +179,29 @@ class URLEmailCleaner(BasePreprocessor):
 class CustomPatternCleaner(BasePreprocessor):
     """自定义模式清理器"""
     
+    def __init__(self, config: Optional[PreprocessConfig] = None):
+        super().__init__(config)
+        self.patterns = self._compile_patterns()
+    
     def process(self, text: str) -> str:
         """使用自定义模式清理文本"""
-        if not text or not self.config.custom_patterns:
+        if not text:
             return text
         
-        for pattern in self.config.custom_patterns:
+        for pattern in self.patterns:
+            text = pattern.sub('', text)
+        
+        return text
+    
+    def _compile_patterns(self) -> List[re.Pattern]:
+        """编译自定义模式，跳过无效的正则表达式"""
+        patterns = []
+        for pattern in self.config.custom_patterns or []:
             try:
-                text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+                patterns.append(re.compile(pattern, re.IGNORECASE))
             except re.error as e:
                 logger.warning(f"无效的正则表达式模式: {pattern}, 错误: {str(e)}")
-                continue
-        
-        return text
+        return patterns
 
 
 class StopwordRemover(BasePreprocessor):
@@ -180,7 +217,7 @@ class StopwordRemover(BasePreprocessor):
             return text
         
         # 简单的词分割（可以根据需要改进）
-        words = re.findall(r'\b\w+\b', text.lower())
+        words = _WORD.findall(text.lower())
         filtered_words = [word for word in words if word not in self.stopwords]
         
         # 重建文本（简化处理）
@@ -220,6 +257,15 @@ class TextPreprocessor:
     def __init__(self, config: Optional[PreprocessConfig] = None):
         self.config = config or PreprocessConfig()
         self.processors = self._initialize_processors()
+        # 仅包含内置预处理器时使用融合处理路径
+        self._fused = True
+        self._char_replacements = self._build_char_replacements()
+        self._custom_patterns = next(
+            (p.patterns for p in self.processors if isinstance(p, CustomPatternCleaner)), []
+        )
+        self._stopwords = next(
+            (p.stopwords for p in self.processors if isinstance(p, StopwordRemover)), set()
+        )
     
     def _initialize_processors(self) -> List[BasePreprocessor]:
         """初始化预处理器列表"""
@@ -252,9 +298,19 @@ class TextPreprocessor:
         
         logger.debug(f"开始预处理文本，长度: {len(text)}")
         
+        if self._fused:
+            processed_text = self._process_fused(text)
+        else:
+            processed_text = self._process_chain(text)
+        
+        logger.debug(f"预处理完成，处理后长度: {len(processed_text)}")
+        
+        return processed_text
+    
+    def _process_chain(self, text: str) -> str:
+        """依次应用所有预处理器，每个预处理器各自遍历一次文本"""
         processed_text = text
         
-        # 依次应用所有预处理器
         for processor in self.processors:
             try:
                 processed_text = processor.process(processed_text)
@@ -267,11 +323,53 @@ class TextPreprocessor:
             processed_text = processed_text.lower()
         
         # 最终清理
-        processed_text = self._final_cleanup(processed_text)
+        return self._final_cleanup(processed_text)
+    
+    def _build_char_replacements(self) -> List[Tuple[str, str]]:
+        """合并全角转换和控制字符移除为一张字符替换表"""
+        # 全角转换的结果都是可见ASCII字符或空格，不会再被移除，两步可以合并
+        if self.config.normalize_unicode:
+            return _HALFWIDTH_CHARS + _REMOVED_CHARS
+        return list(_REMOVED_CHARS)
+    
+    def _process_fused(self, text: str) -> str:
+        """按与预处理器链相同的顺序应用预编译规则，结果与逐个处理一致"""
+        config = self.config
         
-        logger.debug(f"预处理完成，处理后长度: {len(processed_text)}")
+        if config.normalize_unicode:
+            text = unicodedata.normalize('NFC', text)
+        text = _replace_chars(text, self._char_replacements)
         
-        return processed_text
+        if config.remove_special_chars:
+            text = _SPECIAL_CHARS.sub('', text)
+        
+        # 先用廉价的必要条件判断，文本中不可能匹配的规则整遍跳过
+        if config.remove_urls and _URL_HINT.search(text):
+            text = _URL.sub('', text)
+        if config.remove_emails and '@' in text:
+            text = _EMAIL.sub('', text)
+        if config.remove_phone_numbers and _DIGIT_RUN.search(text):
+            for pattern in _PHONE_PATTERNS:
+                text = pattern.sub('', text)
+        
+        for pattern in self._custom_patterns:
+            text = pattern.sub('', text)
+        
+        if config.remove_extra_whitespace:
+            text = _normalize_whitespace(text)
+        
+        if config.remove_stopwords:
+            words = _WORD.findall(text.lower())
+            text = ' '.join(word for word in words if word not in self._stopwords)
+        
+        if config.convert_to_lowercase:
+            text = text.lower()
+        
+        # 空白标准化之后不会再出现多余空行，只有未标准化时才需要清理
+        if not config.remove_extra_whitespace:
+            text = _BLANK_LINES.sub('\n\n', text)
+        
+        return text.strip()
     
     def _final_cleanup(self, text: str) -> str:
         """最终清理"""
@@ -279,7 +377,7 @@ class TextPreprocessor:
             return text
         
         # 移除多余的空行
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+        text = _BLANK_LINES.sub('\n\n', text)
         
         # 移除首尾空白
         text = text.strip()
@@ -293,6 +391,7 @@ class TextPreprocessor:
     def add_custom_processor(self, processor: BasePreprocessor):
         """添加自定义预处理器"""
         self.processors.append(processor)
+        self._fused = False
     
     def get_processing_stats(self, original_text: str, processed_text: str) -> Dict[str, Any]:
         """获取处理统计信息"""
@@ -300,7 +399,7 @@ class TextPreprocessor:
             "original_length": len(original_text),
             "processed_length": len(processed_text),
             "reduction_ratio": 1 - (len(processed_text) / len(original_text)) if original_text else 0,
-            "original_word_count": len(re.findall(r'\b\w+\b', original_text)),
-            "processed_word_count": len(re.findall(r'\b\w+\b', processed_text)),
+            "original_word_count": len(_WORD.findall(original_text)),
+            "processed_word_count": len(_WORD.findall(processed_text)),
             "processors_used": [p.__class__.__name__ for p in self.processors]
         }
\ No newline at end of file
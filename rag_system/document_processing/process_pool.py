@@ -0,0 +1,712 @@
+"""
+文档处理进程池
+
+文本提取、预处理和分割是CPU密集型操作，直接在事件循环中执行会阻塞并发的问答请求。
+本模块将这些步骤放到有界的进程池中执行：
+- 工作进程按配置重建提取器、预处理器和分割器，并在进程内复用
+- 只回传预处理后的文本和文本块偏移量等基础数据，不回传对象图
+- 支持配置工作进程数、每个进程的最大任务数和内存上限
+- 分页格式（如PDF）按页码范围在多个工作进程中并行提取、预处理和分割，
+  父进程只按页顺序合并块偏移量和块ID
+- 可选的提取文本缓存：同一文件重新分块时跳过解析
+"""
+import asyncio
+import logging
+import multiprocessing
+import sys
+from bisect import bisect_right
+from collections import deque
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .extractors import TextExtractorFactory
+from .preprocessors import TextPreprocessor, PreprocessConfig
+from .splitters import RecursiveTextSplitter, SplitConfig, assign_chunk_ids
+from .text_cache import get_text_cache
+from ..models.document import TextChunk
+from ..utils.exceptions import DocumentError, ProcessingError
+from ..utils.executors import EXTRACTION, get_executor
+from ..utils.helpers import compute_chunk_id
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内复用的提取器工厂
+_worker_extractor_factory: Optional[TextExtractorFactory] = None
+
+# 工作进程内复用的处理组件，按配置缓存
+_worker_components: Dict[str, Tuple[TextExtractorFactory, TextPreprocessor, RecursiveTextSplitter]] = {}
+
+
+def _init_worker(memory_limit_mb: Optional[int]) -> None:
+    """工作进程初始化：设置内存上限"""
+    if not memory_limit_mb:
+        return
+
+    try:
+        import resource
+    except ImportError:
+        # Windows等平台不支持resource模块
+        return
+
+    limit = int(memory_limit_mb) * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"设置文档处理进程内存上限失败: {e}")
+
+
+def _get_extractor_factory() -> TextExtractorFactory:
+    """获取（或创建）当前进程的提取器工厂"""
+    global _worker_extractor_factory
+    if _worker_extractor_factory is None:
+        _worker_extractor_factory = TextExtractorFactory()
+    return _worker_extractor_factory
+
+
+def _get_worker_components(split_options: Dict[str, Any],
+                           preprocess_options: Dict[str, Any]):
+    """获取（或创建）当前进程的处理组件"""
+    cache_key = repr((sorted(split_options.items()), sorted(preprocess_options.items())))
+    components = _worker_components.get(cache_key)
+    if components is None:
+        components = (
+            _get_extractor_factory(),
+            TextPreprocessor(PreprocessConfig(**preprocess_options)),
+            RecursiveTextSplitter(SplitConfig(**split_options))
+        )
+        _worker_components[cache_key] = components
+    return components
+
+
+def encode_chunks(text: str, chunks: List[Any]) -> List[Tuple[str, int, int, Optional[str], int, Dict[str, Any]]]:
+    """
+    将文本块编码为偏移量
+
+    能在文本中原样定位的块只回传(start, end)，其余块（如合并后的块）附带内容；
+    保留块ID以便元数据中的父子块引用保持有效
+
+    Returns:
+        (chunk_id, start, end, content, chunk_index, metadata) 列表
+    """
+    encoded = []
+    cursor = 0
+    for chunk in chunks:
+        content = chunk.content
+        start = text.find(content, cursor)
+        if start < 0:
+            start = text.find(content)
+
+        if start >= 0:
+            end = start + len(content)
+            cursor = start + 1
+            encoded.append((chunk.id, start, end, None, chunk.chunk_index, dict(chunk.metadata)))
+        else:
+            encoded.append((chunk.id, -1, -1, content, chunk.chunk_index, dict(chunk.metadata)))
+    return encoded
+
+
+def iter_chunks(payload: Dict[str, Any], doc_id: str) -> Iterator[TextChunk]:
+    """根据工作进程回传的文本和偏移量逐个重建文本块，用于流式处理"""
+    text = payload['text']
+    for chunk_id, start, end, content, chunk_index, metadata in payload['chunks']:
+        if content is None:
+            content = text[start:end]
+        yield TextChunk(
+            id=chunk_id,
+            document_id=doc_id,
+            content=content,
+            chunk_index=chunk_index,
+            metadata=metadata
+        )
+
+
+def decode_chunks(payload: Dict[str, Any], doc_id: str) -> List[TextChunk]:
+    """根据工作进程回传的文本和偏移量重建文本块"""
+    return list(iter_chunks(payload, doc_id))
+
+
+def _preprocess_document(document: Dict[str, Any], preprocessor) -> Dict[str, Any]:
+    """
+    预处理提取出的文档
+
+    Args:
+        document: {'text': 全文} 或 {'pages': [(页码, 页面文本), ...]}
+
+    Returns:
+        同样结构的预处理结果（分页文档去掉预处理后为空的页），附带原始文本长度
+    """
+    try:
+        if 'pages' not in document:
+            text_content = document['text']
+            return {'text': preprocessor.process(text_content), 'raw_length': len(text_content)}
+
+        pages = []
+        raw_length = 0
+        for page_number, page_text in document['pages']:
+            raw_length += len(page_text)
+            processed = preprocessor.process(page_text).strip()
+            if processed:
+                pages.append((page_number, processed))
+        return {'pages': pages, 'raw_length': raw_length}
+    except Exception as e:
+        raise ProcessingError(f"文本分割失败: {str(e)}")
+
+
+def _split_text(text: str, raw_length: int, doc_id: str, splitter) -> Dict[str, Any]:
+    """分割预处理后的整篇文本"""
+    try:
+        chunks = assign_chunk_ids(splitter.split(text, doc_id))
+    except Exception as e:
+        raise ProcessingError(f"文本分割失败: {str(e)}")
+
+    if not chunks:
+        raise ProcessingError("文本分割后没有生成任何块")
+
+    return {
+        'text': text,
+        'chunks': encode_chunks(text, chunks),
+        'raw_length': raw_length
+    }
+
+
+def _split_pages(pages: List[Tuple[int, str]], raw_length: int, doc_id: str, splitter,
+                 require_chunks: bool = True) -> Dict[str, Any]:
+    """拼接预处理后的页面并分割，将页码写入文本块元数据"""
+    if not pages and not require_chunks:
+        return {'text': '', 'chunks': [], 'raw_length': raw_length}
+
+    page_starts = []
+    page_numbers = []
+    offset = 0
+    for page_number, processed in pages:
+        if page_starts:
+            offset += 2
+        page_starts.append(offset)
+        page_numbers.append(page_number)
+        offset += len(processed)
+
+    text = '\n\n'.join(processed for _, processed in pages)
+    try:
+        chunks = assign_chunk_ids(splitter.split(text, doc_id))
+    except Exception as e:
+        raise ProcessingError(f"文本分割失败: {str(e)}")
+
+    if not chunks and require_chunks:
+        raise ProcessingError("文本分割后没有生成任何块")
+
+    encoded = encode_chunks(text, chunks)
+    for _, start, end, content, _, metadata in encoded:
+        if start < 0:
+            # 合并过的块按开头内容定位
+            start = text.find(content[:50])
+            end = start + len(content) if start >= 0 else -1
+        if start < 0:
+            continue
+        metadata['page_number'] = page_numbers[bisect_right(page_starts, start) - 1]
+        metadata['page_end'] = page_numbers[bisect_right(page_starts, max(end - 1, start)) - 1]
+
+    return {
+        'text': text,
+        'chunks': encoded,
+        'raw_length': raw_length
+    }
+
+
+def _split_page_groups(pages: List[Tuple[int, str]], raw_length: int, doc_id: str, splitter,
+                       pages_per_task: int) -> Dict[str, Any]:
+    """按与并行提取相同的页码范围分组分割，使缓存命中时与重新解析时得到相同的文本块"""
+    merger = PageRangeMerger(doc_id)
+    parts = [
+        merger.merge(_split_pages(list(group), 0, doc_id, splitter, require_chunks=False))
+        for _, group in groupby(pages, key=lambda page: (page[0] - 1) // pages_per_task)
+    ]
+    payload = join_parts(parts)
+    if not payload['chunks']:
+        raise ProcessingError("文本分割后没有生成任何块")
+    payload['raw_length'] = raw_length
+    return payload
+
+
+def _split_document(document: Dict[str, Any], doc_id: str, preprocessor, splitter,
+                    cache=None, preprocessed_key: Optional[str] = None,
+                    pages_per_task: Optional[int] = None, text_only: bool = False) -> Dict[str, Any]:
+    """预处理并分割提取出的文档，启用预处理缓存时写入预处理结果"""
+    if 'pages' in document and not document['pages']:
+        raise DocumentError("文档中没有可提取的文本内容")
+
+    processed = _preprocess_document(document, preprocessor)
+    if cache is not None and preprocessed_key and _is_complete(document):
+        cache.put(preprocessed_key, processed)
+    return _split_processed(processed, doc_id, splitter, pages_per_task, text_only)
+
+
+def _is_complete(document: Dict[str, Any]) -> bool:
+    """提取结果是否完整：有页面超时或提取失败被跳过的文档不写入缓存，下次重新解析"""
+    skipped_pages = document.get('skipped_pages', 0)
+    if skipped_pages:
+        logger.warning(f"文档有{skipped_pages}页提取失败被跳过，不写入提取文本缓存")
+    return not skipped_pages
+
+
+def _split_processed(processed: Dict[str, Any], doc_id: str, splitter,
+                     pages_per_task: Optional[int] = None, text_only: bool = False) -> Dict[str, Any]:
+    """
+    分割预处理后的文档，提供 pages_per_task 时分页文档按页码范围分组分割
+
+    text_only 时不分割，只返回预处理后的文本（如由嵌入语义分割器在父进程中分块）
+    """
+    if text_only:
+        return _text_payload(processed)
+    if 'pages' in processed:
+        if pages_per_task:
+            return _split_page_groups(processed['pages'], processed['raw_length'], doc_id, splitter,
+                                      pages_per_task)
+        return _split_pages(processed['pages'], processed['raw_length'], doc_id, splitter)
+    return _split_text(processed['text'], processed['raw_length'], doc_id, splitter)
+
+
+def _text_payload(processed: Dict[str, Any]) -> Dict[str, Any]:
+    """只包含预处理后文本、不含文本块的结果"""
+    if 'pages' in processed:
+        text = '\n\n'.join(page_text for _, page_text in processed['pages'])
+    else:
+        text = processed['text']
+    return {'text': text, 'chunks': [], 'raw_length': processed['raw_length']}
+
+
+def _extract_document(extractor_factory: TextExtractorFactory, extractor, file_path: str,
+                      page_timeout: Optional[float]) -> Dict[str, Any]:
+    """提取文档文本，支持分页的格式逐页提取并记录被跳过的页数"""
+    try:
+        if hasattr(extractor, 'iter_pages'):
+            skipped = []
+            pages = list(extractor.iter_pages(file_path, page_timeout=page_timeout, skipped=skipped))
+            return {'pages': pages, 'skipped_pages': len(skipped)}
+        text_content = extractor_factory.extract_text(file_path)
+    except DocumentError:
+        raise
+    except Exception as e:
+        raise DocumentError(f"提取文档文本失败: {str(e)}")
+
+    if not text_content or not text_content.strip():
+        raise DocumentError("文档中没有可提取的文本内容")
+    return {'text': text_content.strip()}
+
+
+def _load_cached_document(cache, file_path: str, extractor,
+                          preprocess_options: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], bool, Tuple]:
+    """
+    查找文档的缓存文本，优先使用预处理后的结果
+
+    Returns:
+        (缓存的文档或None, 是否已预处理, (原始文本键, 预处理文本键))
+    """
+    keys = cache.make_keys(file_path, extractor, preprocess_options)
+    raw_key, preprocessed_key = keys
+    if preprocessed_key:
+        processed = cache.get(preprocessed_key)
+        if processed is not None:
+            return processed, True, keys
+    return cache.get(raw_key), False, keys
+
+
+def extract_and_split(file_path: str, doc_id: str,
+                      split_options: Dict[str, Any],
+                      preprocess_options: Dict[str, Any],
+                      page_timeout: Optional[float] = None,
+                      cache_options: Optional[Dict[str, Any]] = None,
+                      pages_per_task: Optional[int] = None,
+                      text_only: bool = False) -> Dict[str, Any]:
+    """
+    在工作进程中提取、预处理并分割文档
+
+    支持分页提取的格式（如PDF）逐页处理，文本块元数据中带有页码；提供 pages_per_task 时
+    按页码范围分组分割，与 stream_page_chunks 的结果一致。
+    提供 cache_options 时先查找提取文本缓存，命中则跳过解析；text_only 时只返回预处理后的文本
+
+    Returns:
+        {'text': 预处理后的文本, 'chunks': 文本块偏移量列表, 'raw_length': 原始文本长度}
+    """
+    extractor_factory, preprocessor, splitter = _get_worker_components(split_options, preprocess_options)
+
+    if not Path(file_path).exists():
+        raise DocumentError(f"文件不存在: {file_path}")
+
+    if not extractor_factory.is_supported(file_path):
+        file_type = extractor_factory.detect_file_type(file_path)
+        supported_formats = extractor_factory.get_supported_formats()
+        raise DocumentError(
+            f"不支持的文件格式: {file_type}. "
+            f"支持的格式: {', '.join(supported_formats)}"
+        )
+
+    extractor = extractor_factory.get_extractor(file_path)
+    cache = get_text_cache(cache_options)
+    if cache is None:
+        return _split_document(_extract_document(extractor_factory, extractor, file_path, page_timeout),
+                               doc_id, preprocessor, splitter, pages_per_task=pages_per_task, text_only=text_only)
+
+    document, preprocessed, (raw_key, preprocessed_key) = _load_cached_document(
+        cache, file_path, extractor, preprocess_options
+    )
+    if preprocessed:
+        return _split_processed(document, doc_id, splitter, pages_per_task, text_only)
+    if document is None:
+        document = _extract_document(extractor_factory, extractor, file_path, page_timeout)
+        if _is_complete(document):
+            cache.put(raw_key, document)
+    return _split_document(document, doc_id, preprocessor, splitter, cache, preprocessed_key,
+                           pages_per_task, text_only)
+
+
+def split_cached(file_path: str, doc_id: str,
+                 split_options: Dict[str, Any],
+                 preprocess_options: Dict[str, Any],
+                 cache_options: Dict[str, Any],
+                 pages_per_task: Optional[int] = None,
+                 text_only: bool = False) -> Optional[Dict[str, Any]]:
+    """在工作进程中只用缓存的文本分割文档，未命中时返回None"""
+    _, preprocessor, splitter = _get_worker_components(split_options, preprocess_options)
+    cache = get_text_cache(cache_options)
+    extractor = _get_extractor_factory().get_extractor(file_path)
+    if cache is None or extractor is None or not Path(file_path).exists():
+        return None
+
+    document, preprocessed, (_, preprocessed_key) = _load_cached_document(
+        cache, file_path, extractor, preprocess_options
+    )
+    if document is None:
+        return None
+    if preprocessed:
+        return _split_processed(document, doc_id, splitter, pages_per_task, text_only)
+    return _split_document(document, doc_id, preprocessor, splitter, cache, preprocessed_key,
+                           pages_per_task, text_only)
+
+
+def count_pages(file_path: str) -> int:
+    """获取文档页数，不支持分页的格式返回0"""
+    extractor = _get_extractor_factory().get_extractor(file_path)
+    if extractor is None or not hasattr(extractor, 'get_page_count'):
+        return 0
+    return extractor.get_page_count(file_path)
+
+
+def extract_page_range(file_path: str, start: int, end: int,
+                       page_timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    在工作进程中提取指定页码范围的文本
+
+    Returns:
+        {'pages': [(页码, 页面文本), ...], 'skipped': 被跳过的页码列表}
+    """
+    extractor = _get_extractor_factory().get_extractor(file_path)
+    skipped = []
+    try:
+        pages = list(extractor.iter_pages(file_path, start, end, page_timeout=page_timeout, skipped=skipped))
+    except DocumentError:
+        raise
+    except Exception as e:
+        raise DocumentError(f"提取文档文本失败: {str(e)}")
+    return {'pages': pages, 'skipped': skipped}
+
+
+def split_page_range(file_path: str, start: int, end: int, doc_id: str,
+                     split_options: Dict[str, Any],
+                     preprocess_options: Dict[str, Any],
+                     page_timeout: Optional[float] = None,
+                     keep_pages: bool = False,
+                     text_only: bool = False) -> Dict[str, Any]:
+    """
+    在工作进程中提取、预处理并分割指定页码范围
+
+    块偏移量相对于该范围预处理后的文本，块ID和序号由父进程合并时重新生成；
+    text_only 时不分割，只返回预处理后的文本
+
+    Returns:
+        {'text', 'chunks', 'raw_length', 'skipped_pages'}，keep_pages 时附带
+        原始页面 'raw_pages' 和预处理后的页面 'pages'，供父进程写入提取文本缓存
+    """
+    _, preprocessor, splitter = _get_worker_components(split_options, preprocess_options)
+    extracted = extract_page_range(file_path, start, end, page_timeout)
+    processed = _preprocess_document({'pages': extracted['pages']}, preprocessor)
+
+    if text_only:
+        part = _text_payload(processed)
+    else:
+        part = _split_pages(processed['pages'], processed['raw_length'], doc_id, splitter, require_chunks=False)
+    part['skipped_pages'] = len(extracted['skipped'])
+    if keep_pages:
+        part['raw_pages'] = extracted['pages']
+        part['pages'] = processed['pages']
+    return part
+
+
+def cache_pages(file_path: str, raw_pages: List[Tuple[int, str]], pages: List[Tuple[int, str]],
+                raw_length: int, preprocess_options: Dict[str, Any],
+                cache_options: Dict[str, Any]) -> None:
+    """将并行提取的完整页面写入提取文本缓存"""
+    cache = get_text_cache(cache_options)
+    extractor = _get_extractor_factory().get_extractor(file_path)
+    if cache is None or extractor is None:
+        return
+
+    raw_key, preprocessed_key = cache.make_keys(file_path, extractor, preprocess_options)
+    cache.put(raw_key, {'pages': raw_pages})
+    if preprocessed_key:
+        cache.put(preprocessed_key, {'pages': pages, 'raw_length': raw_length})
+
+
+class PageRangeMerger:
+    """
+    按页顺序合并各页码范围的分割结果
+
+    块序号连续编号，块ID按整篇文档中相同内容的出现次序重新生成（与 assign_chunk_ids 一致）；
+    块偏移量仍相对于所在范围的文本，另记录该范围文本在拼接后全文中的起始位置
+    """
+
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self.length = 0
+        self.chunk_count = 0
+        self.raw_length = 0
+        self.skipped_pages = 0
+        self._occurrences: Dict[str, int] = {}
+
+    def merge(self, part: Dict[str, Any]) -> Dict[str, Any]:
+        text = part['text']
+        chunks = []
+        for _, start, end, content, _, metadata in part['chunks']:
+            chunk_content = content if content is not None else text[start:end]
+            position = self._occurrences.get(chunk_content, 0)
+            self._occurrences[chunk_content] = position + 1
+            chunks.append((
+                compute_chunk_id(self.doc_id, chunk_content, position),
+                start, end, content, self.chunk_count, metadata
+            ))
+            self.chunk_count += 1
+
+        # 范围文本之间与整篇分割时一样以空行分隔
+        offset = self.length + 2 if self.length else 0
+        if text:
+            self.length = offset + len(text)
+        self.raw_length += part['raw_length']
+        self.skipped_pages += part.get('skipped_pages', 0)
+        return {**part, 'chunks': chunks, 'offset': offset}
+
+
+def join_parts(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """将合并后的各范围结果拼接为整篇文档的文本和块偏移量"""
+    if len(parts) == 1 and not parts[0].get('offset'):
+        return parts[0]
+
+    texts = []
+    chunks = []
+    raw_length = 0
+    for part in parts:
+        offset = part.get('offset', 0)
+        if part['text']:
+            texts.append(part['text'])
+        for chunk_id, start, end, content, chunk_index, metadata in part['chunks']:
+            if start >= 0:
+                start, end = start + offset, end + offset
+            chunks.append((chunk_id, start, end, content, chunk_index, metadata))
+        raw_length += part['raw_length']
+    return {'text': '\n\n'.join(texts), 'chunks': chunks, 'raw_length': raw_length}
+
+
+async def _stream_ranges(pool: 'DocumentProcessPool', file_path: str, pages_per_task: int,
+                         func: Callable, *args) -> AsyncIterator[Any]:
+    """
+    按页码范围在进程池中并行执行 func(file_path, start, end, *args)，按范围顺序产出结果
+
+    同时在途的页码范围数不超过进程池工作进程数，避免大文档占满内存
+    """
+    page_count = await pool.run(count_pages, file_path)
+    if page_count == 0:
+        raise DocumentError("文档没有页面")
+
+    ranges = [(start, min(start + pages_per_task, page_count))
+              for start in range(0, page_count, pages_per_task)]
+    pending = deque()
+    next_range = 0
+
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < pool.max_workers:
+                start, end = ranges[next_range]
+                pending.append(asyncio.ensure_future(pool.run(func, file_path, start, end, *args)))
+                next_range += 1
+
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def stream_pages(pool: 'DocumentProcessPool', file_path: str, pages_per_task: int = 25,
+                       page_timeout: Optional[float] = None,
+                       skipped: Optional[List[int]] = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    按页码范围并行提取文档，按页顺序逐页产出
+
+    提供 skipped 列表时，超时或提取失败而被跳过的页码追加到其中
+
+    Yields:
+        (页码, 页面文本)
+    """
+    async for extracted in _stream_ranges(pool, file_path, pages_per_task, extract_page_range, page_timeout):
+        if skipped is not None:
+            skipped.extend(extracted['skipped'])
+        for page in extracted['pages']:
+            yield page
+
+
+async def stream_page_chunks(pool: 'DocumentProcessPool', file_path: str, doc_id: str,
+                             split_options: Dict[str, Any],
+                             preprocess_options: Dict[str, Any],
+                             pages_per_task: int = 25,
+                             page_timeout: Optional[float] = None,
+                             cache_options: Optional[Dict[str, Any]] = None,
+                             text_only: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    按页码范围并行提取、预处理并分割文档，按页顺序产出合并后的各范围分割结果
+
+    每个范围在提取它的工作进程中分割，父进程只合并块偏移量和块ID，不在进程间回传整篇页面。
+    文本块不跨越范围边界。提供 cache_options 且没有跳过页面时，全部范围完成后写入提取文本缓存；
+    text_only 时各范围只回传预处理后的文本
+
+    Yields:
+        {'text': 范围文本, 'chunks': 相对范围文本的块偏移量, 'offset': 范围文本在全文中的位置, ...}
+    """
+    merger = PageRangeMerger(doc_id)
+    keep_pages = cache_options is not None
+    raw_pages, pages = [], []
+
+    async for part in _stream_ranges(pool, file_path, pages_per_task, split_page_range, doc_id,
+                                     split_options, preprocess_options, page_timeout, keep_pages, text_only):
+        if keep_pages:
+            raw_pages.extend(part.pop('raw_pages'))
+            pages.extend(part.pop('pages'))
+        yield merger.merge(part)
+
+    if not merger.length:
+        raise DocumentError("文档中没有可提取的文本内容")
+
+    if keep_pages and _is_complete({'skipped_pages': merger.skipped_pages}):
+        # 在父进程中写入，不再把整篇页面发送到工作进程
+        await get_executor(EXTRACTION).run(cache_pages, file_path, raw_pages, pages, merger.raw_length,
+                                           preprocess_options, cache_options)
+
+
+class DocumentProcessPool:
+    """有界的文档处理进程池"""
+
+    def __init__(self, max_workers: int = 2, max_tasks_per_child: Optional[int] = 50,
+                 memory_limit_mb: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'restarts': 0
+        }
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """创建进程池"""
+        kwargs = {
+            'max_workers': self.max_workers,
+            'initializer': _init_worker,
+            'initargs': (self.memory_limit_mb,)
+        }
+        # max_tasks_per_child需要Python 3.11+，且不兼容fork启动方式
+        if self.max_tasks_per_child and sys.version_info >= (3, 11):
+            kwargs['max_tasks_per_child'] = self.max_tasks_per_child
+            kwargs['mp_context'] = multiprocessing.get_context('spawn')
+
+        logger.info(
+            f"创建文档处理进程池: 工作进程数={self.max_workers}, "
+            f"每进程最大任务数={self.max_tasks_per_child}, 内存上限={self.memory_limit_mb}MB"
+        )
+        return ProcessPoolExecutor(**kwargs)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor
+
+    async def run(self, func, *args):
+        """在进程池中执行函数，超出工作进程数的任务在进程池内排队"""
+        loop = asyncio.get_running_loop()
+        self.stats['submitted'] += 1
+        try:
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool as e:
+            # 工作进程异常退出（如超出内存上限被终止），下次调用时重建进程池
+            self.stats['failed'] += 1
+            self.stats['restarts'] += 1
+            self._discard_executor()
+            logger.error(f"文档处理进程异常退出: {e}")
+            raise ProcessingError("文档处理进程异常退出，可能超出内存上限")
+        except MemoryError:
+            self.stats['failed'] += 1
+            raise ProcessingError("文档处理超出内存上限")
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+
+        self.stats['completed'] += 1
+        return result
+
+    def _discard_executor(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭进程池"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+            logger.info("文档处理进程池已关闭")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程池统计"""
+        return {
+            'max_workers': self.max_workers,
+            'max_tasks_per_child': self.max_tasks_per_child,
+            'memory_limit_mb': self.memory_limit_mb,
+            'active': self._executor is not None,
+            **self.stats
+        }
+
+
+# 全局进程池实例
+_global_process_pool: Optional[DocumentProcessPool] = None
+
+
+def get_document_process_pool(max_workers: int = 2, max_tasks_per_child: Optional[int] = 50,
+                              memory_limit_mb: Optional[int] = None) -> DocumentProcessPool:
+    """获取全局文档处理进程池（首次调用时的参数生效）"""
+    global _global_process_pool
+    if _global_process_pool is None:
+        _global_process_pool = DocumentProcessPool(
+            max_workers=max_workers,
+            max_tasks_per_child=max_tasks_per_child,
+            memory_limit_mb=memory_limit_mb
+        )
+    return _global_process_pool
+
+
+def shutdown_document_process_pool(wait: bool = True) -> None:
+    """关闭全局文档处理进程池"""
+    global _global_process_pool
+    if _global_process_pool is not None:
+        _global_process_pool.shutdown(wait=wait)
+        _global_process_pool = None
+
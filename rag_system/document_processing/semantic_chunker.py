@@ -0,0 +1,204 @@
+"""
+基于嵌入向量的语义分割器
+
+规则语义分割（SemanticSplitter）只能根据转折词判断断点。嵌入模式下：
+- 按句切分后大批量向量化，重复的句子只请求一次（嵌入服务的向量缓存还可跨文档复用）
+- 用相邻窗口平均向量的余弦距离一次算出所有候选断点，距离达到分位数阈值处断开
+- 文本块向量由其句子向量按长度加权平均得到，文本块不需要再次向量化
+"""
+import logging
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .splitters import SplitConfig
+from .token_estimator import get_token_estimator
+from ..models.document import TextChunk
+from ..utils.exceptions import ProcessingError
+from ..utils.helpers import compute_chunk_id
+
+logger = logging.getLogger(__name__)
+
+# 句末标点（可带后引号/括号）、英文句点后接空白、换行
+_SENTENCE_END = re.compile(r'[。！？!?；;]+[”’」』）)]*|\.(?=\s)|\n+')
+_NON_SPACE = re.compile(r'\S')
+
+EmbedTexts = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingSemanticSplitter:
+    """按句子向量的语义距离分割文本，并用句子向量合成文本块向量"""
+
+    def __init__(self, config: Optional[SplitConfig] = None, breakpoint_percentile: float = 90,
+                 window_size: int = 2, batch_size: int = 256):
+        """
+        Args:
+            config: 分割配置，使用其中的块大小、最小块大小和词元上限
+            breakpoint_percentile: 相邻窗口距离达到该分位数时断开
+            window_size: 比较断点两侧各多少个句子的平均向量
+            batch_size: 每次请求嵌入模型的句子数
+        """
+        self.config = config or SplitConfig()
+        self.breakpoint_percentile = breakpoint_percentile
+        self.window_size = max(1, window_size)
+        self.batch_size = max(1, batch_size)
+        self.token_estimator = (
+            get_token_estimator(self.config.token_model) if self.config.max_chunk_tokens else None
+        )
+
+    async def split(self, text: str, document_id: str,
+                    embed_texts: EmbedTexts) -> Tuple[List[TextChunk], List[List[float]]]:
+        """
+        分割文本并返回文本块及其向量
+
+        Args:
+            text: 预处理后的文本
+            document_id: 文档ID
+            embed_texts: 批量向量化函数
+
+        Returns:
+            (文本块列表, 与文本块一一对应的向量列表)
+        """
+        if not text or not text.strip():
+            raise ProcessingError("文本内容为空")
+
+        spans = self._sentence_spans(text)
+        sentence_vectors = await self._embed_sentences([text[start:end] for start, end in spans], embed_texts)
+        groups = self._group_sentences(text, spans, self._boundary_distances(sentence_vectors))
+
+        chunks = []
+        embeddings = []
+        for chunk_index, (first, last) in enumerate(groups):
+            start, end = spans[first][0], spans[last][1]
+            content = text[start:end]
+            chunks.append(TextChunk(
+                id=compute_chunk_id(document_id, content, chunk_index),
+                document_id=document_id,
+                content=content,
+                chunk_index=chunk_index,
+                metadata={
+                    "length": len(content),
+                    "splitter_type": self.__class__.__name__,
+                    "split_method": "semantic_embedding",
+                    "sentence_count": last - first + 1,
+                    "start_pos": start,
+                    "end_pos": end,
+                    "embedding_pooling": "sentence_mean"
+                }
+            ))
+            embeddings.append(self._pool(sentence_vectors[first:last + 1], spans[first:last + 1]))
+
+        logger.info(f"嵌入语义分割完成: 文档ID={document_id}, 句子数={len(spans)}, 生成块数={len(chunks)}")
+        return chunks, embeddings
+
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """按句切分，返回去除首尾空白后的句子区间；超出块大小或词元上限的句子再按长度切开"""
+        spans = []
+        position = 0
+        for match in _SENTENCE_END.finditer(text):
+            self._add_sentence(text, position, match.end(), spans)
+            position = match.end()
+        self._add_sentence(text, position, len(text), spans)
+        return spans
+
+    def _add_sentence(self, text: str, start: int, end: int, spans: List[Tuple[int, int]]) -> None:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start >= end or not _NON_SPACE.search(text, start, end):
+            return
+
+        max_chars = max(1, self.config.chunk_size)
+        pieces = [(piece_start, min(piece_start + max_chars, end)) for piece_start in range(start, end, max_chars)]
+        if self.token_estimator:
+            # 超出词元上限的片段对半切开，直到每段都不超限
+            fitted = []
+            while pieces:
+                piece_start, piece_end = pieces.pop(0)
+                if (piece_end - piece_start > 1
+                        and self.token_estimator.estimate(text[piece_start:piece_end]) > self.config.max_chunk_tokens):
+                    middle = (piece_start + piece_end) // 2
+                    pieces[:0] = [(piece_start, middle), (middle, piece_end)]
+                else:
+                    fitted.append((piece_start, piece_end))
+            pieces = fitted
+        spans.extend(pieces)
+
+    async def _embed_sentences(self, sentences: List[str], embed_texts: EmbedTexts) -> np.ndarray:
+        """分批向量化不重复的句子，返回按句子顺序排列的单位向量矩阵"""
+        unique: Dict[str, int] = {}
+        positions = [unique.setdefault(sentence, len(unique)) for sentence in sentences]
+        unique_sentences = list(unique)
+
+        vectors = []
+        for i in range(0, len(unique_sentences), self.batch_size):
+            batch = unique_sentences[i:i + self.batch_size]
+            embeddings = await embed_texts(batch)
+            if len(embeddings) != len(batch):
+                raise ProcessingError(f"句子向量数量不匹配: 期望 {len(batch)}, 实际 {len(embeddings)}")
+            vectors.extend(embeddings)
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+        return matrix[positions]
+
+    def _boundary_distances(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        计算每个句子边界两侧窗口平均向量的余弦距离
+
+        Returns:
+            长度为 句子数-1 的数组，第k项是第k句与第k+1句之间的距离
+        """
+        count = len(vectors)
+        if count < 2:
+            return np.zeros(0, dtype=np.float32)
+
+        cumulative = np.vstack([np.zeros((1, vectors.shape[1]), dtype=vectors.dtype), np.cumsum(vectors, axis=0)])
+        boundaries = np.arange(1, count)
+        left = cumulative[boundaries] - cumulative[np.maximum(boundaries - self.window_size, 0)]
+        right = cumulative[np.minimum(boundaries + self.window_size, count)] - cumulative[boundaries]
+        similarity = np.einsum('ij,ij->i', left, right) / np.maximum(
+            np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1), 1e-12
+        )
+        return 1.0 - similarity
+
+    def _group_sentences(self, text: str, spans: List[Tuple[int, int]],
+                         distances: np.ndarray) -> List[Tuple[int, int]]:
+        """按语义断点、块大小和词元上限把句子分组，返回每组的(首句, 末句)序号"""
+        if len(distances):
+            threshold = np.percentile(distances, self.breakpoint_percentile)
+            breakpoints = (distances >= threshold) & (distances > 0)
+        else:
+            breakpoints = distances.astype(bool)
+
+        estimate = self.token_estimator.estimate if self.token_estimator else None
+        groups = []
+        first = 0
+        tokens = estimate(text[spans[0][0]:spans[0][1]]) if estimate else 0
+        for k in range(1, len(spans)):
+            group_start = spans[first][0]
+            group_length = spans[k - 1][1] - group_start
+            sentence_tokens = estimate(text[spans[k][0]:spans[k][1]]) if estimate else 0
+
+            if (spans[k][1] - group_start > self.config.chunk_size
+                    or (estimate and tokens + sentence_tokens > self.config.max_chunk_tokens)
+                    or (breakpoints[k - 1] and group_length >= self.config.min_chunk_size)):
+                groups.append((first, k - 1))
+                first = k
+                tokens = sentence_tokens
+            else:
+                tokens += sentence_tokens
+        groups.append((first, len(spans) - 1))
+        return groups
+
+    def _pool(self, vectors: np.ndarray, spans: List[Tuple[int, int]]) -> List[float]:
+        """按句子长度加权平均句子向量并归一化"""
+        weights = np.asarray([end - start for start, end in spans], dtype=np.float32)
+        pooled = weights @ vectors
+        norm = np.linalg.norm(pooled)
+        if norm > 0:
+            pooled = pooled / norm
+        return pooled.tolist()
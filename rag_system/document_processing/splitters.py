@@ -3,17 +3,53 @@
 """
 import logging
 import re
-import uuid
 from abc import ABC, abstractmethod
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 
+from .token_estimator import get_token_estimator
 from ..models.document import TextChunk
 from ..utils.exceptions import ProcessingError
+from ..utils.helpers import compute_chunk_id
 
 logger = logging.getLogger(__name__)
 
+# 清理文本的正则：依次在整篇文本上替换，每个模式都以必需字符开头，便于正则引擎快速跳过
+_SPACE_RUN = re.compile(r'[ \t]{2,}|\t')
+_LINE_TRAILING_SPACE = re.compile(r'[^\S\n]+(?=\n)')
+_LINE_LEADING_SPACE = re.compile(r'\n[^\S\n]+')
+_EXTRA_NEWLINES = re.compile(r'\n{3,}')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_NON_SPACE = re.compile(r'\S')
+
+# 标题识别（配合 pos/endpos 在源文本区间上匹配，不切片）
+_MARKDOWN_HEADER = re.compile(r'(#{1,6})\s+')
+_NUMBERED_HEADER = re.compile(r'[0-9一二三四五六七八九十]+[.、]\s*')
+_CHAPTER_HEADER = re.compile(r'第[0-9一二三四五六七八九十]+[章节部分]')
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """去除区间首尾的空白，返回新的区间"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _iter_paragraph_spans(text: str):
+    """按空行分割段落，逐个返回去除首尾空白后的非空段落区间"""
+    position = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        start, end = _strip_span(text, position, match.start())
+        if start < end:
+            yield start, end
+        position = match.end()
+    start, end = _strip_span(text, position, len(text))
+    if start < end:
+        yield start, end
+
 
 @dataclass
 class SplitConfig:
@@ -26,6 +62,9 @@ class SplitConfig:
     generate_summary: bool = False
     generate_questions: bool = False
     semantic_split: bool = False
+    # 单个文本块的词元上限（按嵌入模型估算），为空时只按字符数限制
+    max_chunk_tokens: Optional[int] = None
+    token_model: Optional[str] = None
 
 
 class BaseSplitter(ABC):
@@ -42,7 +81,8 @@ class BaseSplitter(ABC):
     def _create_chunk(self, content: str, document_id: str, chunk_index: int, 
                      metadata: Optional[Dict[str, Any]] = None) -> TextChunk:
         """创建文本块"""
-        if not content.strip():
+        stripped = content.strip()
+        if not stripped:
             raise ProcessingError("文本块内容不能为空")
         
         chunk_metadata = {
@@ -55,30 +95,40 @@ class BaseSplitter(ABC):
             chunk_metadata.update(metadata)
         
         return TextChunk(
-            id=str(uuid.uuid4()),
+            id=compute_chunk_id(document_id, stripped, chunk_index),
             document_id=document_id,
-            content=content.strip(),
+            content=stripped,
             chunk_index=chunk_index,
             metadata=chunk_metadata
         )
     
     def _clean_text(self, text: str) -> str:
-        """清理文本"""
+        """
+        清理文本：多余的空行合并为一个空行，连续的空格和制表符合并为单个空格，
+        去除行首行尾空白
+        
+        直接在整篇文本上做正则替换，不按行拆分成列表再拼接
+        """
         if not text:
             return ""
         
-        # 先移除多余的换行符
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        
-        # 将连续的空格和制表符统一为单个空格，但保留换行符
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # 移除行首行尾空白，但保留换行符结构
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines]
-        text = '\n'.join(lines)
-        
-        return text
+        # 将连续的空格和制表符统一为单个空格（已预处理的文本通常不需要）
+        if '\t' in text or '  ' in text:
+            text = _SPACE_RUN.sub(' ', text)
+        
+        # 去除行首行尾空白，再将多余的空行合并为一个空行
+        text = _LINE_TRAILING_SPACE.sub('', text)
+        text = _LINE_LEADING_SPACE.sub('\n', text)
+        if '\n\n\n' in text:
+            text = _EXTRA_NEWLINES.sub('\n\n', text)
+        
+        # 去除首尾（不含换行）的空白
+        start, end = 0, len(text)
+        while start < end and text[start] != '\n' and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1] != '\n' and text[end - 1].isspace():
+            end -= 1
+        return text[start:end] if (start, end) != (0, len(text)) else text
     
     def _generate_summary(self, content: str) -> str:
         """生成内容摘要（简单实现）"""
@@ -154,9 +204,9 @@ class FixedSizeSplitter(BaseSplitter):
                     
                     end = best_break
                 
-                chunk_content = text[start:end]
-                
-                if chunk_content.strip():
+                # 按偏移量判断，只在生成块时才切出内容
+                if _NON_SPACE.search(text, start, end):
+                    chunk_content = text[start:end]
                     metadata = {
                         "start_pos": start,
                         "end_pos": end,
@@ -199,41 +249,48 @@ class StructureSplitter(BaseSplitter):
             chunks = []
             chunk_index = 0
             
-            # 按段落分割
-            paragraphs = self._split_by_paragraphs(text)
-            
-            current_chunk = ""
+            # 当前块由重叠前缀和源文本中连续段落的区间组成，生成块时才拼接内容。
+            # 清理后的段落之间恰好是一个空行，相邻段落在源文本中是一个连续区间
+            overlap_prefix = ""
+            span_start = span_end = None
             current_metadata = {"split_method": "structure", "paragraphs": []}
             
-            for para_idx, paragraph in enumerate(paragraphs):
+            def current_content() -> str:
+                body = text[span_start:span_end]
+                return f"{overlap_prefix}\n\n{body}" if overlap_prefix else body
+            
+            for para_idx, (para_start, para_end) in enumerate(_iter_paragraph_spans(text)):
                 # 检查是否是标题
-                is_header = self._is_header(paragraph)
+                is_header = self._is_header(text, para_start, para_end)
                 
                 # 如果是标题且当前块不为空，保存当前块
-                if is_header and current_chunk.strip():
+                if is_header and span_start is not None:
                     chunk = self._create_chunk_with_metadata(
-                        current_chunk, document_id, chunk_index, current_metadata
+                        current_content(), document_id, chunk_index, current_metadata
                     )
                     chunks.append(chunk)
                     chunk_index += 1
-                    current_chunk = ""
+                    overlap_prefix = ""
+                    span_start = span_end = None
                     current_metadata = {"split_method": "structure", "paragraphs": []}
                 
                 # 检查添加当前段落后是否超过大小限制
-                if current_chunk and len(current_chunk) + len(paragraph) > self.config.chunk_size:
+                current_length = 0
+                if span_start is not None:
+                    current_length = span_end - span_start + (len(overlap_prefix) + 2 if overlap_prefix else 0)
+                
+                if span_start is not None and current_length + (para_end - para_start) > self.config.chunk_size:
                     # 保存当前块
+                    content = current_content()
                     chunk = self._create_chunk_with_metadata(
-                        current_chunk, document_id, chunk_index, current_metadata
+                        content, document_id, chunk_index, current_metadata
                     )
                     chunks.append(chunk)
                     chunk_index += 1
                     
                     # 开始新块，考虑重叠
-                    if self.config.chunk_overlap > 0:
-                        overlap_text = current_chunk[-self.config.chunk_overlap:]
-                        current_chunk = overlap_text + "\n\n" + paragraph
-                    else:
-                        current_chunk = paragraph
+                    overlap_prefix = content[-self.config.chunk_overlap:] if self.config.chunk_overlap > 0 else ""
+                    span_start, span_end = para_start, para_end
                     
                     current_metadata = {
                         "split_method": "structure", 
@@ -241,22 +298,22 @@ class StructureSplitter(BaseSplitter):
                     }
                 else:
                     # 添加到当前块
-                    if current_chunk:
-                        current_chunk += "\n\n" + paragraph
+                    if span_start is not None:
+                        span_end = para_end
                         current_metadata["paragraphs"].append(para_idx)
                     else:
-                        current_chunk = paragraph
+                        span_start, span_end = para_start, para_end
                         current_metadata["paragraphs"] = [para_idx]
                 
                 # 标记标题
                 if is_header:
                     current_metadata["has_header"] = True
-                    current_metadata["header_level"] = self._get_header_level(paragraph)
+                    current_metadata["header_level"] = self._get_header_level(text, para_start, para_end)
             
             # 保存最后一个块
-            if current_chunk.strip():
+            if span_start is not None:
                 chunk = self._create_chunk_with_metadata(
-                    current_chunk, document_id, chunk_index, current_metadata
+                    current_content(), document_id, chunk_index, current_metadata
                 )
                 chunks.append(chunk)
             
@@ -270,32 +327,32 @@ class StructureSplitter(BaseSplitter):
     def _split_by_paragraphs(self, text: str) -> List[str]:
         """按段落分割"""
         # 按双换行符分割段落
-        paragraphs = re.split(r'\n\s*\n', text)
-        return [p.strip() for p in paragraphs if p.strip()]
+        return [text[start:end] for start, end in _iter_paragraph_spans(text)]
     
-    def _is_header(self, paragraph: str) -> bool:
-        """判断是否是标题"""
+    def _is_header(self, text: str, start: int = 0, end: Optional[int] = None) -> bool:
+        """判断是否是标题（可传入段落在源文本中的区间）"""
         # 简单的标题检测规则
-        paragraph = paragraph.strip()
+        if end is None:
+            start, end = _strip_span(text, start, len(text))
         
         # Markdown标题
-        if re.match(r'^#{1,6}\s+', paragraph):
+        if _MARKDOWN_HEADER.match(text, start, end):
             return True
         
         # 短段落且以数字或字母开头
-        if len(paragraph) < 100 and re.match(r'^[0-9一二三四五六七八九十]+[.、]\s*', paragraph):
+        if end - start < 100 and _NUMBERED_HEADER.match(text, start, end):
             return True
         
         # 全大写或包含"第...章"等
-        if re.search(r'第[0-9一二三四五六七八九十]+[章节部分]', paragraph):
+        if _CHAPTER_HEADER.search(text, start, end):
             return True
         
         return False
     
-    def _get_header_level(self, paragraph: str) -> int:
+    def _get_header_level(self, text: str, start: int = 0, end: Optional[int] = None) -> int:
         """获取标题级别"""
         # Markdown标题级别
-        match = re.match(r'^(#{1,6})\s+', paragraph)
+        match = _MARKDOWN_HEADER.match(text, start, len(text) if end is None else end)
         if match:
             return len(match.group(1))
         
@@ -341,25 +398,17 @@ class HierarchicalSplitter(BaseSplitter):
             raise ProcessingError(f"层次化分割失败: {str(e)}")
     
     def _build_hierarchy(self, text: str) -> Dict[str, Any]:
-        """构建文档层次结构"""
-        print(f"DEBUG: _build_hierarchy 接收到的文本长度: {len(text)}")
-        print(f"DEBUG: _build_hierarchy 文本前300字符: {repr(text[:300])}")
-        paragraphs = re.split(r'\n\s*\n', text)
-        print(f"DEBUG: 使用 r'\\n\\s*\\n' 分割成 {len(paragraphs)} 个段落")
-        
-        # 尝试不同的分割模式
-        paragraphs2 = re.split(r'\n\n+', text)
-        print(f"DEBUG: 使用 r'\\n\\n+' 分割成 {len(paragraphs2)} 个段落")
-        
-        # 使用更好的分割模式
-        paragraphs = paragraphs2 if len(paragraphs2) > len(paragraphs) else paragraphs
-        
-        for i, para in enumerate(paragraphs[:3]):  # 只显示前3个段落
-            print(f"DEBUG: 段落 {i+1}: {repr(para[:100])}")
+        """
+        构建文档层次结构
         
+        节点内容以源文本中的区间 (content_start, content_end) 记录，源文本保存在根节点的
+        source 中；章节内容（标题行之后的部分及其后的普通段落）在源文本中是连续的
+        """
         hierarchy = {
             "type": "document",
-            "content": "",
+            "source": text,
+            "content_start": None,
+            "content_end": None,
             "children": [],
             "level": 0
         }
@@ -367,25 +416,24 @@ class HierarchicalSplitter(BaseSplitter):
         current_section = hierarchy
         section_stack = [hierarchy]
         
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if not paragraph:
-                continue
-            
+        for para_start, para_end in _iter_paragraph_spans(text):
             # 检测标题级别
-            header_level = self._detect_header_level(paragraph)
+            header_level = self._detect_header_level(text, para_start, para_end)
             
             if header_level > 0:
                 # 分离标题和内容
-                lines = paragraph.split('\n')
-                title = lines[0].strip()
-                content = '\n'.join(lines[1:]).strip() if len(lines) > 1 else ""
+                line_end = text.find('\n', para_start, para_end)
+                if line_end < 0:
+                    line_end = para_end
+                title = text[para_start:line_end].strip()
+                content_start, content_end = _strip_span(text, line_end, para_end)
                 
                 # 创建新的章节
                 section = {
                     "type": "section",
                     "title": title,
-                    "content": content,
+                    "content_start": content_start if content_start < content_end else None,
+                    "content_end": content_end if content_start < content_end else None,
                     "children": [],
                     "level": header_level
                 }
@@ -399,17 +447,17 @@ class HierarchicalSplitter(BaseSplitter):
                 current_section = section
             else:
                 # 添加到当前章节的内容
-                if current_section["content"]:
-                    current_section["content"] += "\n\n" + paragraph
-                else:
-                    current_section["content"] = paragraph
+                if current_section["content_start"] is None:
+                    current_section["content_start"] = para_start
+                current_section["content_end"] = para_end
         
         return hierarchy
     
-    def _detect_header_level(self, paragraph: str) -> int:
-        """检测标题级别"""
+    def _detect_header_level(self, text: str, start: int = 0, end: Optional[int] = None) -> int:
+        """检测标题级别（可传入段落在源文本中的区间）"""
         # 只检测第一行是否为标题
-        first_line = paragraph.split('\n')[0].strip()
+        line_end = text.find('\n', start, len(text) if end is None else end)
+        first_line = text[start:line_end if line_end >= 0 else end].strip()
         
         # Markdown标题
         match = re.match(r'^(#{1,6})\s+', first_line)
@@ -434,6 +482,7 @@ class HierarchicalSplitter(BaseSplitter):
         """根据层次结构生成文本块"""
         chunks = []
         chunk_index = 0
+        text = hierarchy["source"]
         
         def process_node(node: Dict[str, Any], path: List[str] = None):
             nonlocal chunk_index
@@ -442,22 +491,24 @@ class HierarchicalSplitter(BaseSplitter):
                 path = []
             
             # 处理当前节点的内容
-            if node.get("content") and node["content"].strip():
-                content = node["content"].strip()
+            if node.get("content_start") is not None:
+                content_start, content_end = _strip_span(text, node["content_start"], node["content_end"])
+                content_length = content_end - content_start
                 
                 # 检查内容长度是否满足最小要求
-                if len(content) >= self.config.min_chunk_size:
+                if content_length and content_length >= self.config.min_chunk_size:
                     # 如果内容太长，进一步分割
-                    if len(content) > self.config.chunk_size:
-                        sub_chunks = self._split_long_content(content)
-                        for i, sub_content in enumerate(sub_chunks):
-                            if sub_content.strip() and len(sub_content.strip()) >= self.config.min_chunk_size:
+                    if content_length > self.config.chunk_size:
+                        sub_spans = self._split_long_spans(text, content_start, content_end)
+                        for i, (sub_start, sub_end) in enumerate(sub_spans):
+                            if sub_end - sub_start >= self.config.min_chunk_size:
+                                sub_content = text[sub_start:sub_end]
                                 metadata = {
                                     "split_method": "hierarchical",
                                     "hierarchy_path": path.copy(),
                                     "level": node.get("level", 0),
                                     "sub_chunk_index": i,
-                                    "total_sub_chunks": len(sub_chunks)
+                                    "total_sub_chunks": len(sub_spans)
                                 }
                                 
                                 if node.get("title"):
@@ -469,10 +520,11 @@ class HierarchicalSplitter(BaseSplitter):
                                 if self.config.generate_questions:
                                     metadata["questions"] = self._generate_questions(sub_content)
                                 
-                                chunk = self._create_chunk(sub_content.strip(), document_id, chunk_index, metadata)
+                                chunk = self._create_chunk(sub_content, document_id, chunk_index, metadata)
                                 chunks.append(chunk)
                                 chunk_index += 1
                     else:
+                        content = text[content_start:content_end]
                         metadata = {
                             "split_method": "hierarchical",
                             "hierarchy_path": path.copy(),
@@ -505,26 +557,30 @@ class HierarchicalSplitter(BaseSplitter):
         if len(content) <= self.config.chunk_size:
             return [content]
         
-        chunks = []
-        start = 0
+        return [content[start:end] for start, end in self._split_long_spans(content, 0, len(content))]
+    
+    def _split_long_spans(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """按偏移量分割源文本中过长的区间，返回去除首尾空白后的非空子区间"""
+        spans = []
+        position = start
         
-        while start < len(content):
-            end = start + self.config.chunk_size
+        while position < end:
+            stop = position + self.config.chunk_size
             
-            if end < len(content):
+            if stop < end:
                 # 寻找合适的断点
-                for i in range(min(100, len(content) - end)):
-                    if content[end + i] in '.。\n':
-                        end = end + i + 1
+                for i in range(min(100, end - stop)):
+                    if text[stop + i] in '.。\n':
+                        stop = stop + i + 1
                         break
             
-            chunk_content = content[start:end].strip()
-            if chunk_content:
-                chunks.append(chunk_content)
+            span_start, span_end = _strip_span(text, position, min(stop, end))
+            if span_start < span_end:
+                spans.append((span_start, span_end))
             
-            start = max(start + 1, end - self.config.chunk_overlap)
+            position = max(position + 1, stop - self.config.chunk_overlap)
         
-        return chunks
+        return spans
 
 
 class SemanticSplitter(BaseSplitter):
@@ -683,6 +739,9 @@ class RecursiveTextSplitter(BaseSplitter):
             "semantic": SemanticSplitter(config),
             "fixed": FixedSizeSplitter(config)
         }
+        self.token_estimator = (
+            get_token_estimator(self.config.token_model) if self.config.max_chunk_tokens else None
+        )
     
     def split(self, text: str, document_id: str) -> List[TextChunk]:
         """递归分割文本，自动选择最佳策略"""
@@ -734,9 +793,17 @@ class RecursiveTextSplitter(BaseSplitter):
         chunk_index = 0
         
         for chunk in chunks:
-            if len(chunk.content) > self.config.max_chunk_size:
+            too_large = len(chunk.content) > self.config.max_chunk_size
+            if too_large or self._exceeds_token_budget(chunk.content):
                 # 进一步分割过大的块
-                sub_chunks = self._split_large_chunk(chunk, document_id, chunk_index)
+                sub_chunks = self._split_large_chunk(chunk, document_id, chunk_index) if too_large else [chunk]
+                if self.token_estimator:
+                    sub_chunks = [
+                        piece for sub_chunk in sub_chunks
+                        for piece in self._split_to_token_budget(sub_chunk, document_id)
+                    ]
+                for i, sub_chunk in enumerate(sub_chunks):
+                    sub_chunk.chunk_index = chunk_index + i
                 final_chunks.extend(sub_chunks)
                 chunk_index += len(sub_chunks)
             elif len(chunk.content) >= self.config.min_chunk_size:
@@ -745,13 +812,79 @@ class RecursiveTextSplitter(BaseSplitter):
                 final_chunks.append(chunk)
                 chunk_index += 1
             # 过小的块被丢弃或合并到前一个块
-            elif final_chunks and len(final_chunks[-1].content) + len(chunk.content) <= self.config.max_chunk_size:
+            elif (final_chunks
+                  and len(final_chunks[-1].content) + len(chunk.content) <= self.config.max_chunk_size
+                  and self._fits_after_merge(final_chunks[-1].content, chunk.content)):
                 # 合并到前一个块
                 final_chunks[-1].content += "\n\n" + chunk.content
                 final_chunks[-1].metadata["merged_chunks"] = final_chunks[-1].metadata.get("merged_chunks", 0) + 1
         
         return final_chunks
     
+    def _exceeds_token_budget(self, content: str) -> bool:
+        """文本块的估算词元数是否超出上限"""
+        return bool(self.token_estimator) and self.token_estimator.count(content) > self.config.max_chunk_tokens
+    
+    def _fits_after_merge(self, previous: str, content: str) -> bool:
+        """合并后是否仍在词元上限内（估算值按字符累加，可直接相加）"""
+        if not self.token_estimator:
+            return True
+        return self.token_estimator.count(previous) + self.token_estimator.count(content) <= self.config.max_chunk_tokens
+    
+    def _split_to_token_budget(self, chunk: TextChunk, document_id: str) -> List[TextChunk]:
+        """把超出词元上限的块切成若干不超限的子块"""
+        text = chunk.content
+        if not self._exceeds_token_budget(text):
+            return [chunk]
+        
+        spans = []
+        start = 0
+        while start < len(text):
+            end = self._fit_token_budget(text, start)
+            spans.append((start, end))
+            if end >= len(text):
+                break
+            # 重叠部分不超过子块长度的五分之一，保证向前推进
+            overlap = min(self.config.chunk_overlap, (end - start) // 5)
+            start = max(start + 1, end - overlap)
+        
+        # 保留父块的页码、标题等信息，长度由子块重新计算
+        inherited = {key: value for key, value in chunk.metadata.items() if key not in ("length", "created_at")}
+        sub_chunks = []
+        for start, end in spans:
+            if not _NON_SPACE.search(text, start, end):
+                continue
+            sub_chunks.append(self._create_chunk(text[start:end], document_id, chunk.chunk_index, {
+                **inherited,
+                "parent_chunk_id": chunk.id,
+                "is_sub_chunk": True,
+                "original_split_method": chunk.metadata.get("split_method", "unknown"),
+                "split_method": "token_budget",
+                "start_pos": start,
+                "end_pos": end
+            }))
+        return sub_chunks
+    
+    def _fit_token_budget(self, text: str, start: int) -> int:
+        """二分查找从 start 开始不超过词元上限的最远位置，再退回到最近的断句处"""
+        estimate = self.token_estimator.estimate
+        budget = self.config.max_chunk_tokens
+        low, high = start + 1, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate(text[start:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        end = low
+        
+        if end < len(text):
+            # 在末尾50个字符内寻找句号、换行符或空格
+            for i in range(end - 1, max(start, end - 50), -1):
+                if text[i] in '.。！？!?\n ':
+                    return i + 1
+        return end
+    
     def _split_large_chunk(self, chunk: TextChunk, document_id: str, start_index: int) -> List[TextChunk]:
         """分割过大的文本块"""
         # 使用固定大小分割器处理过大的块
@@ -770,6 +903,22 @@ class RecursiveTextSplitter(BaseSplitter):
         return sub_chunks
 
 
+def assign_chunk_ids(chunks: List[TextChunk]) -> List[TextChunk]:
+    """
+    按块内容及其在文档中的出现次序重新生成确定的块ID
+    
+    位置使用相同内容的出现次序而不是块序号，文档局部修改后其余块的ID保持不变，
+    重新处理时只需向量化新增或变化的块
+    """
+    occurrences: Dict[Tuple[str, str], int] = {}
+    for chunk in chunks:
+        key = (chunk.document_id, chunk.content)
+        position = occurrences.get(key, 0)
+        occurrences[key] = position + 1
+        chunk.id = compute_chunk_id(chunk.document_id, chunk.content, position)
+    return chunks
+
+
 # 主要的文本分割器类（向后兼容）
 class TextSplitter(RecursiveTextSplitter):
     """文本分割器（主要接口）"""
@@ -0,0 +1,225 @@
+"""
+提取文本缓存
+
+解析PDF/DOCX是入库流程中最慢的步骤。本模块把提取结果（可选再加上预处理结果）按
+文件内容哈希、提取器类和提取器版本缓存在本地磁盘，重新处理文档或调整分割参数后
+重新分块时可跳过解析：
+- gzip压缩的JSON文件，原子写入（临时文件 + 重命名）
+- 命中时更新文件修改时间，超出容量上限时按最久未使用淘汰
+- 多个工作进程共享同一缓存目录，读取失败按未命中处理
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 缓存条目格式版本，格式不兼容变更时递增
+CACHE_FORMAT_VERSION = 1
+
+# 淘汰后保留的容量比例，避免每次写入都触发淘汰
+_EVICTION_TARGET_RATIO = 0.9
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """分块计算文件内容的SHA-256"""
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while block := f.read(_HASH_BLOCK_SIZE):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def get_extractor_signature(extractor: Any) -> str:
+    """提取器的类名和版本，提取逻辑变化后旧缓存自然失效"""
+    extractor_class = type(extractor)
+    return f"{extractor_class.__module__}.{extractor_class.__qualname__}:{getattr(extractor, 'version', '0')}"
+
+
+def get_options_signature(options: Dict[str, Any]) -> str:
+    """预处理配置的签名"""
+    encoded = json.dumps(options, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+class ExtractedTextCache:
+    """按文件哈希和提取器版本缓存提取文本的磁盘缓存"""
+
+    def __init__(self, cache_dir: str, max_size_mb: float = 1024, cache_preprocessed: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.cache_preprocessed = cache_preprocessed
+        # 本进程估算的缓存总大小，超出上限时重新扫描目录（其他进程也可能写入）
+        self._total_size: Optional[int] = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0
+        }
+
+    def make_key(self, file_hash: str, extractor: Any, variant: Optional[str] = None) -> str:
+        """
+        生成缓存键
+
+        Args:
+            file_hash: 文件内容哈希
+            extractor: 提取文本的提取器
+            variant: 附加的区分信息（如预处理配置签名），为空表示原始提取文本
+        """
+        parts = [file_hash, get_extractor_signature(extractor), variant or 'raw']
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def make_keys(self, file_path: str, extractor: Any,
+                  preprocess_options: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[str]]:
+        """计算原始文本和预处理后文本的缓存键，未启用预处理缓存时后者为空"""
+        file_hash = hash_file(file_path)
+        raw_key = self.make_key(file_hash, extractor)
+        if not self.cache_preprocessed or preprocess_options is None:
+            return raw_key, None
+        return raw_key, self.make_key(file_hash, extractor, get_options_signature(preprocess_options))
+
+    def _entry_path(self, key: str) -> Path:
+        # 按键前缀分目录，避免单个目录下文件过多
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，不存在、损坏或版本不匹配时返回None"""
+        path = self._entry_path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"提取文本缓存读取失败，已忽略: {path}, 错误: {e}")
+            self.stats['misses'] += 1
+            return None
+
+        if entry.get('version') != CACHE_FORMAT_VERSION:
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            # 更新修改时间，淘汰时按最久未使用的顺序删除
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.stats['hits'] += 1
+        return entry['data']
+
+    def put(self, key: str, data: Dict[str, Any]) -> None:
+        """写入缓存条目，写入失败只记录日志"""
+        path = self._entry_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump({'version': CACHE_FORMAT_VERSION, 'created_at': time.time(), 'data': data},
+                          f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            size = path.stat().st_size
+        except OSError as e:
+            logger.warning(f"提取文本缓存写入失败: {path}, 错误: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+
+        self.stats['writes'] += 1
+        if self._total_size is None:
+            self._total_size = self._scan_size()
+        else:
+            self._total_size += size
+
+        if self._total_size > self.max_size_bytes:
+            self._evict()
+
+    def _iter_entries(self):
+        """遍历缓存文件，返回(修改时间, 大小, 路径)"""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob('*/*.json.gz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def _evict(self) -> None:
+        """按最久未使用淘汰，直到总大小降到上限的90%"""
+        entries = sorted(self._iter_entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_size_bytes * _EVICTION_TARGET_RATIO
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.stats['evictions'] += 1
+
+        self._total_size = total
+        logger.info(f"提取文本缓存淘汰完成: 当前大小={total / 1024 / 1024:.1f}MB")
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        removed = 0
+        for _, _, path in list(self._iter_entries()):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                continue
+        self._total_size = 0
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            'cache_dir': str(self.cache_dir),
+            'max_size_mb': self.max_size_bytes / 1024 / 1024,
+            'size_mb': self._scan_size() / 1024 / 1024,
+            **self.stats
+        }
+
+
+# 各进程内按目录复用的缓存实例
+_text_caches: Dict[Tuple[str, float, bool], ExtractedTextCache] = {}
+
+
+def get_text_cache(cache_options: Optional[Dict[str, Any]]) -> Optional[ExtractedTextCache]:
+    """
+    根据缓存配置获取当前进程的缓存实例
+
+    Args:
+        cache_options: {'cache_dir', 'max_size_mb', 'cache_preprocessed'}，为空表示不使用缓存
+    """
+    if not cache_options or not cache_options.get('cache_dir'):
+        return None
+    key = (
+        str(cache_options['cache_dir']),
+        cache_options.get('max_size_mb', 1024),
+        cache_options.get('cache_preprocessed', True)
+    )
+    cache = _text_caches.get(key)
+    if cache is None:
+        cache = ExtractedTextCache(*key)
+        _text_caches[key] = cache
+    return cache
@@ -0,0 +1,113 @@
+"""
+词元数估算器
+
+按字符类别和各嵌入模型的校准系数估算文本的词元数，用于让文本块不超过嵌入模型的输入上限。
+估算只做字符统计，不依赖具体模型的分词器，结果向上取整并偏保守。
+"""
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+# 中日韩文字、全角符号（每个字符单独计数）
+_CJK = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef]')
+# ASCII 标点通常单独成为一个词元
+_ASCII_PUNCT = re.compile(r'[!-/:-@\[-`{-~]')
+_ASCII_SPACE = re.compile(r'[ \t\n\r\f\v]')
+
+
+@dataclass(frozen=True)
+class ModelTokenProfile:
+    """模型的词元校准系数"""
+    max_tokens: int
+    cjk_tokens_per_char: float = 1.0
+    ascii_chars_per_token: float = 3.0
+    other_tokens_per_char: float = 2.0
+    special_tokens: int = 0
+
+
+# 各嵌入模型的校准表，系数取该模型分词器在中英混合语料上的偏大值
+MODEL_TOKEN_PROFILES: Dict[str, ModelTokenProfile] = {
+    # OpenAI cl100k 分词：常用汉字约1个词元，生僻字2~3个
+    'text-embedding-ada-002': ModelTokenProfile(8191, cjk_tokens_per_char=1.5, ascii_chars_per_token=3.5),
+    'text-embedding-3-small': ModelTokenProfile(8191, cjk_tokens_per_char=1.5, ascii_chars_per_token=3.5),
+    'text-embedding-3-large': ModelTokenProfile(8191, cjk_tokens_per_char=1.5, ascii_chars_per_token=3.5),
+    # BERT 分词：汉字逐字切分，另有 [CLS]/[SEP]
+    'BAAI/bge-large-zh-v1.5': ModelTokenProfile(512, special_tokens=2),
+    'BAAI/bge-base-zh-v1.5': ModelTokenProfile(512, special_tokens=2),
+    'BAAI/bge-small-zh-v1.5': ModelTokenProfile(512, special_tokens=2),
+    'BAAI/bge-large-en-v1.5': ModelTokenProfile(512, special_tokens=2),
+    # XLM-R 分词：常用词会合并，按逐字计数偏保守
+    'BAAI/bge-m3': ModelTokenProfile(8192, ascii_chars_per_token=3.5, special_tokens=2),
+    'netease-youdao/bce-embedding-base_v1': ModelTokenProfile(512, ascii_chars_per_token=3.5, special_tokens=2),
+}
+
+# 未收录模型使用的保守系数
+DEFAULT_TOKEN_PROFILE = ModelTokenProfile(8192, cjk_tokens_per_char=1.5, special_tokens=2)
+
+
+def get_model_profile(model: Optional[str]) -> Optional[ModelTokenProfile]:
+    """查找模型的校准系数，兼容带平台前缀的模型名（如 Pro/BAAI/bge-m3）"""
+    if not model:
+        return None
+    profile = MODEL_TOKEN_PROFILES.get(model)
+    if profile:
+        return profile
+    lowered = model.lower()
+    for name, profile in MODEL_TOKEN_PROFILES.items():
+        if lowered.endswith(name.lower()):
+            return profile
+    return None
+
+
+class TokenEstimator:
+    """基于字符统计的词元数估算器"""
+
+    def __init__(self, profile: ModelTokenProfile = DEFAULT_TOKEN_PROFILE, cache_size: int = 4096):
+        self.profile = profile
+        # 同一文本块在分割、合并和校验时会被反复估算
+        self.count = lru_cache(maxsize=cache_size)(self.estimate)
+
+    def estimate(self, text: str) -> int:
+        """估算文本的词元数（不含模型的特殊词元）"""
+        if not text:
+            return 0
+        cjk = len(_CJK.findall(text))
+        ascii_count = len(text.encode('ascii', 'ignore'))
+        other = len(text) - cjk - ascii_count
+        punct = len(_ASCII_PUNCT.findall(text)) if ascii_count else 0
+        spaces = len(_ASCII_SPACE.findall(text)) if ascii_count else 0
+        words = ascii_count - punct - spaces
+
+        profile = self.profile
+        tokens = (
+            cjk * profile.cjk_tokens_per_char
+            + other * profile.other_tokens_per_char
+            + punct
+            + words / profile.ascii_chars_per_token
+        )
+        return math.ceil(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_token_estimator(model: Optional[str] = None) -> TokenEstimator:
+    """获取模型对应的词元估算器（按模型名缓存）"""
+    return TokenEstimator(get_model_profile(model) or DEFAULT_TOKEN_PROFILE)
+
+
+def get_token_budget(model: Optional[str] = None, max_tokens: Optional[int] = None,
+                     safety_margin: float = 0.9) -> int:
+    """
+    计算单个文本块允许的词元数
+
+    已收录的模型取配置上限与校准表上限中的较小值，未收录的模型以配置为准；
+    扣除模型的特殊词元后再乘以安全系数，抵消估算误差
+    """
+    profile = get_model_profile(model)
+    if profile:
+        limit = min(profile.max_tokens, max_tokens) if max_tokens else profile.max_tokens
+    else:
+        profile = DEFAULT_TOKEN_PROFILE
+        limit = max_tokens or profile.max_tokens
+    return max(1, int((limit - profile.special_tokens) * safety_margin))
@@ -53,6 +53,12 @@ class VectorStoreConfig:
     pinecone_api_key: Optional[str] = None
     pinecone_environment: Optional[str] = None
     pinecone_index_name: Optional[str] = None
+    # 向量写入：每批写入的向量数、同时写入的批数、写入线程数、单批失败重试次数和间隔（秒）
+    write_batch_size: int = 500
+    max_inflight_writes: int = 2
+    write_workers: int = 2
+    write_retries: int = 2
+    write_retry_delay: float = 0.5
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -80,6 +86,12 @@ class VectorStoreConfig:
             if not self.pinecone_index_name:
                 errors.append("Pinecone向量存储需要索引名称")
         
+        for name in ("write_batch_size", "max_inflight_writes", "write_workers"):
+            if getattr(self, name) <= 0:
+                errors.append(f"{name} 必须大于0")
+        if self.write_retries < 0:
+            errors.append("write_retries 不能为负数")
+        
         # 验证Chroma配置
         if self.type == "chroma":
             if self.persist_directory:
@@ -27,6 +27,9 @@ class DocumentInfo(BaseModel):
     error_message: Optional[str] = Field(default="", description="错误信息")
     file_path: Optional[str] = Field(default="", description="文件存储路径")
     processing_time: float = Field(default=0.0, ge=0, description="处理时间(秒)")
+    job_id: Optional[str] = Field(default=None, description="后台入库任务ID")
+    content_hash: Optional[str] = Field(default=None, description="文件内容SHA-256摘要")
+    alias_of: Optional[str] = Field(default=None, description="内容重复时指向的原文档ID")
 
     @field_validator('file_type')
     @classmethod
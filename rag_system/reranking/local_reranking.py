@@ -12,6 +12,7 @@ from typing import List, Dict, Any, Tuple
 from datetime import datetime
 
 from .base import BaseReranking, RerankingConfig, RerankingMetrics
+from ..utils.executors import PRIORITY_INTERACTIVE, RERANK, get_executor
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +31,8 @@ class LocalReranking(BaseReranking):
         start_time = time.time()
         
         try:
-            # 在线程池中加载模型以避免阻塞
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._load_model)
+            # 在重排序线程池中加载模型以避免阻塞
+            await get_executor(RERANK).run(self._load_model)
             
             self._model_load_time = time.time() - start_time
             self._initialized = True
@@ -90,12 +90,9 @@ class LocalReranking(BaseReranking):
             # 准备查询-文档对
             pairs = self._prepare_pairs(query, documents)
             
-            # 在线程池中执行重排序计算
-            loop = asyncio.get_event_loop()
-            
-            # 设置超时
+            # 在重排序线程池中执行计算，设置超时
             scores = await asyncio.wait_for(
-                loop.run_in_executor(None, self._compute_scores, pairs),
+                get_executor(RERANK).run(self._compute_scores, pairs, priority=PRIORITY_INTERACTIVE),
                 timeout=self.config.timeout
             )
             
@@ -141,9 +138,8 @@ class LocalReranking(BaseReranking):
         start_time = time.time()
         
         try:
-            loop = asyncio.get_event_loop()
             all_scores = await asyncio.wait_for(
-                loop.run_in_executor(None, self._compute_scores, all_pairs),
+                get_executor(RERANK).run(self._compute_scores, all_pairs, priority=PRIORITY_INTERACTIVE),
                 timeout=self.config.timeout * len(queries)
             )
             
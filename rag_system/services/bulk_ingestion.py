@@ -0,0 +1,436 @@
+"""
+批量目录入库模块
+
+将整个目录树中的文档一次性入库，用于新语料的初始导入：
+- 复用文档服务的处理流水线（进程池提取、分批向量化、分批写入向量）
+- 多个文档并发处理
+- 文档记录按批一次性写入数据库
+- 进度写入清单文件，中断后重新运行会跳过已完成的文件
+- 结束时统计吞吐量
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models.document import DocumentInfo, DocumentStatus
+from ..utils.exceptions import DocumentError, FileTooLargeError
+from .document_service import DocumentService
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestStatus:
+    """清单中的文件状态"""
+    REGISTERED = "registered"  # 已登记文档记录，尚未处理完成
+    COMPLETED = "completed"
+    DUPLICATE = "duplicate"  # 内容与已入库文档相同，已登记为别名
+    FAILED = "failed"
+
+
+class IngestionManifest:
+    """
+    批量入库进度清单
+
+    JSON Lines格式，每个文件状态变化时追加一行并立即落盘，
+    同一文件以最后一行为准；进程中断时最多丢失正在写入的一行
+    """
+
+    FINISHED_STATUSES = (ManifestStatus.COMPLETED, ManifestStatus.DUPLICATE)
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._file = None
+
+    def load(self) -> int:
+        """读取已有清单，返回记录的文件数"""
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"跳过损坏的清单记录: {self.path}:{line_number}")
+                        continue
+                    self.entries[entry['path']] = entry
+        return len(self.entries)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """获取文件的最新记录"""
+        return self.entries.get(path)
+
+    def is_finished(self, path: str) -> bool:
+        """文件是否已完成入库"""
+        entry = self.entries.get(path)
+        return entry is not None and entry['status'] in self.FINISHED_STATUSES
+
+    def record(self, path: str, status: str, **fields) -> Dict[str, Any]:
+        """追加一条文件状态记录"""
+        entry = {'path': path, 'status': status, **fields, 'updated_at': datetime.now().isoformat()}
+        self.entries[path] = entry
+
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return entry
+
+    def close(self) -> None:
+        """关闭清单文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+@dataclass
+class BulkIngestionStats:
+    """批量入库统计"""
+    total_files: int = 0
+    skipped: int = 0  # 之前的运行中已完成
+    completed: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    chunks: int = 0
+    embeddings: int = 0
+    bytes_processed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return (self.completed + self.duplicates) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def embeddings_per_second(self) -> float:
+        return self.embeddings / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典，包含吞吐量"""
+        data = asdict(self)
+        data.update({
+            'documents_per_second': round(self.documents_per_second, 2),
+            'chunks_per_second': round(self.chunks_per_second, 2),
+            'embeddings_per_second': round(self.embeddings_per_second, 2)
+        })
+        return data
+
+
+class BulkIngestionService:
+    """批量目录入库服务"""
+
+    MANIFEST_NAME = ".rag_ingest_manifest.jsonl"
+
+    def __init__(self, document_service: DocumentService, config: Optional[Dict[str, Any]] = None):
+        self.document_service = document_service
+        self.config = config or {}
+
+        # 同时处理的文档数，每个文档内部还会按页并行提取、分批向量化
+        self.concurrency = max(1, self.config.get('bulk_concurrency', 4))
+        # 每批登记的文档数，一批文档记录在一个事务中写入
+        self.register_batch_size = max(1, self.config.get('bulk_register_batch_size', 100))
+        self.copy_chunk_size = self.config.get('upload_chunk_size', 1024 * 1024)
+        self.progress_interval = self.config.get('bulk_progress_interval', 100)
+
+        self.stats = BulkIngestionStats()
+        self._manifest: Optional[IngestionManifest] = None
+        # 本次运行中已登记但尚未入库完成的内容哈希
+        self._pending_hashes: Dict[str, str] = {}
+        self._deferred: List[Path] = []
+        self._started_at = 0.0
+
+    def discover_files(self, root: Path) -> List[Path]:
+        """按路径顺序列出目录树中支持的文件"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            # 跳过隐藏目录
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.startswith('.'):
+                    continue
+                if self.document_service.document_processor.is_supported_file(filename):
+                    files.append(Path(dirpath) / filename)
+        return files
+
+    async def ingest_directory(self, root, manifest_path=None) -> BulkIngestionStats:
+        """
+        入库目录树中的所有支持的文件
+
+        Args:
+            root: 文档目录
+            manifest_path: 进度清单路径，默认为目录下的 .rag_ingest_manifest.jsonl
+
+        Returns:
+            本次运行的统计信息
+        """
+        root = Path(root).resolve()
+        if not root.is_dir():
+            raise DocumentError(f"目录不存在: {root}")
+
+        self._manifest = IngestionManifest(manifest_path or root / self.MANIFEST_NAME)
+        recorded = self._manifest.load()
+
+        files = self.discover_files(root)
+        pending = [path for path in files if not self._manifest.is_finished(str(path))]
+
+        self.stats = BulkIngestionStats(total_files=len(files), skipped=len(files) - len(pending))
+        self._pending_hashes = {}
+        self._deferred = []
+        self._started_at = time.monotonic()
+        logger.info(
+            f"开始批量入库: 目录={root}, 文件数={len(files)}, "
+            f"清单已有记录={recorded}, 待处理={len(pending)}"
+        )
+
+        try:
+            await self._run(pending)
+
+            # 与本次运行中其他文件内容相同的文件，待原文档入库后再登记为别名
+            if self._deferred:
+                deferred, self._deferred = self._deferred, []
+                self._pending_hashes = {}
+                await self._run(deferred)
+        finally:
+            self.stats.elapsed = time.monotonic() - self._started_at
+            self._manifest.close()
+
+        logger.info(f"批量入库完成: {self.stats.to_dict()}")
+        return self.stats
+
+    async def _run(self, paths: List[Path]) -> None:
+        """登记和处理并行：登记协程按批写入文档记录，工作协程并发处理"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def register():
+            try:
+                for start in range(0, len(paths), self.register_batch_size):
+                    batch = paths[start:start + self.register_batch_size]
+                    for item in await self._register_batch(batch):
+                        await queue.put(item)
+            finally:
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+        async def work():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                await self._ingest_file(*item)
+
+        await asyncio.gather(register(), *(work() for _ in range(self.concurrency)))
+
+    async def _register_batch(self, paths: List[Path]) -> List[Tuple[Path, DocumentInfo]]:
+        """复制文件并批量登记文档记录，返回需要处理的文档"""
+        resumed = []
+        registered = []
+
+        for path in paths:
+            try:
+                item = await self._prepare_file(path)
+            except Exception as e:
+                self._record_failure(path, None, e)
+                continue
+            if item is None:
+                continue
+            if item[1].id in self._resumed_ids(path):
+                resumed.append(item)
+            else:
+                registered.append(item)
+
+        if registered:
+            try:
+                self.document_service.document_crud.create_documents([doc for _, doc in registered])
+            except Exception as e:
+                for path, doc_info in registered:
+                    self._discard_stored_file(doc_info)
+                    self._record_failure(path, None, e)
+                return resumed
+
+            for path, doc_info in registered:
+                self._manifest.record(
+                    str(path), ManifestStatus.REGISTERED,
+                    document_id=doc_info.id, content_hash=doc_info.content_hash
+                )
+
+        return resumed + registered
+
+    def _resumed_ids(self, path: Path) -> Tuple[str, ...]:
+        """清单中该文件之前登记的文档ID"""
+        entry = self._manifest.get(str(path))
+        return (entry['document_id'],) if entry and entry.get('document_id') else ()
+
+    async def _prepare_file(self, path: Path) -> Optional[Tuple[Path, DocumentInfo]]:
+        """
+        准备单个文件
+
+        之前的运行中已登记的文件沿用原文档记录；新文件复制到文档存储目录，
+        内容重复时登记为别名并返回None
+        """
+        service = self.document_service
+
+        resumed = await self._resume_document(path)
+        if resumed is not None:
+            return path, resumed
+
+        doc_id = str(uuid.uuid4())
+        file_type = path.suffix.lower().lstrip('.')
+        stored_path = service._get_document_file_path(doc_id, file_type)
+
+        loop = asyncio.get_running_loop()
+        file_size, content_hash = await loop.run_in_executor(None, self._copy_file, path, stored_path)
+
+        doc_info = DocumentInfo(
+            id=doc_id,
+            filename=path.name,
+            file_type=file_type,
+            file_size=file_size,
+            file_path=str(stored_path),
+            upload_time=datetime.now(),
+            status=DocumentStatus.PROCESSING,
+            chunk_count=0,
+            content_hash=content_hash
+        )
+
+        if content_hash in self._pending_hashes:
+            os.remove(stored_path)
+            self._deferred.append(path)
+            return None
+
+        try:
+            duplicate = service._find_duplicate_document(content_hash)
+            is_alias = duplicate is not None and await service._create_alias_document(doc_info, duplicate)
+        except Exception:
+            os.remove(stored_path)
+            raise
+
+        if is_alias:
+            os.remove(stored_path)
+            self.stats.duplicates += 1
+            self._manifest.record(
+                str(path), ManifestStatus.DUPLICATE, document_id=doc_id, alias_of=duplicate.id
+            )
+            return None
+
+        self._pending_hashes[content_hash] = doc_id
+        return path, doc_info
+
+    async def _resume_document(self, path: Path) -> Optional[DocumentInfo]:
+        """恢复之前的运行中已登记但未完成的文档"""
+        for doc_id in self._resumed_ids(path):
+            try:
+                doc_info = await self.document_service.get_document(doc_id)
+            except DocumentError:
+                return None
+            if not Path(doc_info.file_path).exists():
+                return None
+            logger.debug(f"继续处理之前登记的文档: {path} -> {doc_id}")
+            return doc_info
+        return None
+
+    def _copy_file(self, source: Path, target: Path) -> Tuple[int, str]:
+        """复制文件到文档存储目录，同时计算大小和SHA-256"""
+        max_file_size = self.document_service.max_file_size
+        hasher = hashlib.sha256()
+        file_size = 0
+        tmp_path = target.with_name(f"{target.name}.part")
+
+        try:
+            with open(source, 'rb') as src, open(tmp_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(self.copy_chunk_size)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if max_file_size and file_size > max_file_size:
+                        raise FileTooLargeError(
+                            f"文件大小超过限制（{max_file_size // (1024 * 1024)}MB）",
+                            max_size=max_file_size
+                        )
+                    hasher.update(chunk)
+                    dst.write(chunk)
+
+            if file_size == 0:
+                raise DocumentError("文件内容为空")
+
+            os.replace(tmp_path, target)
+            return file_size, hasher.hexdigest()
+
+        except Exception:
+            try:
+                tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+
+    async def _ingest_file(self, path: Path, doc_info: DocumentInfo) -> None:
+        """处理单个文档，失败时记录错误并继续处理其他文档"""
+        from ..database.models import DocumentStatus as DBDocumentStatus
+
+        try:
+            result = await self.document_service._ingest_document(doc_info)
+        except Exception as e:
+            try:
+                self.document_service.document_crud.update_document_status(
+                    doc_info.id, DBDocumentStatus.ERROR, str(e)
+                )
+            except Exception:
+                pass
+            self._record_failure(path, doc_info.id, e)
+            return
+        finally:
+            self._pending_hashes.pop(doc_info.content_hash, None)
+
+        vector_count = result.vector_count or len(result.vectors)
+        self.stats.completed += 1
+        self.stats.chunks += result.chunk_count
+        self.stats.embeddings += vector_count
+        self.stats.bytes_processed += doc_info.file_size
+        self._manifest.record(
+            str(path), ManifestStatus.COMPLETED, document_id=doc_info.id,
+            chunk_count=result.chunk_count, vector_count=vector_count
+        )
+        self._log_progress()
+
+    def _record_failure(self, path: Path, doc_id: Optional[str], error: Exception) -> None:
+        """记录失败的文件，下次运行时重试"""
+        logger.error(f"文件入库失败: {path}, 错误: {str(error)}")
+        self.stats.failed += 1
+        self._manifest.record(str(path), ManifestStatus.FAILED, document_id=doc_id, error=str(error))
+
+    def _discard_stored_file(self, doc_info: DocumentInfo) -> None:
+        """删除未能登记的文档文件"""
+        try:
+            os.remove(doc_info.file_path)
+        except FileNotFoundError:
+            pass
+        self._pending_hashes.pop(doc_info.content_hash, None)
+
+    def _log_progress(self) -> None:
+        """按间隔输出进度和吞吐量"""
+        done = self.stats.completed + self.stats.duplicates + self.stats.failed
+        if not self.progress_interval or done % self.progress_interval:
+            return
+
+        elapsed = time.monotonic() - self._started_at
+        remaining = self.stats.total_files - self.stats.skipped - done
+        logger.info(
+            f"批量入库进度: 已处理={done}, 剩余={remaining}, "
+            f"文档/秒={done / elapsed:.2f}, 文本块/秒={self.stats.chunks / elapsed:.1f}"
+        )
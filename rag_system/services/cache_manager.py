@@ -6,6 +6,7 @@
 - 缓存配置的动态调整
 - 缓存失效策略管理
 - 缓存性能分析和优化建议
+- 命中率低时把热点查询交给缓存预热服务重放
 """
 
 import logging
@@ -31,6 +32,7 @@ class CachePolicy:
     hit_rate_threshold: float = 0.3  # 命中率阈值
     enable_auto_cleanup: bool = True  # 启用自动清理
     enable_adaptive_ttl: bool = False  # 启用自适应TTL
+    hot_query_limit: int = 20  # 预热的热点查询数量
 
 
 @dataclass
@@ -51,16 +53,19 @@ class CacheMetrics:
 class CacheManager:
     """高级缓存管理器"""
     
-    def __init__(self, cache_service: CacheService, policy: Optional[CachePolicy] = None):
+    def __init__(self, cache_service: CacheService, policy: Optional[CachePolicy] = None,
+                 warmup_service=None):
         """
         初始化缓存管理器
         
         Args:
             cache_service: 缓存服务实例
             policy: 缓存策略配置
+            warmup_service: 缓存预热服务，为None时使用全局预热服务（未启动时不预热）
         """
         self.cache_service = cache_service
         self.policy = policy or CachePolicy()
+        self.warmup_service = warmup_service
         
         # 管理状态
         self.is_running = False
@@ -179,13 +184,21 @@ class CacheManager:
                     lru_deleted = await self._cleanup_lru_cache()
                     optimization_actions.append(f"清理LRU缓存: {lru_deleted}个条目")
             
-            # 命中率优化
+            # 条目数超出上限时按LRU淘汰
+            elif metrics.total_entries > self.policy.max_entries:
+                lru_deleted = await self._cleanup_lru_cache()
+                optimization_actions.append(f"清理LRU缓存: {lru_deleted}个条目")
+            
+            # 命中率优化：热点查询交给预热服务通过检索服务重放
             if metrics.hit_rate < self.policy.hit_rate_threshold:
-                # 分析热点查询并预热
-                hot_queries = await self._analyze_hot_queries()
-                if hot_queries:
-                    warmed_count = await self.cache_service.warm_up_cache(hot_queries)
-                    optimization_actions.append(f"预热热点查询: {warmed_count}个查询")
+                warmup_service = self._get_warmup_service()
+                if warmup_service is None:
+                    logger.info("缓存预热服务未启动，跳过热点查询预热")
+                else:
+                    hot_queries = await self._analyze_hot_queries()
+                    if hot_queries:
+                        warmup_result = await warmup_service.warm_up(hot_queries)
+                        optimization_actions.append(f"预热热点查询: {warmup_result['warmed']}个查询")
             
             # 更新最后清理时间
             self.last_metrics.last_cleanup_time = datetime.now()
@@ -285,19 +298,17 @@ class CacheManager:
             return 0
     
     async def _cleanup_lru_cache(self) -> int:
-        """清理最少使用的缓存"""
+        """清理最少使用的缓存，使条目数不超过策略上限"""
         try:
-            # 简化实现：清理一半的缓存
-            # 实际实现需要Redis的LRU支持或自定义LRU逻辑
             cache_info = await self.cache_service.get_cache_info()
             total_entries = cache_info.get('cached_queries', 0)
             
             if total_entries > self.policy.max_entries:
-                # 清理超出限制的条目
+                # 按最近访问时间淘汰超出限制的条目
                 excess_entries = total_entries - self.policy.max_entries
-                # 这里需要实现LRU清理逻辑
-                logger.info(f"需要清理LRU缓存: {excess_entries}个条目")
-                return excess_entries
+                deleted_count = await self.cache_service.evict_lru(excess_entries)
+                logger.info(f"清理LRU缓存完成: 需要{excess_entries}个, 实际删除{deleted_count}个条目")
+                return deleted_count
             
             return 0
             
@@ -305,30 +316,24 @@ class CacheManager:
             logger.error(f"清理LRU缓存失败: {e}")
             return 0
     
+    def _get_warmup_service(self):
+        """获取缓存预热服务"""
+        if self.warmup_service is not None:
+            return self.warmup_service
+        
+        from .cache_warmup import get_cache_warmup_service
+        return get_cache_warmup_service()
+    
     async def _analyze_hot_queries(self) -> List[Dict[str, Any]]:
-        """分析热点查询"""
+        """分析热点查询（基于缓存服务记录的真实访问频率）"""
         try:
-            # 这里需要实现查询频率分析
-            # 简化实现：返回一些常见查询
-            hot_queries = [
-                {
-                    'query': '什么是人工智能？',
-                    'config': {
-                        'search_mode': 'semantic',
-                        'top_k': 5,
-                        'enable_cache': True
-                    }
-                },
-                {
-                    'query': '机器学习的应用',
-                    'config': {
-                        'search_mode': 'hybrid',
-                        'top_k': 10,
-                        'enable_cache': True
-                    }
-                }
-            ]
+            hot_queries = self.cache_service.get_hot_queries(self.policy.hot_query_limit)
+            
+            # 预热时需要写入缓存
+            for query_info in hot_queries:
+                query_info.setdefault('config', {})['enable_cache'] = True
             
+            logger.debug(f"分析热点查询完成: {len(hot_queries)}个")
             return hot_queries
             
         except Exception as e:
@@ -10,6 +10,7 @@
 """
 
 import json
+import time
 import hashlib
 import logging
 from typing import List, Optional, Dict, Any
@@ -18,6 +19,7 @@ from dataclasses import asdict
 
 from ..models.config import RetrievalConfig
 from ..models.vector import SearchResult
+from .query_tracker import QueryFrequencyTracker
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +45,16 @@ class CacheService:
         self.redis_db = self.config.get('redis_db', 0)
         self.redis_password = self.config.get('redis_password', None)
         
+        # 访问追踪：Redis有序集合记录最近访问时间（用于LRU淘汰），
+        # Count-Min Sketch记录查询频率（用于热点预热）
+        self.lru_key = self.config.get('cache_lru_key', 'retrieval_lru')
+        self.query_tracker = QueryFrequencyTracker(
+            width=self.config.get('hot_query_sketch_width', 4096),
+            depth=self.config.get('hot_query_sketch_depth', 4),
+            capacity=self.config.get('hot_query_capacity', 200),
+            decay_interval=self.config.get('hot_query_decay_interval', 3600)
+        )
+        
         # 统计信息
         self.cache_stats = {
             'hits': 0,
@@ -107,6 +119,7 @@ class CacheService:
         try:
             # 生成缓存键
             cache_key = self._generate_cache_key(query, config, **kwargs)
+            self._record_query_access(cache_key, query, config, **kwargs)
             
             # 从Redis获取缓存数据
             cached_data = await self.redis_client.get(cache_key)
@@ -115,6 +128,7 @@ class CacheService:
                 # 反序列化缓存数据
                 results = self._deserialize_results(cached_data)
                 self.cache_stats['hits'] += 1
+                await self._touch_lru(cache_key)
                 
                 logger.info(f"缓存命中: {cache_key[:32]}... (共{len(results)}个结果)")
                 return results
@@ -128,6 +142,28 @@ class CacheService:
             logger.error(f"缓存读取失败: {e}")
             return None
     
+    async def is_cached(self, query: str, config: RetrievalConfig, **kwargs) -> bool:
+        """
+        检查查询结果是否已缓存（不计入命中统计和访问频率）
+        
+        Args:
+            query: 查询字符串
+            config: 检索配置
+            **kwargs: 其他影响检索结果的参数
+            
+        Returns:
+            是否存在缓存
+        """
+        if not self.cache_enabled:
+            return False
+        
+        try:
+            cache_key = self._generate_cache_key(query, config, **kwargs)
+            return bool(await self.redis_client.exists(cache_key))
+        except Exception as e:
+            logger.debug(f"检查缓存是否存在失败: {e}")
+            return False
+    
     async def cache_results(
         self, 
         query: str,
@@ -156,6 +192,7 @@ class CacheService:
             
             # 写入Redis缓存
             await self.redis_client.setex(cache_key, self.cache_ttl, serialized_data)
+            await self._touch_lru(cache_key)
             
             logger.info(f"缓存写入成功: {cache_key[:32]}... (共{len(results)}个结果)")
             
@@ -198,6 +235,80 @@ class CacheService:
         logger.debug(f"生成缓存键: {cache_key} <- {key_string}")
         return cache_key
     
+    def _record_query_access(self, cache_key: str, query: str, config: RetrievalConfig, **kwargs) -> None:
+        """记录查询访问频率，保留查询和配置以便预热时重放"""
+        try:
+            payload = {
+                'query': query,
+                'config': {
+                    'search_mode': config.search_mode,
+                    'top_k': config.top_k,
+                    'similarity_threshold': config.similarity_threshold,
+                    'enable_rerank': config.enable_rerank,
+                    'enable_cache': config.enable_cache
+                }
+            }
+            if kwargs:
+                payload['kwargs'] = {k: v for k, v in kwargs.items() if v is not None}
+            self.query_tracker.record(cache_key, payload)
+        except Exception as e:
+            logger.debug(f"记录查询访问失败: {e}")
+    
+    async def _touch_lru(self, cache_key: str) -> None:
+        """更新缓存键的最近访问时间"""
+        try:
+            await self.redis_client.zadd(self.lru_key, {cache_key: time.time()})
+        except Exception as e:
+            logger.debug(f"更新LRU访问时间失败: {e}")
+    
+    def get_hot_queries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        获取访问最频繁的查询
+        
+        Args:
+            limit: 返回的最大查询数量
+            
+        Returns:
+            热点查询列表，每个元素包含query、config和估计访问次数hits
+        """
+        hot_queries = []
+        for _, count, payload in self.query_tracker.top(limit):
+            if not payload:
+                continue
+            hot_queries.append({**payload, 'hits': count})
+        return hot_queries
+    
+    async def evict_lru(self, count: int) -> int:
+        """
+        按最近访问时间淘汰最久未使用的缓存条目
+        
+        Args:
+            count: 需要淘汰的条目数
+            
+        Returns:
+            实际删除的缓存条目数量
+        """
+        if not self.cache_enabled or count <= 0:
+            return 0
+        
+        try:
+            # 先清理已过期键在有序集合中的残留成员，避免浪费淘汰名额
+            await self.redis_client.zremrangebyscore(self.lru_key, '-inf', time.time() - self.cache_ttl)
+            
+            oldest_keys = await self.redis_client.zrange(self.lru_key, 0, count - 1)
+            if not oldest_keys:
+                return 0
+            
+            deleted_count = await self.redis_client.delete(*oldest_keys)
+            await self.redis_client.zrem(self.lru_key, *oldest_keys)
+            
+            logger.info(f"LRU淘汰完成，删除{deleted_count}个条目")
+            return deleted_count
+            
+        except Exception as e:
+            logger.error(f"LRU淘汰失败: {e}")
+            return 0
+    
     def _serialize_results(self, results: List[SearchResult]) -> str:
         """
         序列化检索结果
@@ -309,6 +420,7 @@ class CacheService:
             if keys:
                 # 删除匹配的键
                 deleted_count = await self.redis_client.delete(*keys)
+                await self.redis_client.zrem(self.lru_key, *keys)
                 logger.info(f"清理缓存完成，删除{deleted_count}个条目")
                 return deleted_count
             else:
@@ -329,7 +441,8 @@ class CacheService:
         info = {
             'enabled': self.cache_enabled,
             'ttl': self.cache_ttl,
-            'stats': self.cache_stats.copy()
+            'stats': self.cache_stats.copy(),
+            'query_tracker': self.query_tracker.get_stats()
         }
         
         # 计算命中率
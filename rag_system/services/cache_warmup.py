@@ -0,0 +1,380 @@
+"""
+缓存预热服务模块
+
+从真实问答历史中挖掘高频问题并重放检索，使部署或缓存清空后尽快恢复命中率：
+- 从QAPairModel统计最近一段时间内的高频问题，合并缓存服务追踪到的热点查询
+- 以有界并发、低优先级重放检索（有在线问答请求时让出）
+- 时间预算或提供商调用配额耗尽时停止
+- 支持启动时执行和周期性执行
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+
+from ..database.crud import QAPairCRUD
+from ..database.session import DatabaseSession
+from ..models.config import RetrievalConfig
+from ..utils.exceptions import ConfigurationError, DatabaseError
+from ..utils.single_flight import get_single_flight
+from .base import BaseService
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmupService(BaseService):
+    """基于问答历史的缓存预热服务"""
+
+    def __init__(
+        self,
+        retrieval_service,
+        config: Optional[Dict[str, Any]] = None,
+        qa_pair_crud: Optional[QAPairCRUD] = None
+    ):
+        """
+        初始化缓存预热服务
+
+        Args:
+            retrieval_service: 增强检索服务实例，用于重放检索
+            config: 预热配置
+            qa_pair_crud: 问答对CRUD，为None时在initialize中根据database_url创建
+        """
+        super().__init__(config)
+        self.retrieval_service = retrieval_service
+        self.qa_pair_crud = qa_pair_crud
+        self.db_session: Optional[DatabaseSession] = None
+
+        # 预热配置
+        self.history_days = self.config.get('warmup_history_days', 7)
+        self.max_queries = self.config.get('warmup_max_queries', 100)
+        self.concurrency = max(1, self.config.get('warmup_concurrency', 2))
+        self.time_budget = self.config.get('warmup_time_budget', 120.0)  # 秒
+        self.max_provider_calls = self.config.get('warmup_max_provider_calls', 200)
+        self.max_consecutive_failures = self.config.get('warmup_max_consecutive_failures', 3)
+        self.interval = self.config.get('warmup_interval', 3600)  # 周期性预热间隔（秒），<=0表示只在启动时执行
+        self.startup_delay = self.config.get('warmup_startup_delay', 5.0)
+        self.replay_delay = self.config.get('warmup_replay_delay', 0.05)
+        self.max_live_requests = self.config.get('warmup_max_live_requests', 0)
+        self.yield_interval = self.config.get('warmup_yield_interval', 0.2)
+
+        # 运行状态
+        self.is_running = False
+        self.warmup_task = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.total_runs = 0
+
+    async def initialize(self) -> None:
+        """初始化预热服务，建立问答历史的数据库访问"""
+        if self.qa_pair_crud is not None:
+            return
+
+        try:
+            # 问答历史由在线服务写入，数据库目录不存在说明配置有误，不自动创建
+            self.db_session = DatabaseSession(
+                self.config.get('database_url', 'sqlite:///./database/documents.db'),
+                echo=self.config.get('database_echo', False),
+                create_directory=False
+            )
+            self.qa_pair_crud = QAPairCRUD(self.db_session.session)
+        except Exception as e:
+            logger.error(f"缓存预热服务无法访问问答历史: {e}")
+            raise DatabaseError(f"缓存预热服务无法访问问答历史: {e}")
+
+        logger.info("缓存预热服务初始化完成")
+
+    async def cleanup(self) -> None:
+        """清理资源"""
+        await self.stop()
+        if self.db_session is not None:
+            try:
+                self.db_session.close()
+            except Exception as e:
+                logger.warning(f"关闭预热服务数据库连接失败: {e}")
+            self.db_session = None
+
+    async def start(self) -> None:
+        """启动预热任务：启动后执行一次，之后按间隔周期执行"""
+        if self.is_running:
+            logger.warning("缓存预热任务已经在运行")
+            return
+
+        self.is_running = True
+        self.warmup_task = asyncio.create_task(self._warmup_loop())
+        logger.info(f"缓存预热任务已启动，间隔: {self.interval}秒")
+
+    async def stop(self) -> None:
+        """停止预热任务"""
+        if not self.is_running:
+            return
+
+        self.is_running = False
+        if self.warmup_task:
+            self.warmup_task.cancel()
+            try:
+                await self.warmup_task
+            except asyncio.CancelledError:
+                pass
+            self.warmup_task = None
+
+        logger.info("缓存预热任务已停止")
+
+    async def _warmup_loop(self) -> None:
+        """预热循环"""
+        try:
+            await asyncio.sleep(self.startup_delay)
+
+            while self.is_running:
+                try:
+                    await self.warm_up()
+                except Exception as e:
+                    logger.error(f"缓存预热执行失败: {e}")
+
+                if self.interval <= 0:
+                    break
+                await asyncio.sleep(self.interval)
+
+        except asyncio.CancelledError:
+            pass
+
+    async def collect_queries(self) -> List[Dict[str, Any]]:
+        """
+        收集预热查询：问答历史中的高频问题 + 缓存服务追踪的热点查询
+
+        Returns:
+            按频率降序的查询列表，每个元素包含query、config和hits
+        """
+        default_config = self._get_warmup_config()
+        candidates: Dict[str, Dict[str, Any]] = {}
+
+        # 问答历史中的高频问题
+        if self.qa_pair_crud is not None:
+            try:
+                since = datetime.now() - timedelta(days=self.history_days)
+                loop = asyncio.get_running_loop()
+                rows = await loop.run_in_executor(
+                    None, self.qa_pair_crud.get_frequent_questions, since, self.max_queries
+                )
+                for question, frequency in rows:
+                    question = (question or "").strip()
+                    if not question:
+                        continue
+                    entry = candidates.setdefault(question, {
+                        'query': question,
+                        'config': default_config.to_dict(),
+                        'hits': 0
+                    })
+                    entry['hits'] += frequency
+            except Exception as e:
+                logger.warning(f"读取问答历史失败: {e}")
+
+        # 缓存服务追踪的热点查询（保留其实际检索配置）
+        cache_service = getattr(self.retrieval_service, 'cache_service', None)
+        if cache_service is not None:
+            try:
+                for hot_query in cache_service.get_hot_queries(self.max_queries):
+                    question = hot_query.get('query', '').strip()
+                    if not question:
+                        continue
+                    config = {**hot_query.get('config', {}), 'enable_cache': True}
+                    entry = candidates.get(question)
+                    if entry is None:
+                        candidates[question] = {
+                            'query': question,
+                            'config': config,
+                            'kwargs': hot_query.get('kwargs', {}),
+                            'hits': hot_query.get('hits', 0)
+                        }
+                    else:
+                        entry['hits'] = max(entry['hits'], hot_query.get('hits', 0))
+            except Exception as e:
+                logger.warning(f"读取热点查询失败: {e}")
+
+        queries = sorted(candidates.values(), key=lambda item: item['hits'], reverse=True)
+        return queries[:self.max_queries]
+
+    async def warm_up(self, queries: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        执行一次预热
+
+        Args:
+            queries: 预热查询列表，为None时从问答历史收集
+
+        Returns:
+            预热结果统计
+        """
+        start_time = datetime.now()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.time_budget
+
+        cache_service = getattr(self.retrieval_service, 'cache_service', None)
+        if cache_service is None or not cache_service.cache_enabled:
+            # 缓存不可用时重放只会消耗提供商配额
+            logger.info("检索缓存未启用，跳过缓存预热")
+            return {'candidates': 0, 'warmed': 0, 'already_cached': 0, 'failed': 0,
+                    'provider_calls': 0, 'stopped_reason': 'cache_disabled', 'duration': 0.0}
+
+        if queries is None:
+            queries = await self.collect_queries()
+
+        result = {
+            'candidates': len(queries),
+            'warmed': 0,
+            'already_cached': 0,
+            'failed': 0,
+            'provider_calls': 0,
+            'stopped_reason': None,
+            'duration': 0.0
+        }
+        consecutive_failures = 0
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for query_info in queries:
+            queue.put_nowait(query_info)
+
+        def budget_exhausted() -> Optional[str]:
+            if loop.time() >= deadline:
+                return 'time_budget'
+            if result['provider_calls'] >= self.max_provider_calls:
+                return 'provider_quota'
+            if consecutive_failures >= self.max_consecutive_failures:
+                return 'provider_errors'
+            return None
+
+        async def worker() -> None:
+            nonlocal consecutive_failures
+            while not queue.empty():
+                reason = budget_exhausted()
+                if reason:
+                    result['stopped_reason'] = result['stopped_reason'] or reason
+                    return
+
+                query_info = queue.get_nowait()
+
+                # 低优先级：有在线问答请求时让出
+                if not await self._wait_for_idle(deadline):
+                    result['stopped_reason'] = result['stopped_reason'] or 'time_budget'
+                    return
+
+                try:
+                    query = query_info['query']
+                    config = RetrievalConfig.from_dict(query_info.get('config', {}))
+                    config.enable_cache = True
+                    kwargs = query_info.get('kwargs') or {}
+
+                    if await cache_service.is_cached(query, config, **kwargs):
+                        result['already_cached'] += 1
+                        continue
+
+                    result['provider_calls'] += 1
+                    await self.retrieval_service.search_with_config(query, config, **kwargs)
+                    result['warmed'] += 1
+                    consecutive_failures = 0
+
+                except Exception as e:
+                    result['failed'] += 1
+                    consecutive_failures += 1
+                    logger.warning(f"预热查询失败: {e}")
+
+                if self.replay_delay > 0:
+                    await asyncio.sleep(self.replay_delay)
+
+        await asyncio.gather(*[worker() for _ in range(min(self.concurrency, max(1, len(queries))))])
+
+        result['duration'] = (datetime.now() - start_time).total_seconds()
+        self.last_result = {**result, 'finished_at': datetime.now().isoformat()}
+        self.total_runs += 1
+
+        logger.info(
+            f"缓存预热完成: 候选{result['candidates']}个, 预热{result['warmed']}个, "
+            f"已缓存{result['already_cached']}个, 失败{result['failed']}个, "
+            f"耗时{result['duration']:.2f}s, 停止原因: {result['stopped_reason'] or 'completed'}"
+        )
+        return result
+
+    async def _wait_for_idle(self, deadline: float) -> bool:
+        """等待在线请求降到阈值以下，超过截止时间返回False"""
+        loop = asyncio.get_running_loop()
+        live_requests = get_single_flight("qa")
+        while live_requests.inflight_count() > self.max_live_requests:
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(self.yield_interval)
+        return True
+
+    def _get_warmup_config(self) -> RetrievalConfig:
+        """预热使用的检索配置：检索服务默认配置并启用缓存"""
+        default_config = getattr(self.retrieval_service, 'default_config', None)
+        if isinstance(default_config, RetrievalConfig):
+            config = RetrievalConfig.from_dict(default_config.to_dict())
+        else:
+            config = RetrievalConfig()
+        config.enable_cache = True
+        return config
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取预热服务状态"""
+        return {
+            'is_running': self.is_running,
+            'total_runs': self.total_runs,
+            'last_result': self.last_result,
+            'config': {
+                'history_days': self.history_days,
+                'max_queries': self.max_queries,
+                'concurrency': self.concurrency,
+                'time_budget': self.time_budget,
+                'max_provider_calls': self.max_provider_calls,
+                'interval': self.interval
+            }
+        }
+
+
+# 全局预热服务实例
+_global_warmup_service: Optional[CacheWarmupService] = None
+
+
+def get_cache_warmup_service() -> Optional[CacheWarmupService]:
+    """获取全局缓存预热服务"""
+    return _global_warmup_service
+
+
+async def start_global_cache_warmup(config: Dict[str, Any]) -> CacheWarmupService:
+    """创建检索服务并启动全局缓存预热任务"""
+    global _global_warmup_service
+
+    if _global_warmup_service is None:
+        from .enhanced_retrieval_service import EnhancedRetrievalService
+
+        # 问答检索不读取缓存时预热结果不会被使用
+        if not config.get('enable_cache', False):
+            raise ConfigurationError("问答检索未启用缓存（retrieval.enable_cache），缓存预热没有作用")
+
+        # 与问答服务使用相同的检索参数，保证预热结果的缓存键与在线请求一致
+        retrieval_service = EnhancedRetrievalService({
+            **config,
+            'default_top_k': config.get('retrieval_top_k', 5)
+        })
+        # 启动成功后才设置全局实例，失败时下次调用重新创建
+        warmup_service = CacheWarmupService(retrieval_service, config)
+        try:
+            await retrieval_service.initialize()
+            await warmup_service.initialize()
+            await warmup_service.start()
+        except Exception:
+            await warmup_service.cleanup()
+            await retrieval_service.cleanup()
+            raise
+
+        _global_warmup_service = warmup_service
+
+    return _global_warmup_service
+
+
+async def stop_global_cache_warmup() -> None:
+    """停止全局缓存预热任务"""
+    global _global_warmup_service
+
+    if _global_warmup_service is not None:
+        await _global_warmup_service.cleanup()
+        await _global_warmup_service.retrieval_service.cleanup()
+        _global_warmup_service = None
@@ -0,0 +1,348 @@
+"""
+文本块邻接表
+
+入库时按文档记录文本块的顺序（前后相邻的块）和所属章节（层次化分割的父章节），
+问答时据此把命中的文本块扩展到相邻的块，不需要再次检索或向量化：
+- 每个文档一个gzip压缩的JSON行文件：章节行 {"section": 路径}，文本块行 [块ID, 章节序号, 与上一块的重叠字符数]
+- 不保存文本块内容，扩展时一次批量读取相邻块的内容（文本块内容存储）
+- 写入时流式追加到临时文件，完成后原子替换
+- 读取后的邻接表按文档缓存在内存中，按估算的占用字节数限制容量
+"""
+import gzip
+import json
+import logging
+import os
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..models.document import TextChunk
+from ..utils.memory_cache import get_memory_cache
+
+logger = logging.getLogger(__name__)
+
+# 邻接表文件格式版本，格式不兼容变更时递增；版本1的文本块行末尾多一列内容，读取时忽略
+ADJACENCY_FORMAT_VERSION = 2
+_READABLE_VERSIONS = (1, ADJACENCY_FORMAT_VERSION)
+
+# 邻接表在内存中每个文本块的估算字节数（块ID字符串、列表项和字典项）
+_ESTIMATED_BYTES_PER_CHUNK = 200
+
+# 批量读取文本块内容的函数 (块ID列表) -> {块ID: 内容}
+FetchTexts = Callable[[List[str]], Awaitable[Dict[str, str]]]
+
+# 相邻块重叠部分的最大检查长度
+_MAX_OVERLAP_CHARS = 2000
+
+
+def get_section_path(chunk: TextChunk) -> Optional[str]:
+    """文本块所属章节：层次化分割的章节路径，其次是章节标题"""
+    path = chunk.metadata.get('hierarchy_path')
+    if path:
+        return " / ".join(str(title) for title in path)
+    return chunk.metadata.get('section_title') or None
+
+
+def compute_overlap(previous: str, current: str) -> int:
+    """计算上一块结尾与当前块开头重复的字符数（分割时的块重叠）"""
+    if not previous or not current:
+        return 0
+    start = max(0, len(previous) - min(len(current), _MAX_OVERLAP_CHARS))
+    first = current[0]
+    position = previous.find(first, start)
+    while position != -1:
+        # 最早的匹配位置对应最长的重叠
+        if current.startswith(previous[position:]):
+            return len(previous) - position
+        position = previous.find(first, position + 1)
+    return 0
+
+
+class ChunkAdjacencyTable:
+    """单个文档的文本块邻接表"""
+
+    def __init__(self, document_id: str, chunk_ids: List[str],
+                 sections: List[int], overlaps: List[int], section_paths: List[str]):
+        self.document_id = document_id
+        self.chunk_ids = chunk_ids
+        self.sections = sections
+        self.overlaps = overlaps
+        self.section_paths = section_paths
+        self.positions = {chunk_id: position for position, chunk_id in enumerate(chunk_ids)}
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def estimated_size(self) -> int:
+        """邻接表在内存中的估算字节数"""
+        return len(self.chunk_ids) * _ESTIMATED_BYTES_PER_CHUNK + sum(len(path) for path in self.section_paths)
+
+    def position(self, chunk_id: str) -> Optional[int]:
+        """文本块在文档中的位置"""
+        return self.positions.get(chunk_id)
+
+    def previous(self, chunk_id: str) -> Optional[str]:
+        """前一个文本块ID"""
+        position = self.positions.get(chunk_id)
+        if position is None or position == 0:
+            return None
+        return self.chunk_ids[position - 1]
+
+    def next(self, chunk_id: str) -> Optional[str]:
+        """后一个文本块ID"""
+        position = self.positions.get(chunk_id)
+        if position is None or position + 1 >= len(self.chunk_ids):
+            return None
+        return self.chunk_ids[position + 1]
+
+    def section(self, chunk_id: str) -> Optional[str]:
+        """文本块所属章节路径"""
+        position = self.positions.get(chunk_id)
+        if position is None or self.sections[position] < 0:
+            return None
+        return self.section_paths[self.sections[position]]
+
+    def neighbors(self, chunk_id: str, window: int = 1, same_section: bool = False) -> List[int]:
+        """
+        获取相邻文本块的位置，按与命中块的距离由近到远排列（同距离时前一块在先）
+
+        Args:
+            window: 两侧各取多少个块
+            same_section: 只取同一章节内的块
+        """
+        position = self.positions.get(chunk_id)
+        if position is None:
+            return []
+
+        section = self.sections[position]
+        result = []
+        for distance in range(1, window + 1):
+            for neighbor in (position - distance, position + distance):
+                if not 0 <= neighbor < len(self.chunk_ids):
+                    continue
+                if same_section and self.sections[neighbor] != section:
+                    continue
+                result.append(neighbor)
+        return result
+
+    def join(self, positions: Iterable[int], texts: Dict[str, str]) -> str:
+        """按文档顺序拼接文本块，去掉连续块之间的重叠部分"""
+        parts = []
+        last = None
+        for position in sorted(set(positions)):
+            content = texts[self.chunk_ids[position]]
+            if last is not None and position == last + 1:
+                content = content[self.overlaps[position]:]
+            if content:
+                parts.append(content)
+            last = position
+        return "\n".join(parts)
+
+
+class ChunkAdjacencyWriter:
+    """按文档顺序流式写入邻接表"""
+
+    def __init__(self, store: "ChunkAdjacencyStore", document_id: str):
+        self.store = store
+        self.document_id = document_id
+        self.path = store._table_path(document_id)
+        self.tmp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.tmp_path, 'wt', encoding='utf-8', compresslevel=6)
+        self._write({'version': ADJACENCY_FORMAT_VERSION, 'document_id': document_id})
+        self._sections: Dict[str, int] = {}
+        self._last_content: Optional[str] = None
+        self.chunk_count = 0
+
+    def _write(self, row: Any) -> None:
+        self._file.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+
+    def add(self, chunks: Iterable[TextChunk]) -> None:
+        """追加一批文本块（按文档顺序）"""
+        for chunk in chunks:
+            section_path = get_section_path(chunk)
+            section = -1
+            if section_path is not None:
+                section = self._sections.get(section_path, -1)
+                if section < 0:
+                    section = len(self._sections)
+                    self._sections[section_path] = section
+                    self._write({'section': section_path})
+
+            overlap = compute_overlap(self._last_content, chunk.content) if self._last_content else 0
+            self._write([chunk.id, section, overlap])
+            self._last_content = chunk.content
+            self.chunk_count += 1
+
+    def commit(self) -> None:
+        """完成写入，替换该文档原有的邻接表"""
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        self.store._tables.delete(self.document_id)
+        logger.debug(f"文本块邻接表已写入: 文档ID={self.document_id}, 块数={self.chunk_count}")
+
+    def abort(self) -> None:
+        """放弃写入，保留原有的邻接表"""
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            self.tmp_path.unlink()
+        except OSError:
+            pass
+
+
+class ChunkAdjacencyStore:
+    """按文档存储文本块邻接表"""
+
+    def __init__(self, base_dir: str, cache_max_mb: float = 32):
+        self.base_dir = Path(base_dir)
+        max_bytes = int(cache_max_mb * 1024 * 1024)
+        self._tables = get_memory_cache(
+            f"chunk_adjacency:{self.base_dir}", max_entries=sys.maxsize,
+            max_bytes=max_bytes, size_of=_table_size
+        )
+        self._tables.resize(max_bytes=max_bytes)
+
+    def _table_path(self, document_id: str) -> Path:
+        return self.base_dir / f"{document_id}.jsonl.gz"
+
+    def open_writer(self, document_id: str) -> ChunkAdjacencyWriter:
+        """开始写入文档的邻接表"""
+        return ChunkAdjacencyWriter(self, document_id)
+
+    def save(self, document_id: str, chunks: Iterable[TextChunk]) -> None:
+        """写入文档全部文本块的邻接表"""
+        writer = self.open_writer(document_id)
+        try:
+            writer.add(chunks)
+        except Exception:
+            writer.abort()
+            raise
+        writer.commit()
+
+    def load(self, document_id: str) -> Optional[ChunkAdjacencyTable]:
+        """读取文档的邻接表，不存在或损坏时返回None"""
+        table = self._tables.get(document_id)
+        if table is not None:
+            return table
+
+        path = self._table_path(document_id)
+        chunk_ids, sections, overlaps, section_paths = [], [], [], []
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('version') not in _READABLE_VERSIONS:
+                    return None
+                for line in f:
+                    row = json.loads(line)
+                    if isinstance(row, dict):
+                        section_paths.append(row['section'])
+                        continue
+                    chunk_id, section, overlap = row[:3]
+                    chunk_ids.append(chunk_id)
+                    sections.append(section)
+                    overlaps.append(overlap)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"文本块邻接表读取失败，已忽略: {path}, 错误: {e}")
+            return None
+
+        table = ChunkAdjacencyTable(document_id, chunk_ids, sections, overlaps, section_paths)
+        self._tables.set(document_id, table)
+        return table
+
+    def delete(self, document_id: str) -> bool:
+        """删除文档的邻接表"""
+        self._tables.delete(document_id)
+        try:
+            self._table_path(document_id).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def rename(self, document_id: str, new_document_id: str) -> bool:
+        """将邻接表转给另一个文档（原文档删除后由别名接管）"""
+        self._tables.delete(document_id)
+        self._tables.delete(new_document_id)
+        try:
+            os.replace(self._table_path(document_id), self._table_path(new_document_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def expand(self, hits: List[Tuple[str, str]], budget: int, fetch_texts: FetchTexts,
+                     window: int = 1, same_section: bool = False) -> Dict[str, Tuple[str, List[str]]]:
+        """
+        在字符预算内把命中的文本块扩展到相邻的块
+
+        命中块和窗口内的候选相邻块的内容通过 fetch_texts 一次批量读取。
+        按命中顺序（相关度从高到低）依次为每个命中块加入距离最近的相邻块，
+        已命中或已被其他命中块加入的块不重复加入，读取不到内容的块跳过
+
+        Args:
+            hits: [(文档ID, 块ID)]，按相关度从高到低排列
+            budget: 可用于相邻块的字符数
+            fetch_texts: 批量读取文本块内容的异步函数
+            window: 每个命中块两侧最多扩展的块数
+            same_section: 只扩展到同一章节内的块
+
+        Returns:
+            {块ID: (扩展后的内容, 按文档顺序排列的块ID列表)}，只包含实际扩展了的命中块
+        """
+        tables = {}
+        hit_positions = {}
+        candidates: Dict[str, List[int]] = {}
+        for document_id, chunk_id in hits:
+            if document_id not in tables:
+                tables[document_id] = self.load(document_id)
+            table = tables[document_id]
+            if table is not None and chunk_id in table.positions:
+                hit_positions.setdefault(document_id, set()).add(table.positions[chunk_id])
+                candidates[chunk_id] = table.neighbors(chunk_id, window, same_section)
+
+        if not candidates:
+            return {}
+
+        wanted = []
+        for document_id, chunk_id in hits:
+            if chunk_id in candidates:
+                table = tables[document_id]
+                wanted.append(chunk_id)
+                wanted.extend(table.chunk_ids[position] for position in candidates[chunk_id])
+        texts = await fetch_texts(list(dict.fromkeys(wanted)))
+
+        used = {document_id: set(positions) for document_id, positions in hit_positions.items()}
+        added: Dict[str, List[int]] = {}
+        for document_id, chunk_id in hits:
+            if chunk_id not in candidates or chunk_id in added or chunk_id not in texts:
+                continue
+            table = tables[document_id]
+            for position in candidates[chunk_id]:
+                content = texts.get(table.chunk_ids[position])
+                if position in used[document_id] or content is None:
+                    continue
+                cost = len(content) + 1
+                if cost > budget:
+                    continue
+                budget -= cost
+                used[document_id].add(position)
+                added.setdefault(chunk_id, []).append(position)
+
+        expanded = {}
+        for document_id, chunk_id in hits:
+            if chunk_id not in added or chunk_id in expanded:
+                continue
+            table = tables[document_id]
+            positions = sorted(added[chunk_id] + [table.positions[chunk_id]])
+            expanded[chunk_id] = (table.join(positions, texts), [table.chunk_ids[p] for p in positions])
+        return expanded
+
+
+def _table_size(table: ChunkAdjacencyTable) -> int:
+    return table.estimated_size
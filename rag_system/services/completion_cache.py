@@ -0,0 +1,148 @@
+"""
+LLM补全缓存模块
+
+按提示词指纹缓存LLM生成结果，支持：
+- 缓存键包含提供商、模型、采样参数和完整提示词
+- 温度大于0时默认跳过缓存（可显式允许）
+- 进程内一级缓存 + Redis二级缓存
+"""
+
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+from .cache_service import CacheService
+from ..utils.memory_cache import get_memory_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCache:
+    """LLM补全缓存"""
+
+    KEY_PREFIX = "llm_completion:"
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, cache_service: Optional[CacheService] = None):
+        """
+        初始化补全缓存
+
+        Args:
+            config: 配置字典
+            cache_service: 提供Redis连接的缓存服务（可选，不可用时仅使用进程内缓存）
+        """
+        self.config = config or {}
+        self.cache_service = cache_service
+
+        self.enabled = self.config.get('enable_completion_cache', False)
+        self.ttl = self.config.get('completion_cache_ttl', 3600)
+        self.allow_sampling = self.config.get('completion_cache_allow_sampling', False)
+
+        self.memory_cache = get_memory_cache(
+            'llm_completion',
+            max_entries=self.config.get('completion_cache_max_entries', 1000),
+            default_ttl=self.ttl
+        )
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'errors': 0
+        }
+
+    def is_cacheable(self, temperature: Optional[float]) -> bool:
+        """判断给定采样参数的生成结果是否可以缓存
+
+        温度大于0时生成结果不确定，除非显式允许，否则不缓存
+        """
+        if not self.enabled:
+            return False
+        if temperature and temperature > 0 and not self.allow_sampling:
+            self.stats['bypassed'] += 1
+            return False
+        return True
+
+    def generate_key(
+        self,
+        provider: str,
+        model: str,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """生成补全缓存键（提示词指纹）"""
+        fingerprint = json.dumps(
+            {
+                'provider': provider,
+                'model': model,
+                'temperature': temperature,
+                'max_tokens': max_tokens,
+                'prompt': prompt
+            },
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return f"{self.KEY_PREFIX}{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()}"
+
+    def _redis_available(self) -> bool:
+        return bool(self.cache_service and self.cache_service.cache_enabled and self.cache_service.redis_client)
+
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存的补全结果"""
+        completion = self.memory_cache.get(key)
+        if completion is not None:
+            self.stats['hits'] += 1
+            return completion
+
+        if self._redis_available():
+            try:
+                cached_data = await self.cache_service.redis_client.get(key)
+                if cached_data:
+                    completion = json.loads(cached_data).get('completion')
+                    if completion is not None:
+                        # 回填进程内缓存
+                        self.memory_cache.set(key, completion)
+                        self.stats['hits'] += 1
+                        return completion
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"读取补全缓存失败: {e}")
+
+        self.stats['misses'] += 1
+        return None
+
+    async def set(self, key: str, completion: str) -> None:
+        """写入补全结果"""
+        self.memory_cache.set(key, completion, ttl=self.ttl)
+
+        if self._redis_available():
+            try:
+                cache_data = json.dumps(
+                    {'completion': completion, 'cached_at': datetime.now().isoformat()},
+                    ensure_ascii=False
+                )
+                await self.cache_service.redis_client.setex(key, self.ttl, cache_data)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"写入补全缓存失败: {e}")
+
+    async def clear(self) -> int:
+        """清空补全缓存"""
+        count = self.memory_cache.clear()
+        if self._redis_available():
+            count += await self.cache_service.clear_cache(f"{self.KEY_PREFIX}*")
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取补全缓存统计信息"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'allow_sampling': self.allow_sampling,
+            'hit_rate': self.stats['hits'] / total if total > 0 else 0.0,
+            'memory_entries': len(self.memory_cache),
+            **self.stats
+        }
@@ -1,20 +1,29 @@
 """
 文档处理服务实现
 """
+import asyncio
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterable, Tuple, AsyncIterator, Union, AsyncIterable
+from dataclasses import dataclass, asdict
 import uuid
 from datetime import datetime
 
 from ..models.document import TextChunk
 from ..models.vector import Vector
 from ..document_processing.extractors import TextExtractorFactory
-from ..document_processing.splitters import RecursiveTextSplitter, SplitConfig
+from ..document_processing.splitters import RecursiveTextSplitter, SplitConfig, assign_chunk_ids
 from ..document_processing.preprocessors import TextPreprocessor, PreprocessConfig
+from ..document_processing.semantic_chunker import EmbeddingSemanticSplitter
+from ..document_processing.token_estimator import get_token_budget
+from ..document_processing.process_pool import (
+    get_document_process_pool, extract_and_split, split_cached, stream_page_chunks, join_parts,
+    decode_chunks, iter_chunks
+)
+from ..document_processing.text_cache import get_text_cache
 from .embedding_service import EmbeddingService
 from ..utils.exceptions import DocumentError, ProcessingError
+from ..utils.executors import EXTRACTION, get_executor
 from .base import BaseService
 
 logger = logging.getLogger(__name__)
@@ -29,6 +38,8 @@ class ProcessResult:
     error_message: str = ""
     processing_time: float = 0.0
     chunk_count: int = 0
+    reused_chunk_count: int = 0
+    vector_count: int = 0
 
 
 class DocumentProcessor(BaseService):
@@ -47,7 +58,9 @@ class DocumentProcessor(BaseService):
             'api_base': self.config.get('embedding_api_base'),
             'batch_size': self.config.get('embedding_batch_size', 100),
             'dimensions': self.config.get('embedding_dimensions'),
-            'timeout': self.config.get('embedding_timeout', 30)
+            'timeout': self.config.get('embedding_timeout', 30),
+            # 嵌入语义分割会逐句向量化，默认启用向量缓存使重复句子不再请求模型
+            'cache_max_mb': self._get_embedding_cache_max_mb()
         }
         #print(f'Document_Processor 嵌入式模型配置 Config ：{embedding_config}')
         self.embedding_service = EmbeddingService(embedding_config)
@@ -61,10 +74,23 @@ class DocumentProcessor(BaseService):
             preserve_structure=self.config.get('preserve_structure', True),
             generate_summary=self.config.get('generate_summary', False),
             generate_questions=self.config.get('generate_questions', False),
-            semantic_split=self.config.get('semantic_split', False)
+            semantic_split=self.config.get('semantic_split', False),
+            max_chunk_tokens=self._get_chunk_token_budget(),
+            token_model=self.config.get('embedding_model', 'text-embedding-ada-002')
         )
+        self.split_config = split_config
         self.text_splitter = RecursiveTextSplitter(split_config)
         
+        # 嵌入语义分割：按句子向量的语义距离分块，文本块向量由句子向量合成
+        self.semantic_splitter = None
+        if self.config.get('semantic_split_mode') == 'embedding':
+            self.semantic_splitter = EmbeddingSemanticSplitter(
+                split_config,
+                breakpoint_percentile=self.config.get('semantic_breakpoint_percentile', 90),
+                window_size=self.config.get('semantic_window_size', 2),
+                batch_size=self.config.get('semantic_embedding_batch_size', 256)
+            )
+        
         # 初始化预处理器配置
         preprocess_config = PreprocessConfig(
             remove_extra_whitespace=self.config.get('remove_extra_whitespace', True),
@@ -78,12 +104,52 @@ class DocumentProcessor(BaseService):
             language=self.config.get('language', 'zh'),
             custom_patterns=self.config.get('custom_patterns', None)
         )
+        self.preprocess_config = preprocess_config
         self.text_preprocessor = TextPreprocessor(preprocess_config)
         
+        # 进程池配置：提取和分割在独立进程中执行，避免阻塞事件循环；0表示不使用进程池
+        self.process_pool_workers = self.config.get('process_pool_workers', 2)
+        self.process_pool_max_tasks_per_child = self.config.get('process_pool_max_tasks_per_child', 50)
+        self.process_pool_memory_limit_mb = self.config.get('process_pool_memory_limit_mb')
+        
+        # 分页文档（PDF）按页码范围并行提取，单页超时后跳过该页
+        self.pages_per_task = self.config.get('pdf_pages_per_task', 25)
+        self.page_timeout = self.config.get('pdf_page_timeout', 30)
+        
+        # 流式处理：文本块按批向量化并写入，阶段之间的队列最多积压 pipeline_queue_size 批
+        self.pipeline_batch_size = self.config.get('pipeline_batch_size', 32)
+        self.pipeline_queue_size = self.config.get('pipeline_queue_size', 2)
+        
+        # 提取文本缓存：按文件内容哈希和提取器版本缓存解析结果，未配置目录时不启用
+        text_cache_dir = self.config.get('text_cache_dir')
+        self.text_cache_options = {
+            'cache_dir': str(text_cache_dir),
+            'max_size_mb': self.config.get('text_cache_max_size_mb', 1024),
+            'cache_preprocessed': self.config.get('text_cache_preprocessed', True)
+        } if text_cache_dir else None
+        
         # 保持向后兼容
         self._chunk_size = split_config.chunk_size
         self._chunk_overlap = split_config.chunk_overlap
-    
+
+    def _get_embedding_cache_max_mb(self) -> float:
+        """向量缓存容量（MB）：未配置时仅在嵌入语义分割模式下启用"""
+        cache_max_mb = self.config.get('embedding_cache_max_mb')
+        if cache_max_mb is None:
+            return 16 if self.config.get('semantic_split_mode') == 'embedding' else 0
+        return cache_max_mb
+
+    def _get_chunk_token_budget(self) -> int:
+        """单个文本块的词元上限：优先使用显式配置，否则按嵌入模型的输入上限推算"""
+        max_chunk_tokens = self.config.get('max_chunk_tokens')
+        if max_chunk_tokens:
+            return max_chunk_tokens
+        return get_token_budget(
+            self.config.get('embedding_model', 'text-embedding-ada-002'),
+            self.config.get('embedding_max_tokens'),
+            self.config.get('chunk_token_safety_margin', 0.9)
+        )
+
     async def initialize(self) -> None:
         """初始化文档处理器"""
         # 初始化嵌入服务
@@ -143,10 +209,9 @@ class DocumentProcessor(BaseService):
             logger.debug(f"文本预处理完成: 原长度={len(text)}, 处理后长度={len(preprocessed_text)}")
             
             # 使用递归分割器分割文本
-            chunks = self.text_splitter.split(preprocessed_text, doc_id)
+            chunks = assign_chunk_ids(self.text_splitter.split(preprocessed_text, doc_id))
             
 
-            
             if not chunks:
                 raise ProcessingError("文本分割后没有生成任何块")
             
@@ -159,6 +224,85 @@ class DocumentProcessor(BaseService):
             logger.error(f"文本分割失败: 文档ID={doc_id}, 错误: {str(e)}")
             raise ProcessingError(f"文本分割失败: {str(e)}")
     
+    async def extract_and_split(self, file_path: str, doc_id: str) -> List[TextChunk]:
+        """
+        提取并分割文档，不阻塞事件循环
+        
+        启用进程池时在工作进程中执行，只回传文本和块偏移量，分页文档按页码范围并行提取；
+        未启用时在线程池中执行
+        """
+        payload = await self._extract_payload(file_path, doc_id)
+        return decode_chunks(payload, doc_id)
+    
+    async def _extract_payload(self, file_path: str, doc_id: str, text_only: bool = False) -> Dict[str, Any]:
+        """
+        提取并分割文档，返回预处理后的文本和文本块偏移量
+        
+        text_only 时工作进程不分割，只返回预处理后的文本（嵌入语义分割在父进程中分块）
+        """
+        payload = join_parts([part async for part in self._extract_parts(file_path, doc_id, text_only)])
+        logger.info(
+            f"文档提取和分割完成: 文档ID={doc_id}, 文本长度={payload['raw_length']}, 块数={len(payload['chunks'])}"
+        )
+        return payload
+    
+    async def _iter_chunks(self, file_path: str, doc_id: str) -> AsyncIterator[TextChunk]:
+        """提取并分割文档，分页文档每完成一个页码范围就产出其文本块"""
+        chunk_count = 0
+        async for part in self._extract_parts(file_path, doc_id):
+            for chunk in iter_chunks(part, doc_id):
+                chunk_count += 1
+                yield chunk
+        logger.info(f"文档提取和分割完成: 文档ID={doc_id}, 块数={chunk_count}")
+    
+    async def _extract_parts(self, file_path: str, doc_id: str,
+                             text_only: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        提取并分割文档，按页顺序产出分割结果
+        
+        分页文档未命中缓存时按页码范围在工作进程中并行提取、预处理和分割，逐个范围产出；
+        其余情况产出一个整篇文档的结果
+        """
+        split_options = asdict(self.split_config)
+        preprocess_options = asdict(self.preprocess_config)
+        
+        if not self.process_pool_workers:
+            yield await get_executor(EXTRACTION).run(
+                extract_and_split, file_path, doc_id, split_options, preprocess_options,
+                self.page_timeout, self.text_cache_options, self.pages_per_task, text_only
+            )
+            return
+        
+        process_pool = get_document_process_pool(
+            max_workers=self.process_pool_workers,
+            max_tasks_per_child=self.process_pool_max_tasks_per_child,
+            memory_limit_mb=self.process_pool_memory_limit_mb
+        )
+        logger.info(f"提交文档到处理进程池: {file_path}, 文档ID: {doc_id}")
+        
+        extractor = self.extractor_factory.get_extractor(file_path)
+        if not (Path(file_path).exists() and hasattr(extractor, 'iter_pages')):
+            yield await process_pool.run(
+                extract_and_split, file_path, doc_id, split_options, preprocess_options,
+                self.page_timeout, self.text_cache_options, self.pages_per_task, text_only
+            )
+            return
+        
+        if self.text_cache_options:
+            payload = await process_pool.run(
+                split_cached, file_path, doc_id, split_options, preprocess_options,
+                self.text_cache_options, self.pages_per_task, text_only
+            )
+            if payload is not None:
+                yield payload
+                return
+        
+        async for part in stream_page_chunks(
+            process_pool, file_path, doc_id, split_options, preprocess_options,
+            self.pages_per_task, self.page_timeout, self.text_cache_options, text_only
+        ):
+            yield part
+    
     async def vectorize_chunks(self, chunks: List[TextChunk], document_name: str = None) -> List[Vector]:
         """向量化文本块"""
         try:
@@ -176,21 +320,53 @@ class DocumentProcessor(BaseService):
             logger.error(f"向量化失败: 错误: {str(e)}")
             raise ProcessingError(f"向量化失败: {str(e)}")
     
-    async def process_document(self, file_path: str, doc_id: str, document_name: str = None) -> ProcessResult:
-        """处理文档的完整流程"""
+    async def process_document(self, file_path: str, doc_id: str, document_name: str = None,
+                               chunk_filter=None, vector_sink=None) -> ProcessResult:
+        """
+        处理文档的完整流程
+        
+        Args:
+            chunk_filter: 可选的异步过滤函数 (doc_id, chunks) -> 需要向量化的块，
+                按批调用，用于跳过已有向量的块
+            vector_sink: 可选的异步写入函数 (vectors) -> Any。提供时文本块按批向量化后
+                立即写入，结果中不保留文本块和向量，内存占用与文档大小无关
+        """
         start_time = datetime.now()
         
         try:
             logger.info(f"开始处理文档: {file_path}, 文档ID: {doc_id}")
             
-            # 1. 提取文本
-            text_content = self.extract_text(file_path)
-            print(f'提取文本：{text_content}')
-            # 2. 分割文本
-            chunks = self.split_text(text_content, doc_id)
+            # 1-2. 提取并分割文本（在进程池中执行，分页文档逐个页码范围产出文本块）
+            # 嵌入语义分割：句子向量化后分块，文本块直接使用合成的向量
+            embed = None
+            semantic_chunks = None
+            if self.semantic_splitter is not None:
+                payload = await self._extract_payload(file_path, doc_id, text_only=True)
+                semantic_chunks, embed = await self._split_semantically(payload['text'], doc_id, document_name)
             
-            # 3. 向量化，传递文档名称
-            vectors = await self.vectorize_chunks(chunks, document_name)
+            # 3-4. 过滤已有向量的块，分批向量化并写入
+            if vector_sink is None:
+                if semantic_chunks is not None:
+                    chunks = semantic_chunks
+                else:
+                    chunks = [chunk async for chunk in self._iter_chunks(file_path, doc_id)]
+                vectors = []
+                
+                async def collect(batch: List[Vector]) -> None:
+                    vectors.extend(batch)
+                
+                chunk_count, embedded_count, vector_count = await self._embed_and_store(
+                    chunks, doc_id, document_name, chunk_filter, collect, embed
+                )
+            else:
+                chunks, vectors = [], []
+                chunk_count, embedded_count, vector_count = await self._embed_and_store(
+                    semantic_chunks if semantic_chunks is not None else self._iter_chunks(file_path, doc_id),
+                    doc_id, document_name, chunk_filter, vector_sink, embed
+                )
+            
+            if not chunk_count:
+                raise ProcessingError("文本分割后没有生成任何块")
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -199,13 +375,15 @@ class DocumentProcessor(BaseService):
                 chunks=chunks,
                 vectors=vectors,
                 processing_time=processing_time,
-                chunk_count=len(chunks)
+                chunk_count=chunk_count,
+                reused_chunk_count=chunk_count - embedded_count,
+                vector_count=vector_count
             )
             
             logger.info(
                 f"文档处理完成: {file_path}, "
-                f"块数: {len(chunks)}, "
-                f"向量数: {len(vectors)}, "
+                f"块数: {chunk_count}, "
+                f"向量数: {vector_count}, "
                 f"耗时: {processing_time:.2f}秒"
             )
             
@@ -234,6 +412,105 @@ class DocumentProcessor(BaseService):
                 processing_time=processing_time
             )
     
+    async def _split_semantically(self, text: str, doc_id: str, document_name: Optional[str]):
+        """
+        按句子向量分割文本
+        
+        Returns:
+            (文本块列表, 按批返回合成向量的异步函数)
+        """
+        chunks, embeddings = await self.semantic_splitter.split(
+            text, doc_id, self.embedding_service.vectorize_texts
+        )
+        assign_chunk_ids(chunks)
+        pooled = {chunk.id: embedding for chunk, embedding in zip(chunks, embeddings)}
+        
+        async def embed(batch: List[TextChunk]) -> List[Vector]:
+            return self.embedding_service.build_vectors(
+                batch, [pooled[chunk.id] for chunk in batch], document_name
+            )
+        
+        return chunks, embed
+    
+    async def _embed_and_store(self, chunks: Union[Iterable[TextChunk], AsyncIterable[TextChunk]], doc_id: str,
+                               document_name: Optional[str], chunk_filter, vector_sink,
+                               embed=None) -> Tuple[int, int, int]:
+        """
+        流式向量化并写入文本块
+        
+        读取分批、向量化、写入三个阶段并发执行：向量化下一批的同时写入上一批。
+        阶段之间使用有界队列，下游变慢时上游等待，内存中最多保留几批文本块和向量
+        
+        Args:
+            chunks: 文本块的同步或异步迭代器
+            embed: 可选的异步函数 (chunks) -> 向量列表，默认调用嵌入模型向量化
+        
+        Returns:
+            (文本块数, 向量化的块数, 写入的向量数)
+        """
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        store_queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        counts = {'chunks': 0, 'embedded': 0, 'vectors': 0}
+        
+        async def read_batches() -> None:
+            batch = []
+            
+            async def add(chunk: TextChunk) -> None:
+                nonlocal batch
+                batch.append(chunk)
+                counts['chunks'] += 1
+                if len(batch) >= self.pipeline_batch_size:
+                    await embed_queue.put(batch)
+                    batch = []
+            
+            if hasattr(chunks, '__aiter__'):
+                async for chunk in chunks:
+                    await add(chunk)
+            else:
+                for chunk in chunks:
+                    await add(chunk)
+            if batch:
+                await embed_queue.put(batch)
+            await embed_queue.put(None)
+        
+        async def embed_batches() -> None:
+            while (batch := await embed_queue.get()) is not None:
+                if chunk_filter is not None:
+                    batch = await chunk_filter(doc_id, batch)
+                if batch:
+                    counts['embedded'] += len(batch)
+                    if embed is not None:
+                        await store_queue.put(await embed(batch))
+                    else:
+                        await store_queue.put(await self.vectorize_chunks(batch, document_name))
+            await store_queue.put(None)
+        
+        async def store_batches() -> None:
+            while (vectors := await store_queue.get()) is not None:
+                await vector_sink(vectors)
+                counts['vectors'] += len(vectors)
+        
+        tasks = [
+            asyncio.create_task(read_batches()),
+            asyncio.create_task(embed_batches()),
+            asyncio.create_task(store_batches())
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # 任一阶段失败时停止其余阶段，避免阻塞在队列上
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        
+        return counts['chunks'], counts['embedded'], counts['vectors']
+    
+    def get_text_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取提取文本缓存统计（命中数等只统计当前进程），未启用时返回None"""
+        cache = get_text_cache(self.text_cache_options)
+        return cache.get_stats() if cache else None
+    
     def get_supported_formats(self) -> List[str]:
         """获取支持的文件格式"""
         return self.extractor_factory.get_supported_formats()
@@ -1,27 +1,46 @@
 """
 文档管理服务实现
 """
+import asyncio
+import hashlib
 import logging
 import os
 import uuid
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 from fastapi import UploadFile
 
-from ..models.document import DocumentInfo, DocumentStatus
+from ..models.document import DocumentInfo, DocumentStatus, TextChunk
+from ..models.vector import Vector
 from ..models.config import VectorStoreConfig
 from ..database.crud import DocumentCRUD
 from ..database.connection import DatabaseManager
+from ..database.session import DatabaseSession
 from ..models.config import DatabaseConfig
-from .document_processor import DocumentProcessor
+from .chunk_adjacency import ChunkAdjacencyStore, ChunkAdjacencyWriter
+from .document_processor import DocumentProcessor, ProcessResult
 from .vector_service import VectorStoreService
-from ..utils.exceptions import DocumentError, ProcessingError, VectorStoreError
+from ..utils.exceptions import DocumentError, ProcessingError, VectorStoreError, FileTooLargeError
+from ..utils.helpers import compute_text_hash
 from .base import BaseService
 
 logger = logging.getLogger(__name__)
 
+# 进程内共享的文档处理并发上限：各请求创建各自的服务实例，上限需要跨实例共享
+_processing_semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+
+def _get_processing_semaphore(limit: int) -> asyncio.Semaphore:
+    """获取当前事件循环的文档处理信号量，上限以首次创建时的配置为准"""
+    global _processing_semaphore
+    loop = asyncio.get_running_loop()
+    if _processing_semaphore is None or _processing_semaphore[0] is not loop:
+        _processing_semaphore = (loop, asyncio.Semaphore(max(1, limit)))
+    return _processing_semaphore[1]
+
 
 class DocumentService(BaseService):
     """文档管理服务"""
@@ -29,17 +48,43 @@ class DocumentService(BaseService):
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         super().__init__(config)
         #print(f'Document_Service 配置 CONFIG : {config}')
+        # 提取文本缓存默认放在文档存储目录下，text_cache_enabled 为 False 时关闭
+        text_cache_dir = None
+        if self.config.get('text_cache_enabled', True):
+            text_cache_dir = self.config.get('text_cache_dir') or os.path.join(
+                self.config.get('storage_dir', './documents'), '.text_cache'
+            )
+        
         # 初始化文档处理
         processor_config = {
             'chunk_size': self.config.get('chunk_size', 1000),
             'chunk_overlap': self.config.get('chunk_overlap', 200),
             'min_chunk_size': self.config.get('min_chunk_size', 100),  # 添加min_chunk_size配置
             'max_chunk_size': self.config.get('max_chunk_size', 2000),  # 添加max_chunk_size配置
+            'semantic_split': self.config.get('semantic_split', False),
+            'semantic_split_mode': self.config.get('semantic_split_mode', 'rules'),
+            'semantic_breakpoint_percentile': self.config.get('semantic_breakpoint_percentile', 90),
+            'semantic_window_size': self.config.get('semantic_window_size', 2),
+            'semantic_embedding_batch_size': self.config.get('semantic_embedding_batch_size', 256),
             'embedding_provider': self.config.get('embedding_provider', 'mock'),
             'embedding_model': self.config.get('embedding_model', 'text-embedding-ada-002'),
             'embedding_api_key': self.config.get('embedding_api_key'),
             'embedding_batch_size': self.config.get('embedding_batch_size', 10),  # 添加批量大小配置
             'embedding_dimensions': self.config.get('embedding_dimensions'),
+            'embedding_cache_max_mb': self.config.get('embedding_cache_max_mb'),
+            'embedding_max_tokens': self.config.get('embedding_max_tokens'),
+            'max_chunk_tokens': self.config.get('max_chunk_tokens'),
+            'chunk_token_safety_margin': self.config.get('chunk_token_safety_margin', 0.9),
+            'process_pool_workers': self.config.get('process_pool_workers', 2),
+            'process_pool_max_tasks_per_child': self.config.get('process_pool_max_tasks_per_child', 50),
+            'process_pool_memory_limit_mb': self.config.get('process_pool_memory_limit_mb'),
+            'pdf_pages_per_task': self.config.get('pdf_pages_per_task', 25),
+            'pdf_page_timeout': self.config.get('pdf_page_timeout', 30),
+            'pipeline_batch_size': self.config.get('pipeline_batch_size', 32),
+            'pipeline_queue_size': self.config.get('pipeline_queue_size', 2),
+            'text_cache_dir': text_cache_dir,
+            'text_cache_max_size_mb': self.config.get('text_cache_max_size_mb', 1024),
+            'text_cache_preprocessed': self.config.get('text_cache_preprocessed', True),
         }
         #print(f'Document_Service 配置 processor_config : {processor_config}')
 
@@ -49,7 +94,12 @@ class DocumentService(BaseService):
         vector_config = VectorStoreConfig(
             type=self.config.get('vector_store_type', 'chroma'),
             persist_directory=self.config.get('vector_store_path', './chroma_db'),
-            collection_name=self.config.get('collection_name', 'documents')
+            collection_name=self.config.get('collection_name', 'documents'),
+            write_batch_size=self.config.get('vector_write_batch_size', 500),
+            max_inflight_writes=self.config.get('vector_max_inflight_writes', 2),
+            write_workers=self.config.get('vector_write_workers', 2),
+            write_retries=self.config.get('vector_write_retries', 2),
+            write_retry_delay=self.config.get('vector_write_retry_delay', 0.5)
         )
         #print(f'Document_Service 配置 vector_config : {vector_config}')
         self.vector_service = VectorStoreService(vector_config)
@@ -62,10 +112,37 @@ class DocumentService(BaseService):
         #print(f'Document_Service 配置 db_config : {db_config}')
         self.db_manager = DatabaseManager(db_config)
         self.document_crud = None  # 将在initialize中创建
+        self.db_session: Optional[DatabaseSession] = None
+        
+        # 后台入库队列（为None时使用全局队列，队列未启动时在请求内同步处理）
+        self.ingestion_queue = None
+        
+        # 上传限制：超过上限的文件在流式写入过程中即被拒绝
+        self.max_file_size = self.config.get('max_file_size', 50 * 1024 * 1024)
+        self.upload_chunk_size = self.config.get('upload_chunk_size', 1024 * 1024)
+        
+        # 并发：批量上传时同时进行的上传数，没有入库队列时同时处理的文档数（全局）
+        self.batch_upload_concurrency = max(1, self.config.get('batch_upload_concurrency', 8))
+        self.max_concurrent_processing = self.config.get('max_concurrent_processing', 4)
+        
+        # 批量删除：每批删除向量的文档数，并行删除文件的线程数
+        self.delete_batch_size = max(1, self.config.get('delete_batch_size', 500))
+        self.delete_file_workers = max(1, self.config.get('delete_file_workers', 16))
+        
+        # 去重：内容相同的文件作为原文档的别名，内容相同的文本块共享向量
+        self.document_dedup_enabled = self.config.get('document_dedup_enabled', True)
+        self.chunk_dedup_enabled = self.config.get('chunk_dedup_enabled', True)
         
         # 文档存储目录
         self.storage_dir = Path(self.config.get('storage_dir', './documents'))
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 文本块邻接表：入库时记录块的前后顺序和所属章节，问答时据此扩展上下文
+        self.chunk_adjacency = None
+        if self.config.get('chunk_adjacency_enabled', True):
+            self.chunk_adjacency = ChunkAdjacencyStore(
+                self.config.get('chunk_adjacency_dir') or str(self.storage_dir / '.chunk_adjacency')
+            )
     
     async def initialize(self) -> None:
         """初始化文档服务"""
@@ -91,6 +168,26 @@ class DocumentService(BaseService):
             logger.error(f"文档管理服务初始化失败: {str(e)}")
             raise ProcessingError(f"文档管理服务初始化失败: {str(e)}")
     
+    async def initialize_with_session(self) -> None:
+        """
+        在 database_url 上的SQLAlchemy会话上初始化文档服务（不存在的表自动创建）
+        
+        只初始化文档处理器和向量存储，命令行入库和后台入库队列使用
+        """
+        try:
+            self.db_session = DatabaseSession(
+                self.config.get('database_url', 'sqlite:///./database/documents.db'),
+                echo=self.config.get('database_echo', False)
+            )
+            self.document_crud = DocumentCRUD(self.db_session.session)
+            await self.document_processor.initialize()
+            await self.vector_service.initialize()
+            logger.info("文档管理服务初始化成功")
+        except Exception as e:
+            logger.error(f"文档管理服务初始化失败: {str(e)}")
+            await self.cleanup()
+            raise ProcessingError(f"文档管理服务初始化失败: {str(e)}")
+    
     async def cleanup(self) -> None:
         """清理资源"""
         try:
@@ -100,7 +197,10 @@ class DocumentService(BaseService):
             if self.document_processor:
                 await self.document_processor.cleanup()
             
-            if self.db_manager:
+            if self.db_session:
+                self.db_session.close()
+                self.db_session = None
+            elif self.db_manager:
                 self.db_manager.close()
             
             logger.info("文档管理服务资源清理完成")
@@ -127,8 +227,8 @@ class DocumentService(BaseService):
                     f"支持的格式: {', '.join(supported_formats)}"
                 )
             
-            # 保存上传的文件
-            file_path = await self._save_uploaded_file(file, doc_id)
+            # 流式保存上传的文件
+            file_path, file_size, content_hash = await self._save_uploaded_file(file, doc_id)
             
             # 创建文档信息记录
             file_extension = Path(file.filename).suffix.lower()
@@ -138,18 +238,26 @@ class DocumentService(BaseService):
                 id=doc_id,
                 filename=file.filename,
                 file_type=file_type,
-                file_size=file.size or 0,
+                file_size=file_size,
                 file_path=str(file_path),
                 upload_time=datetime.now(),
                 status=DocumentStatus.PROCESSING,
-                chunk_count=0
+                chunk_count=0,
+                content_hash=content_hash
             )
             
+            # 内容与已入库文档相同时作为其别名，不再重复处理
+            duplicate = self._find_duplicate_document(content_hash)
+            if duplicate is not None and await self._create_alias_document(doc_info, duplicate):
+                os.remove(file_path)
+                logger.info(f"文档内容重复，已作为别名登记: {file.filename} -> {duplicate.id}")
+                return doc_info
+            
             # 保存到数据库
             self.document_crud.create_document(doc_info)
             
-            # 异步处理文档（在后台进行）
-            await self._process_document_async(doc_info)
+            # 登记后台入库任务；队列未启动时在请求内处理
+            await self._schedule_processing(doc_info)
             
             logger.info(f"文档上传成功: {file.filename}, ID: {doc_id}")
             return doc_info
@@ -171,74 +279,241 @@ class DocumentService(BaseService):
             except:
                 pass
             
+            if isinstance(e, FileTooLargeError):
+                raise
             raise DocumentError(f"文档上传失败: {str(e)}")
     
-    async def _save_uploaded_file(self, file: UploadFile, doc_id: str) -> Path:
-        """保存上传的文件"""
+    async def _save_uploaded_file(self, file: UploadFile, doc_id: str) -> Tuple[Path, int, str]:
+        """
+        分块流式保存上传的文件
+        
+        边读边写，写入过程中检查大小上限并增量计算SHA-256，
+        完整写入后才重命名为正式文件
+        
+        Returns:
+            (文件路径, 文件大小, SHA-256摘要)
+        """
+        # 生成文件路径
+        file_extension = Path(file.filename).suffix
+        filename = f"{doc_id}{file_extension}"
+        file_path = self.storage_dir / filename
+        tmp_path = self.storage_dir / f"{filename}.part"
+        
+        loop = asyncio.get_running_loop()
+        hasher = hashlib.sha256()
+        file_size = 0
+        
         try:
-            # 生成文件路径
-            file_extension = Path(file.filename).suffix
-            filename = f"{doc_id}{file_extension}"
-            file_path = self.storage_dir / filename
-            
-            # 保存文件
-            content = await file.read()
-            with open(file_path, 'wb') as f:
-                f.write(content)
-            
-            logger.debug(f"文件保存成功: {file_path}")
-            return file_path
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(self.upload_chunk_size)
+                    if not chunk:
+                        break
+                    
+                    file_size += len(chunk)
+                    if self.max_file_size and file_size > self.max_file_size:
+                        raise FileTooLargeError(
+                            f"文件大小超过限制（{self.max_file_size // (1024 * 1024)}MB）",
+                            max_size=self.max_file_size
+                        )
+                    
+                    hasher.update(chunk)
+                    await loop.run_in_executor(None, f.write, chunk)
+            
+            if file_size == 0:
+                raise DocumentError("文件内容为空")
+            
+            os.replace(tmp_path, file_path)
+            
+            logger.debug(f"文件保存成功: {file_path}, 大小: {file_size}")
+            return file_path, file_size, hasher.hexdigest()
             
         except Exception as e:
+            # 清理未完成的临时文件
+            try:
+                tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+            
+            if isinstance(e, DocumentError):
+                raise
             logger.error(f"保存文件失败: {str(e)}")
             raise DocumentError(f"保存文件失败: {str(e)}")
     
+    def _find_duplicate_document(self, content_hash: str):
+        """查找内容相同且已入库的原文档"""
+        if not self.document_dedup_enabled or not content_hash:
+            return None
+        
+        try:
+            db_doc = self.document_crud.get_document_by_hash(content_hash)
+        except DocumentError as e:
+            logger.warning(f"按内容哈希查找文档失败: {str(e)}")
+            return None
+        
+        if db_doc is None or getattr(db_doc, 'content_hash', None) != content_hash:
+            return None
+        return db_doc
+    
+    async def _create_alias_document(self, doc_info: DocumentInfo, duplicate) -> bool:
+        """
+        将新上传的文档登记为重复文档的别名，共享其向量
+        
+        Returns:
+            原文档没有可共享的向量时返回False，由调用方按新文档处理
+        """
+        shared = await self.vector_service.share_document_vectors(duplicate.id, doc_info.id)
+        if not shared:
+            return False
+        
+        doc_info.alias_of = duplicate.id
+        doc_info.status = DocumentStatus.READY
+        doc_info.chunk_count = duplicate.chunk_count or 0
+        doc_info.file_path = str(self._get_document_file_path(duplicate.id, duplicate.file_type))
+        
+        try:
+            self.document_crud.create_document(doc_info)
+        except Exception:
+            # 撤销已添加的向量归属
+            await self.vector_service.delete_vectors(doc_info.id)
+            raise
+        return True
+    
+    def _get_document_file_path(self, doc_id: str, file_type: str) -> Path:
+        """获取文档文件的存储路径"""
+        file_ext = file_type if file_type.startswith('.') else f".{file_type}"
+        return self.storage_dir / f"{doc_id}{file_ext}"
+    
+    def _get_document_aliases(self, doc_id: str) -> list:
+        """获取指向指定文档的别名记录"""
+        try:
+            return list(self.document_crud.get_document_aliases(doc_id))
+        except Exception as e:
+            logger.warning(f"获取文档别名失败: {doc_id}, 错误: {str(e)}")
+            return []
+    
+    def _promote_alias(self, db_doc, aliases: list) -> None:
+        """原文档被删除时，将最早的别名提升为原文档并接管文件"""
+        successor = aliases[0]
+        
+        source_path = self._get_document_file_path(db_doc.id, db_doc.file_type)
+        if source_path.exists():
+            os.replace(source_path, self._get_document_file_path(successor.id, successor.file_type))
+        
+        if self.chunk_adjacency is not None:
+            self.chunk_adjacency.rename(db_doc.id, successor.id)
+        
+        self.document_crud.update_document_alias(successor.id, None)
+        for alias in aliases[1:]:
+            self.document_crud.update_document_alias(alias.id, successor.id)
+        
+        logger.info(f"原文档已删除，别名 {successor.id} 接管为原文档")
+    
+    async def _filter_duplicate_chunks(self, doc_id: str, chunks: List[TextChunk]) -> List[TextChunk]:
+        """
+        跳过与已有向量内容相同的文本块
+        
+        按规范化文本哈希查找已有向量，命中的向量增加该文档的归属，
+        只返回需要新向量化的块
+        """
+        new_chunks, _ = await self._find_shared_chunks(doc_id, chunks)
+        return new_chunks
+    
+    async def _find_shared_chunks(self, doc_id: str, chunks: List[TextChunk],
+                                  seen_hashes: Optional[Set[str]] = None) -> Tuple[List[TextChunk], Set[str]]:
+        """
+        查找可共享已有向量的文本块
+        
+        Args:
+            seen_hashes: 同一文档之前批次已出现的文本哈希，分批处理时跨批去重
+        
+        Returns:
+            (需要新向量化的块, 被该文档共享的已有向量ID)
+        """
+        if seen_hashes is None:
+            seen_hashes = set()
+        
+        unique_chunks = []
+        batch_hashes = set()
+        for chunk in chunks:
+            text_hash = compute_text_hash(chunk.content)
+            chunk.metadata['text_hash'] = text_hash
+            # 文档内重复的块只保留第一个
+            if text_hash in seen_hashes or text_hash in batch_hashes:
+                continue
+            batch_hashes.add(text_hash)
+            unique_chunks.append(chunk)
+        seen_hashes.update(batch_hashes)
+        
+        existing = await self.vector_service.find_vectors_by_text_hash(list(batch_hashes)) if batch_hashes else {}
+        if existing:
+            await self.vector_service.add_document_references(list(existing.values()), doc_id)
+        
+        new_chunks = [chunk for chunk in unique_chunks if chunk.metadata['text_hash'] not in existing]
+        logger.info(
+            f"文本块去重: 文档ID={doc_id}, 总块数={len(chunks)}, "
+            f"共享已有向量={len(existing)}, 需向量化={len(new_chunks)}"
+        )
+        return new_chunks, set(existing.values())
+    
+    async def _begin_reindex(self, doc_id: str) -> "_DocumentReindex":
+        """读取文档已有向量，开始一次增量更新"""
+        existing = await self.vector_service.get_document_vectors(doc_id)
+        adjacency = None
+        if self.chunk_adjacency is not None:
+            try:
+                adjacency = self.chunk_adjacency.open_writer(doc_id)
+            except OSError as e:
+                logger.warning(f"创建文本块邻接表失败: {doc_id}, 错误: {str(e)}")
+        return _DocumentReindex(self, doc_id, existing, adjacency)
+    
+    def _get_ingestion_queue(self):
+        """获取可用的入库队列"""
+        if self.ingestion_queue is not None:
+            return self.ingestion_queue
+        
+        from .ingestion_queue import get_ingestion_queue
+        queue = get_ingestion_queue()
+        return queue if queue is not None and queue.is_running else None
+    
+    async def _schedule_processing(self, doc_info: DocumentInfo) -> None:
+        """登记文档处理任务，没有入库队列时直接处理"""
+        queue = self._get_ingestion_queue()
+        if queue is None:
+            async with _get_processing_semaphore(self.max_concurrent_processing):
+                await self._process_document_async(doc_info)
+            return
+        
+        job = await queue.enqueue(doc_info.id, {
+            'file_path': doc_info.file_path,
+            'filename': doc_info.filename
+        })
+        doc_info.job_id = job['id']
+    
+    async def process_ingestion_job(self, job: Dict[str, Any], report_progress=None) -> None:
+        """处理入库队列中的任务，失败时抛出异常以便队列重试"""
+        doc_id = job['document_id']
+        payload = job.get('payload') or {}
+        
+        doc_info = await self.get_document(doc_id)
+        if payload.get('file_path'):
+            doc_info.file_path = payload['file_path']
+        if not Path(doc_info.file_path).exists():
+            raise DocumentError(f"文档文件不存在: {doc_info.file_path}")
+        
+        # 重试或恢复的任务不清空已有向量：块ID由内容和位置确定，增量更新只向量化缺少的块，
+        # 完成后移除不再出现的旧向量；失败的尝试已回滚本次写入的向量
+        await self._ingest_document(doc_info, report_progress)
+    
+    async def handle_ingestion_failure(self, job: Dict[str, Any], error: str) -> None:
+        """入库任务重试耗尽后将文档标记为错误"""
+        from ..database.models import DocumentStatus as DBDocumentStatus
+        self.document_crud.update_document_status(job['document_id'], DBDocumentStatus.ERROR, error)
+    
     async def _process_document_async(self, doc_info: DocumentInfo) -> None:
         """异步处理文档"""
         try:
-            logger.info(f"开始处理文档: {doc_info.filename}, ID: {doc_info.id}")
-            
-            # 处理文档，传递文档名称
-            result = await self.document_processor.process_document(
-                doc_info.file_path, 
-                doc_info.id,
-                doc_info.filename  # 传递真实的文档名称
-            )
-            
-            if result.success:
-                # 存储向量到向量数据库
-                if result.vectors:
-                    await self.vector_service.add_vectors(result.vectors)
-                
-                # 更新文档状态
-                doc_info.status = DocumentStatus.READY
-                doc_info.chunk_count = result.chunk_count
-                doc_info.processing_time = result.processing_time
-                
-                logger.info(
-                    f"文档处理成功: {doc_info.filename}, "
-                    f"块数: {result.chunk_count}, "
-                    f"向量数: {len(result.vectors)}"
-                )
-            else:
-                # 处理失败
-                doc_info.status = DocumentStatus.ERROR
-                doc_info.error_message = result.error_message
-                
-                logger.error(f"文档处理失败: {doc_info.filename}, 错误: {result.error_message}")
-            
-            # 更新数据库
-            from ..database.models import DocumentStatus as DBDocumentStatus
-            
-            if doc_info.status == DocumentStatus.READY:
-                self.document_crud.update_document_status(doc_info.id, DBDocumentStatus.READY)
-                self.document_crud.update_document_chunk_count(doc_info.id, doc_info.chunk_count)
-            else:
-                self.document_crud.update_document_status(
-                    doc_info.id, 
-                    DBDocumentStatus.ERROR, 
-                    doc_info.error_message
-                )
+            await self._ingest_document(doc_info)
             
         except Exception as e:
             logger.error(f"文档处理异常: {doc_info.filename}, 错误: {str(e)}")
@@ -254,6 +529,57 @@ class DocumentService(BaseService):
             except:
                 pass
     
+    async def _ingest_document(self, doc_info: DocumentInfo, report_progress=None) -> ProcessResult:
+        """处理文档并写入向量存储，处理失败时抛出ProcessingError"""
+        from ..database.models import DocumentStatus as DBDocumentStatus
+        
+        async def progress(value: float, stage: str) -> None:
+            if report_progress:
+                await report_progress(value, stage)
+        
+        logger.info(f"开始处理文档: {doc_info.filename}, ID: {doc_info.id}")
+        await progress(0.1, "processing")
+        
+        # 处理文档，传递文档名称；只向量化与已有向量相比新增或变化的块，
+        # 向量按批写入向量数据库，与后续批次的向量化并行
+        reindex = await self._begin_reindex(doc_info.id)
+        try:
+            result = await self.document_processor.process_document(
+                doc_info.file_path, 
+                doc_info.id,
+                doc_info.filename,  # 传递真实的文档名称
+                chunk_filter=reindex.filter,
+                vector_sink=reindex.sink
+            )
+            
+            if not result.success:
+                logger.error(f"文档处理失败: {doc_info.filename}, 错误: {result.error_message}")
+                raise ProcessingError(result.error_message or "文档处理失败")
+            
+            # 存储未流式写入的向量，新向量全部写入后再移除旧向量
+            await progress(0.7, "storing")
+            if result.vectors:
+                await reindex.sink(result.vectors)
+            await reindex.finish()
+        except BaseException:
+            await reindex.abort()
+            raise
+        
+        # 更新文档状态
+        doc_info.status = DocumentStatus.READY
+        doc_info.chunk_count = result.chunk_count
+        doc_info.processing_time = result.processing_time
+        
+        self.document_crud.update_document_status(doc_info.id, DBDocumentStatus.READY)
+        self.document_crud.update_document_chunk_count(doc_info.id, doc_info.chunk_count)
+        
+        logger.info(
+            f"文档处理成功: {doc_info.filename}, "
+            f"块数: {result.chunk_count}, "
+            f"向量数: {result.vector_count or len(result.vectors)}"
+        )
+        return result
+    
     async def delete_document(self, doc_id: str) -> bool:
         """删除文档"""
         try:
@@ -265,23 +591,28 @@ class DocumentService(BaseService):
                 logger.warning(f"文档不存在: {doc_id}")
                 return False
             
-            # 删除向量数据
+            # 删除向量数据（与其他文档共享的向量只移除归属）
             try:
                 await self.vector_service.delete_vectors(doc_id)
                 logger.debug(f"删除文档向量成功: {doc_id}")
             except VectorStoreError as e:
                 logger.warning(f"删除文档向量失败: {doc_id}, 错误: {str(e)}")
             
-            # 删除文件
-            try:
-                # 构建文件路径（假设文件存储在storage_dir中）
-                file_ext = db_doc.file_type if db_doc.file_type.startswith('.') else f".{db_doc.file_type}"
-                file_path = self.storage_dir / f"{doc_id}{file_ext}"
-                if file_path.exists():
-                    os.remove(file_path)
-                    logger.debug(f"删除文档文件成功: {file_path}")
-            except Exception as e:
-                logger.warning(f"删除文档文件失败: {file_path}, 错误: {str(e)}")
+            # 有别名指向该文档时由别名接管文件，否则删除文件
+            aliases = self._get_document_aliases(doc_id)
+            if aliases:
+                self._promote_alias(db_doc, aliases)
+            else:
+                if self.chunk_adjacency is not None:
+                    self.chunk_adjacency.delete(doc_id)
+                try:
+                    # 构建文件路径（假设文件存储在storage_dir中）
+                    file_path = self._get_document_file_path(doc_id, db_doc.file_type)
+                    if file_path.exists():
+                        os.remove(file_path)
+                        logger.debug(f"删除文档文件成功: {file_path}")
+                except Exception as e:
+                    logger.warning(f"删除文档文件失败: {file_path}, 错误: {str(e)}")
             
             # 删除数据库记录
             success = self.document_crud.delete_document(doc_id)
@@ -297,6 +628,110 @@ class DocumentService(BaseService):
             logger.error(f"删除文档失败: {doc_id}, 错误: {str(e)}")
             return False
     
+    async def delete_documents(self, doc_ids: List[str], report_progress=None) -> Dict[str, Any]:
+        """
+        批量删除文档
+        
+        向量按批删除，文件并行删除，数据库记录在一个事务中删除；
+        有别名（不在本次删除范围内）指向的原文档需要由别名接管，逐个按单文档删除处理
+        
+        Args:
+            doc_ids: 要删除的文档ID列表
+            report_progress: 进度回调 (进度0~1, 阶段)
+            
+        Returns:
+            {"deleted_count": 成功数, "failed_count": 失败数, "failed_documents": 失败的文档ID列表}
+        """
+        async def progress(value: float, stage: str) -> None:
+            if report_progress:
+                await report_progress(value, stage)
+        
+        doc_ids = list(dict.fromkeys(doc_ids))
+        logger.info(f"开始批量删除文档: {len(doc_ids)} 个")
+        
+        db_docs = self.document_crud.get_documents_by_ids(doc_ids)
+        found_ids = {db_doc.id for db_doc in db_docs}
+        failed = [doc_id for doc_id in doc_ids if doc_id not in found_ids]
+        if failed:
+            logger.warning(f"文档不存在: {len(failed)} 个")
+        
+        # 别名不在删除范围内的原文档需要别名接管文件和向量
+        promoted_ids = {
+            alias.alias_of for alias in self.document_crud.get_aliases_of_documents(list(found_ids))
+            if alias.id not in found_ids
+        }
+        bulk_docs = [db_doc for db_doc in db_docs if db_doc.id not in promoted_ids]
+        bulk_ids = [db_doc.id for db_doc in bulk_docs]
+        
+        # 删除向量数据（与其他文档共享的向量只移除归属）
+        for i in range(0, len(bulk_ids), self.delete_batch_size):
+            batch = bulk_ids[i:i + self.delete_batch_size]
+            try:
+                await self.vector_service.delete_documents_vectors(batch)
+            except VectorStoreError as e:
+                logger.warning(f"批量删除文档向量失败: {len(batch)} 个文档, 错误: {str(e)}")
+            await progress(0.6 * min(i + len(batch), len(bulk_ids)) / len(bulk_ids), "vectors")
+        
+        # 并行删除文件和邻接表
+        removed_files = await asyncio.get_running_loop().run_in_executor(
+            None, self._remove_document_files, bulk_docs
+        )
+        logger.debug(f"删除文档文件: {removed_files} 个")
+        await progress(0.8, "files")
+        
+        # 一个事务删除全部数据库记录
+        deleted = 0
+        if bulk_ids:
+            try:
+                deleted = self.document_crud.delete_documents(bulk_ids)
+            except DocumentError as e:
+                logger.error(f"批量删除文档记录失败: {str(e)}")
+                failed.extend(bulk_ids)
+        await progress(0.9, "database")
+        
+        # 由别名接管的原文档逐个删除
+        for doc_id in promoted_ids:
+            if await self.delete_document(doc_id):
+                deleted += 1
+            else:
+                failed.append(doc_id)
+        await progress(1.0, "completed")
+        
+        logger.info(f"批量删除文档完成: 成功 {deleted}, 失败 {len(failed)}")
+        return {
+            "deleted_count": deleted,
+            "failed_count": len(failed),
+            "failed_documents": failed
+        }
+    
+    def _remove_document_files(self, db_docs: list) -> int:
+        """并行删除文档文件和邻接表，返回删除的文件数"""
+        def remove(db_doc) -> bool:
+            if self.chunk_adjacency is not None:
+                self.chunk_adjacency.delete(db_doc.id)
+            file_path = self._get_document_file_path(db_doc.id, db_doc.file_type)
+            try:
+                file_path.unlink()
+                return True
+            except FileNotFoundError:
+                return False
+            except OSError as e:
+                logger.warning(f"删除文档文件失败: {file_path}, 错误: {str(e)}")
+                return False
+        
+        if not db_docs:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(self.delete_file_workers, len(db_docs))) as pool:
+            return sum(pool.map(remove, db_docs))
+    
+    async def list_document_ids(self) -> List[str]:
+        """获取全部文档ID"""
+        try:
+            return self.document_crud.get_document_ids()
+        except Exception as e:
+            logger.error(f"获取文档ID列表失败: {str(e)}")
+            raise DocumentError(f"获取文档ID列表失败: {str(e)}")
+    
     async def list_documents(self) -> List[DocumentInfo]:
         """获取文档列表"""
         try:
@@ -351,17 +786,18 @@ class DocumentService(BaseService):
             # 获取文档信息
             doc_info = await self.get_document(doc_id)
             
+            # 别名文档没有自己的文件和向量，重新处理其原文档
+            if doc_info.alias_of:
+                logger.info(f"文档 {doc_id} 是 {doc_info.alias_of} 的别名，重新处理原文档")
+                return await self.reprocess_document(doc_info.alias_of)
+            
             # 检查文件是否存在
             file_ext = doc_info.file_type if doc_info.file_type.startswith('.') else f".{doc_info.file_type}"
             file_path = self.storage_dir / f"{doc_id}{file_ext}"
             if not file_path.exists():
                 raise DocumentError(f"文档文件不存在: {file_path}")
             
-            # 删除旧的向量数据
-            try:
-                await self.vector_service.delete_vectors(doc_id)
-            except:
-                pass
+            # 保留旧的向量数据：处理时与新的文本块对比，只更新变化的部分
             
             # 更新状态为处理中
             from ..database.models import DocumentStatus as DBDocumentStatus
@@ -369,9 +805,9 @@ class DocumentService(BaseService):
             
             # 重新处理文档
             doc_info.file_path = str(file_path)
-            await self._process_document_async(doc_info)
+            await self._schedule_processing(doc_info)
             
-            logger.info(f"文档重新处理完成: {doc_id}")
+            logger.info(f"文档重新处理已开始: {doc_id}")
             return True
             
         except Exception as e:
@@ -391,6 +827,7 @@ class DocumentService(BaseService):
                 "total_chunks": sum(d.chunk_count for d in documents),
                 "vector_count": await self.vector_service.get_vector_count(),
                 "storage_directory": str(self.storage_dir),
+                "text_cache": self.document_processor.get_text_cache_stats(),
                 "supported_formats": self.document_processor.get_supported_formats()
             }
             
@@ -416,15 +853,156 @@ class DocumentService(BaseService):
         if file_type.startswith('.'):
             file_type = file_type[1:]
         
+        # 迁移前的旧记录没有内容哈希和别名
+        content_hash = getattr(db_doc, 'content_hash', None)
+        if not isinstance(content_hash, str):
+            content_hash = None
+        alias_of = getattr(db_doc, 'alias_of', None)
+        if not isinstance(alias_of, str):
+            alias_of = None
+        
         return DocumentInfo(
             id=db_doc.id,
             filename=db_doc.filename,
             file_type=file_type,
             file_size=db_doc.file_size,
-            file_path=str(self.storage_dir / f"{db_doc.id}.{file_type}"),
+            file_path=str(self.storage_dir / f"{alias_of or db_doc.id}.{file_type}"),
             upload_time=db_doc.upload_time,
             status=status_mapping.get(db_doc.status, DocumentStatus.ERROR),
             chunk_count=db_doc.chunk_count or 0,
             error_message=db_doc.error_message or "",
-            processing_time=0.0  # 这个字段在数据库模型中不存在
-        )
\ No newline at end of file
+            processing_time=0.0,  # 这个字段在数据库模型中不存在
+            content_hash=content_hash,
+            alias_of=alias_of
+        )
+
+
+class _DocumentReindex:
+    """
+    单个文档的增量更新
+    
+    块ID由内容和位置确定：ID已有向量的块保持不动（只同步序号等位置信息），
+    其余块（启用块级去重时先尝试共享其他文档的向量）需要向量化。
+    文本块分批到达，全部处理完成后移除不再出现的旧向量；
+    处理失败时移除本次新写入（或新共享）的向量，保留原有的
+    """
+    
+    def __init__(self, service: DocumentService, doc_id: str, existing: Dict[str, Dict[str, Any]],
+                 adjacency: Optional[ChunkAdjacencyWriter] = None):
+        self.service = service
+        self.doc_id = doc_id
+        self.existing = existing
+        self.adjacency = adjacency
+        self.chunk_ids: Set[str] = set()
+        self.shared_ids: Set[str] = set()
+        self.written_ids: Set[str] = set()
+        self.seen_hashes: Set[str] = set()
+        self.unchanged_count = 0
+        self.embed_count = 0
+    
+    async def filter(self, doc_id: str, chunks: List[TextChunk]) -> List[TextChunk]:
+        """处理一批文本块，返回需要向量化的块"""
+        vector_service = self.service.vector_service
+        self._record_adjacency(chunks)
+        unchanged = [chunk for chunk in chunks if chunk.id in self.existing]
+        changed = [chunk for chunk in chunks if chunk.id not in self.existing]
+        self.chunk_ids.update(chunk.id for chunk in chunks)
+        
+        if self.service.chunk_dedup_enabled:
+            chunks_to_embed, shared_ids = await self.service._find_shared_chunks(
+                doc_id, changed, self.seen_hashes
+            )
+            self.shared_ids.update(shared_ids)
+        else:
+            chunks_to_embed = changed
+        
+        # 未变化的块可能因前面的修改而移动，只更新元数据中的位置信息
+        ids_to_update = []
+        metadatas_to_update = []
+        for chunk in unchanged:
+            metadata = self.existing[chunk.id]
+            if metadata.get('document_id') != doc_id:
+                continue
+            position = {'chunk_index': chunk.chunk_index}
+            for key in ('page_number', 'page_end'):
+                if key in chunk.metadata:
+                    position[key] = chunk.metadata[key]
+            if any(metadata.get(key) != value for key, value in position.items()):
+                ids_to_update.append(chunk.id)
+                metadatas_to_update.append(position)
+        if ids_to_update:
+            await vector_service.update_vector_metadata(ids_to_update, metadatas_to_update)
+        
+        self.unchanged_count += len(unchanged)
+        self.embed_count += len(chunks_to_embed)
+        return chunks_to_embed
+    
+    async def sink(self, vectors: List[Vector]) -> None:
+        """写入向量，记录本次新写入的向量ID以便失败时回滚"""
+        # 写入前记录，部分写入后失败时同样需要移除
+        self.written_ids.update(vector.id for vector in vectors if vector.id not in self.existing)
+        await self.service.vector_service.add_vectors(vectors)
+    
+    def _record_adjacency(self, chunks: List[TextChunk]) -> None:
+        """记录文本块的邻接关系，写入失败时放弃邻接表但不影响入库"""
+        if self.adjacency is None:
+            return
+        try:
+            self.adjacency.add(chunks)
+        except OSError as e:
+            logger.warning(f"写入文本块邻接表失败: {self.doc_id}, 错误: {str(e)}")
+            self._discard_adjacency()
+    
+    def _discard_adjacency(self) -> None:
+        """放弃本次的邻接表，保留原有的"""
+        if self.adjacency is not None:
+            self.adjacency.abort()
+            self.adjacency = None
+    
+    async def abort(self) -> int:
+        """
+        处理失败时回滚：放弃本次的邻接表，移除本次新写入的向量和新共享的向量归属，
+        原有的向量和邻接表保持不变
+        
+        Returns:
+            移除的向量数
+        """
+        self._discard_adjacency()
+        
+        rollback_ids = [
+            vector_id for vector_id in self.written_ids | self.shared_ids
+            if vector_id not in self.existing
+        ]
+        if not rollback_ids:
+            return 0
+        try:
+            await self.service.vector_service.remove_vectors(self.doc_id, rollback_ids)
+        except VectorStoreError as e:
+            logger.warning(f"回滚文档向量失败: {self.doc_id}, 错误: {str(e)}")
+            return 0
+        logger.info(f"文档处理失败，已移除本次写入的向量: 文档ID={self.doc_id}, 向量数={len(rollback_ids)}")
+        return len(rollback_ids)
+    
+    async def finish(self) -> int:
+        """移除不再出现的旧向量，返回移除的向量数"""
+        if self.adjacency is not None:
+            try:
+                self.adjacency.commit()
+            except OSError as e:
+                logger.warning(f"保存文本块邻接表失败: {self.doc_id}, 错误: {str(e)}")
+                self.adjacency.abort()
+            self.adjacency = None
+        
+        stale_ids = [
+            vector_id for vector_id in self.existing
+            if vector_id not in self.chunk_ids and vector_id not in self.shared_ids
+        ]
+        if stale_ids:
+            await self.service.vector_service.remove_vectors(self.doc_id, stale_ids)
+        
+        if self.existing:
+            logger.info(
+                f"增量更新文档向量: 文档ID={self.doc_id}, 未变化={self.unchanged_count}, "
+                f"需向量化={self.embed_count}, 移除旧向量={len(stale_ids)}"
+            )
+        return len(stale_ids)
@@ -1,16 +1,20 @@
 """
 嵌入向量化服务
 """
+import hashlib
 import logging
+import sys
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import uuid
+
+import numpy as np
 
 from ..models.document import TextChunk
 from ..models.vector import Vector
 from ..embeddings import EmbeddingFactory, EmbeddingConfig, BaseEmbedding
 from ..utils.exceptions import ProcessingError, ConfigurationError
 from ..utils.model_exceptions import ModelConnectionError, ModelResponseError, UnsupportedProviderError
+from ..utils.memory_cache import get_memory_cache
 from .base import BaseService
 
 logger = logging.getLogger(__name__)
@@ -27,6 +31,20 @@ class EmbeddingService(BaseService):
         self._fallback_config = self._create_fallback_config()
         self._enable_fallback = self.config.get('enable_embedding_fallback', True)
         self._dimension_cache: Dict[str, int] = {}  # 缓存不同模型的维度
+        self._fallback_switches = 0  # 切换到备用模型的次数
+        
+        # 文本向量缓存：相同文本（如语义分割中重复的句子）不重复请求嵌入模型，0表示不启用。
+        # 向量以float32数组存储，按占用字节数限制容量；每个模型一个缓存，容量以当前配置为准
+        self._embedding_cache = None
+        cache_max_mb = self.config.get('cache_max_mb', 0)
+        if cache_max_mb:
+            config = self._embedding_config
+            max_bytes = int(cache_max_mb * 1024 * 1024)
+            self._embedding_cache = get_memory_cache(
+                f"embeddings:{config.provider}:{config.model}:{config.dimensions}",
+                max_entries=sys.maxsize, max_bytes=max_bytes, size_of=_embedding_nbytes
+            )
+            self._embedding_cache.resize(max_bytes=max_bytes)
     
     def _create_embedding_config(self) -> EmbeddingConfig:
         """创建嵌入配置"""
@@ -83,6 +101,7 @@ class EmbeddingService(BaseService):
             
             if self._fallback_model:
                 logger.warning(f"切换到备用嵌入模型: {self._fallback_config.provider}")
+                self._fallback_switches += 1
                 return True
             
             return False
@@ -282,7 +301,38 @@ class EmbeddingService(BaseService):
         if not valid_texts:
             raise ProcessingError("没有有效的文本内容")
         
-        return await self._vectorize_with_error_handling(valid_texts, single=False)
+        if self._embedding_cache is None:
+            return await self._vectorize_with_error_handling(valid_texts, single=False)
+        return await self._vectorize_texts_cached(valid_texts)
+    
+    def _embedding_cache_key(self, text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    async def _vectorize_texts_cached(self, texts: List[str]) -> List[List[float]]:
+        """先查向量缓存，只对未命中的不同文本调用嵌入模型"""
+        keys = [self._embedding_cache_key(text) for text in texts]
+        embeddings = [self._embedding_cache.get(key) for key in keys]
+        
+        missing: Dict[str, str] = {}
+        for key, text, embedding in zip(keys, texts, embeddings):
+            if embedding is None:
+                missing.setdefault(key, text)
+        
+        if missing:
+            fallback_switches = self._fallback_switches
+            new_embeddings = dict(zip(
+                missing, await self._vectorize_with_error_handling(list(missing.values()), single=False)
+            ))
+            # 期间切换过备用模型时不写入缓存，避免备用模型的向量以主模型的名义缓存
+            if self._fallback_switches == fallback_switches:
+                for key, embedding in new_embeddings.items():
+                    self._embedding_cache.set(key, np.asarray(embedding, dtype=np.float32))
+            return [
+                embedding.tolist() if embedding is not None else new_embeddings[key]
+                for key, embedding in zip(keys, embeddings)
+            ]
+        
+        return [embedding.tolist() for embedding in embeddings]
     
     async def vectorize_query(self, query: str) -> List[float]:
         """对查询文本进行向量化"""
@@ -310,26 +360,7 @@ class EmbeddingService(BaseService):
             # 批量向量化
             embeddings = await self.vectorize_texts(texts)
             
-            # 创建向量对象
-            vectors = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                vector = Vector(
-                    id=str(uuid.uuid4()),
-                    document_id=chunk.document_id,
-                    chunk_id=chunk.id,
-                    embedding=embedding,
-                    metadata={
-                        "document_name": document_name or f'Document_{chunk.document_id[:8]}',  # 添加真实文档名称
-                        "chunk_index": chunk.chunk_index,
-                        "content": chunk.content,  # 存储实际内容
-                        "content_length": len(chunk.content),
-                        "embedding_model": self._embedding_config.model,
-                        "embedding_provider": self._embedding_config.provider,
-                        "embedding_dimensions": len(embedding),
-                        "created_at": datetime.now().isoformat()
-                    }
-                )
-                vectors.append(vector)
+            vectors = self.build_vectors(chunks, embeddings, document_name)
             
             logger.info(f"文本块向量化完成: 生成 {len(vectors)} 个向量")
             return vectors
@@ -338,6 +369,35 @@ class EmbeddingService(BaseService):
             logger.error(f"文本块向量化失败: {str(e)}")
             raise ProcessingError(f"文本块向量化失败: {str(e)}")
     
+    def build_vectors(self, chunks: List[TextChunk], embeddings: List[List[float]],
+                      document_name: str = None) -> List[Vector]:
+        """根据文本块和对应的嵌入向量创建向量对象"""
+        vectors = []
+        for chunk, embedding in zip(chunks, embeddings):
+            # 向量ID与块ID一致，重新处理时内容未变的块可直接对应到已有向量
+            vector = Vector(
+                id=chunk.id,
+                document_id=chunk.document_id,
+                chunk_id=chunk.id,
+                embedding=embedding,
+                metadata={
+                    "document_name": document_name or f'Document_{chunk.document_id[:8]}',  # 添加真实文档名称
+                    "chunk_index": chunk.chunk_index,
+                    "content": chunk.content,  # 存储实际内容
+                    "content_length": len(chunk.content),
+                    "embedding_model": self._embedding_config.model,
+                    "embedding_provider": self._embedding_config.provider,
+                    "embedding_dimensions": len(embedding),
+                    "created_at": datetime.now().isoformat()
+                }
+            )
+            # 保留页码（便于引用出处）、规范化文本哈希（用于块级去重）和向量来源
+            for key in ("page_number", "page_end", "text_hash", "embedding_pooling"):
+                if key in chunk.metadata:
+                    vector.metadata[key] = chunk.metadata[key]
+            vectors.append(vector)
+        return vectors
+    
     def get_embedding_dimension(self) -> int:
         """获取嵌入向量的维度"""
         self._ensure_initialized()
@@ -500,4 +560,9 @@ class EmbeddingService(BaseService):
             
         except Exception as e:
             logger.error(f"获取嵌入服务统计失败: {str(e)}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+
+def _embedding_nbytes(embedding: np.ndarray) -> int:
+    """缓存中向量占用的字节数"""
+    return embedding.nbytes
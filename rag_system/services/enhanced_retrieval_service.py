@@ -9,10 +9,11 @@ from ..models.vector import SearchResult
 from ..models.config import RetrievalConfig
 from .retrieval_service import RetrievalService
 from .search_mode_router import SearchModeRouter
-from .cache_service import CacheService
+from .cache_service import CacheService, CacheKeyGenerator
 from .reranking_service import RerankingService
 from .model_manager import ModelManager, get_model_manager
 from ..utils.exceptions import ProcessingError
+from ..utils.single_flight import get_single_flight
 from .base import BaseService
 
 logger = logging.getLogger(__name__)
@@ -33,6 +34,10 @@ class EnhancedRetrievalService(BaseService):
         # 初始化缓存服务
         self.cache_service = CacheService(config)
         
+        # 合并相同查询的并发检索
+        self.enable_single_flight = self.config.get('enable_single_flight', True)
+        self.single_flight = get_single_flight("retrieval")
+        
         # 获取模型管理器（如果可用）
         self.model_manager = get_model_manager()
         
@@ -216,66 +221,21 @@ class EnhancedRetrievalService(BaseService):
                 logger.info(f"缓存命中: 找到 {len(cached_results)} 个结果, 耗时 {cache_hit_time:.3f}s")
                 return cached_results
             
-            # 2. 缓存未命中，执行实际检索
+            # 2. 缓存未命中，执行实际检索（相同查询的并发请求只执行一次）
             self.cache_stats['cache_misses'] += 1
             
-            # 使用搜索路由器执行检索
-            results = await self.search_router.search_with_mode(
-                query=query,
-                config=effective_config,
-                **kwargs
-            )
-            
-            # 2.5. 应用重排序（如果启用）
-            if effective_config.enable_rerank and results:
-                rerank_start_time = datetime.now()
-                
-                try:
-                    self.rerank_stats['total_rerank_requests'] += 1
-                    
-                    # 获取重排序服务
-                    reranking_service = self._get_reranking_service()
-                    if not reranking_service:
-                        logger.warning("重排序服务不可用，跳过重排序")
-                        return results
-                    
-                    # 执行重排序
-                    results = await reranking_service.rerank_results(
-                        query=query,
-                        results=results,
-                        config=effective_config
-                    )
-                    
-                    # 更新重排序统计
-                    rerank_time = (datetime.now() - rerank_start_time).total_seconds()
-                    self.rerank_stats['successful_reranks'] += 1
-                    self.rerank_stats['total_rerank_time'] += rerank_time
-                    self.rerank_stats['avg_rerank_time'] = (
-                        self.rerank_stats['total_rerank_time'] / self.rerank_stats['successful_reranks']
-                    )
-                    
-                    logger.info(f"重排序完成: 处理{len(results)}个结果, 耗时{rerank_time:.3f}s")
-                    
-                except Exception as rerank_error:
-                    # 重排序失败时记录错误但不影响检索结果
-                    rerank_time = (datetime.now() - rerank_start_time).total_seconds()
-                    self.rerank_stats['failed_reranks'] += 1
-                    self.rerank_stats['total_rerank_time'] += rerank_time
-                    
-                    logger.warning(f"重排序失败，使用原始结果: {rerank_error}")
-            
-            # 3. 缓存检索结果
-            try:
-                await self.cache_service.cache_results(
-                    query=query,
-                    config=effective_config,
-                    results=results,
-                    **kwargs
+            if self.enable_single_flight:
+                flight_key = CacheKeyGenerator.generate_retrieval_key(query, effective_config, **kwargs)
+                results, shared = await self.single_flight.do(
+                    flight_key,
+                    lambda: self._search_and_cache(query, effective_config, **kwargs)
                 )
-            except Exception as cache_error:
-                # 缓存写入失败不应该影响检索结果
-                self.cache_stats['cache_errors'] += 1
-                logger.warning(f"缓存写入失败: {cache_error}")
+                if shared:
+                    # follower获得独立的列表，避免调用方修改影响其他请求
+                    results = list(results)
+                    logger.info(f"合并进行中的相同检索: 共享 {len(results)} 个结果")
+            else:
+                results = await self._search_and_cache(query, effective_config, **kwargs)
             
             # 更新统计信息
             cache_miss_time = (datetime.now() - start_time).total_seconds()
@@ -292,6 +252,73 @@ class EnhancedRetrievalService(BaseService):
             logger.error(f"配置化检索失败: {str(e)}")
             raise ProcessingError(f"配置化检索失败: {str(e)}")
     
+    async def _search_and_cache(
+        self,
+        query: str,
+        effective_config: RetrievalConfig,
+        **kwargs
+    ) -> List[SearchResult]:
+        """执行检索、重排序并写入缓存（缓存未命中时的完整流程）"""
+        # 使用搜索路由器执行检索
+        results = await self.search_router.search_with_mode(
+            query=query,
+            config=effective_config,
+            **kwargs
+        )
+        
+        # 2.5. 应用重排序（如果启用）
+        if effective_config.enable_rerank and results:
+            rerank_start_time = datetime.now()
+            
+            try:
+                self.rerank_stats['total_rerank_requests'] += 1
+                
+                # 获取重排序服务
+                reranking_service = self._get_reranking_service()
+                if not reranking_service:
+                    logger.warning("重排序服务不可用，跳过重排序")
+                    return results
+                
+                # 执行重排序
+                results = await reranking_service.rerank_results(
+                    query=query,
+                    results=results,
+                    config=effective_config
+                )
+                
+                # 更新重排序统计
+                rerank_time = (datetime.now() - rerank_start_time).total_seconds()
+                self.rerank_stats['successful_reranks'] += 1
+                self.rerank_stats['total_rerank_time'] += rerank_time
+                self.rerank_stats['avg_rerank_time'] = (
+                    self.rerank_stats['total_rerank_time'] / self.rerank_stats['successful_reranks']
+                )
+                
+                logger.info(f"重排序完成: 处理{len(results)}个结果, 耗时{rerank_time:.3f}s")
+                
+            except Exception as rerank_error:
+                # 重排序失败时记录错误但不影响检索结果
+                rerank_time = (datetime.now() - rerank_start_time).total_seconds()
+                self.rerank_stats['failed_reranks'] += 1
+                self.rerank_stats['total_rerank_time'] += rerank_time
+                
+                logger.warning(f"重排序失败，使用原始结果: {rerank_error}")
+        
+        # 3. 缓存检索结果
+        try:
+            await self.cache_service.cache_results(
+                query=query,
+                config=effective_config,
+                results=results,
+                **kwargs
+            )
+        except Exception as cache_error:
+            # 缓存写入失败不应该影响检索结果
+            self.cache_stats['cache_errors'] += 1
+            logger.warning(f"缓存写入失败: {cache_error}")
+        
+        return results
+    
     async def search_similar_documents(
         self, 
         query: str, 
@@ -435,7 +462,8 @@ class EnhancedRetrievalService(BaseService):
                     'avg_rerank_time': self.rerank_stats['avg_rerank_time'],
                     'total_rerank_time': self.rerank_stats['total_rerank_time'],
                     'reranking_service_metrics': reranking_metrics
-                }
+                },
+                'single_flight_statistics': self.single_flight.get_stats()
             }
             
             return service_stats
@@ -472,6 +500,7 @@ class EnhancedRetrievalService(BaseService):
             
             # 重置缓存服务统计
             self.cache_service.reset_stats()
+            self.single_flight.reset_stats()
             
             # 重置重排序服务统计
             reranking_service = self._get_reranking_service()
@@ -653,6 +682,10 @@ class EnhancedRetrievalService(BaseService):
         """获取相关文本块（代理方法）"""
         return await self.base_retrieval_service.get_relevant_chunks(query, top_k, **kwargs)
     
+    async def get_chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """按文本块ID批量读取内容（代理方法）"""
+        return await self.base_retrieval_service.get_chunk_texts(chunk_ids)
+    
     async def get_document_statistics(self, document_id: str) -> Dict[str, Any]:
         """获取文档统计（代理方法）"""
         return await self.base_retrieval_service.get_document_statistics(document_id)
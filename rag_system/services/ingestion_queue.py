@@ -0,0 +1,471 @@
+"""
+文档入库任务队列模块
+
+持久化的后台入库队列，上传请求只负责登记任务，处理由工作协程池完成：
+- 基于SQLite的任务表，进程崩溃或重启后任务不丢失
+- 可配置的工作协程数量
+- 按任务重试，指数退避
+- 任务状态和进度查询
+- 启动时恢复上次未完成（运行中）的任务
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from enum import Enum
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+
+from ..database.factory import DatabaseFactory
+from .base import BaseService
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    """入库任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+# 进度回调：(进度0-1, 阶段描述)
+ProgressCallback = Callable[[float, str], Awaitable[None]]
+# 任务处理函数：(任务, 进度回调)
+JobHandler = Callable[[Dict[str, Any], ProgressCallback], Awaitable[None]]
+
+
+class IngestionJobStore:
+    """基于SQLite的入库任务存储"""
+
+    TABLE_NAME = "ingestion_jobs"
+
+    def __init__(self, database_url: str = "sqlite:///./database/ingestion_jobs.db"):
+        self.database_url = database_url
+        self.adapter = DatabaseFactory.create_adapter(database_url)
+
+    async def initialize(self) -> None:
+        """初始化数据库和任务表"""
+        db_path = getattr(self.adapter, 'db_path', None)
+        if db_path and db_path != ':memory:':
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        await self.adapter.initialize()
+        await self.adapter.create_tables({
+            self.TABLE_NAME: f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                    id TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL DEFAULT '{{}}',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    progress REAL NOT NULL DEFAULT 0,
+                    stage TEXT,
+                    error TEXT,
+                    next_run_at TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """
+        })
+        await self.adapter.create_index(self.TABLE_NAME, 'idx_ingestion_jobs_status', ['status', 'next_run_at'])
+        await self.adapter.create_index(self.TABLE_NAME, 'idx_ingestion_jobs_document', ['document_id'])
+
+    async def close(self) -> None:
+        """关闭数据库连接"""
+        await self.adapter.close()
+
+    async def create_job(self, document_id: str, payload: Dict[str, Any], max_attempts: int) -> Dict[str, Any]:
+        """创建待处理任务"""
+        now = datetime.now().isoformat()
+        job_id = str(uuid.uuid4())
+        await self.adapter.execute_update(
+            f"""
+            INSERT INTO {self.TABLE_NAME}
+                (id, document_id, status, payload, attempts, max_attempts, progress, next_run_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 0, ?, 0, ?, ?, ?)
+            """,
+            (job_id, document_id, JobStatus.PENDING.value, json.dumps(payload, ensure_ascii=False),
+             max_attempts, now, now, now)
+        )
+        return await self.get_job(job_id)
+
+    async def claim_next_job(self) -> Optional[Dict[str, Any]]:
+        """领取一个到期的待处理任务并标记为运行中
+
+        使用条件更新保证同一任务只会被一个工作协程（或进程）领取
+        """
+        now = datetime.now().isoformat()
+        while True:
+            rows = await self.adapter.execute_query(
+                f"""
+                SELECT id FROM {self.TABLE_NAME}
+                WHERE status = ? AND next_run_at <= ?
+                ORDER BY next_run_at, created_at
+                LIMIT 1
+                """,
+                (JobStatus.PENDING.value, now)
+            )
+            if not rows:
+                return None
+
+            job_id = rows[0]['id']
+            claimed = await self.adapter.execute_update(
+                f"""
+                UPDATE {self.TABLE_NAME}
+                SET status = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ? AND status = ?
+                """,
+                (JobStatus.RUNNING.value, now, job_id, JobStatus.PENDING.value)
+            )
+            if claimed:
+                return await self.get_job(job_id)
+            # 被其他工作者抢先领取，继续尝试下一个
+
+    async def update_progress(self, job_id: str, progress: float, stage: str) -> None:
+        """更新任务进度"""
+        await self.adapter.execute_update(
+            f"UPDATE {self.TABLE_NAME} SET progress = ?, stage = ?, updated_at = ? WHERE id = ?",
+            (max(0.0, min(1.0, progress)), stage, datetime.now().isoformat(), job_id)
+        )
+
+    async def mark_succeeded(self, job_id: str) -> None:
+        """标记任务成功"""
+        await self.adapter.execute_update(
+            f"""
+            UPDATE {self.TABLE_NAME}
+            SET status = ?, progress = 1, stage = ?, error = NULL, updated_at = ?
+            WHERE id = ?
+            """,
+            (JobStatus.SUCCEEDED.value, "completed", datetime.now().isoformat(), job_id)
+        )
+
+    async def mark_retry(self, job_id: str, error: str, delay: float) -> None:
+        """任务失败，延迟后重新排队"""
+        now = datetime.now()
+        await self.adapter.execute_update(
+            f"""
+            UPDATE {self.TABLE_NAME}
+            SET status = ?, error = ?, stage = ?, next_run_at = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (JobStatus.PENDING.value, error, "retry_scheduled",
+             (now + timedelta(seconds=delay)).isoformat(), now.isoformat(), job_id)
+        )
+
+    async def mark_failed(self, job_id: str, error: str) -> None:
+        """标记任务最终失败"""
+        await self.adapter.execute_update(
+            f"UPDATE {self.TABLE_NAME} SET status = ?, error = ?, stage = ?, updated_at = ? WHERE id = ?",
+            (JobStatus.FAILED.value, error, "failed", datetime.now().isoformat(), job_id)
+        )
+
+    async def recover_running_jobs(self) -> int:
+        """将上次进程中断时仍在运行的任务重新排队"""
+        now = datetime.now().isoformat()
+        return await self.adapter.execute_update(
+            f"""
+            UPDATE {self.TABLE_NAME}
+            SET status = ?, stage = ?, next_run_at = ?, updated_at = ?
+            WHERE status = ?
+            """,
+            (JobStatus.PENDING.value, "recovered", now, now, JobStatus.RUNNING.value)
+        )
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务"""
+        rows = await self.adapter.execute_query(
+            f"SELECT * FROM {self.TABLE_NAME} WHERE id = ?", (job_id,)
+        )
+        return self._row_to_job(rows[0]) if rows else None
+
+    async def get_latest_job(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """获取文档最近的入库任务"""
+        rows = await self.adapter.execute_query(
+            f"""
+            SELECT * FROM {self.TABLE_NAME}
+            WHERE document_id = ?
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (document_id,)
+        )
+        return self._row_to_job(rows[0]) if rows else None
+
+    async def list_jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """按创建时间倒序列出任务"""
+        if status:
+            rows = await self.adapter.execute_query(
+                f"SELECT * FROM {self.TABLE_NAME} WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                (status, limit)
+            )
+        else:
+            rows = await self.adapter.execute_query(
+                f"SELECT * FROM {self.TABLE_NAME} ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            )
+        return [self._row_to_job(row) for row in rows]
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        rows = await self.adapter.execute_query(
+            f"SELECT status, COUNT(*) AS count FROM {self.TABLE_NAME} GROUP BY status"
+        )
+        counts = {status.value: 0 for status in JobStatus}
+        counts.update({row['status']: row['count'] for row in rows})
+        return counts
+
+    @staticmethod
+    def _row_to_job(row: Dict[str, Any]) -> Dict[str, Any]:
+        job = dict(row)
+        try:
+            job['payload'] = json.loads(job.get('payload') or '{}')
+        except ValueError:
+            job['payload'] = {}
+        return job
+
+
+class IngestionQueue(BaseService):
+    """持久化的文档入库队列和工作协程池"""
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        handler: Optional[JobHandler] = None,
+        failure_handler: Optional[Callable[[Dict[str, Any], str], Awaitable[None]]] = None
+    ):
+        """
+        初始化入库队列
+
+        Args:
+            config: 队列配置
+            handler: 任务处理函数，抛出异常表示本次尝试失败
+            failure_handler: 任务最终失败（重试耗尽）时的回调
+        """
+        super().__init__(config)
+        self.handler = handler
+        self.failure_handler = failure_handler
+
+        self.num_workers = max(1, self.config.get('ingestion_workers', 2))
+        self.max_attempts = max(1, self.config.get('ingestion_max_attempts', 3))
+        self.retry_backoff = self.config.get('ingestion_retry_backoff', 2.0)  # 秒，按尝试次数指数增长
+        self.retry_max_backoff = self.config.get('ingestion_retry_max_backoff', 60.0)
+        self.poll_interval = self.config.get('ingestion_poll_interval', 1.0)
+
+        self.store = IngestionJobStore(
+            self.config.get('ingestion_queue_url', 'sqlite:///./database/ingestion_jobs.db')
+        )
+
+        self.is_running = False
+        self.workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.stats = {
+            'processed': 0,
+            'succeeded': 0,
+            'retried': 0,
+            'failed': 0,
+            'recovered': 0
+        }
+
+    async def initialize(self) -> None:
+        """初始化任务存储"""
+        await self.store.initialize()
+        logger.info("入库任务队列初始化完成")
+
+    async def cleanup(self) -> None:
+        """停止工作协程并关闭存储"""
+        await self.stop()
+        await self.store.close()
+
+    async def start(self) -> None:
+        """恢复中断的任务并启动工作协程池"""
+        if self.is_running:
+            logger.warning("入库任务队列已经在运行")
+            return
+        if self.handler is None:
+            raise ValueError("未设置任务处理函数")
+
+        recovered = await self.store.recover_running_jobs()
+        if recovered:
+            self.stats['recovered'] += recovered
+            logger.info(f"恢复了 {recovered} 个中断的入库任务")
+
+        self.is_running = True
+        self._wakeup = asyncio.Event()
+        self.workers = [
+            asyncio.create_task(self._worker_loop(i)) for i in range(self.num_workers)
+        ]
+        logger.info(f"入库任务队列已启动，工作协程数: {self.num_workers}")
+
+    async def stop(self) -> None:
+        """停止工作协程，运行中的任务在下次启动时恢复"""
+        if not self.is_running:
+            return
+
+        self.is_running = False
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        logger.info("入库任务队列已停止")
+
+    async def enqueue(self, document_id: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        登记入库任务
+
+        Args:
+            document_id: 文档ID
+            payload: 任务处理所需的数据（如文件路径、文件名）
+
+        Returns:
+            任务信息
+        """
+        job = await self.store.create_job(document_id, payload or {}, self.max_attempts)
+        self._wakeup.set()
+        logger.info(f"入库任务已登记: {job['id']}, 文档: {document_id}")
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态和进度"""
+        return await self.store.get_job(job_id)
+
+    async def get_document_job(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """获取文档最近的入库任务"""
+        return await self.store.get_latest_job(document_id)
+
+    async def list_jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """列出任务"""
+        return await self.store.list_jobs(status, limit)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计信息"""
+        return {
+            'is_running': self.is_running,
+            'workers': self.num_workers,
+            'jobs': await self.store.count_by_status(),
+            **self.stats
+        }
+
+    def _get_retry_delay(self, attempts: int) -> float:
+        """计算第attempts次失败后的重试延迟"""
+        return min(self.retry_backoff * (2 ** (attempts - 1)), self.retry_max_backoff)
+
+    async def _worker_loop(self, worker_id: int) -> None:
+        """工作协程：领取并处理任务，无任务时等待唤醒或轮询"""
+        try:
+            while self.is_running:
+                try:
+                    job = await self.store.claim_next_job()
+                except Exception as e:
+                    logger.error(f"领取入库任务失败: {e}")
+                    job = None
+
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                await self._run_job(job, worker_id)
+
+        except asyncio.CancelledError:
+            pass
+
+    async def _run_job(self, job: Dict[str, Any], worker_id: int) -> None:
+        """执行单个任务并记录结果"""
+        job_id = job['id']
+        self.stats['processed'] += 1
+        logger.info(f"[worker-{worker_id}] 开始处理入库任务: {job_id}, 第{job['attempts']}次尝试")
+
+        async def report_progress(progress: float, stage: str) -> None:
+            try:
+                await self.store.update_progress(job_id, progress, stage)
+            except Exception as e:
+                logger.warning(f"更新入库任务进度失败: {e}")
+
+        try:
+            await self.handler(job, report_progress)
+            await self.store.mark_succeeded(job_id)
+            self.stats['succeeded'] += 1
+            logger.info(f"[worker-{worker_id}] 入库任务完成: {job_id}")
+
+        except asyncio.CancelledError:
+            # 停止时中断的任务保持运行中状态，下次启动时恢复
+            raise
+
+        except Exception as e:
+            error = str(e)
+            if job['attempts'] < job['max_attempts']:
+                delay = self._get_retry_delay(job['attempts'])
+                await self.store.mark_retry(job_id, error, delay)
+                self.stats['retried'] += 1
+                logger.warning(f"入库任务失败，{delay:.1f}秒后重试: {job_id}, 错误: {error}")
+            else:
+                await self.store.mark_failed(job_id, error)
+                self.stats['failed'] += 1
+                logger.error(f"入库任务最终失败: {job_id}, 错误: {error}")
+                if self.failure_handler:
+                    try:
+                        await self.failure_handler(job, error)
+                    except Exception as callback_error:
+                        logger.error(f"入库任务失败回调异常: {callback_error}")
+
+
+# 全局入库队列实例及其专用的文档服务
+_global_ingestion_queue: Optional[IngestionQueue] = None
+_global_ingestion_document_service = None
+
+
+def get_ingestion_queue() -> Optional[IngestionQueue]:
+    """获取全局入库队列（未启动时返回None）"""
+    return _global_ingestion_queue
+
+
+async def start_global_ingestion_queue(config: Dict[str, Any]) -> IngestionQueue:
+    """创建文档服务并启动全局入库队列"""
+    global _global_ingestion_queue, _global_ingestion_document_service
+
+    if _global_ingestion_queue is None:
+        from .document_service import DocumentService
+
+        # 文档记录使用 database_url 上的SQLAlchemy会话，与命令行入库相同
+        document_service = DocumentService(config)
+        await document_service.initialize_with_session()
+
+        queue = IngestionQueue(
+            config,
+            handler=document_service.process_ingestion_job,
+            failure_handler=document_service.handle_ingestion_failure
+        )
+        try:
+            await queue.initialize()
+            await queue.start()
+        except Exception:
+            await queue.cleanup()
+            await document_service.cleanup()
+            raise
+
+        _global_ingestion_document_service = document_service
+        _global_ingestion_queue = queue
+
+    return _global_ingestion_queue
+
+
+async def stop_global_ingestion_queue() -> None:
+    """停止全局入库队列"""
+    global _global_ingestion_queue, _global_ingestion_document_service
+
+    if _global_ingestion_queue is not None:
+        await _global_ingestion_queue.cleanup()
+        _global_ingestion_queue = None
+
+    if _global_ingestion_document_service is not None:
+        await _global_ingestion_document_service.cleanup()
+        _global_ingestion_document_service = None
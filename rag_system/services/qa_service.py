@@ -1,6 +1,7 @@
 """
 问答服务实现
 """
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -10,11 +11,15 @@ from ..models.qa import QAResponse, SourceInfo
 from ..models.vector import SearchResult
 from ..models.config import RetrievalConfig
 from ..services.enhanced_retrieval_service import EnhancedRetrievalService
+from ..services.cache_service import CacheKeyGenerator
+from ..services.completion_cache import CompletionCache
+from ..services.chunk_adjacency import ChunkAdjacencyStore
 from ..services.embedding_service import EmbeddingService
 from ..llm.factory import LLMFactory
 from ..llm.base import LLMConfig, BaseLLM
 from ..utils.exceptions import ProcessingError, QAError
 from ..utils.model_exceptions import ModelConnectionError, ModelResponseError, UnsupportedProviderError
+from ..utils.single_flight import get_single_flight
 from .base import BaseService
 
 logger = logging.getLogger(__name__)
@@ -81,6 +86,22 @@ class QAService(BaseService):
         self.include_sources = self.config.get('include_sources', True)
         self.no_answer_threshold = self.config.get('no_answer_threshold', 0.5)
         self.enable_fallback = self.config.get('enable_llm_fallback', True)
+        
+        # 上下文扩展：按入库时记录的邻接表把命中的块扩展到相邻的块，不再额外检索
+        self.enable_context_expansion = self.config.get('enable_context_expansion', False)
+        self.context_expansion_window = self.config.get('context_expansion_window', 1)
+        self.context_expansion_same_section = self.config.get('context_expansion_same_section', False)
+        self.chunk_adjacency = ChunkAdjacencyStore(
+            self.config.get('chunk_adjacency_dir', './documents/.chunk_adjacency'),
+            cache_max_mb=self.config.get('chunk_adjacency_cache_mb', 32)
+        ) if self.enable_context_expansion else None
+        
+        # 合并相同问题的并发请求
+        self.enable_single_flight = self.config.get('enable_single_flight', True)
+        self.single_flight = get_single_flight("qa")
+        
+        # LLM补全缓存（按提示词指纹，复用检索服务的Redis连接）
+        self.completion_cache = CompletionCache(self.config, self.retrieval_service.cache_service)
     
     def _create_fallback_config(self) -> Optional[LLMConfig]:
         """创建备用LLM配置"""
@@ -217,37 +238,19 @@ class QAService(BaseService):
             if not question or not question.strip():
                 raise QAError("问题不能为空")
             
-            start_time = datetime.now()
-            
-            print(f'问题：{question}')
-            # 1. 检索相关上下文
-            context_results = await self.retrieve_context(question, **kwargs)
-
-            print(f'检索到的内容：{context_results}')
-            
-            # 2. 检查是否找到相关内容
-            if not context_results or all(r.similarity_score < self.no_answer_threshold for r in context_results):
-                return self._create_no_answer_response(question, session_id)
-            
-            # 3. 生成答案
-            answer = await self.generate_answer(question, context_results, **kwargs)
-            
-            # 4. 创建源信息
-            sources = self._create_source_info(context_results) if self.include_sources else []
-            
-            end_time = datetime.now()
-            processing_time = (end_time - start_time).total_seconds()
-            
-            response = QAResponse(
-                question=question,
-                answer=answer,
-                sources=sources,
-                processing_time=processing_time,
-                confidence_score=self._calculate_confidence(context_results)
-            )
+            if self.enable_single_flight:
+                flight_key = self._generate_single_flight_key(question, **kwargs)
+                response, shared = await self.single_flight.do(
+                    flight_key,
+                    lambda: self._answer_question(question, session_id, **kwargs)
+                )
+                if shared:
+                    # follower获得独立的响应副本和新的响应ID
+                    response = response.model_copy(deep=True, update={'id': str(uuid.uuid4())})
+                    logger.info("合并进行中的相同问题，共享答案")
+                return response
             
-            logger.info(f"问题处理完成，耗时: {processing_time:.2f}秒")
-            return response
+            return await self._answer_question(question, session_id, **kwargs)
             
         except QAError:
             raise
@@ -255,6 +258,78 @@ class QAService(BaseService):
             logger.error(f"问题处理失败: {str(e)}")
             raise QAError(f"问题处理失败: {str(e)}")
     
+    async def _answer_question(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        **kwargs
+    ) -> QAResponse:
+        """执行完整的问答流程：检索、生成答案并组装响应"""
+        start_time = datetime.now()
+        
+        print(f'问题：{question}')
+        # 1. 检索相关上下文
+        context_results = await self.retrieve_context(question, **kwargs)
+
+        print(f'检索到的内容：{context_results}')
+        
+        # 2. 检查是否找到相关内容
+        if not context_results or all(r.similarity_score < self.no_answer_threshold for r in context_results):
+            return self._create_no_answer_response(question, session_id)
+        
+        # 3. 扩展到相邻文本块并生成答案
+        context_results = await self._expand_context(context_results)
+        answer = await self.generate_answer(question, context_results, **kwargs)
+        
+        # 4. 创建源信息
+        sources = self._create_source_info(context_results) if self.include_sources else []
+        
+        end_time = datetime.now()
+        processing_time = (end_time - start_time).total_seconds()
+        
+        response = QAResponse(
+            question=question,
+            answer=answer,
+            sources=sources,
+            processing_time=processing_time,
+            confidence_score=self._calculate_confidence(context_results)
+        )
+        
+        logger.info(f"问题处理完成，耗时: {processing_time:.2f}秒")
+        return response
+    
+    def _generate_single_flight_key(self, question: str, **kwargs) -> str:
+        """生成请求合并键：检索缓存键加上影响答案的LLM参数"""
+        retrieval_kwargs = {k: v for k, v in kwargs.items() if k not in ('top_k', 'temperature', 'max_tokens')}
+        retrieval_key = CacheKeyGenerator.generate_retrieval_key(
+            question.strip(),
+            self._build_retrieval_config(kwargs.get('top_k')),
+            **retrieval_kwargs
+        )
+        
+        key_components = [
+            retrieval_key,
+            f"provider:{self.llm_config.provider}",
+            f"model:{self.llm_config.model}",
+            f"temperature:{kwargs.get('temperature')}",
+            f"max_tokens:{kwargs.get('max_tokens')}",
+            f"max_context_length:{self.max_context_length}",
+            f"context_expansion:{self.enable_context_expansion}:{self.context_expansion_window}:"
+            f"{self.context_expansion_same_section}"
+        ]
+        key_string = "|".join(key_components)
+        return f"qa:{hashlib.md5(key_string.encode('utf-8')).hexdigest()}"
+    
+    def _build_retrieval_config(self, top_k: Optional[int] = None) -> RetrievalConfig:
+        """创建当前查询的检索配置"""
+        return RetrievalConfig(
+            top_k=top_k or self.retrieval_config.top_k,
+            similarity_threshold=self.retrieval_config.similarity_threshold,
+            search_mode=self.retrieval_config.search_mode,
+            enable_rerank=self.retrieval_config.enable_rerank,
+            enable_cache=self.retrieval_config.enable_cache
+        )
+    
     async def retrieve_context(
         self, 
         question: str, 
@@ -268,13 +343,7 @@ class QAService(BaseService):
             print(f"检索问题相关上下文: {question[:50]}...")
             # 使用增强检索服务进行配置化搜索
             # 创建当前查询的检索配置
-            current_config = RetrievalConfig(
-                top_k=top_k or self.retrieval_config.top_k,
-                similarity_threshold=self.retrieval_config.similarity_threshold,
-                search_mode=self.retrieval_config.search_mode,
-                enable_rerank=self.retrieval_config.enable_rerank,
-                enable_cache=self.retrieval_config.enable_cache
-            )
+            current_config = self._build_retrieval_config(top_k)
             
             # 使用配置化检索
             results = await self.retrieval_service.search_with_config(
@@ -331,13 +400,37 @@ class QAService(BaseService):
         """带错误处理的答案生成"""
         # 尝试主要LLM
         if self.llm:
+            # 相同提示词和采样参数的确定性生成可以直接复用缓存结果
+            completion_key = None
+            effective_temperature = kwargs.get('temperature')
+            if effective_temperature is None:
+                effective_temperature = self.llm_config.temperature
+            if self.completion_cache.is_cacheable(effective_temperature):
+                completion_key = self.completion_cache.generate_key(
+                    provider=self.llm_config.provider,
+                    model=self.llm_config.model,
+                    prompt=prompt,
+                    temperature=effective_temperature,
+                    max_tokens=kwargs.get('max_tokens') or self.llm_config.max_tokens
+                )
+                cached_answer = await self.completion_cache.get(completion_key)
+                if cached_answer is not None:
+                    logger.info("LLM补全缓存命中")
+                    return cached_answer
+            
             try:
                 response = await self.llm.generate_text(
                     prompt=prompt,
                     temperature=kwargs.get('temperature'),
                     max_tokens=kwargs.get('max_tokens')
                 )
-                return self._format_llm_response(response, self.llm_config.provider)
+                answer = self._format_llm_response(response, self.llm_config.provider)
+                
+                # 只缓存主要LLM的结果，降级答案不缓存
+                if completion_key:
+                    await self.completion_cache.set(completion_key, answer)
+                
+                return answer
                 
             except (ModelConnectionError, ModelResponseError) as e:
                 logger.warning(f"主要LLM调用失败: {str(e)}")
@@ -459,6 +552,56 @@ class QAService(BaseService):
                 "error": str(e)
             }
     
+    async def _expand_context(self, context: List[SearchResult]) -> List[SearchResult]:
+        """
+        在上下文长度限制内把命中的文本块扩展到相邻的块
+        
+        命中块先按提示词的格式占用上下文长度，剩余部分按相关度顺序分给各命中块的相邻块，
+        相邻块的内容通过向量存储一次批量读取
+        """
+        if not self.chunk_adjacency or not context:
+            return context
+        
+        budget = self.max_context_length
+        fitted = []
+        for i, result in enumerate(context):
+            length = len(f"文档片段 {i+1}:\n{result.content}\n")
+            if length > budget:
+                break
+            budget -= length
+            fitted.append(result)
+        
+        if not fitted or budget <= 0:
+            return context
+        
+        try:
+            expanded = await self.chunk_adjacency.expand(
+                [(result.document_id, result.chunk_id) for result in fitted],
+                budget,
+                self.retrieval_service.get_chunk_texts,
+                window=self.context_expansion_window,
+                same_section=self.context_expansion_same_section
+            )
+        except Exception as e:
+            logger.warning(f"上下文扩展失败，使用原始检索结果: {str(e)}")
+            return context
+        
+        if not expanded:
+            return context
+        
+        results = []
+        for result in context:
+            if result.chunk_id in expanded:
+                content, chunk_ids = expanded[result.chunk_id]
+                result = result.model_copy(update={
+                    'content': content,
+                    'metadata': {**result.metadata, 'expanded_chunk_ids': chunk_ids}
+                })
+            results.append(result)
+        
+        logger.debug(f"上下文扩展: {len(expanded)} 个命中块扩展到相邻的块")
+        return results
+    
     def _build_prompt(self, question: str, context: List[SearchResult]) -> str:
         """构建提示词"""
         # 准备上下文文本
@@ -590,7 +733,9 @@ class QAService(BaseService):
                 "vector_count": retrieval_stats.get("vector_count", 0),
                 "document_count": retrieval_stats.get("document_count", 0),
                 "available_llm_providers": LLMFactory.get_available_providers(),
-                "fallback_enabled": self.enable_fallback
+                "fallback_enabled": self.enable_fallback,
+                "context_expansion_enabled": self.enable_context_expansion,
+                "completion_cache": self.completion_cache.get_stats()
             }
             
             return stats
@@ -0,0 +1,186 @@
+"""
+查询频率追踪模块
+
+基于Count-Min Sketch的热点查询追踪，支持：
+- 固定内存的查询频率估计（与不同查询的数量无关）
+- 周期性衰减，使热点反映近期访问
+- 有界的热点候选集合，用于缓存预热
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueryFrequencyTracker:
+    """带衰减的Count-Min Sketch查询频率追踪器"""
+
+    def __init__(
+        self,
+        width: int = 4096,
+        depth: int = 4,
+        capacity: int = 200,
+        decay_interval: float = 3600.0,
+        decay_factor: float = 0.5
+    ):
+        """
+        初始化查询频率追踪器
+
+        Args:
+            width: 每行计数器数量，决定估计误差（约 总访问数 * e / width）
+            depth: 哈希函数数量，决定误差概率（约 e^-depth）
+            capacity: 热点候选集合的最大条目数
+            decay_interval: 衰减间隔（秒），<=0 表示不衰减
+            decay_factor: 每次衰减保留的比例（0-1）
+        """
+        if width <= 0 or depth <= 0:
+            raise ValueError("width和depth必须大于0")
+        if not 0 <= decay_factor <= 1:
+            raise ValueError("decay_factor必须在0-1之间")
+
+        self.width = width
+        self.depth = depth
+        self.capacity = max(1, capacity)
+        self.decay_interval = decay_interval
+        self.decay_factor = decay_factor
+
+        self._rows = [array('L', [0]) * width for _ in range(depth)]
+        # key -> [估计次数, 负载数据]
+        self._candidates: Dict[str, List[Any]] = {}
+        self._total = 0
+        self._last_decay = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _indexes(self, key: str) -> List[int]:
+        """使用双重哈希计算每行的计数器位置"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def record(self, key: str, payload: Optional[Any] = None, count: int = 1) -> int:
+        """
+        记录一次查询访问
+
+        Args:
+            key: 查询的归一化键
+            payload: 与查询关联的数据（如查询文本和配置），用于预热
+            count: 增加的次数
+
+        Returns:
+            该查询当前的估计访问次数
+        """
+        with self._lock:
+            self._maybe_decay()
+
+            indexes = self._indexes(key)
+            estimate = min(self._rows[i][idx] for i, idx in enumerate(indexes)) + count
+
+            # 保守更新：只提升低于新估计值的计数器，降低过估计
+            for i, idx in enumerate(indexes):
+                if self._rows[i][idx] < estimate:
+                    self._rows[i][idx] = estimate
+
+            self._total += count
+            self._update_candidates(key, estimate, payload)
+            return estimate
+
+    def estimate(self, key: str) -> int:
+        """获取查询的估计访问次数"""
+        with self._lock:
+            return min(self._rows[i][idx] for i, idx in enumerate(self._indexes(key)))
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int, Any]]:
+        """
+        获取访问最频繁的查询
+
+        Args:
+            limit: 返回的最大条目数
+
+        Returns:
+            (key, 估计次数, 负载数据) 列表，按次数降序
+        """
+        with self._lock:
+            self._maybe_decay()
+            items = [(key, value[0], value[1]) for key, value in self._candidates.items() if value[0] > 0]
+
+        items.sort(key=lambda item: item[1], reverse=True)
+        return items[:limit]
+
+    def decay(self) -> None:
+        """立即执行一次衰减"""
+        with self._lock:
+            self._apply_decay()
+
+    def reset(self) -> None:
+        """清空所有计数"""
+        with self._lock:
+            self._rows = [array('L', [0]) * self.width for _ in range(self.depth)]
+            self._candidates.clear()
+            self._total = 0
+            self._last_decay = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取追踪器统计信息"""
+        with self._lock:
+            return {
+                'width': self.width,
+                'depth': self.depth,
+                'capacity': self.capacity,
+                'tracked_candidates': len(self._candidates),
+                'total_records': self._total,
+                'memory_bytes': sum(row.itemsize * len(row) for row in self._rows)
+            }
+
+    def _update_candidates(self, key: str, estimate: int, payload: Optional[Any]) -> None:
+        """维护有界的热点候选集合"""
+        entry = self._candidates.get(key)
+        if entry is not None:
+            entry[0] = estimate
+            if payload is not None:
+                entry[1] = payload
+            return
+
+        if len(self._candidates) < self.capacity:
+            self._candidates[key] = [estimate, payload]
+            return
+
+        # 候选集合已满：替换估计次数最小的条目
+        min_key = min(self._candidates, key=lambda k: self._candidates[k][0])
+        if self._candidates[min_key][0] < estimate:
+            del self._candidates[min_key]
+            self._candidates[key] = [estimate, payload]
+
+    def _maybe_decay(self) -> None:
+        """到达衰减间隔时执行衰减"""
+        if self.decay_interval <= 0:
+            return
+        elapsed = time.monotonic() - self._last_decay
+        if elapsed >= self.decay_interval:
+            # 长时间无访问时一次性补齐多个衰减周期
+            for _ in range(min(int(elapsed // self.decay_interval), 32)):
+                self._apply_decay()
+
+    def _apply_decay(self) -> None:
+        """按衰减因子缩小所有计数"""
+        factor = self.decay_factor
+        for row in self._rows:
+            for idx in range(self.width):
+                if row[idx]:
+                    row[idx] = int(row[idx] * factor)
+
+        for key in list(self._candidates):
+            decayed = int(self._candidates[key][0] * factor)
+            if decayed <= 0:
+                del self._candidates[key]
+            else:
+                self._candidates[key][0] = decayed
+
+        self._total = int(self._total * factor)
+        self._last_decay = time.monotonic()
+        logger.debug(f"查询频率衰减完成，剩余候选: {len(self._candidates)}")
@@ -22,6 +22,7 @@ from datetime import datetime
 
 from ..models.config import RetrievalConfig
 from ..models.vector import SearchResult
+from ..utils.executors import PRIORITY_INTERACTIVE, RERANK, get_executor
 
 logger = logging.getLogger(__name__)
 
@@ -109,9 +110,8 @@ class RerankingService:
                 # 初始化API客户端
                 await self._initialize_api_client()
             else:
-                # 在线程池中加载本地模型以避免阻塞
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, self._load_model)
+                # 在重排序线程池中加载本地模型以避免阻塞
+                await get_executor(RERANK).run(self._load_model)
             
             load_time = time.time() - start_time
             self.metrics.model_load_time = load_time
@@ -250,13 +250,10 @@ class RerankingService:
             content = result.content[:self.max_length] if len(result.content) > self.max_length else result.content
             pairs.append((query, content))
         
-        # 在线程池中执行重排序计算
-        loop = asyncio.get_event_loop()
-        
-        # 设置超时
+        # 在重排序线程池中执行计算，优先于同一线程池中的其他任务
         try:
             scores = await asyncio.wait_for(
-                loop.run_in_executor(None, self._compute_rerank_scores, pairs),
+                get_executor(RERANK).run(self._compute_rerank_scores, pairs, priority=PRIORITY_INTERACTIVE),
                 timeout=self.timeout
             )
         except asyncio.TimeoutError:
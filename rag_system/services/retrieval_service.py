@@ -137,9 +137,11 @@ class RetrievalService(BaseService):
             
             # 如果指定了文档ID过滤，则过滤结果
             if document_ids:
+                # 共享向量归属多个文档，任一归属文档命中即保留
                 search_results = [
                     result for result in search_results 
                     if result.document_id in document_ids
+                    or any(doc_id in document_ids for doc_id in result.metadata.get('document_ids', '').split(','))
                 ]
             
             # 过滤低相似度结果
@@ -411,6 +413,10 @@ class RetrievalService(BaseService):
         
         return sorted_results
     
+    async def get_chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """按文本块ID批量读取内容"""
+        return await self.vector_service.get_chunk_texts(chunk_ids)
+    
     async def get_document_statistics(self, document_id: str) -> Dict[str, Any]:
         """获取文档的检索统计信息"""
         try:
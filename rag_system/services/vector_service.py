@@ -126,6 +126,91 @@ class VectorStoreService(BaseService):
             logger.error(f"删除向量失败: {str(e)}")
             raise VectorStoreError(f"删除向量失败: {str(e)}")
     
+    async def delete_documents_vectors(self, document_ids: List[str]) -> bool:
+        """批量删除多个文档的向量"""
+        self._ensure_initialized()
+        
+        if not document_ids:
+            return True
+        
+        try:
+            logger.info(f"批量删除 {len(document_ids)} 个文档的向量")
+            return await self._store.delete_documents_vectors(document_ids)
+            
+        except Exception as e:
+            logger.error(f"批量删除向量失败: {str(e)}")
+            raise VectorStoreError(f"批量删除向量失败: {str(e)}")
+    
+    async def find_vectors_by_text_hash(self, text_hashes: List[str]) -> Dict[str, str]:
+        """按规范化文本哈希查找已有向量，返回 {文本哈希: 向量ID}"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.find_by_text_hashes(text_hashes)
+        except Exception as e:
+            logger.error(f"按文本哈希查找向量失败: {str(e)}")
+            raise VectorStoreError(f"按文本哈希查找向量失败: {str(e)}")
+    
+    async def add_document_references(self, vector_ids: List[str], document_id: str) -> int:
+        """将已有向量同时归属到指定文档"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.add_document_references(vector_ids, document_id)
+        except Exception as e:
+            logger.error(f"添加向量归属失败: {str(e)}")
+            raise VectorStoreError(f"添加向量归属失败: {str(e)}")
+    
+    async def share_document_vectors(self, source_document_id: str, target_document_id: str) -> int:
+        """将源文档的全部向量同时归属到目标文档"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.share_document_vectors(source_document_id, target_document_id)
+        except Exception as e:
+            logger.error(f"共享文档向量失败: {str(e)}")
+            raise VectorStoreError(f"共享文档向量失败: {str(e)}")
+    
+    async def get_document_vectors(self, document_id: str) -> Dict[str, Dict[str, Any]]:
+        """获取文档已有向量的元数据 {向量ID: 元数据}"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.get_document_vectors(document_id)
+        except Exception as e:
+            logger.error(f"查询文档向量失败: {str(e)}")
+            raise VectorStoreError(f"查询文档向量失败: {str(e)}")
+    
+    async def remove_vectors(self, document_id: str, vector_ids: List[str]) -> int:
+        """移除文档的指定向量，共享向量只移除归属"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.remove_vectors(document_id, vector_ids)
+        except Exception as e:
+            logger.error(f"移除向量失败: {str(e)}")
+            raise VectorStoreError(f"移除向量失败: {str(e)}")
+    
+    async def get_chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """按文本块ID批量读取内容"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.get_chunk_texts(chunk_ids)
+        except Exception as e:
+            logger.error(f"读取文本块内容失败: {str(e)}")
+            raise VectorStoreError(f"读取文本块内容失败: {str(e)}")
+    
+    async def update_vector_metadata(self, vector_ids: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """只更新向量元数据，不重新写入嵌入"""
+        self._ensure_initialized()
+        
+        try:
+            return await self._store.update_vector_metadata(vector_ids, metadatas)
+        except Exception as e:
+            logger.error(f"更新向量元数据失败: {str(e)}")
+            raise VectorStoreError(f"更新向量元数据失败: {str(e)}")
+    
     async def update_vectors(self, document_id: str, vectors: List[Vector]) -> bool:
         """更新指定文档的向量"""
         self._ensure_initialized()
@@ -0,0 +1,160 @@
+"""
+进程内缓存持久化工具
+
+在关闭时将全局内存缓存写入本地快照文件，启动时在后台恢复，
+使滚动重启后无需从冷缓存开始：
+- gzip压缩的JSON格式，带格式版本号
+- 模型/配置指纹变化时快照失效
+- 原子写入（临时文件 + 重命名），避免留下不完整的快照
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from .memory_cache import get_memory_cache, get_memory_caches
+
+logger = logging.getLogger(__name__)
+
+# 快照格式版本，格式不兼容变更时递增
+SNAPSHOT_VERSION = 1
+
+# 影响缓存内容的配置项：任一变化都会使快照失效
+FINGERPRINT_KEYS = (
+    'embedding_provider',
+    'embedding_model',
+    'embedding_dimensions',
+    'llm_provider',
+    'llm_model',
+    'reranking_provider',
+    'reranking_model',
+    'vector_store_type',
+    'collection_name',
+)
+
+
+def compute_cache_fingerprint(config: Dict[str, Any]) -> str:
+    """根据模型和检索相关配置计算缓存指纹"""
+    fingerprint_data = {key: config.get(key) for key in FINGERPRINT_KEYS}
+    fingerprint_string = json.dumps(fingerprint_data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(fingerprint_string.encode('utf-8')).hexdigest()[:16]
+
+
+def save_cache_snapshot(path: str, fingerprint: str) -> int:
+    """
+    将所有全局内存缓存写入快照文件
+
+    Args:
+        path: 快照文件路径
+        fingerprint: 当前模型/配置指纹
+
+    Returns:
+        写入的条目数
+    """
+    caches = {}
+    total_entries = 0
+
+    for name, cache in get_memory_caches().items():
+        entries = []
+        for key, expires_at, value in cache.snapshot():
+            try:
+                # 只持久化可JSON序列化的值
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            entries.append([key, expires_at, value])
+
+        caches[name] = {
+            'max_entries': cache.max_entries,
+            'default_ttl': cache.default_ttl,
+            'entries': entries
+        }
+        total_entries += len(entries)
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'fingerprint': fingerprint,
+        'created_at': time.time(),
+        'caches': caches
+    }
+
+    snapshot_path = Path(path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, snapshot_path)
+
+    logger.info(f"缓存快照已保存: {path}，{len(caches)}个缓存，{total_entries}个条目")
+    return total_entries
+
+
+def load_cache_snapshot(path: str, fingerprint: str) -> int:
+    """
+    从快照文件恢复全局内存缓存
+
+    版本或指纹不匹配、文件损坏时丢弃快照
+
+    Args:
+        path: 快照文件路径
+        fingerprint: 当前模型/配置指纹
+
+    Returns:
+        恢复的条目数
+    """
+    snapshot_path = Path(path)
+    if not snapshot_path.exists():
+        logger.debug(f"缓存快照不存在: {path}")
+        return 0
+
+    try:
+        with gzip.open(snapshot_path, 'rt', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"缓存快照读取失败，已忽略: {e}")
+        return 0
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        logger.info(f"缓存快照版本不匹配（{snapshot.get('version')} != {SNAPSHOT_VERSION}），已忽略")
+        return 0
+
+    if snapshot.get('fingerprint') != fingerprint:
+        logger.info("模型或配置已变化，缓存快照失效")
+        return 0
+
+    restored = 0
+    for name, cache_data in snapshot.get('caches', {}).items():
+        cache = get_memory_cache(
+            name,
+            max_entries=cache_data.get('max_entries', 1000),
+            default_ttl=cache_data.get('default_ttl')
+        )
+        entries = [tuple(entry) for entry in cache_data.get('entries', [])]
+        restored += cache.restore(entries)
+
+    logger.info(f"缓存快照已恢复: {path}，{restored}个条目")
+    return restored
+
+
+def restore_cache_snapshot_in_background(path: str, fingerprint: str) -> asyncio.Task:
+    """
+    在后台线程中恢复缓存快照，不阻塞服务就绪
+
+    Returns:
+        恢复任务，结果为恢复的条目数
+    """
+    async def _restore() -> int:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, load_cache_snapshot, path, fingerprint)
+        except Exception as e:
+            logger.warning(f"后台恢复缓存快照失败: {e}")
+            return 0
+
+    return asyncio.create_task(_restore())
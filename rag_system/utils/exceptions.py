@@ -105,6 +105,14 @@ class ProcessingError(RAGSystemException):
     def __init__(self, message: str = "处理操作失败"):
         super().__init__(message, "PROCESSING_ERROR")
 
+# 文档特定异常类
+class FileTooLargeError(DocumentError):
+    """上传文件超过大小限制"""
+    def __init__(self, message: str = "文件大小超过限制", max_size: int = None):
+        super().__init__(message)
+        self.error_code = "FILE_TOO_LARGE"
+        self.max_size = max_size
+
 # 检索特定异常类
 class SearchModeError(RetrievalError):
     """搜索模式错误"""
@@ -0,0 +1,249 @@
+"""
+按负载类型划分的具名线程池
+
+向量检索、向量写入、重排序和文本提取各用一个大小固定的线程池，不同负载互不排队：
+- 线程池内按优先级出队，问答检索、重排序等交互任务先于同一线程池中的普通任务
+- 后台线程池（向量写入、文本提取）在有交互任务进行时先让出一小段时间再执行
+- 记录队列深度和排队等待时间
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 任务优先级，数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+
+# 负载类型
+VECTOR_READ = "vector-read"
+VECTOR_WRITE = "vector-write"
+RERANK = "rerank"
+EXTRACTION = "extraction"
+
+# 各负载类型的默认线程数和是否为后台负载
+DEFAULT_EXECUTORS = {
+    VECTOR_READ: (4, False),
+    VECTOR_WRITE: (2, True),
+    RERANK: (2, False),
+    EXTRACTION: (2, True),
+}
+
+# 后台任务为交互任务让出的最长时间（秒），超过后照常执行，避免后台任务被饿死
+DEFAULT_BACKGROUND_YIELD = 0.05
+
+
+class _InteractiveTasks:
+    """进程内进行中（排队或执行）的交互任务计数"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def begin(self) -> None:
+        with self._cond:
+            self._count += 1
+
+    def end(self) -> None:
+        with self._cond:
+            self._count -= 1
+            if self._count == 0:
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """等待交互任务全部完成（最多timeout秒），返回是否发生了让出"""
+        with self._cond:
+            if self._count == 0:
+                return False
+            self._cond.wait_for(lambda: self._count == 0, timeout)
+            return True
+
+
+_interactive_tasks = _InteractiveTasks()
+
+
+class WorkloadExecutor(Executor):
+    """具名、大小固定、按优先级出队的线程池"""
+
+    def __init__(self, name: str, max_workers: int, background: bool = False,
+                 background_yield: float = DEFAULT_BACKGROUND_YIELD):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.background = background
+        self.background_yield = background_yield
+
+        self._cond = threading.Condition()
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._threads: list = []
+        self._idle = 0
+        self._active = 0
+        self._shutdown = False
+        self.reset_stats()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """以普通优先级提交任务（run_in_executor 使用此接口）"""
+        return self.submit_with_priority(PRIORITY_NORMAL, fn, *args, **kwargs)
+
+    def submit_with_priority(self, priority: int, fn: Callable, /, *args, **kwargs) -> Future:
+        """按优先级提交任务"""
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"线程池已关闭: {self.name}")
+            if priority == PRIORITY_INTERACTIVE:
+                _interactive_tasks.begin()
+            heapq.heappush(self._queue, (priority, next(self._sequence), time.monotonic(), future, fn, args, kwargs))
+            self.stats['submitted'] += 1
+            self.stats['peak_queue_depth'] = max(self.stats['peak_queue_depth'], len(self._queue))
+            # 空闲线程不够处理排队任务时按需增加线程
+            if len(self._queue) > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._cond.notify()
+        return future
+
+    async def run(self, fn: Callable, *args, priority: int = PRIORITY_NORMAL) -> Any:
+        """在线程池中执行同步函数并等待结果"""
+        return await asyncio.wrap_future(self.submit_with_priority(priority, fn, *args))
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                if not self._queue:
+                    return
+                priority, _, submitted_at, future, fn, args, kwargs = heapq.heappop(self._queue)
+                self._active += 1
+
+            try:
+                if self.background and _interactive_tasks.wait_idle(self.background_yield):
+                    with self._cond:
+                        self.stats['yielded'] += 1
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                wait = time.monotonic() - submitted_at
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    exception, succeeded = e, False
+                else:
+                    exception, succeeded = None, True
+
+                # 先更新统计再通知调用方，调用方拿到结果时统计已包含本任务
+                with self._cond:
+                    self.stats['completed' if succeeded else 'failed'] += 1
+                    self.stats['total_wait'] += wait
+                    self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+                if succeeded:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exception)
+                    del exception
+            finally:
+                if priority == PRIORITY_INTERACTIVE:
+                    _interactive_tasks.end()
+                with self._cond:
+                    self._active -= 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """关闭线程池，默认执行完已提交的任务"""
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                while self._queue:
+                    priority, _, _, future, _, _, _ = heapq.heappop(self._queue)
+                    future.cancel()
+                    if priority == PRIORITY_INTERACTIVE:
+                        _interactive_tasks.end()
+            self._cond.notify_all()
+        if wait:
+            for thread in list(self._threads):
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取线程池统计：当前队列深度、执行中任务数和排队等待时间"""
+        with self._cond:
+            finished = self.stats['completed'] + self.stats['failed']
+            return {
+                'name': self.name,
+                'max_workers': self.max_workers,
+                'background': self.background,
+                'threads': len(self._threads),
+                'active': self._active,
+                'queue_depth': len(self._queue),
+                'peak_queue_depth': self.stats['peak_queue_depth'],
+                'submitted': self.stats['submitted'],
+                'completed': self.stats['completed'],
+                'failed': self.stats['failed'],
+                'yielded': self.stats['yielded'],
+                'avg_wait_ms': self.stats['total_wait'] / finished * 1000 if finished else 0.0,
+                'max_wait_ms': self.stats['max_wait'] * 1000
+            }
+
+    def reset_stats(self) -> None:
+        """重置统计信息"""
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'yielded': 0,
+            'peak_queue_depth': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0
+        }
+
+
+# 全局线程池：服务实例按请求创建时，同一负载类型仍共用一个线程池
+_global_executors: Dict[str, WorkloadExecutor] = {}
+_global_executors_lock = threading.Lock()
+
+
+def get_executor(name: str, max_workers: Optional[int] = None) -> WorkloadExecutor:
+    """获取指定负载类型的全局线程池，不存在时创建，线程数以首次创建时的配置为准"""
+    with _global_executors_lock:
+        executor = _global_executors.get(name)
+        if executor is None:
+            default_workers, background = DEFAULT_EXECUTORS.get(name, (4, False))
+            executor = WorkloadExecutor(name, max_workers or default_workers, background=background)
+            _global_executors[name] = executor
+            logger.debug(f"创建线程池: {name}, 线程数: {executor.max_workers}, 后台: {background}")
+        return executor
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有已创建的全局线程池的统计信息"""
+    with _global_executors_lock:
+        executors = list(_global_executors.values())
+    return {
+        'interactive_tasks': _interactive_tasks.count,
+        'executors': {executor.name: executor.get_stats() for executor in executors}
+    }
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """关闭所有全局线程池"""
+    with _global_executors_lock:
+        executors = list(_global_executors.values())
+        _global_executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -18,6 +18,21 @@ def generate_hash(content: str) -> str:
     return hashlib.md5(content.encode()).hexdigest()
 
 
+def compute_text_hash(content: str) -> str:
+    """计算规范化文本（忽略大小写和空白差异）的SHA-256哈希，用于文本块去重"""
+    normalized = " ".join(content.lower().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def compute_chunk_id(document_id: str, content: str, position: int) -> str:
+    """
+    根据文档ID、块内容和位置生成确定的文本块ID
+
+    相同文档中内容和位置都不变的块在重新处理时得到相同的ID
+    """
+    return str(uuid.uuid5(uuid.UUID(document_id), f"{position}:{content}"))
+
+
 def get_file_extension(filename: str) -> str:
     """获取文件扩展名"""
     return Path(filename).suffix.lower()
@@ -0,0 +1,213 @@
+"""
+进程内缓存工具
+
+提供带TTL的LRU内存缓存，作为Redis之前的一级缓存使用：
+- 条目数上限和可选的字节数上限，超出时淘汰最久未使用的条目
+- 每个条目独立的过期时间
+- 按名称共享的全局缓存实例
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """带TTL的线程安全LRU内存缓存"""
+
+    def __init__(self, name: str = "memory", max_entries: int = 1000, default_ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None, size_of: Optional[Callable[[Any], int]] = None):
+        """
+        初始化内存缓存
+
+        Args:
+            name: 缓存名称
+            max_entries: 最大条目数
+            default_ttl: 默认过期时间（秒），None表示不过期
+            max_bytes: 最大占用字节数，None表示只按条目数限制
+            size_of: 计算条目值字节数的函数，设置 max_bytes 时必须提供
+        """
+        if max_bytes is not None and size_of is None:
+            raise ValueError("按字节数限制容量时必须提供 size_of")
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._size_of = size_of
+        self._bytes = 0
+
+        # key -> (过期时间戳或None, 值)；过期时间使用墙钟时间，便于持久化
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，未命中或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存值
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 过期时间（秒），None时使用默认TTL
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value)
+            self._bytes += self._sizeof(value)
+            self._evict()
+
+    def _sizeof(self, value: Any) -> int:
+        return self._size_of(value) if self._size_of is not None else 0
+
+    def _remove(self, key: str) -> Tuple[Optional[float], Any]:
+        """删除条目并扣减占用字节数（调用方持有锁）"""
+        entry = self._entries.pop(key)
+        self._bytes -= self._sizeof(entry[1])
+        return entry
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目直到不超过条目数和字节数上限（调用方持有锁）"""
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def resize(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """调整容量上限，超出新上限的条目立即淘汰"""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max(1, max_entries)
+            if max_bytes is not None:
+                if self._size_of is None:
+                    raise ValueError("按字节数限制容量时必须提供 size_of")
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def delete(self, key: str) -> bool:
+        """删除缓存值"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> int:
+        """清空缓存，返回清理的条目数"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return count
+
+    def snapshot(self) -> List[Tuple[str, Optional[float], Any]]:
+        """导出未过期的条目，按最久未使用到最近使用排列
+
+        Returns:
+            (key, 过期时间戳或None, 值) 列表
+        """
+        now = time.time()
+        with self._lock:
+            return [
+                (key, expires_at, value)
+                for key, (expires_at, value) in self._entries.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def restore(self, entries: List[Tuple[str, Optional[float], Any]]) -> int:
+        """从快照恢复条目
+
+        跳过已过期的条目；已存在的键保留当前值（启动后写入的数据更新）
+
+        Args:
+            entries: snapshot()导出的条目列表
+
+        Returns:
+            恢复的条目数
+        """
+        now = time.time()
+        restored = 0
+        with self._lock:
+            # 从最近使用的条目开始逐个放到队首，保持快照中的LRU顺序
+            for key, expires_at, value in reversed(entries):
+                if expires_at is not None and expires_at <= now:
+                    continue
+                if key in self._entries:
+                    continue
+                self._entries[key] = (expires_at, value)
+                self._bytes += self._sizeof(value)
+                # 恢复的条目视为比启动后访问的条目更旧
+                self._entries.move_to_end(key, last=False)
+                restored += 1
+
+            self._evict()
+        return restored
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.stats['hits'] / total if total > 0 else 0.0,
+            **self.stats
+        }
+
+
+# 全局内存缓存：按名称共享，服务实例按请求创建时也能复用
+_global_memory_caches: Dict[str, MemoryCache] = {}
+
+
+def get_memory_cache(name: str, max_entries: int = 1000, default_ttl: Optional[float] = None,
+                     max_bytes: Optional[int] = None,
+                     size_of: Optional[Callable[[Any], int]] = None) -> MemoryCache:
+    """获取指定名称的全局内存缓存，不存在时按给定参数创建"""
+    cache = _global_memory_caches.get(name)
+    if cache is None:
+        cache = MemoryCache(name, max_entries=max_entries, default_ttl=default_ttl,
+                            max_bytes=max_bytes, size_of=size_of)
+        _global_memory_caches[name] = cache
+    return cache
+
+
+def get_memory_caches() -> Dict[str, MemoryCache]:
+    """获取所有已创建的全局内存缓存"""
+    return dict(_global_memory_caches)
@@ -0,0 +1,89 @@
+"""
+请求合并（single-flight）工具
+
+相同键的并发调用只执行一次，其余调用等待首个调用（leader）的结果，
+用于避免热点问题同时到达时重复执行检索、重排序和LLM调用。
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """按键合并并发的异步调用"""
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            'leaders': 0,
+            'coalesced': 0
+        }
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """执行或加入一次调用
+
+        Args:
+            key: 合并键，相同键的并发调用共享同一次执行
+            func: 无参数的异步函数，仅由leader执行
+
+        Returns:
+            (结果, 是否为共享结果)；共享结果表示当前调用是等待leader的follower
+        """
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is not asyncio.get_running_loop():
+            # 属于其他事件循环的残留任务，无法在当前循环等待
+            task = None
+        if task is not None:
+            self.stats['coalesced'] += 1
+            logger.debug(f"[{self.name}] 合并进行中的请求: {key[:32]}...")
+            # shield：follower被取消时不影响共享的执行
+            return await asyncio.shield(task), True
+
+        self.stats['leaders'] += 1
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        # shield：leader的调用方被取消时，其他等待者仍能拿到结果
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        """执行完成后移除键，之后的调用重新执行"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 读取异常，避免所有等待者都被取消时出现未获取异常的警告
+        if not task.cancelled():
+            task.exception()
+
+    def inflight_count(self) -> int:
+        """当前进行中的调用数"""
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计信息"""
+        return {
+            **self.stats,
+            'inflight': len(self._inflight)
+        }
+
+    def reset_stats(self) -> None:
+        """重置统计信息"""
+        self.stats = {
+            'leaders': 0,
+            'coalesced': 0
+        }
+
+
+# 全局请求合并组：服务实例按请求创建时，也能在进程内合并相同请求
+_global_single_flights: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """获取指定名称的全局请求合并组"""
+    group = _global_single_flights.get(name)
+    if group is None:
+        group = SingleFlight(name)
+        _global_single_flights[name] = group
+    return group
@@ -4,8 +4,10 @@
 """
 from .chroma_store import ChromaVectorStore
 from .base import VectorStoreBase
+from .chunk_text_store import ChunkTextStore
 
 __all__ = [
     "ChromaVectorStore",
-    "VectorStoreBase"
+    "VectorStoreBase",
+    "ChunkTextStore"
 ]
\ No newline at end of file
@@ -59,6 +59,40 @@ class VectorStoreBase(ABC):
         """清理资源"""
         pass
     
+    async def delete_documents_vectors(self, document_ids: List[str]) -> bool:
+        """批量删除多个文档的向量，默认逐个文档删除，支持条件批量删除的存储可覆盖"""
+        for document_id in document_ids:
+            await self.delete_vectors(document_id)
+        return True
+    
+    async def find_by_text_hashes(self, text_hashes: List[str]) -> Dict[str, str]:
+        """按规范化文本哈希查找已有向量，不支持共享向量的存储返回空"""
+        return {}
+    
+    async def add_document_references(self, vector_ids: List[str], document_id: str) -> int:
+        """将已有向量同时归属到指定文档，返回新增归属的向量数"""
+        return 0
+    
+    async def share_document_vectors(self, source_document_id: str, target_document_id: str) -> int:
+        """将源文档的全部向量同时归属到目标文档"""
+        return 0
+    
+    async def get_document_vectors(self, document_id: str) -> Dict[str, Dict[str, Any]]:
+        """获取文档已有向量的元数据 {向量ID: 元数据}，用于增量更新"""
+        return {}
+    
+    async def remove_vectors(self, document_id: str, vector_ids: List[str]) -> int:
+        """移除文档的指定向量（共享向量只移除归属），返回处理的向量数"""
+        return 0
+    
+    async def update_vector_metadata(self, vector_ids: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """只更新向量元数据（不重新写入嵌入），返回更新的向量数"""
+        return 0
+    
+    async def get_chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """按文本块ID批量读取内容 {块ID: 内容}，不存在的块不出现在结果中"""
+        return {}
+    
     def is_initialized(self) -> bool:
         """检查是否已初始化"""
         return self._initialized
@@ -2,10 +2,10 @@
 Chroma向量数据库实现
 """
 import logging
-from typing import List, Dict, Any, Optional
+import os
+from typing import List, Dict, Any, Optional, Set, Tuple
 import uuid
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
 try:
     import chromadb
@@ -17,10 +17,22 @@ except ImportError:
 from ..models.vector import Vector, SearchResult
 from ..models.config import VectorStoreConfig
 from ..utils.exceptions import VectorStoreError
+from ..utils.executors import PRIORITY_INTERACTIVE, VECTOR_READ, VECTOR_WRITE, get_executor
 from .base import VectorStoreBase
+from .chunk_text_store import ChunkTextStore
 
 logger = logging.getLogger(__name__)
 
+# 共享向量的文档归属标记前缀：元数据键 doc_<文档ID> 为True表示该向量属于此文档
+DOCUMENT_FLAG_PREFIX = "doc_"
+
+# 文本块内容存储的文件名（位于向量数据库目录下）
+CHUNK_TEXT_DB_NAME = "chunk_texts.sqlite3"
+
+# 批量删除时每次查询覆盖的文档数，以及每次删除调用的向量数（低于Chroma单批上限）
+DELETE_DOCUMENTS_BATCH_SIZE = 100
+DELETE_IDS_BATCH_SIZE = 5000
+
 
 
 class ChromaClientManager:
@@ -66,7 +78,10 @@ class ChromaVectorStore(VectorStoreBase):
         
         self._client = None
         self._collection = None
-        self._executor = ThreadPoolExecutor(max_workers=4)
+        self._text_store: Optional[ChunkTextStore] = None
+        # 进程内共用的读写线程池：大文档写入时检索不会排在写入之后，检索优先于其他读取
+        self._executor = get_executor(VECTOR_READ)
+        self._write_executor = get_executor(VECTOR_WRITE, config.write_workers)
     
     async def initialize(self) -> None:
         """初始化Chroma客户端和集合"""
@@ -89,6 +104,7 @@ class ChromaVectorStore(VectorStoreBase):
         """同步初始化方法"""
         # 使用单例管理器获取客户端
         self._client = ChromaClientManager.get_client(self.config.persist_directory)
+        self._text_store = ChunkTextStore(os.path.join(self.config.persist_directory, CHUNK_TEXT_DB_NAME))
         
         # 获取或创建集合
         try:
@@ -115,38 +131,27 @@ class ChromaVectorStore(VectorStoreBase):
         try:
             logger.info(f"添加 {len(vectors)} 个向量到Chroma")
             
-            # 准备数据
-            ids = []
-            embeddings = []
-            metadatas = []
-            documents = []
+            # 按批准备数据并写入，同时进行的批数有上限，避免为整个文档一次构造请求；
+            # 单批失败时重试该批，已写入的批次保留
+            batch_size = max(1, self.config.write_batch_size)
+            semaphore = asyncio.Semaphore(max(1, self.config.max_inflight_writes))
             
-            for vector in vectors:
-                ids.append(vector.id)
-                embeddings.append(vector.embedding)
-                
-                # 准备元数据
-                metadata = {
-                    "document_id": vector.document_id,
-                    "chunk_id": vector.chunk_id,
-                    **vector.metadata
-                }
-                metadatas.append(metadata)
-                
-                # 使用实际的文档内容
-                content = vector.metadata.get("content", vector.chunk_id)
-                documents.append(content)
+            async def write(start: int) -> int:
+                async with semaphore:
+                    batch = vectors[start:start + batch_size]
+                    await self._write_batch(*self._prepare_batch(batch))
+                    return len(batch)
             
-            # 在线程池中执行添加操作
-            await asyncio.get_event_loop().run_in_executor(
-                self._executor,
-                lambda: self._collection.add(
-                    ids=ids,
-                    embeddings=embeddings,
-                    metadatas=metadatas,
-                    documents=documents
-                )
+            results = await asyncio.gather(
+                *(write(start) for start in range(0, len(vectors), batch_size)),
+                return_exceptions=True
             )
+            errors = [result for result in results if isinstance(result, BaseException)]
+            written = sum(result for result in results if not isinstance(result, BaseException))
+            if errors:
+                raise VectorStoreError(
+                    f"{len(errors)}/{len(results)} 批写入失败，已写入 {written} 个向量: {errors[0]}"
+                )
             
             logger.info(f"成功添加 {len(vectors)} 个向量")
             return True
@@ -155,6 +160,57 @@ class ChromaVectorStore(VectorStoreBase):
             logger.error(f"添加向量失败: {str(e)}")
             raise VectorStoreError(f"添加向量失败: {str(e)}")
     
+    def _prepare_batch(self, vectors: List[Vector]) -> Tuple[List[str], List[List[float]],
+                                                             List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """构造一批向量的写入数据：ID、嵌入、元数据和文本块内容"""
+        ids = []
+        embeddings = []
+        metadatas = []
+        texts = []
+        
+        for vector in vectors:
+            ids.append(vector.id)
+            embeddings.append(vector.embedding)
+            
+            # 准备元数据（文本内容单独存储，不写入向量索引）
+            metadata = {
+                "document_id": vector.document_id,
+                "chunk_id": vector.chunk_id,
+                **{key: value for key, value in vector.metadata.items() if key != "content"}
+            }
+            # 文档归属：向量可被内容相同的多个文档共享
+            metadata.setdefault("document_ids", vector.document_id)
+            metadata[f"{DOCUMENT_FLAG_PREFIX}{vector.document_id}"] = True
+            metadatas.append(metadata)
+            
+            # 使用实际的文档内容
+            texts.append((vector.id, vector.metadata.get("content", vector.chunk_id)))
+        
+        return ids, embeddings, metadatas, texts
+    
+    async def _write_batch(self, ids: List[str], embeddings: List[List[float]],
+                           metadatas: List[Dict[str, Any]], texts: List[Tuple[str, str]]) -> None:
+        """
+        在写入线程池中写入一批向量，失败时按配置重试
+        
+        Chroma 的 add 会跳过已存在的ID，重试时不会重复写入该批中已经写入的部分
+        """
+        def add_sync():
+            # 先写入内容，检索到向量时内容一定存在
+            self._text_store.put_many(texts)
+            self._collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        
+        attempts = max(0, self.config.write_retries) + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                await asyncio.get_event_loop().run_in_executor(self._write_executor, add_sync)
+                return
+            except Exception as e:
+                if attempt >= attempts:
+                    raise
+                logger.warning(f"写入向量批次失败（{len(ids)} 个），第 {attempt} 次重试: {str(e)}")
+                await asyncio.sleep(self.config.write_retry_delay * attempt)
+    
     async def search_similar(self, query_vector: List[float], top_k: int = 5,
                            similarity_threshold: float = 0.0) -> List[SearchResult]:
         """搜索相似向量"""
@@ -167,24 +223,23 @@ class ChromaVectorStore(VectorStoreBase):
         try:
             logger.debug(f"搜索相似向量，top_k={top_k}, threshold={similarity_threshold}")
             
-            # 在线程池中执行查询
-            results = await asyncio.get_event_loop().run_in_executor(
-                self._executor,
+            # 在线程池中执行查询（只取ID、距离和元数据，不取文本）
+            results = await self._executor.run(
                 lambda: self._collection.query(
                     query_embeddings=[query_vector],
                     n_results=top_k,
-                    include=["metadatas", "distances", "documents"]
-                )
+                    include=["metadatas", "distances"]
+                ),
+                priority=PRIORITY_INTERACTIVE
             )
             
             # 处理结果
-            search_results = []
+            hits = []
             
             if results and results.get("ids") and len(results["ids"]) > 0:
                 ids = results["ids"][0]
                 distances = results.get("distances", [[]])[0]
                 metadatas = results.get("metadatas", [[]])[0]
-                documents = results.get("documents", [[]])[0]
                 
                 for i, vector_id in enumerate(ids):
                     # Chroma返回的是余弦距离，需要转换为相似度分数
@@ -197,16 +252,11 @@ class ChromaVectorStore(VectorStoreBase):
                         continue
                     
                     metadata = metadatas[i] if i < len(metadatas) else {}
-                    document = documents[i] if i < len(documents) else ""
-                    
-                    search_result = SearchResult(
-                        chunk_id=vector_id,
-                        document_id=metadata.get("document_id", ""),
-                        content=document,
-                        similarity_score=similarity_score,
-                        metadata=metadata
-                    )
-                    search_results.append(search_result)
+                    hits.append((vector_id, similarity_score, metadata or {}))
+            
+            # 只为通过阈值的结果批量读取内容
+            contents = await self._fetch_contents([vector_id for vector_id, _, _ in hits])
+            search_results = self._build_results(hits, contents)
             
             logger.debug(f"找到 {len(search_results)} 个相似向量")
             return search_results
@@ -215,8 +265,64 @@ class ChromaVectorStore(VectorStoreBase):
             logger.error(f"搜索相似向量失败: {str(e)}")
             raise VectorStoreError(f"搜索失败: {str(e)}")
     
+    async def get_chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """按文本块ID（即向量ID）批量读取内容"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        return await self._fetch_contents(chunk_ids)
+    
+    async def _fetch_contents(self, vector_ids: List[str]) -> Dict[str, str]:
+        """
+        批量读取文本块内容
+        
+        内容存储中没有的向量（内容单独存储之前写入的向量）从Chroma的documents字段读取
+        """
+        if not vector_ids:
+            return {}
+        
+        def fetch_sync() -> Dict[str, str]:
+            contents = self._text_store.get_many(vector_ids)
+            missing = [vector_id for vector_id in vector_ids if vector_id not in contents]
+            if missing:
+                legacy = self._collection.get(ids=missing, include=["documents"])
+                for vector_id, document in zip(legacy.get("ids") or [], legacy.get("documents") or []):
+                    if document:
+                        contents[vector_id] = document
+            return contents
+        
+        return await self._executor.run(fetch_sync, priority=PRIORITY_INTERACTIVE)
+    
+    def _build_results(self, hits: List[Tuple[str, float, Dict[str, Any]]],
+                       contents: Dict[str, str]) -> List[SearchResult]:
+        """组装检索结果，缺少内容的向量跳过"""
+        search_results = []
+        for vector_id, similarity_score, metadata in hits:
+            content = contents.get(vector_id)
+            if not content:
+                logger.warning(f"向量 {vector_id} 缺少文本内容，已跳过")
+                continue
+            search_results.append(SearchResult(
+                chunk_id=vector_id,
+                document_id=metadata.get("document_id", ""),
+                content=content,
+                similarity_score=similarity_score,
+                metadata=metadata
+            ))
+        return search_results
+    
+    def _document_where(self, document_id: str) -> Dict[str, Any]:
+        """匹配属于指定文档（主归属或共享）的向量"""
+        return {"$or": [
+            {"document_id": document_id},
+            {f"{DOCUMENT_FLAG_PREFIX}{document_id}": True}
+        ]}
+    
     async def delete_vectors(self, document_id: str) -> bool:
-        """删除指定文档的所有向量"""
+        """
+        删除指定文档的所有向量
+        
+        与其他文档共享的向量只移除该文档的归属，仍有归属文档时保留
+        """
         if not self._initialized:
             raise VectorStoreError("向量存储未初始化")
         
@@ -227,38 +333,299 @@ class ChromaVectorStore(VectorStoreBase):
             results = await asyncio.get_event_loop().run_in_executor(
                 self._executor,
                 lambda: self._collection.get(
-                    where={"document_id": document_id},
+                    where=self._document_where(document_id),
                     include=["metadatas"]
                 )
             )
             
-            if results and results.get("ids"):
-                ids_to_delete = results["ids"]
-                
-                # 删除向量
-                await asyncio.get_event_loop().run_in_executor(
-                    self._executor,
-                    lambda: self._collection.delete(ids=ids_to_delete)
-                )
-                
-                logger.info(f"成功删除 {len(ids_to_delete)} 个向量")
-                return True
-            else:
+            if not results or not results.get("ids"):
                 logger.info(f"文档 {document_id} 没有找到向量")
                 return True
             
+            deleted, detached = await self._detach_vectors(
+                {document_id}, results["ids"], results.get("metadatas") or []
+            )
+            
+            logger.info(f"成功删除 {deleted} 个向量，{detached} 个共享向量保留")
+            return True
+            
         except Exception as e:
             logger.error(f"删除向量失败: {str(e)}")
             raise VectorStoreError(f"删除向量失败: {str(e)}")
     
+    async def delete_documents_vectors(self, document_ids: List[str]) -> bool:
+        """
+        批量删除多个文档的向量
+        
+        按批用一个条件查询取出多个文档的向量，只属于这些文档的向量按批删除，
+        与其他文档共享的向量一次更新移除全部归属
+        """
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        document_ids = list(dict.fromkeys(document_ids))
+        if not document_ids:
+            return True
+        
+        try:
+            logger.info(f"批量删除 {len(document_ids)} 个文档的向量")
+            
+            removed = set(document_ids)
+            deleted = detached = 0
+            for i in range(0, len(document_ids), DELETE_DOCUMENTS_BATCH_SIZE):
+                where = self._documents_where(document_ids[i:i + DELETE_DOCUMENTS_BATCH_SIZE])
+                results = await asyncio.get_event_loop().run_in_executor(
+                    self._executor,
+                    lambda: self._collection.get(where=where, include=["metadatas"])
+                )
+                if not results or not results.get("ids"):
+                    continue
+                
+                batch_deleted, batch_detached = await self._detach_vectors(
+                    removed, results["ids"], results.get("metadatas") or []
+                )
+                deleted += batch_deleted
+                detached += batch_detached
+            
+            logger.info(f"成功删除 {deleted} 个向量，{detached} 个共享向量保留")
+            return True
+            
+        except Exception as e:
+            logger.error(f"批量删除向量失败: {str(e)}")
+            raise VectorStoreError(f"批量删除向量失败: {str(e)}")
+    
+    def _documents_where(self, document_ids: List[str]) -> Dict[str, Any]:
+        """匹配属于任一指定文档（主归属或共享）的向量"""
+        return {"$or": [{"document_id": {"$in": document_ids}}] + [
+            {f"{DOCUMENT_FLAG_PREFIX}{document_id}": True} for document_id in document_ids
+        ]}
+    
+    async def _detach_vectors(self, document_ids: Set[str], vector_ids: List[str],
+                              metadatas: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        移除向量对指定文档的归属，没有其他归属文档的向量直接删除
+        
+        Returns:
+            (删除的向量数, 仅移除归属的向量数)
+        """
+        ids_to_delete = []
+        ids_to_update = []
+        metadatas_to_update = []
+        
+        for vector_id, metadata in zip(vector_ids, metadatas):
+            metadata = metadata or {}
+            all_owners = _split_document_ids(metadata)
+            owners = [owner for owner in all_owners if owner not in document_ids]
+            if not owners:
+                ids_to_delete.append(vector_id)
+                continue
+            
+            ids_to_update.append(vector_id)
+            update = {
+                "document_id": owners[0],
+                "document_ids": ",".join(owners)
+            }
+            for document_id in document_ids:
+                flag = f"{DOCUMENT_FLAG_PREFIX}{document_id}"
+                if document_id in all_owners or flag in metadata:
+                    update[flag] = None
+            metadatas_to_update.append(update)
+        
+        if ids_to_delete:
+            def delete_sync():
+                for i in range(0, len(ids_to_delete), DELETE_IDS_BATCH_SIZE):
+                    batch = ids_to_delete[i:i + DELETE_IDS_BATCH_SIZE]
+                    self._collection.delete(ids=batch)
+                    self._text_store.delete_many(batch)
+            
+            await asyncio.get_event_loop().run_in_executor(self._write_executor, delete_sync)
+        
+        if ids_to_update:
+            def update_sync():
+                for i in range(0, len(ids_to_update), DELETE_IDS_BATCH_SIZE):
+                    self._collection.update(
+                        ids=ids_to_update[i:i + DELETE_IDS_BATCH_SIZE],
+                        metadatas=metadatas_to_update[i:i + DELETE_IDS_BATCH_SIZE]
+                    )
+            
+            await asyncio.get_event_loop().run_in_executor(self._write_executor, update_sync)
+        
+        return len(ids_to_delete), len(ids_to_update)
+    
+    async def get_document_vectors(self, document_id: str) -> Dict[str, Dict[str, Any]]:
+        """获取文档已有向量（包括共享向量）的元数据 {向量ID: 元数据}"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: self._collection.get(
+                    where=self._document_where(document_id),
+                    include=["metadatas"]
+                )
+            )
+            
+            return {
+                vector_id: metadata or {}
+                for vector_id, metadata in zip(results.get("ids") or [], results.get("metadatas") or [])
+            }
+            
+        except Exception as e:
+            logger.error(f"查询文档向量失败: {str(e)}")
+            raise VectorStoreError(f"查询文档向量失败: {str(e)}")
+    
+    async def remove_vectors(self, document_id: str, vector_ids: List[str]) -> int:
+        """移除文档的指定向量，共享向量只移除该文档的归属"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        if not vector_ids:
+            return 0
+        
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: self._collection.get(ids=list(vector_ids), include=["metadatas"])
+            )
+            
+            deleted, detached = await self._detach_vectors(
+                {document_id}, results.get("ids") or [], results.get("metadatas") or []
+            )
+            return deleted + detached
+            
+        except Exception as e:
+            logger.error(f"移除向量失败: {str(e)}")
+            raise VectorStoreError(f"移除向量失败: {str(e)}")
+    
+    async def update_vector_metadata(self, vector_ids: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """只更新向量元数据，不重新写入嵌入"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        if not vector_ids:
+            return 0
+        
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                self._write_executor,
+                lambda: self._collection.update(ids=list(vector_ids), metadatas=list(metadatas))
+            )
+            return len(vector_ids)
+            
+        except Exception as e:
+            logger.error(f"更新向量元数据失败: {str(e)}")
+            raise VectorStoreError(f"更新向量元数据失败: {str(e)}")
+    
+    async def find_by_text_hashes(self, text_hashes: List[str]) -> Dict[str, str]:
+        """按规范化文本哈希查找已有向量，返回 {文本哈希: 向量ID}"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        if not text_hashes:
+            return {}
+        
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: self._collection.get(
+                    where={"text_hash": {"$in": list(text_hashes)}},
+                    include=["metadatas"]
+                )
+            )
+            
+            found = {}
+            for vector_id, metadata in zip(results.get("ids") or [], results.get("metadatas") or []):
+                text_hash = (metadata or {}).get("text_hash")
+                if text_hash and text_hash not in found:
+                    found[text_hash] = vector_id
+            return found
+            
+        except Exception as e:
+            logger.error(f"按文本哈希查找向量失败: {str(e)}")
+            raise VectorStoreError(f"按文本哈希查找向量失败: {str(e)}")
+    
+    async def add_document_references(self, vector_ids: List[str], document_id: str) -> int:
+        """将已有向量同时归属到指定文档，返回新增归属的向量数"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        if not vector_ids:
+            return 0
+        
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: self._collection.get(ids=list(vector_ids), include=["metadatas"])
+            )
+            
+            ids_to_update = []
+            metadatas_to_update = []
+            for vector_id, metadata in zip(results.get("ids") or [], results.get("metadatas") or []):
+                owners = _split_document_ids(metadata or {})
+                if document_id in owners:
+                    continue
+                
+                owners.append(document_id)
+                ids_to_update.append(vector_id)
+                metadatas_to_update.append({
+                    "document_ids": ",".join(owners),
+                    f"{DOCUMENT_FLAG_PREFIX}{document_id}": True
+                })
+            
+            if ids_to_update:
+                await asyncio.get_event_loop().run_in_executor(
+                    self._write_executor,
+                    lambda: self._collection.update(ids=ids_to_update, metadatas=metadatas_to_update)
+                )
+            
+            logger.info(f"文档 {document_id} 共享 {len(ids_to_update)} 个已有向量")
+            return len(ids_to_update)
+            
+        except Exception as e:
+            logger.error(f"添加向量归属失败: {str(e)}")
+            raise VectorStoreError(f"添加向量归属失败: {str(e)}")
+    
+    async def share_document_vectors(self, source_document_id: str, target_document_id: str) -> int:
+        """将源文档的全部向量同时归属到目标文档（用于内容重复的文档别名）"""
+        if not self._initialized:
+            raise VectorStoreError("向量存储未初始化")
+        
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: self._collection.get(where=self._document_where(source_document_id), include=[])
+            )
+        except Exception as e:
+            logger.error(f"查询文档向量失败: {str(e)}")
+            raise VectorStoreError(f"查询文档向量失败: {str(e)}")
+        
+        return await self.add_document_references(results.get("ids") or [], target_document_id)
+    
     async def update_vectors(self, document_id: str, vectors: List[Vector]) -> bool:
-        """更新指定文档的向量"""
+        """
+        增量更新指定文档的向量
+        
+        向量ID由块内容和位置确定，ID相同即内容未变：只写入新增的向量，
+        只移除不再出现的向量，未变化的向量保持不动
+        """
         try:
-            # 先删除旧向量
-            await self.delete_vectors(document_id)
+            existing = await self.get_document_vectors(document_id)
+            new_ids = {vector.id for vector in vectors}
+            
+            stale_ids = [vector_id for vector_id in existing if vector_id not in new_ids]
+            added = [vector for vector in vectors if vector.id not in existing]
+            
+            if stale_ids:
+                await self.remove_vectors(document_id, stale_ids)
+            if added:
+                await self.add_vectors(added)
             
-            # 添加新向量
-            return await self.add_vectors(vectors)
+            logger.info(
+                f"增量更新文档 {document_id} 的向量: 新增 {len(added)}，"
+                f"移除 {len(stale_ids)}，未变化 {len(vectors) - len(added)}"
+            )
+            return True
             
         except Exception as e:
             logger.error(f"更新向量失败: {str(e)}")
@@ -290,13 +657,13 @@ class ChromaVectorStore(VectorStoreBase):
             
             # 删除集合
             await asyncio.get_event_loop().run_in_executor(
-                self._executor,
+                self._write_executor,
                 lambda: self._client.delete_collection(self.config.collection_name)
             )
             
             # 重新创建集合
             await asyncio.get_event_loop().run_in_executor(
-                self._executor,
+                self._write_executor,
                 lambda: self._client.create_collection(
                     name=self.config.collection_name,
                     metadata={"description": "RAG知识库向量存储"}
@@ -304,6 +671,7 @@ class ChromaVectorStore(VectorStoreBase):
             )
             
             self._collection = self._client.get_collection(self.config.collection_name)
+            await asyncio.get_event_loop().run_in_executor(self._write_executor, self._text_store.clear)
             
             logger.info("成功清空所有向量数据")
             return True
@@ -315,9 +683,10 @@ class ChromaVectorStore(VectorStoreBase):
     async def cleanup(self) -> None:
         """清理资源"""
         try:
-            if self._executor:
-                self._executor.shutdown(wait=True)
-                self._executor = None
+            # 线程池为进程内共用，不在此关闭
+            if self._text_store:
+                self._text_store.close()
+                self._text_store = None
             
             self._collection = None
             self._client = None
@@ -339,7 +708,8 @@ class ChromaVectorStore(VectorStoreBase):
             return {
                 "name": self.config.collection_name,
                 "count": count,
-                "persist_directory": self.config.persist_directory
+                "persist_directory": self.config.persist_directory,
+                "chunk_texts": self._text_store.get_stats()
             }
             
         except Exception as e:
@@ -355,28 +725,27 @@ class ChromaVectorStore(VectorStoreBase):
         try:
             logger.debug(f"批量搜索 {len(query_vectors)} 个查询向量")
             
-            # 在线程池中执行批量查询
-            results = await asyncio.get_event_loop().run_in_executor(
-                self._executor,
+            # 在线程池中执行批量查询（只取ID、距离和元数据，不取文本）
+            results = await self._executor.run(
                 lambda: self._collection.query(
                     query_embeddings=query_vectors,
                     n_results=top_k,
-                    include=["metadatas", "distances", "documents"]
-                )
+                    include=["metadatas", "distances"]
+                ),
+                priority=PRIORITY_INTERACTIVE
             )
             
             # 处理批量结果
-            batch_results = []
+            batch_hits = []
             
             if results and results.get("ids"):
                 for query_idx in range(len(query_vectors)):
-                    query_results = []
+                    query_hits = []
                     
                     if query_idx < len(results["ids"]):
                         ids = results["ids"][query_idx]
                         distances = results.get("distances", [])[query_idx] if query_idx < len(results.get("distances", [])) else []
                         metadatas = results.get("metadatas", [])[query_idx] if query_idx < len(results.get("metadatas", [])) else []
-                        documents = results.get("documents", [])[query_idx] if query_idx < len(results.get("documents", [])) else []
                         
                         for i, vector_id in enumerate(ids):
                             distance = distances[i] if i < len(distances) else 1.0
@@ -386,22 +755,25 @@ class ChromaVectorStore(VectorStoreBase):
                                 continue
                             
                             metadata = metadatas[i] if i < len(metadatas) else {}
-                            document = documents[i] if i < len(documents) else ""
-                            
-                            search_result = SearchResult(
-                                chunk_id=vector_id,
-                                document_id=metadata.get("document_id", ""),
-                                content=document,
-                                similarity_score=similarity_score,
-                                metadata=metadata
-                            )
-                            query_results.append(search_result)
+                            query_hits.append((vector_id, similarity_score, metadata or {}))
                     
-                    batch_results.append(query_results)
+                    batch_hits.append(query_hits)
+            
+            # 所有查询通过阈值的结果一次读取内容
+            contents = await self._fetch_contents(
+                list(dict.fromkeys(vector_id for hits in batch_hits for vector_id, _, _ in hits))
+            )
+            batch_results = [self._build_results(hits, contents) for hits in batch_hits]
             
             logger.debug(f"批量搜索完成，返回 {len(batch_results)} 组结果")
             return batch_results
             
         except Exception as e:
             logger.error(f"批量搜索失败: {str(e)}")
-            raise VectorStoreError(f"批量搜索失败: {str(e)}")
\ No newline at end of file
+            raise VectorStoreError(f"批量搜索失败: {str(e)}")
+
+
+def _split_document_ids(metadata: Dict[str, Any]) -> List[str]:
+    """解析向量归属的文档ID列表"""
+    document_ids = metadata.get("document_ids") or metadata.get("document_id") or ""
+    return [doc_id for doc_id in document_ids.split(",") if doc_id]
@@ -0,0 +1,97 @@
+"""
+文本块内容存储
+
+向量索引只保存向量和过滤用的元数据，文本块内容压缩后单独存放在本地SQLite中，
+按向量ID（即文本块ID）批量读取：检索时先按相似度和阈值筛选，只为保留下来的结果读取内容。
+"""
+import logging
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# SQLite 单条语句的参数个数上限为999（旧版本），批量读取和删除时分段执行
+_SQL_BATCH_SIZE = 500
+
+_COMPRESSION_LEVEL = 6
+
+
+class ChunkTextStore:
+    """按文本块ID存储压缩文本的SQLite存储"""
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 向量存储的线程池中多个线程共用一个连接，由锁串行化
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_texts (id TEXT PRIMARY KEY, content BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> int:
+        """写入（或覆盖）文本块内容，返回写入条数"""
+        rows = [
+            (chunk_id, zlib.compress(text.encode('utf-8'), _COMPRESSION_LEVEL))
+            for chunk_id, text in items
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO chunk_texts (id, content) VALUES (?, ?)", rows)
+        return len(rows)
+
+    def get_many(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """批量读取文本块内容，不存在的ID不出现在结果中"""
+        found = {}
+        unique_ids = list(dict.fromkeys(chunk_ids))
+        with self._lock:
+            for i in range(0, len(unique_ids), _SQL_BATCH_SIZE):
+                batch = unique_ids[i:i + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT id, content FROM chunk_texts WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                for chunk_id, content in rows:
+                    found[chunk_id] = zlib.decompress(content).decode('utf-8')
+        return found
+
+    def delete_many(self, chunk_ids: List[str]) -> int:
+        """删除文本块内容，返回删除条数"""
+        deleted = 0
+        with self._lock, self._conn:
+            for i in range(0, len(chunk_ids), _SQL_BATCH_SIZE):
+                batch = chunk_ids[i:i + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(f"DELETE FROM chunk_texts WHERE id IN ({placeholders})", batch)
+                deleted += cursor.rowcount
+        return deleted
+
+    def clear(self) -> None:
+        """清空全部内容"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunk_texts")
+
+    def count(self) -> int:
+        """文本块条数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_texts").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        """条数和压缩后的总字节数"""
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM chunk_texts"
+            ).fetchone()
+        return {"count": count, "compressed_bytes": size}
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            self._conn.close()
@@ -13,6 +13,11 @@ setup(
     author="RAG System Team",
     packages=find_packages(),
     install_requires=requirements,
+    entry_points={
+        "console_scripts": [
+            "rag_system=rag_system.cli:main",
+        ],
+    },
     python_requires=">=3.8",
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -2,6 +2,9 @@
 文档管理API测试
 测试任务5.2：文档列表查询API和文档删除功能
 """
+import asyncio
+import json
+import time
 import pytest
 import pytest_asyncio
 import uuid
@@ -12,7 +15,7 @@ from datetime import datetime
 
 from rag_system.api.document_api import router, get_document_service
 from rag_system.models.document import DocumentInfo, DocumentStatus
-from rag_system.utils.exceptions import DocumentError
+from rag_system.utils.exceptions import DocumentError, FileTooLargeError
 
 
 # 创建测试应用
@@ -29,6 +32,8 @@ def mock_document_service():
     service.list_documents = AsyncMock()
     service.get_document = AsyncMock()
     service.delete_document = AsyncMock()
+    service.list_document_ids = AsyncMock()
+    service.delete_documents = AsyncMock()
     service.reprocess_document = AsyncMock()
     service.get_service_stats = AsyncMock()
     return service
@@ -430,8 +435,11 @@ class TestDocumentBatchDeleteAPI:
     
     def test_delete_all_documents_success(self, mock_document_service, sample_documents):
         """测试成功批量删除所有文档"""
-        mock_document_service.list_documents.return_value = sample_documents
-        mock_document_service.delete_document.return_value = True
+        document_ids = [doc.id for doc in sample_documents]
+        mock_document_service.list_document_ids.return_value = document_ids
+        mock_document_service.delete_documents.return_value = {
+            "deleted_count": 3, "failed_count": 0, "failed_documents": []
+        }
         
         app.dependency_overrides[get_document_service] = lambda: mock_document_service
         
@@ -446,8 +454,10 @@ class TestDocumentBatchDeleteAPI:
             assert data["deleted_count"] == 3
             assert data["failed_count"] == 0
             
-            # 验证删除方法被调用3次
-            assert mock_document_service.delete_document.call_count == 3
+            # 验证一次批量删除全部文档
+            mock_document_service.delete_documents.assert_called_once()
+            assert mock_document_service.delete_documents.call_args[0][0] == document_ids
+            mock_document_service.delete_document.assert_not_called()
             
         finally:
             app.dependency_overrides.clear()
@@ -468,7 +478,7 @@ class TestDocumentBatchDeleteAPI:
     
     def test_delete_all_documents_empty_list(self, mock_document_service):
         """测试删除空文档列表"""
-        mock_document_service.list_documents.return_value = []
+        mock_document_service.list_document_ids.return_value = []
         
         app.dependency_overrides[get_document_service] = lambda: mock_document_service
         
@@ -489,15 +499,12 @@ class TestDocumentBatchDeleteAPI:
     
     def test_delete_all_documents_partial_failure(self, mock_document_service, sample_documents):
         """测试部分删除失败"""
-        mock_document_service.list_documents.return_value = sample_documents
+        mock_document_service.list_document_ids.return_value = [doc.id for doc in sample_documents]
         
         # 模拟第二个文档删除失败
-        def mock_delete(doc_id):
-            if doc_id == sample_documents[1].id:
-                return False
-            return True
-        
-        mock_document_service.delete_document.side_effect = mock_delete
+        mock_document_service.delete_documents.return_value = {
+            "deleted_count": 2, "failed_count": 1, "failed_documents": [sample_documents[1].id]
+        }
         
         app.dependency_overrides[get_document_service] = lambda: mock_document_service
         
@@ -511,10 +518,188 @@ class TestDocumentBatchDeleteAPI:
             assert data["success"] is False
             assert data["deleted_count"] == 2
             assert data["failed_count"] == 1
-            assert "failed_documents" in data
+            assert data["failed_documents"] == [sample_documents[1].id]
+            
+        finally:
+            app.dependency_overrides.clear()
+
+
+class TestDocumentUploadAPI:
+    """文档上传API测试"""
+    
+    def test_upload_too_large_returns_413(self, mock_document_service):
+        """测试文件超过大小限制时返回413"""
+        mock_document_service.upload_document = AsyncMock(
+            side_effect=FileTooLargeError("文件大小超过限制（50MB）")
+        )
+        app.dependency_overrides[get_document_service] = lambda: mock_document_service
+        
+        try:
+            client = TestClient(app)
+            response = client.post("/documents/upload", files={'file': ("big.txt", b"content", "text/plain")})
+            
+            assert response.status_code == 413
+            assert "文件大小超过限制" in response.json()['detail']
+        finally:
+            app.dependency_overrides.clear()
+
+
+class TestDocumentBatchUploadAPI:
+    """批量上传API测试"""
+    
+    @staticmethod
+    def _slow_upload(delays):
+        async def upload(file):
+            await asyncio.sleep(delays[file.filename])
+            return DocumentInfo(
+                id=str(uuid.uuid4()),
+                filename=file.filename,
+                file_type="txt",
+                file_size=7,
+                file_path=f"/tmp/{file.filename}",
+                upload_time=datetime.now(),
+                status=DocumentStatus.PROCESSING
+            )
+        return upload
+    
+    def test_batch_upload_runs_files_concurrently(self, mock_document_service):
+        """测试批量上传并发处理各文件，结果按文件顺序返回"""
+        delays = {f"doc{i}.txt": 0.2 for i in range(5)}
+        mock_document_service.batch_upload_concurrency = 8
+        mock_document_service.upload_document = AsyncMock(side_effect=self._slow_upload(delays))
+        app.dependency_overrides[get_document_service] = lambda: mock_document_service
+        
+        try:
+            client = TestClient(app)
+            files = [('files', (name, b"content", "text/plain")) for name in delays]
+            files.append(('files', ("image.png", b"content", "image/png")))
+            
+            start = time.monotonic()
+            response = client.post("/documents/batch-upload", files=files)
+            elapsed = time.monotonic() - start
+            
+            assert response.status_code == 200
+            data = response.json()
+            assert [item['filename'] for item in data] == list(delays) + ["image.png"]
+            assert all(item['success'] for item in data[:5])
+            assert data[5]['success'] is False
+            # 5个各需0.2秒的文件并发完成，远小于串行的1秒
+            assert elapsed < 0.8
+        finally:
+            app.dependency_overrides.clear()
+    
+    def test_batch_upload_respects_concurrency_limit(self, mock_document_service):
+        """测试批次内同时进行的上传数不超过上限"""
+        running = 0
+        max_running = 0
+        
+        async def upload(file):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            raise DocumentError("保存失败")
+        
+        mock_document_service.batch_upload_concurrency = 2
+        mock_document_service.upload_document = AsyncMock(side_effect=upload)
+        app.dependency_overrides[get_document_service] = lambda: mock_document_service
+        
+        try:
+            client = TestClient(app)
+            files = [('files', (f"doc{i}.txt", b"content", "text/plain")) for i in range(6)]
+            response = client.post("/documents/batch-upload", files=files)
             
+            assert response.status_code == 200
+            assert all("保存失败" in item['message'] for item in response.json())
+            assert max_running == 2
         finally:
             app.dependency_overrides.clear()
+    
+    def test_batch_upload_streams_in_completion_order(self, mock_document_service):
+        """测试流式返回按完成顺序输出每个文件的结果"""
+        delays = {"slow.txt": 0.3, "medium.txt": 0.15, "fast.txt": 0.0}
+        mock_document_service.batch_upload_concurrency = 8
+        mock_document_service.upload_document = AsyncMock(side_effect=self._slow_upload(delays))
+        app.dependency_overrides[get_document_service] = lambda: mock_document_service
+        
+        try:
+            client = TestClient(app)
+            files = [('files', (name, b"content", "text/plain")) for name in delays]
+            response = client.post("/documents/batch-upload?stream=true", files=files)
+            
+            assert response.status_code == 200
+            assert response.headers['content-type'].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            assert [item['filename'] for item in lines] == ["fast.txt", "medium.txt", "slow.txt"]
+        finally:
+            app.dependency_overrides.clear()
+
+
+class TestIngestionJobAPI:
+    """入库任务API测试"""
+    
+    @pytest.fixture
+    def sample_job(self):
+        """示例任务"""
+        now = datetime.now().isoformat()
+        return {
+            'id': 'job-1', 'document_id': 'doc-1', 'status': 'running', 'payload': {},
+            'progress': 0.7, 'stage': 'storing', 'attempts': 1, 'max_attempts': 3,
+            'error': None, 'next_run_at': now, 'created_at': now, 'updated_at': now
+        }
+    
+    @pytest.fixture
+    def mock_queue(self, sample_job):
+        """Mock入库队列"""
+        queue = Mock()
+        queue.is_running = True
+        queue.get_job = AsyncMock(return_value=sample_job)
+        queue.get_document_job = AsyncMock(return_value=sample_job)
+        queue.list_jobs = AsyncMock(return_value=[sample_job])
+        queue.get_stats = AsyncMock(return_value={'workers': 2, 'jobs': {'running': 1}})
+        return queue
+    
+    def test_get_job(self, mock_queue):
+        """测试查询任务状态和进度"""
+        with patch('rag_system.services.ingestion_queue.get_ingestion_queue', return_value=mock_queue):
+            client = TestClient(app)
+            
+            response = client.get("/documents/jobs/job-1")
+            assert response.status_code == 200
+            assert response.json()['progress'] == 0.7
+            assert response.json()['stage'] == 'storing'
+            
+            response = client.get("/documents/doc-1/ingestion")
+            assert response.status_code == 200
+            mock_queue.get_document_job.assert_called_once_with('doc-1')
+            
+            mock_queue.get_job.return_value = None
+            response = client.get("/documents/jobs/missing")
+            assert response.status_code == 404
+    
+    def test_list_jobs(self, mock_queue):
+        """测试列出任务和队列统计"""
+        with patch('rag_system.services.ingestion_queue.get_ingestion_queue', return_value=mock_queue):
+            client = TestClient(app)
+            
+            response = client.get("/documents/jobs?status_filter=running")
+            assert response.status_code == 200
+            data = response.json()
+            assert len(data['jobs']) == 1
+            assert data['stats']['workers'] == 2
+            mock_queue.list_jobs.assert_called_once_with('running', 100)
+            
+            response = client.get("/documents/jobs?status_filter=unknown")
+            assert response.status_code == 400
+    
+    def test_queue_disabled(self):
+        """测试队列未启用时返回503"""
+        with patch('rag_system.services.ingestion_queue.get_ingestion_queue', return_value=None):
+            client = TestClient(app)
+            
+            response = client.get("/documents/jobs/job-1")
+            assert response.status_code == 503
 
 
 class TestDocumentAPIIntegration:
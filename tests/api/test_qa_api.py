@@ -9,7 +9,7 @@ from fastapi.testclient import TestClient
 from fastapi import FastAPI
 from datetime import datetime
 
-from rag_system.api.qa_api import router, get_qa_service, get_result_processor
+from rag_system.api.qa_api import router, get_qa_service, get_qa_service_config, get_result_processor
 from rag_system.models.qa import QAResponse, SourceInfo, QAStatus
 from rag_system.utils.exceptions import QAError
 
@@ -452,4 +452,19 @@ class TestQAAPIIntegration:
             assert "问答处理失败" in response.json()["detail"]
         finally:
             # 清理依赖覆盖
-            app.dependency_overrides.clear()
\ No newline at end of file
+            app.dependency_overrides.clear()
+
+
+class TestQAServiceConfig:
+    """问答服务配置测试"""
+
+    @pytest.mark.parametrize("enable_cache", [True, False])
+    def test_enable_cache_from_retrieval_config(self, enable_cache):
+        """测试检索缓存开关传给问答服务，与缓存预热读写相同的键"""
+        app_config = Mock()
+        app_config.retrieval.enable_cache = enable_cache
+
+        with patch('rag_system.config.loader.ConfigLoader.load_config', return_value=app_config):
+            config = get_qa_service_config()
+
+        assert config['enable_cache'] is enable_cache
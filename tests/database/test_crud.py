@@ -184,6 +184,7 @@ class TestDocumentCRUD:
         assert success is False
 
 
+
 class TestSessionCRUD:
     """会话CRUD测试"""
     
@@ -377,4 +378,101 @@ class TestQAPairCRUD:
         
         # 测试删除不存在的问答对
         success = qa_pair_crud.delete_qa_pair(str(uuid.uuid4()))
-        assert success is False
\ No newline at end of file
+        assert success is False
+
+@pytest.fixture
+def orm_session():
+    """基于内存SQLite的ORM会话fixture"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from rag_system.database.models import Base
+    
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    
+    yield session
+    
+    session.close()
+    engine.dispose()
+
+
+class TestFrequentQuestions:
+    """高频问题统计测试"""
+    
+    def test_get_frequent_questions(self, orm_session):
+        """测试按提问次数统计高频问题"""
+        session_crud = SessionCRUD(orm_session)
+        qa_pair_crud = QAPairCRUD(orm_session)
+        session = Session()
+        session_crud.create_session(session)
+        
+        now = datetime.now()
+        questions = ["什么是RAG？"] * 3 + ["如何上传文档？"] * 2 + ["系统支持哪些格式？"]
+        for i, question in enumerate(questions):
+            qa_pair_crud.create_qa_pair(QAPair(
+                session_id=session.id,
+                question=question,
+                answer="answer",
+                timestamp=now - timedelta(minutes=i)
+            ))
+        # 超出统计时间范围的历史问题
+        for _ in range(5):
+            qa_pair_crud.create_qa_pair(QAPair(
+                session_id=session.id,
+                question="很久以前的问题",
+                answer="answer",
+                timestamp=now - timedelta(days=30)
+            ))
+        
+        frequent = qa_pair_crud.get_frequent_questions(since=now - timedelta(days=7), limit=2)
+        
+        assert frequent == [("什么是RAG？", 3), ("如何上传文档？", 2)]
+        
+        all_time = qa_pair_crud.get_frequent_questions(limit=1)
+        assert all_time == [("很久以前的问题", 5)]
+
+
+class TestBulkDocumentDelete:
+    """文档记录批量删除测试"""
+    
+    def test_delete_documents(self, orm_session):
+        """测试在一个事务中批量删除文档记录"""
+        document_crud = DocumentCRUD(orm_session)
+        doc_ids = [str(uuid.uuid4()) for _ in range(3)]
+        document_crud.create_documents([
+            DocumentInfo(
+                id=doc_id,
+                filename=f"test{i}.pdf",
+                file_type="pdf",
+                file_size=1024,
+                upload_time=datetime.now(),
+                status=DocumentStatus.READY
+            )
+            for i, doc_id in enumerate(doc_ids)
+        ])
+        
+        assert sorted(document_crud.get_document_ids()) == sorted(doc_ids)
+        assert len(document_crud.get_documents_by_ids(doc_ids[:2])) == 2
+        
+        # 不存在的ID忽略
+        assert document_crud.delete_documents(doc_ids[:2] + [str(uuid.uuid4())]) == 2
+        
+        assert document_crud.get_document(doc_ids[0]) is None
+        assert document_crud.get_document(doc_ids[2]) is not None
+        assert document_crud.delete_documents([]) == 0
+    
+    def test_get_aliases_of_documents(self, orm_session):
+        """测试批量获取指向指定文档的别名"""
+        document_crud = DocumentCRUD(orm_session)
+        original_id = str(uuid.uuid4())
+        alias_id = str(uuid.uuid4())
+        document_crud.create_documents([
+            DocumentInfo(id=original_id, filename="a.pdf", file_type="pdf", file_size=1,
+                         status=DocumentStatus.READY),
+            DocumentInfo(id=alias_id, filename="b.pdf", file_type="pdf", file_size=1,
+                         status=DocumentStatus.READY, alias_of=original_id)
+        ])
+        
+        aliases = document_crud.get_aliases_of_documents([original_id, alias_id])
+        assert [alias.id for alias in aliases] == [alias_id]
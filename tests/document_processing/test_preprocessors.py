@@ -462,4 +462,47 @@ class TestPreprocessorIntegration:
         
         # 验证基本内容保留
         assert "联系信息" in result
-        assert "测试文档" in result
\ No newline at end of file
+        assert "测试文档" in result
+
+class TestFusedPreprocessing:
+    """融合处理路径测试"""
+    
+    SAMPLES = [
+        "  标题\t\t内容  \n   第二行   \n\n\n\n\n第三行\t \n",
+        "访问 HTTPS://EXAMPLE.COM 或 www.Example.org/path 联系 Test@Example.com 获取信息",
+        "电话：123-456-7890，1234567890，+86 138 1234 5678；日期：2023-12-25",
+        "全角ＡＢＣ！　空格​零宽\x00控制\x0b字符，é 组合字符",
+        "The quick brown fox is in the box.\n\n\n   \n  It was the best of times.",
+        "\n \n \n正文\r\n\r\n\r\n结尾\xa0",
+    ]
+    
+    CONFIGS = [
+        {},
+        {'remove_extra_whitespace': False},
+        {'normalize_unicode': False, 'remove_special_chars': True},
+        {'remove_phone_numbers': True, 'custom_patterns': [r'\d{4}-\d{2}-\d{2}', r'[']},
+        {'convert_to_lowercase': True, 'remove_urls': False, 'remove_emails': False},
+        {'remove_stopwords': True, 'language': 'en'},
+        {'remove_stopwords': True, 'remove_extra_whitespace': False, 'language': 'mixed'},
+    ]
+    
+    @pytest.mark.parametrize("options", CONFIGS)
+    def test_fused_matches_processor_chain(self, options):
+        """测试融合处理与逐个预处理器处理结果一致"""
+        preprocessor = TextPreprocessor(PreprocessConfig(**options))
+        
+        for text in self.SAMPLES:
+            assert preprocessor.process(text) == preprocessor._process_chain(text)
+    
+    def test_custom_processor_uses_chain(self):
+        """测试添加自定义预处理器后回退到逐个处理"""
+        preprocessor = TextPreprocessor()
+        
+        class CustomProcessor:
+            def process(self, text):
+                return text.replace("测试", "TEST")
+        
+        preprocessor.add_custom_processor(CustomProcessor())
+        
+        assert preprocessor._fused is False
+        assert preprocessor.process("这是  测试文本") == "这是 TEST文本"
@@ -0,0 +1,327 @@
+"""
+文档处理进程池测试
+"""
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import asdict
+from unittest.mock import patch
+
+import pytest
+
+from rag_system.document_processing.extractors import PDFExtractor, _PageTimeout
+from rag_system.document_processing.process_pool import (
+    DocumentProcessPool, extract_and_split, encode_chunks, decode_chunks, join_parts, split_page_range,
+    stream_page_chunks, stream_pages
+)
+from rag_system.document_processing.preprocessors import PreprocessConfig
+from rag_system.document_processing.splitters import RecursiveTextSplitter, SplitConfig
+from rag_system.models.document import TextChunk
+from rag_system.services.document_processor import DocumentProcessor
+from rag_system.utils.exceptions import DocumentError
+
+
+@pytest.fixture
+def text_file():
+    """临时文本文件"""
+    content = "\n\n".join(f"第{i}段内容，用于测试进程池中的文本提取和分割。" * 5 for i in range(20))
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+        f.write(content)
+        path = f.name
+    yield path
+    os.unlink(path)
+
+
+def build_pdf(page_texts):
+    """构造每页一行文本的最小PDF"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(page_texts)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(page_texts)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(page_texts):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(data))
+        data += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        data += f"{offset:010d} 00000 n \n".encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(data)
+
+
+@pytest.fixture
+def pdf_file():
+    """临时PDF文件"""
+    pages = [f"Page {i} of the manual describes step {i} in detail for operators" for i in range(1, 8)]
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+        f.write(build_pdf(pages))
+        path = f.name
+    yield path
+    os.unlink(path)
+
+
+
+def _options(chunk_size=200):
+    split_config = SplitConfig(chunk_size=chunk_size, chunk_overlap=20, min_chunk_size=10)
+    return asdict(split_config), asdict(PreprocessConfig())
+
+
+class TestChunkEncoding:
+    """文本块偏移量编码测试"""
+
+    def test_encode_uses_offsets_for_exact_chunks(self):
+        doc_id = str(uuid.uuid4())
+        text = "第一段内容\n\n第二段内容"
+        chunks = [
+            TextChunk(document_id=doc_id, content="第一段内容", chunk_index=0, metadata={'a': 1}),
+            TextChunk(document_id=doc_id, content="第二段内容", chunk_index=1),
+        ]
+
+        encoded = encode_chunks(text, chunks)
+
+        assert encoded[0][1:4] == (0, 5, None)
+        assert encoded[1][1:4] == (7, 12, None)
+
+        decoded = decode_chunks({'text': text, 'chunks': encoded}, doc_id)
+        assert [c.content for c in decoded] == ["第一段内容", "第二段内容"]
+        assert [c.id for c in decoded] == [c.id for c in chunks]
+        assert decoded[0].metadata == {'a': 1}
+
+    def test_encode_keeps_content_when_not_found(self):
+        doc_id = str(uuid.uuid4())
+        chunk = TextChunk(document_id=doc_id, content="合并后的内容", chunk_index=0)
+
+        encoded = encode_chunks("原始文本", [chunk])
+
+        assert encoded[0][1:4] == (-1, -1, "合并后的内容")
+        assert decode_chunks({'text': "原始文本", 'chunks': encoded}, doc_id)[0].content == "合并后的内容"
+
+
+class TestExtractAndSplit:
+    """工作进程处理函数测试"""
+
+    def test_extract_and_split_returns_plain_data(self, text_file):
+        doc_id = str(uuid.uuid4())
+        split_options, preprocess_options = _options()
+
+        payload = extract_and_split(text_file, doc_id, split_options, preprocess_options)
+
+        assert isinstance(payload['text'], str)
+        assert payload['raw_length'] > 0
+        assert len(payload['chunks']) > 1
+        for chunk_id, start, end, content, chunk_index, metadata in payload['chunks']:
+            assert isinstance(chunk_id, str)
+            assert isinstance(metadata, dict)
+
+    def test_text_only_skips_splitting(self, text_file, pdf_file):
+        split_options, preprocess_options = _options()
+
+        with patch.object(RecursiveTextSplitter, 'split', side_effect=AssertionError("不应分割")):
+            payload = extract_and_split(text_file, str(uuid.uuid4()), split_options, preprocess_options,
+                                        text_only=True)
+            paged = extract_and_split(pdf_file, str(uuid.uuid4()), split_options, preprocess_options,
+                                      pages_per_task=3, text_only=True)
+
+        assert payload['chunks'] == [] and payload['text'].startswith("第0段")
+        assert paged['chunks'] == []
+        assert paged['text'].startswith("Page 1") and "Page 7" in paged['text']
+
+    def test_extract_and_split_missing_file(self):
+        split_options, preprocess_options = _options()
+
+        with pytest.raises(DocumentError, match="文件不存在"):
+            extract_and_split("missing.txt", str(uuid.uuid4()), split_options, preprocess_options)
+
+
+class TestDocumentProcessPool:
+    """进程池测试"""
+
+    @pytest.mark.asyncio
+    async def test_run_in_worker_process(self, text_file):
+        pool = DocumentProcessPool(max_workers=1, max_tasks_per_child=2)
+        try:
+            doc_id = str(uuid.uuid4())
+            split_options, preprocess_options = _options()
+
+            payload = await pool.run(extract_and_split, text_file, doc_id, split_options, preprocess_options)
+            chunks = decode_chunks(payload, doc_id)
+
+            assert len(chunks) > 1
+            assert all(chunk.document_id == doc_id for chunk in chunks)
+            assert pool.get_stats()['completed'] == 1
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_worker_errors_propagate(self):
+        pool = DocumentProcessPool(max_workers=1)
+        try:
+            split_options, preprocess_options = _options()
+
+            with pytest.raises(DocumentError, match="文件不存在"):
+                await pool.run(extract_and_split, "missing.txt", str(uuid.uuid4()),
+                               split_options, preprocess_options)
+            assert pool.get_stats()['failed'] == 1
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_event_loop_not_blocked(self):
+        """测试进程池执行期间事件循环保持响应"""
+        pool = DocumentProcessPool(max_workers=1)
+        try:
+            task = asyncio.create_task(pool.run(time.sleep, 0.5))
+
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            assert time.monotonic() - start < 0.2
+
+            await task
+        finally:
+            pool.shutdown()
+
+
+class TestDocumentProcessorOffload:
+    """文档处理器卸载测试"""
+
+    @pytest.mark.asyncio
+    async def test_process_pool_matches_inline_split(self, text_file):
+        config = {'chunk_size': 200, 'chunk_overlap': 20, 'min_chunk_size': 10}
+        pooled = DocumentProcessor({**config, 'process_pool_workers': 1})
+        inline = DocumentProcessor({**config, 'process_pool_workers': 0})
+        doc_id = str(uuid.uuid4())
+
+        pooled_chunks = await pooled.extract_and_split(text_file, doc_id)
+        inline_chunks = await inline.extract_and_split(text_file, doc_id)
+
+        assert [c.content for c in pooled_chunks] == [c.content for c in inline_chunks]
+        assert [c.chunk_index for c in pooled_chunks] == [c.chunk_index for c in inline_chunks]
+
+
+class TestPagedExtraction:
+    """分页提取测试"""
+
+    def test_iter_pages_in_order(self, pdf_file):
+        extractor = PDFExtractor()
+
+        pages = list(extractor.iter_pages(pdf_file))
+        assert [number for number, _ in pages] == list(range(1, 8))
+        assert pages[0][1].startswith("Page 1 of the manual")
+
+        assert [number for number, _ in extractor.iter_pages(pdf_file, 2, 4)] == [3, 4]
+        assert extractor.get_page_count(pdf_file) == 7
+
+    def test_page_timeout_skips_page(self):
+
+        class SlowPage:
+            def extract_text(self):
+                time.sleep(1)
+                return "never"
+
+        with pytest.raises(_PageTimeout):
+            PDFExtractor()._extract_page_text(SlowPage(), 0.05)
+
+    def test_iter_pages_skips_timed_out_page(self, pdf_file, monkeypatch):
+        extractor = PDFExtractor()
+        original = extractor._extract_page_text
+        calls = []
+
+        def flaky(page, timeout):
+            calls.append(page)
+            if len(calls) == 2:
+                raise _PageTimeout()
+            return original(page, timeout)
+
+        monkeypatch.setattr(extractor, '_extract_page_text', flaky)
+
+        skipped = []
+        pages = list(extractor.iter_pages(pdf_file, page_timeout=1, skipped=skipped))
+
+        assert [number for number, _ in pages] == [1, 3, 4, 5, 6, 7]
+        assert skipped == [2]
+
+    @pytest.mark.asyncio
+    async def test_stream_pages_parallel_in_order(self, pdf_file):
+        pool = DocumentProcessPool(max_workers=2)
+        try:
+            pages = [page async for page in stream_pages(pool, pdf_file, pages_per_task=2)]
+
+            assert [number for number, _ in pages] == list(range(1, 8))
+            # 页数 + 4个页码范围
+            assert pool.get_stats()['completed'] == 5
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_chunks_carry_page_numbers(self, pdf_file):
+        processor = DocumentProcessor({
+            'chunk_size': 100, 'chunk_overlap': 0, 'min_chunk_size': 10,
+            'process_pool_workers': 1, 'pdf_pages_per_task': 3
+        })
+        doc_id = str(uuid.uuid4())
+
+        chunks = await processor.extract_and_split(pdf_file, doc_id)
+
+        assert len(chunks) > 1
+        page_numbers = [chunk.metadata['page_number'] for chunk in chunks]
+        assert page_numbers[0] == 1
+        assert page_numbers == sorted(page_numbers)
+        assert all(chunk.metadata['page_end'] >= chunk.metadata['page_number'] for chunk in chunks)
+        assert "Page 7" in chunks[-1].content or chunks[-1].metadata['page_end'] == 7
+
+    def test_split_page_range_returns_chunks_only(self, pdf_file):
+        split_options, preprocess_options = _options(chunk_size=100)
+
+        part = split_page_range(pdf_file, 2, 4, str(uuid.uuid4()), split_options, preprocess_options)
+
+        assert set(part) == {'text', 'chunks', 'raw_length', 'skipped_pages'}
+        assert part['text'].startswith("Page 3")
+        assert {chunk[5]['page_number'] for chunk in part['chunks']} <= {3, 4}
+
+    @pytest.mark.asyncio
+    async def test_stream_page_chunks_matches_grouped_split(self, pdf_file):
+        split_options, preprocess_options = _options(chunk_size=100)
+        doc_id = str(uuid.uuid4())
+        pool = DocumentProcessPool(max_workers=2)
+        try:
+            parts = [part async for part in stream_page_chunks(
+                pool, pdf_file, doc_id, split_options, preprocess_options, pages_per_task=2
+            )]
+        finally:
+            pool.shutdown()
+
+        assert len(parts) == 4
+        streamed = join_parts(parts)
+        expected = extract_and_split(pdf_file, doc_id, split_options, preprocess_options, pages_per_task=2)
+        assert streamed['text'] == expected['text']
+        assert [chunk[:5] for chunk in streamed['chunks']] == [chunk[:5] for chunk in expected['chunks']]
+        assert [chunk.chunk_index for chunk in decode_chunks(streamed, doc_id)] == list(range(len(streamed['chunks'])))
+
+    @pytest.mark.asyncio
+    async def test_repeated_pages_get_distinct_chunk_ids(self, tmp_path):
+        pdf_path = tmp_path / "repeated.pdf"
+        pdf_path.write_bytes(build_pdf(["The same boilerplate footer text on every page"] * 4))
+        split_options, preprocess_options = _options(chunk_size=100)
+        pool = DocumentProcessPool(max_workers=2)
+        try:
+            parts = [part async for part in stream_page_chunks(
+                pool, str(pdf_path), str(uuid.uuid4()), split_options, preprocess_options, pages_per_task=1
+            )]
+        finally:
+            pool.shutdown()
+
+        chunk_ids = [chunk[0] for part in parts for chunk in part['chunks']]
+        assert len(chunk_ids) == 4
+        assert len(set(chunk_ids)) == 4
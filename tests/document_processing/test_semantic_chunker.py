@@ -0,0 +1,134 @@
+"""
+嵌入语义分割器测试
+"""
+import numpy as np
+import pytest
+
+from rag_system.document_processing.semantic_chunker import EmbeddingSemanticSplitter
+from rag_system.document_processing.splitters import SplitConfig
+from rag_system.utils.exceptions import ProcessingError
+
+
+DOC_ID = "87654321-4321-8765-cba9-987654321cba"
+
+TOPIC_WORDS = {
+    "天气": [1.0, 0.0, 0.0],
+    "股票": [0.0, 1.0, 0.0],
+    "足球": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbedder:
+    """按句子中的主题词返回向量，并记录每次请求的句子"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            vector = np.zeros(3)
+            for word, topic in TOPIC_WORDS.items():
+                if word in text:
+                    vector += topic
+            vectors.append((vector * 2).tolist())
+        return vectors
+
+
+def build_text():
+    sentences = (
+        [f"今天的天气情况第{i}次播报。" for i in range(4)]
+        + [f"股票市场行情第{i}次更新。" for i in range(4)]
+        + [f"足球比赛结果第{i}次公布。" for i in range(4)]
+    )
+    return "".join(sentences)
+
+
+class TestEmbeddingSemanticSplitter:
+    """嵌入语义分割器测试"""
+
+    @pytest.fixture
+    def splitter(self):
+        return EmbeddingSemanticSplitter(
+            SplitConfig(chunk_size=1000, chunk_overlap=0, min_chunk_size=10),
+            breakpoint_percentile=80,
+            window_size=1
+        )
+
+    @pytest.mark.asyncio
+    async def test_breaks_at_topic_changes(self, splitter):
+        """在主题变化处断开"""
+        embedder = FakeEmbedder()
+        chunks, embeddings = await splitter.split(build_text(), DOC_ID, embedder)
+
+        assert len(chunks) == 3
+        assert "天气" in chunks[0].content and "股票" not in chunks[0].content
+        assert "股票" in chunks[1].content and "足球" not in chunks[1].content
+        assert "足球" in chunks[2].content
+        assert [chunk.chunk_index for chunk in chunks] == [0, 1, 2]
+        assert all(chunk.metadata["split_method"] == "semantic_embedding" for chunk in chunks)
+        assert len(embeddings) == 3
+
+    @pytest.mark.asyncio
+    async def test_pooled_vectors_are_normalized(self, splitter):
+        """文本块向量由句子向量合成并归一化"""
+        chunks, embeddings = await splitter.split(build_text(), DOC_ID, FakeEmbedder())
+
+        for embedding in embeddings:
+            assert np.linalg.norm(embedding) == pytest.approx(1.0, abs=1e-5)
+        assert np.argmax(embeddings[0]) == 0
+        assert np.argmax(embeddings[1]) == 1
+        assert np.argmax(embeddings[2]) == 2
+
+    @pytest.mark.asyncio
+    async def test_repeated_sentences_embedded_once(self):
+        """重复的句子只向量化一次，并按批请求"""
+        splitter = EmbeddingSemanticSplitter(SplitConfig(chunk_size=1000, chunk_overlap=0), batch_size=2)
+        embedder = FakeEmbedder()
+        text = "天气晴朗。股票上涨。天气晴朗。足球比赛。天气晴朗。"
+
+        await splitter.split(text, DOC_ID, embedder)
+
+        requested = [sentence for call in embedder.calls for sentence in call]
+        assert sorted(requested) == sorted(["天气晴朗。", "股票上涨。", "足球比赛。"])
+        assert all(len(call) <= 2 for call in embedder.calls)
+
+    @pytest.mark.asyncio
+    async def test_respects_chunk_size(self):
+        """单一主题的长文本也按块大小分割"""
+        splitter = EmbeddingSemanticSplitter(SplitConfig(chunk_size=50, chunk_overlap=0, min_chunk_size=10))
+        text = "".join(f"天气情况第{i}次播报。" for i in range(30))
+
+        chunks, _ = await splitter.split(text, DOC_ID, FakeEmbedder())
+
+        assert len(chunks) > 1
+        assert all(len(chunk.content) <= 50 for chunk in chunks)
+        assert "".join(chunk.content for chunk in chunks) == text
+
+    @pytest.mark.asyncio
+    async def test_respects_token_budget(self):
+        """文本块不超过词元上限"""
+        config = SplitConfig(chunk_size=1000, chunk_overlap=0, min_chunk_size=10,
+                             max_chunk_tokens=40, token_model="BAAI/bge-large-zh-v1.5")
+        splitter = EmbeddingSemanticSplitter(config)
+        text = "天气" * 100 + "。" + "".join(f"天气情况第{i}次播报。" for i in range(10))
+
+        chunks, _ = await splitter.split(text, DOC_ID, FakeEmbedder())
+
+        assert all(splitter.token_estimator.estimate(chunk.content) <= 40 for chunk in chunks)
+
+    @pytest.mark.asyncio
+    async def test_empty_text(self, splitter):
+        """空文本抛出异常"""
+        with pytest.raises(ProcessingError):
+            await splitter.split("   ", DOC_ID, FakeEmbedder())
+
+    @pytest.mark.asyncio
+    async def test_embedding_count_mismatch(self, splitter):
+        """嵌入函数返回的向量数量不一致时抛出异常"""
+        async def broken_embed(texts):
+            return [[1.0, 0.0, 0.0]]
+
+        with pytest.raises(ProcessingError):
+            await splitter.split("天气晴朗。股票上涨。", DOC_ID, broken_embed)
@@ -6,8 +6,9 @@ import uuid
 
 from rag_system.document_processing.splitters import (
     FixedSizeSplitter, StructureSplitter, HierarchicalSplitter,
-    SemanticSplitter, RecursiveTextSplitter, TextSplitter, SplitConfig
+    SemanticSplitter, RecursiveTextSplitter, TextSplitter, SplitConfig, assign_chunk_ids
 )
+from rag_system.document_processing.token_estimator import get_token_estimator
 from rag_system.models.document import TextChunk
 from rag_system.utils.exceptions import ProcessingError
 
@@ -392,6 +393,112 @@ class TestTextSplitter:
                 assert "summary" in chunk.metadata
 
 
+class TestChunkIdentity:
+    """确定的文本块ID测试"""
+    
+    def _split(self, paragraphs, doc_id):
+        config = SplitConfig(chunk_size=60, chunk_overlap=0, min_chunk_size=5)
+        return assign_chunk_ids(StructureSplitter(config).split("\n\n".join(paragraphs), doc_id))
+    
+    def test_ids_are_deterministic(self):
+        """测试相同文本多次分割得到相同的块ID"""
+        doc_id = str(uuid.uuid4())
+        paragraphs = [f"## 第{i}节\n这是用于测试块标识的段落内容，第{i}节。" for i in range(6)]
+        
+        first = self._split(paragraphs, doc_id)
+        second = self._split(paragraphs, doc_id)
+        
+        assert [c.id for c in first] == [c.id for c in second]
+        assert len({c.id for c in first}) == len(first)
+        # 不同文档的相同内容得到不同的ID
+        assert self._split(paragraphs, str(uuid.uuid4()))[0].id != first[0].id
+    
+    def test_local_edit_keeps_other_ids(self):
+        """测试插入段落后其余块的ID不变"""
+        doc_id = str(uuid.uuid4())
+        paragraphs = [f"## 第{i}节\n这是用于测试块标识的段落内容，第{i}节。" for i in range(6)]
+        original = self._split(paragraphs, doc_id)
+        
+        edited = self._split(paragraphs[:2] + ["## 新增\n新插入的一节内容，其余章节保持不变。"] + paragraphs[2:], doc_id)
+        
+        assert len({c.id for c in edited} - {c.id for c in original}) == 1
+        assert {c.id for c in original} <= {c.id for c in edited}
+    
+    def test_repeated_content_gets_distinct_ids(self):
+        """测试文档内重复内容按出现次序区分"""
+        doc_id = str(uuid.uuid4())
+        chunks = assign_chunk_ids([
+            TextChunk(document_id=doc_id, content="重复的内容", chunk_index=i) for i in range(3)
+        ])
+        
+        assert len({c.id for c in chunks}) == 3
+
+
+class TestTextCleaning:
+    """文本清洗测试"""
+    
+    def test_clean_text_normalizes_whitespace(self):
+        """测试合并空格、去除行首尾空白并压缩空行"""
+        splitter = FixedSizeSplitter(SplitConfig())
+        text = "  标题\t\t内容  \n   第二行   \n\n\n\n\n第三行\t \n"
+        
+        assert splitter._clean_text(text) == "标题 内容\n第二行\n\n第三行\n"
+    
+    def test_structure_split_keeps_headers_with_spans(self):
+        """测试按段落偏移合并时标题仍独立成块"""
+        config = SplitConfig(chunk_size=80, chunk_overlap=0, min_chunk_size=5)
+        text = "# 概述\n\n第一段内容。\n\n第二段内容。\n\n## 细节\n\n第三段内容。"
+        
+        chunks = StructureSplitter(config).split(text, str(uuid.uuid4()))
+        
+        assert [c.content for c in chunks] == [
+            "# 概述\n\n第一段内容。\n\n第二段内容。", "## 细节\n\n第三段内容。"
+        ]
+
+
+class TestTokenBudget:
+    """词元上限测试"""
+    
+    def test_chunks_never_exceed_token_budget(self):
+        """测试中英混合文本的块都不超过词元上限"""
+        config = SplitConfig(
+            chunk_size=1000, chunk_overlap=100, min_chunk_size=50, max_chunk_size=2000,
+            max_chunk_tokens=200, token_model='BAAI/bge-large-zh-v1.5'
+        )
+        text = "\n\n".join(
+            "段落%d：系统支持 mixed-language retrieval，检索延迟约 35ms。" % i * 15 for i in range(10)
+        )
+        estimator = get_token_estimator('BAAI/bge-large-zh-v1.5')
+        
+        chunks = RecursiveTextSplitter(config).split(text, str(uuid.uuid4()))
+        
+        assert all(estimator.count(c.content) <= 200 for c in chunks)
+        assert [c.chunk_index for c in chunks] == list(range(len(chunks)))
+        sub_chunks = [c for c in chunks if c.metadata.get("split_method") == "token_budget"]
+        assert sub_chunks and all(c.metadata["is_sub_chunk"] for c in sub_chunks)
+        # 切分后的内容覆盖原文
+        assert chunks[-1].content.endswith("35ms。")
+    
+    def test_merge_respects_token_budget(self):
+        """测试过小的块不会合并到已接近上限的块中"""
+        config = SplitConfig(min_chunk_size=20, max_chunk_tokens=30, token_model='BAAI/bge-large-zh-v1.5')
+        splitter = RecursiveTextSplitter(config)
+        doc_id = str(uuid.uuid4())
+        chunks = [
+            TextChunk(document_id=doc_id, content="甲" * 25, chunk_index=0),
+            TextChunk(document_id=doc_id, content="乙" * 10, chunk_index=1),
+        ]
+        
+        assert [c.content for c in splitter._post_process_chunks(chunks, doc_id)] == ["甲" * 25]
+    
+    def test_no_budget_keeps_character_limits(self):
+        """测试未设置词元上限时只按字符数分割"""
+        splitter = RecursiveTextSplitter(SplitConfig(chunk_size=1000, max_chunk_size=2000))
+        
+        assert splitter.token_estimator is None
+        assert len(splitter.split("这是一个句子。" * 100, str(uuid.uuid4()))) == 1
+
+
 class TestSplitterErrorHandling:
     """分割器错误处理测试"""
     
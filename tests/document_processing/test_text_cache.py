@@ -0,0 +1,161 @@
+"""
+提取文本缓存测试
+"""
+import os
+import time
+import uuid
+from dataclasses import asdict
+from unittest.mock import patch
+
+import pytest
+
+from rag_system.document_processing.extractors import PDFExtractor, TxtExtractor, _PageTimeout
+from rag_system.document_processing.preprocessors import PreprocessConfig, TextPreprocessor
+from rag_system.document_processing.process_pool import extract_and_split
+from rag_system.document_processing.splitters import SplitConfig
+from rag_system.document_processing.text_cache import ExtractedTextCache, hash_file
+from rag_system.services.document_processor import DocumentProcessor
+from tests.document_processing.test_process_pool import build_pdf
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "manual.txt"
+    path.write_text("\n\n".join(f"第{i}段：缓存提取结果，重新分块时跳过解析。" * 5 for i in range(20)),
+                    encoding='utf-8')
+    return str(path)
+
+
+def _options(chunk_size=200):
+    return asdict(SplitConfig(chunk_size=chunk_size, chunk_overlap=20, min_chunk_size=10)), asdict(PreprocessConfig())
+
+
+class TestExtractedTextCache:
+    """磁盘缓存测试"""
+
+    def test_round_trip_compressed(self, tmp_path, text_file):
+        cache = ExtractedTextCache(str(tmp_path / "cache"))
+        key = cache.make_key(hash_file(text_file), TxtExtractor())
+
+        assert cache.get(key) is None
+        cache.put(key, {'text': "提取的文本" * 1000})
+
+        assert cache.get(key) == {'text': "提取的文本" * 1000}
+        entry_file = next((tmp_path / "cache").glob("*/*.json.gz"))
+        assert entry_file.stat().st_size < len("提取的文本".encode('utf-8') * 1000)
+        assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+    def test_key_depends_on_extractor_version(self, tmp_path):
+        cache = ExtractedTextCache(str(tmp_path))
+        extractor = TxtExtractor()
+        key = cache.make_key("abc", extractor)
+
+        extractor.version = "2"
+
+        assert cache.make_key("abc", extractor) != key
+        assert cache.make_key("abc", PDFExtractor()) != key
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = ExtractedTextCache(str(tmp_path), max_size_mb=0.02)
+        payload = {'text': os.urandom(6000).hex()}
+        for name in ("a", "b"):
+            cache.put(name * 64, payload)
+        # 读取 a 使其成为最近使用的条目
+        time.sleep(0.01)
+        assert cache.get("a" * 64) is not None
+
+        cache.put("c" * 64, payload)
+
+        assert cache.stats['evictions'] >= 1
+        assert cache.get("b" * 64) is None
+        assert cache.get("c" * 64) is not None
+        assert cache._scan_size() <= cache.max_size_bytes
+
+
+class TestCachedExtraction:
+    """缓存命中时跳过解析"""
+
+    def test_second_split_skips_extraction_and_preprocessing(self, tmp_path, text_file):
+        cache_options = {'cache_dir': str(tmp_path / "cache")}
+        split_options, preprocess_options = _options()
+        doc_id = str(uuid.uuid4())
+
+        first = extract_and_split(text_file, doc_id, split_options, preprocess_options, None, cache_options)
+
+        with patch.object(TxtExtractor, 'extract', side_effect=AssertionError("不应重新解析")), \
+                patch.object(TextPreprocessor, 'process', side_effect=AssertionError("不应重新预处理")):
+            second = extract_and_split(text_file, doc_id, split_options, preprocess_options, None, cache_options)
+
+        assert second['text'] == first['text']
+        assert [chunk[:3] for chunk in second['chunks']] == [chunk[:3] for chunk in first['chunks']]
+
+    def test_rechunk_with_new_split_options_uses_cache(self, tmp_path, text_file):
+        cache_options = {'cache_dir': str(tmp_path / "cache"), 'cache_preprocessed': False}
+        split_options, preprocess_options = _options(chunk_size=200)
+        doc_id = str(uuid.uuid4())
+        extract_and_split(text_file, doc_id, split_options, preprocess_options, None, cache_options)
+
+        with patch.object(TxtExtractor, 'extract', side_effect=AssertionError("不应重新解析")):
+            payload = extract_and_split(text_file, doc_id, _options(chunk_size=100)[0],
+                                        preprocess_options, None, cache_options)
+
+        assert len(payload['chunks']) > 1
+
+    def test_changed_file_misses_cache(self, tmp_path, text_file):
+        cache_options = {'cache_dir': str(tmp_path / "cache")}
+        split_options, preprocess_options = _options()
+        extract_and_split(text_file, str(uuid.uuid4()), split_options, preprocess_options, None, cache_options)
+
+        with open(text_file, 'a', encoding='utf-8') as f:
+            f.write("\n\n新增的段落内容。")
+        payload = extract_and_split(text_file, str(uuid.uuid4()), split_options, preprocess_options,
+                                    None, cache_options)
+
+        assert payload['text'].endswith("新增的段落内容。")
+
+    def test_timed_out_page_not_cached(self, tmp_path):
+        pdf_path = tmp_path / "manual.pdf"
+        pdf_path.write_bytes(build_pdf([f"Page {i} explains step {i} of the procedure" for i in range(1, 6)]))
+        cache_dir = tmp_path / "cache"
+        cache_options = {'cache_dir': str(cache_dir)}
+        split_options, preprocess_options = _options(chunk_size=100)
+        original = PDFExtractor._extract_page_text
+        calls = []
+
+        def flaky(self, page, timeout):
+            calls.append(page)
+            if len(calls) == 2:
+                raise _PageTimeout()
+            return original(self, page, timeout)
+
+        with patch.object(PDFExtractor, '_extract_page_text', flaky):
+            payload = extract_and_split(str(pdf_path), str(uuid.uuid4()), split_options, preprocess_options,
+                                        1, cache_options)
+
+        assert "Page 2" not in payload['text']
+        assert list(cache_dir.glob("*/*.json.gz")) == []
+
+        # 下次处理重新解析，得到完整的页面
+        payload = extract_and_split(str(pdf_path), str(uuid.uuid4()), split_options, preprocess_options,
+                                    1, cache_options)
+        assert "Page 2" in payload['text']
+        assert len(list(cache_dir.glob("*/*.json.gz"))) == 2
+
+    @pytest.mark.asyncio
+    async def test_pooled_pdf_reuses_cached_pages(self, tmp_path):
+        pdf_path = tmp_path / "manual.pdf"
+        pdf_path.write_bytes(build_pdf([f"Page {i} explains step {i} of the procedure" for i in range(1, 6)]))
+        processor = DocumentProcessor({
+            'chunk_size': 100, 'chunk_overlap': 0, 'min_chunk_size': 10,
+            'process_pool_workers': 1, 'text_cache_dir': str(tmp_path / "cache")
+        })
+        doc_id = str(uuid.uuid4())
+
+        first = await processor.extract_and_split(str(pdf_path), doc_id)
+
+        with patch('rag_system.services.document_processor.stream_page_chunks',
+                   side_effect=AssertionError("不应重新解析")):
+            second = await processor.extract_and_split(str(pdf_path), doc_id)
+
+        assert [c.content for c in second] == [c.content for c in first]
+        assert [c.metadata['page_number'] for c in second] == [c.metadata['page_number'] for c in first]
@@ -0,0 +1,51 @@
+"""
+词元数估算器测试
+"""
+from rag_system.document_processing.token_estimator import (
+    DEFAULT_TOKEN_PROFILE, MODEL_TOKEN_PROFILES, TokenEstimator,
+    get_model_profile, get_token_budget, get_token_estimator
+)
+
+
+class TestTokenEstimator:
+    """估算器测试"""
+
+    def test_counts_by_character_class(self):
+        estimator = TokenEstimator(MODEL_TOKEN_PROFILES['BAAI/bge-large-zh-v1.5'])
+
+        assert estimator.estimate("") == 0
+        assert estimator.estimate("中文文本") == 4
+        # 6个字母按每3个字符一个词元，标点单独计数，空格不计
+        assert estimator.estimate("abc def!") == 3
+        assert estimator.estimate("检索 retrieval，") == 2 + 3 + 1
+
+    def test_count_is_memoized(self):
+        estimator = TokenEstimator()
+        text = "缓存的估算结果" * 10
+
+        assert estimator.count(text) == estimator.estimate(text)
+        estimator.count(text)
+        assert estimator.count.cache_info().hits == 1
+
+    def test_estimator_cached_per_model(self):
+        assert get_token_estimator('BAAI/bge-m3') is get_token_estimator('BAAI/bge-m3')
+        assert get_token_estimator('unknown-model').profile == DEFAULT_TOKEN_PROFILE
+
+
+class TestTokenBudget:
+    """词元上限计算测试"""
+
+    def test_model_profile_lookup(self):
+        assert get_model_profile('Pro/BAAI/bge-m3') is MODEL_TOKEN_PROFILES['BAAI/bge-m3']
+        assert get_model_profile('unknown-model') is None
+        assert get_model_profile(None) is None
+
+    def test_budget_uses_smaller_limit(self):
+        # 512 - [CLS]/[SEP] 后乘以安全系数
+        assert get_token_budget('BAAI/bge-large-zh-v1.5') == int(510 * 0.9)
+        assert get_token_budget('BAAI/bge-large-zh-v1.5', max_tokens=8192) == int(510 * 0.9)
+        assert get_token_budget('text-embedding-3-small', max_tokens=1000, safety_margin=1.0) == 1000
+
+    def test_unknown_model_uses_configured_limit(self):
+        assert get_token_budget('custom-model', max_tokens=2048, safety_margin=1.0) == 2046
+        assert get_token_budget('custom-model') == int((DEFAULT_TOKEN_PROFILE.max_tokens - 2) * 0.9)
@@ -84,6 +84,14 @@ class TestVectorStoreConfig:
         assert any("需要API密钥" in error for error in errors)
         assert any("需要环境配置" in error for error in errors)
         assert any("需要索引名称" in error for error in errors)
+    
+    def test_validate_write_settings(self):
+        """测试验证向量写入配置"""
+        config = VectorStoreConfig(write_batch_size=0, write_retries=-1)
+        errors = config.validate()
+        assert len(errors) == 2
+        assert any("write_batch_size" in error for error in errors)
+        assert any("write_retries" in error for error in errors)
 
 
 class TestEmbeddingsConfig:
@@ -0,0 +1,60 @@
+"""
+文本预处理性能基准测试
+
+对比融合处理路径与逐个预处理器处理的吞吐量，设置 PREPROCESS_BENCHMARK_MB 可调整文本大小。
+"""
+import os
+import random
+import time
+
+import pytest
+
+from rag_system.document_processing.preprocessors import TextPreprocessor, PreprocessConfig
+
+
+BENCHMARK_MB = float(os.environ.get('PREPROCESS_BENCHMARK_MB', '2'))
+
+SAMPLE_WORDS = {
+    'zh': ["这是", "中文", "文档，", "内容。", "检索", "向量", "\n\n\n", "（注）", "  ", "\t"],
+    'en': ["retrieval", "vector", "the", "document.", "query", "\n", "index", "answer", "  ", "\t"],
+}
+
+
+def build_text(language: str, size_mb: float, seed: int = 7) -> str:
+    """构造指定大小的测试文本"""
+    rng = random.Random(seed)
+    words = SAMPLE_WORDS[language]
+    target = int(size_mb * 1024 * 1024)
+    parts = []
+    size = 0
+    while size < target:
+        word = rng.choice(words)
+        parts.append(word)
+        size += len(word.encode('utf-8')) + 1
+    return " ".join(parts)
+
+
+def best_time(func, text: str, repeat: int = 2) -> float:
+    """多次运行取最短耗时"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@pytest.mark.parametrize("language", ["zh", "en"])
+def test_fused_faster_than_chain(language):
+    """测试融合处理吞吐量不低于逐个预处理器处理"""
+    text = build_text(language, BENCHMARK_MB)
+    preprocessor = TextPreprocessor(PreprocessConfig(remove_phone_numbers=True))
+    
+    assert preprocessor.process(text) == preprocessor._process_chain(text)
+    
+    fused = best_time(preprocessor.process, text)
+    chain = best_time(preprocessor._process_chain, text)
+    
+    print(f"{language}: {BENCHMARK_MB}MB fused {BENCHMARK_MB / fused:.1f}MB/s, "
+          f"chain {BENCHMARK_MB / chain:.1f}MB/s")
+    assert fused < chain
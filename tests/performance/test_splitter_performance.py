@@ -0,0 +1,84 @@
+"""
+文本分割器性能基准测试
+
+默认使用较小的文本以保持测试快速，设置 SPLITTER_BENCHMARK_MB=50 可在大文本上运行。
+"""
+import os
+import random
+import time
+import tracemalloc
+import uuid
+
+import pytest
+
+from rag_system.document_processing.splitters import (
+    SplitConfig, FixedSizeSplitter, StructureSplitter, HierarchicalSplitter, BaseSplitter
+)
+
+
+BENCHMARK_MB = float(os.environ.get('SPLITTER_BENCHMARK_MB', '2'))
+
+
+def build_text(size_mb: float, seed: int = 42) -> str:
+    """构造包含标题、段落和多余空白的测试文本"""
+    rng = random.Random(seed)
+    words = ["retrieval", "vector", "chunk", "document", "embedding", "query", "index", "answer"]
+    target = int(size_mb * 1024 * 1024)
+    parts = []
+    size = 0
+    section = 0
+    while size < target:
+        if rng.random() < 0.1:
+            section += 1
+            part = f"## Section {section}\n\n"
+        else:
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 30)))
+            part = f"{sentence}.  \t{sentence}.  \n\n\n"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def measure(splitter: BaseSplitter, text: str):
+    """返回分割耗时(秒)和峰值额外内存(字节)"""
+    doc_id = str(uuid.uuid4())
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = splitter.split(text, doc_id)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert chunks
+    return elapsed, peak
+
+
+SPLITTERS = [FixedSizeSplitter, StructureSplitter, HierarchicalSplitter]
+
+
+@pytest.mark.parametrize("splitter_cls", SPLITTERS, ids=lambda cls: cls.__name__)
+def test_split_memory_bounded(splitter_cls):
+    """测试分割峰值内存与输入大小同阶，而不是多份文本副本"""
+    text = build_text(BENCHMARK_MB)
+    splitter = splitter_cls(SplitConfig(chunk_size=1000, chunk_overlap=100, min_chunk_size=50))
+
+    elapsed, peak = measure(splitter, text)
+    text_bytes = len(text.encode('utf-8'))
+
+    print(f"{splitter_cls.__name__}: {len(text) / 1024 / 1024:.1f}MB, "
+          f"{elapsed:.2f}s, peak {peak / 1024 / 1024:.1f}MB")
+    # 文本块本身约占一份文本，另允许清洗后的缓冲区和元数据开销
+    assert peak < text_bytes * 6
+
+
+@pytest.mark.parametrize("splitter_cls", SPLITTERS, ids=lambda cls: cls.__name__)
+def test_split_time_scales_linearly(splitter_cls):
+    """测试分割耗时随输入大小近似线性增长"""
+    splitter = splitter_cls(SplitConfig(chunk_size=1000, chunk_overlap=100, min_chunk_size=50))
+    small = build_text(BENCHMARK_MB / 4)
+    large = build_text(BENCHMARK_MB)
+
+    small_time = min(measure(splitter, small)[0] for _ in range(2))
+    large_time = min(measure(splitter, large)[0] for _ in range(2))
+
+    # 4倍输入，线性实现约4倍耗时
+    assert large_time < small_time * 8
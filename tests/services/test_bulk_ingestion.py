@@ -0,0 +1,304 @@
+"""
+批量目录入库测试
+"""
+import json
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+import pytest_asyncio
+
+from rag_system.cli import build_ingest_config, build_parser, format_report, main
+from rag_system.database.models import DocumentStatus as DBDocumentStatus
+from rag_system.models.document import DocumentStatus
+from rag_system.services.bulk_ingestion import (
+    BulkIngestionService, IngestionManifest, ManifestStatus
+)
+from rag_system.services.document_service import DocumentService
+from rag_system.utils.exceptions import ProcessingError
+
+
+class InMemoryDocumentCRUD:
+    """内存中的文档记录存储"""
+
+    STATUS_MAPPING = {
+        DocumentStatus.PROCESSING: DBDocumentStatus.PROCESSING,
+        DocumentStatus.READY: DBDocumentStatus.READY,
+        DocumentStatus.ERROR: DBDocumentStatus.ERROR
+    }
+
+    def __init__(self):
+        self.documents = {}
+        self.batches = []
+
+    def create_document(self, doc_info):
+        self.create_documents([doc_info])
+
+    def create_documents(self, documents):
+        self.batches.append([doc.id for doc in documents])
+        for doc in documents:
+            self.documents[doc.id] = SimpleNamespace(
+                id=doc.id, filename=doc.filename, file_type=doc.file_type, file_size=doc.file_size,
+                upload_time=doc.upload_time, status=self.STATUS_MAPPING[doc.status],
+                chunk_count=doc.chunk_count, error_message=doc.error_message,
+                content_hash=doc.content_hash, alias_of=doc.alias_of
+            )
+        return len(documents)
+
+    def get_document(self, doc_id):
+        return self.documents.get(doc_id)
+
+    def get_document_by_hash(self, content_hash):
+        for doc in self.documents.values():
+            if doc.content_hash == content_hash and doc.alias_of is None and doc.status == DBDocumentStatus.READY:
+                return doc
+        return None
+
+    def update_document_status(self, doc_id, status, error_message=None):
+        self.documents[doc_id].status = status
+        if error_message:
+            self.documents[doc_id].error_message = error_message
+        return True
+
+    def update_document_chunk_count(self, doc_id, chunk_count):
+        self.documents[doc_id].chunk_count = chunk_count
+        return True
+
+
+@pytest_asyncio.fixture
+async def document_service():
+    """使用内存文档记录的文档服务"""
+    temp_dir = tempfile.mkdtemp()
+    service = DocumentService({
+        'storage_dir': os.path.join(temp_dir, 'documents'),
+        'vector_store_type': 'chroma',
+        'vector_store_path': os.path.join(temp_dir, 'chroma_db'),
+        'collection_name': 'bulk_test',
+        'embedding_provider': 'mock',
+        'embedding_dimensions': 384,
+        'chunk_size': 200,
+        'chunk_overlap': 20,
+        'min_chunk_size': 10,
+        'process_pool_workers': 0
+    })
+    service.db_manager = Mock()
+    await service.initialize()
+    service.document_crud = InMemoryDocumentCRUD()
+
+    yield service
+
+    await service.cleanup()
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def corpus_dir():
+    """待入库的文档目录"""
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, 'manuals', 'v2'))
+    os.makedirs(os.path.join(root, '.cache'))
+
+    files = {
+        'intro.txt': "产品介绍。" * 40,
+        'faq.md': "# 常见问题\n\n如何安装？按说明操作。\n\n如何升级？下载新版本。",
+        'manuals/setup.txt': "安装步骤：首先下载安装包，然后运行安装程序。" * 10,
+        'manuals/v2/usage.txt': "使用说明：登录后在控制台创建项目。" * 10,
+        'manuals/image.bin': "不支持的格式",
+        '.hidden.txt': "隐藏文件",
+        '.cache/cached.txt': "缓存目录中的文件",
+    }
+    for name, content in files.items():
+        with open(os.path.join(root, name), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    yield root
+    shutil.rmtree(root, ignore_errors=True)
+
+
+def read_manifest(root):
+    manifest = IngestionManifest(os.path.join(root, BulkIngestionService.MANIFEST_NAME))
+    manifest.load()
+    return manifest
+
+
+class TestIngestionManifest:
+    """进度清单测试"""
+
+    def test_last_record_wins_and_corrupt_lines_skipped(self, tmp_path):
+        path = tmp_path / "manifest.jsonl"
+        manifest = IngestionManifest(path)
+        manifest.record("/a.txt", ManifestStatus.REGISTERED, document_id="d1")
+        manifest.record("/a.txt", ManifestStatus.COMPLETED, document_id="d1")
+        manifest.record("/b.txt", ManifestStatus.FAILED, error="boom")
+        manifest.close()
+        # 模拟中断时写了一半的行
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"path": "/c.txt", "sta')
+
+        reloaded = IngestionManifest(path)
+        assert reloaded.load() == 2
+        assert reloaded.is_finished("/a.txt")
+        assert not reloaded.is_finished("/b.txt")
+        assert not reloaded.is_finished("/c.txt")
+
+
+class TestBulkIngestionService:
+    """批量入库测试"""
+
+    @pytest.mark.asyncio
+    async def test_ingest_directory(self, document_service, corpus_dir):
+        """测试递归入库支持的文件并统计吞吐量"""
+        bulk = BulkIngestionService(document_service, {'bulk_concurrency': 2})
+
+        stats = await bulk.ingest_directory(corpus_dir)
+
+        assert stats.total_files == 4
+        assert stats.completed == 4
+        assert stats.failed == 0
+        assert stats.chunks > 0
+        assert stats.embeddings == await document_service.vector_service.get_vector_count()
+        assert stats.to_dict()['documents_per_second'] > 0
+
+        # 文档记录按批写入
+        crud = document_service.document_crud
+        assert crud.batches == [list(crud.documents)]
+        assert all(doc.status == DBDocumentStatus.READY for doc in crud.documents.values())
+
+        manifest = read_manifest(corpus_dir)
+        assert sorted(os.path.relpath(path, corpus_dir) for path in manifest.entries) == [
+            'faq.md', 'intro.txt', os.path.join('manuals', 'setup.txt'),
+            os.path.join('manuals', 'v2', 'usage.txt')
+        ]
+        assert all(entry['status'] == ManifestStatus.COMPLETED for entry in manifest.entries.values())
+
+    @pytest.mark.asyncio
+    async def test_rerun_skips_finished_files(self, document_service, corpus_dir):
+        """测试重新运行时跳过已完成的文件"""
+        await BulkIngestionService(document_service).ingest_directory(corpus_dir)
+
+        with patch.object(document_service, '_ingest_document') as mock_ingest:
+            stats = await BulkIngestionService(document_service).ingest_directory(corpus_dir)
+
+        mock_ingest.assert_not_called()
+        assert stats.skipped == 4
+        assert stats.completed == 0
+
+    @pytest.mark.asyncio
+    async def test_resume_retries_failed_with_same_document(self, document_service, corpus_dir):
+        """测试失败的文件在下次运行时沿用原文档记录重试"""
+        original = document_service._ingest_document
+
+        async def flaky(doc_info, report_progress=None):
+            if doc_info.filename == 'faq.md':
+                raise ProcessingError("向量化超时")
+            return await original(doc_info, report_progress)
+
+        with patch.object(document_service, '_ingest_document', side_effect=flaky):
+            stats = await BulkIngestionService(document_service).ingest_directory(corpus_dir)
+
+        assert stats.completed == 3
+        assert stats.failed == 1
+        failed_entry = read_manifest(corpus_dir).get(os.path.join(corpus_dir, 'faq.md'))
+        assert failed_entry['status'] == ManifestStatus.FAILED
+        failed_id = failed_entry['document_id']
+        assert document_service.document_crud.get_document(failed_id).status == DBDocumentStatus.ERROR
+
+        stats = await BulkIngestionService(document_service).ingest_directory(corpus_dir)
+
+        assert stats.skipped == 3
+        assert stats.completed == 1
+        assert len(document_service.document_crud.documents) == 4
+        assert document_service.document_crud.get_document(failed_id).status == DBDocumentStatus.READY
+
+    @pytest.mark.asyncio
+    async def test_duplicate_files_become_aliases(self, document_service, corpus_dir):
+        """测试同一次运行中内容相同的文件登记为别名"""
+        shutil.copy(os.path.join(corpus_dir, 'intro.txt'), os.path.join(corpus_dir, 'intro_copy.txt'))
+
+        stats = await BulkIngestionService(document_service).ingest_directory(corpus_dir)
+
+        assert stats.completed == 4
+        assert stats.duplicates == 1
+        entry = read_manifest(corpus_dir).get(os.path.join(corpus_dir, 'intro_copy.txt'))
+        assert entry['status'] == ManifestStatus.DUPLICATE
+        alias = document_service.document_crud.get_document(entry['document_id'])
+        assert alias.alias_of == entry['alias_of']
+
+
+class TestIngestCommand:
+    """命令行测试"""
+
+    def test_parse_ingest_arguments(self):
+        args = build_parser().parse_args(['ingest', '/data/corpus', '--concurrency', '8'])
+
+        assert args.command == 'ingest'
+        assert args.directory == '/data/corpus'
+        assert args.concurrency == 8
+        assert args.manifest is None
+
+    def test_batch_size_options_override_config(self):
+        """测试流水线批量参数只覆盖pipeline_batch_size，不影响嵌入请求的批量大小"""
+        args = build_parser().parse_args([
+            'ingest', '/data/corpus', '--pipeline-batch-size', '64', '--process-workers', '3'
+        ])
+        base_config = {'pipeline_batch_size': 32, 'embedding_batch_size': 10, 'process_pool_workers': 2}
+
+        with patch('rag_system.api.document_api.get_document_service_config', return_value=dict(base_config)):
+            config = build_ingest_config(args)
+
+        assert config['pipeline_batch_size'] == 64
+        assert config['embedding_batch_size'] == 10
+        assert config['process_pool_workers'] == 3
+
+        with patch('rag_system.api.document_api.get_document_service_config', return_value=dict(base_config)):
+            assert build_ingest_config(build_parser().parse_args(['ingest', '/data/corpus'])) == base_config
+
+    def test_format_report(self):
+        from rag_system.services.bulk_ingestion import BulkIngestionStats
+
+        report = format_report(BulkIngestionStats(total_files=10, completed=10, chunks=200,
+                                                  embeddings=200, elapsed=4.0))
+
+        assert "2.50 文档/秒" in report
+        assert "50.0 文本块/秒" in report
+
+    def test_ingest_command_end_to_end(self, corpus_dir, tmp_path):
+        """测试命令行入库：写入SQLite文档记录和向量，重新运行时跳过已完成的文件"""
+        database_path = tmp_path / "db" / "documents.db"
+        config = {
+            'storage_dir': str(tmp_path / "documents"),
+            'vector_store_type': 'chroma',
+            'vector_store_path': str(tmp_path / "chroma"),
+            'collection_name': 'cli_ingest',
+            'embedding_provider': 'mock',
+            'embedding_dimensions': 64,
+            'chunk_size': 200,
+            'chunk_overlap': 20,
+            'min_chunk_size': 10,
+            'process_pool_workers': 0,
+            'database_url': f"sqlite:///{database_path}"
+        }
+
+        with patch('rag_system.api.document_api.get_document_service_config', return_value=dict(config)):
+            assert main(['ingest', corpus_dir, '--concurrency', '2']) == 0
+            assert main(['ingest', corpus_dir]) == 0
+
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from rag_system.database.crud import DocumentCRUD
+
+        engine = create_engine(f"sqlite:///{database_path}")
+        session = sessionmaker(bind=engine)()
+        try:
+            documents = DocumentCRUD(session).get_documents()
+            assert sorted(doc.filename for doc in documents) == ['faq.md', 'intro.txt', 'setup.txt', 'usage.txt']
+            assert all(doc.status == DBDocumentStatus.READY and doc.chunk_count > 0 for doc in documents)
+        finally:
+            session.close()
+            engine.dispose()
+
+        manifest = read_manifest(corpus_dir)
+        assert all(entry['status'] == ManifestStatus.COMPLETED for entry in manifest.entries.values())
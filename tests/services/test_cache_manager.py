@@ -37,6 +37,14 @@ class TestCacheManager:
         }
         service.clear_cache.return_value = 100
         service.warm_up_cache.return_value = 5
+        service.evict_lru.return_value = 1000
+        service.get_hot_queries = Mock(return_value=[
+            {
+                'query': '什么是人工智能？',
+                'config': {'search_mode': 'semantic', 'top_k': 5},
+                'hits': 42
+            }
+        ])
         return service
     
     @pytest.fixture
@@ -53,9 +61,16 @@ class TestCacheManager:
         )
     
     @pytest.fixture
-    def cache_manager(self, cache_service, cache_policy):
+    def warmup_service(self):
+        """模拟缓存预热服务"""
+        service = Mock()
+        service.warm_up = AsyncMock(return_value={'warmed': 1, 'already_cached': 0, 'failed': 0})
+        return service
+    
+    @pytest.fixture
+    def cache_manager(self, cache_service, cache_policy, warmup_service):
         """缓存管理器fixture"""
-        return CacheManager(cache_service, cache_policy)
+        return CacheManager(cache_service, cache_policy, warmup_service=warmup_service)
     
     def test_cache_manager_initialization(self, cache_service, cache_policy):
         """测试缓存管理器初始化"""
@@ -148,10 +163,66 @@ class TestCacheManager:
         result = await cache_manager.optimize_cache()
         
         assert result['success'] is True
-        assert any('预热热点查询' in action for action in result['actions'])
+        assert "预热热点查询: 1个查询" in result['actions']
+        
+        # 验证追踪到的热点查询交给预热服务重放
+        cache_manager.warmup_service.warm_up.assert_awaited_once()
+        cache_manager.cache_service.get_hot_queries.assert_called_once_with(cache_manager.policy.hot_query_limit)
+        warmed_queries = cache_manager.warmup_service.warm_up.call_args[0][0]
+        assert warmed_queries[0]['query'] == '什么是人工智能？'
+        assert warmed_queries[0]['config']['enable_cache'] is True
+        cache_manager.cache_service.warm_up_cache.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_optimize_cache_without_warmup_service(self, cache_service, cache_policy):
+        """测试预热服务未启动时不预热，也不报告预热数量"""
+        cache_service.get_cache_info.return_value = {
+            'enabled': True,
+            'hit_rate': 0.2,
+            'cached_queries': 10,
+            'redis_memory': {'used_memory': 0}
+        }
+        manager = CacheManager(cache_service, cache_policy)
+        
+        with patch('rag_system.services.cache_warmup.get_cache_warmup_service', return_value=None):
+            result = await manager.optimize_cache()
+        
+        assert result['success'] is True
+        assert not any('预热' in action for action in result['actions'])
+        cache_service.warm_up_cache.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_optimize_cache_no_hot_queries(self, cache_manager):
+        """测试没有访问记录时不进行预热"""
+        cache_manager.cache_service.get_cache_info.return_value = {
+            'enabled': True,
+            'hit_rate': 0.2,
+            'cached_queries': 10,
+            'redis_memory': {'used_memory': 0}
+        }
+        cache_manager.cache_service.get_hot_queries.return_value = []
+        
+        result = await cache_manager.optimize_cache()
+        
+        assert result['success'] is True
+        cache_manager.warmup_service.warm_up.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_optimize_cache_evicts_entries_over_limit(self, cache_manager):
+        """测试条目数超出上限时按LRU淘汰"""
+        cache_manager.cache_service.get_cache_info.return_value = {
+            'enabled': True,
+            'hit_rate': 0.75,
+            'cached_queries': 6000,  # 超过max_entries=5000
+            'redis_memory': {'used_memory': 10 * 1024 * 1024}
+        }
         
-        # 验证预热方法被调用
-        cache_manager.cache_service.warm_up_cache.assert_called()
+        result = await cache_manager.optimize_cache()
+        
+        assert result['success'] is True
+        cache_manager.cache_service.evict_lru.assert_called_once_with(1000)
+        cache_manager.cache_service.clear_cache.assert_not_called()
+        assert any('清理LRU缓存: 1000' in action for action in result['actions'])
     
     @pytest.mark.asyncio
     async def test_update_policy(self, cache_manager):
@@ -484,6 +484,102 @@ class TestCacheService:
         assert warmed_count == 2
         assert mock_redis.exists.call_count == 2
     
+    @pytest.mark.asyncio
+    async def test_cache_access_updates_lru(self, cache_service, sample_config, sample_results):
+        """测试缓存写入和命中时更新LRU访问时间"""
+        cache_service.cache_enabled = True
+        
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = cache_service._serialize_results(sample_results)
+        cache_service.redis_client = mock_redis
+        
+        await cache_service.cache_results("测试查询", sample_config, sample_results)
+        await cache_service.get_cached_results("测试查询", sample_config)
+        
+        cache_key = cache_service._generate_cache_key("测试查询", sample_config)
+        assert mock_redis.zadd.call_count == 2
+        assert mock_redis.zadd.call_args[0][0] == cache_service.lru_key
+        assert cache_key in mock_redis.zadd.call_args[0][1]
+    
+    @pytest.mark.asyncio
+    async def test_lru_update_failure_does_not_affect_hit(self, cache_service, sample_config, sample_results):
+        """测试LRU更新失败不影响缓存命中"""
+        cache_service.cache_enabled = True
+        
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = cache_service._serialize_results(sample_results)
+        mock_redis.zadd.side_effect = Exception("zadd失败")
+        cache_service.redis_client = mock_redis
+        
+        result = await cache_service.get_cached_results("测试查询", sample_config)
+        
+        assert len(result) == 3
+        assert cache_service.cache_stats['errors'] == 0
+    
+    @pytest.mark.asyncio
+    async def test_evict_lru(self, cache_service):
+        """测试按最近访问时间淘汰缓存"""
+        cache_service.cache_enabled = True
+        
+        mock_redis = AsyncMock()
+        mock_redis.zrange.return_value = ['retrieval:old1', 'retrieval:old2']
+        mock_redis.delete.return_value = 2
+        cache_service.redis_client = mock_redis
+        
+        deleted_count = await cache_service.evict_lru(2)
+        
+        assert deleted_count == 2
+        mock_redis.zrange.assert_called_once_with(cache_service.lru_key, 0, 1)
+        mock_redis.delete.assert_called_once_with('retrieval:old1', 'retrieval:old2')
+        mock_redis.zrem.assert_called_once_with(cache_service.lru_key, 'retrieval:old1', 'retrieval:old2')
+    
+    @pytest.mark.asyncio
+    async def test_evict_lru_disabled(self, cache_service):
+        """测试缓存禁用时不进行淘汰"""
+        cache_service.cache_enabled = False
+        
+        assert await cache_service.evict_lru(10) == 0
+    
+    @pytest.mark.asyncio
+    async def test_get_hot_queries(self, cache_service, sample_config):
+        """测试热点查询按访问频率排序"""
+        cache_service.cache_enabled = True
+        
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+        cache_service.redis_client = mock_redis
+        
+        for _ in range(3):
+            await cache_service.get_cached_results("热门问题", sample_config)
+        await cache_service.get_cached_results("冷门问题", sample_config)
+        
+        hot_queries = cache_service.get_hot_queries(limit=1)
+        
+        assert len(hot_queries) == 1
+        assert hot_queries[0]['query'] == "热门问题"
+        assert hot_queries[0]['hits'] == 3
+        assert hot_queries[0]['config']['search_mode'] == sample_config.search_mode
+        assert hot_queries[0]['config']['top_k'] == sample_config.top_k
+    
+    @pytest.mark.asyncio
+    async def test_is_cached(self, cache_service, sample_config):
+        """测试检查缓存存在不影响统计和访问频率"""
+        cache_service.cache_enabled = True
+
+        mock_redis = AsyncMock()
+        mock_redis.exists.return_value = 1
+        cache_service.redis_client = mock_redis
+
+        assert await cache_service.is_cached("测试查询", sample_config) is True
+        mock_redis.exists.assert_called_once_with(
+            cache_service._generate_cache_key("测试查询", sample_config)
+        )
+        assert cache_service.cache_stats['total_requests'] == 0
+        assert cache_service.get_hot_queries() == []
+
+        mock_redis.exists.side_effect = Exception("Redis error")
+        assert await cache_service.is_cached("测试查询", sample_config) is False
+
     @pytest.mark.asyncio
     async def test_close(self, cache_service):
         """测试关闭缓存服务"""
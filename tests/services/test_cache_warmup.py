@@ -0,0 +1,336 @@
+"""
+缓存预热服务测试
+"""
+
+import pytest
+import asyncio
+import uuid
+from unittest.mock import Mock, AsyncMock, patch
+
+from rag_system.database.crud import QAPairCRUD
+from rag_system.services.cache_warmup import (
+    CacheWarmupService, get_cache_warmup_service, start_global_cache_warmup, stop_global_cache_warmup
+)
+from rag_system.services.enhanced_retrieval_service import EnhancedRetrievalService
+from rag_system.services.qa_service import QAService
+from rag_system.services.search_mode_router import SearchModeRouter
+from rag_system.models.config import RetrievalConfig
+from rag_system.models.qa import QAPair
+from rag_system.models.vector import SearchResult
+from rag_system.utils.exceptions import ConfigurationError, DatabaseError
+from rag_system.utils.single_flight import get_single_flight
+
+
+class FakeRedis:
+    """只实现检索缓存用到的命令的内存Redis"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def zadd(self, key, mapping):
+        return len(mapping)
+
+    async def close(self):
+        pass
+
+
+def use_redis(retrieval_service, redis):
+    """让检索服务的缓存使用给定的Redis"""
+    retrieval_service.cache_service.redis_client = redis
+    retrieval_service.cache_service.cache_enabled = True
+
+
+class TestCacheWarmupService:
+    """缓存预热服务测试类"""
+
+    @pytest.fixture
+    def retrieval_service(self):
+        """模拟检索服务"""
+        service = Mock()
+        service.default_config = RetrievalConfig(top_k=5, similarity_threshold=0.5)
+        service.cache_service = Mock()
+        service.cache_service.cache_enabled = True
+        service.cache_service.is_cached = AsyncMock(return_value=False)
+        service.cache_service.get_hot_queries = Mock(return_value=[])
+        service.search_with_config = AsyncMock(return_value=[])
+        return service
+
+    @pytest.fixture
+    def qa_pair_crud(self):
+        """模拟问答对CRUD"""
+        crud = Mock()
+        crud.get_frequent_questions = Mock(return_value=[
+            ("什么是RAG？", 5),
+            (" 如何上传文档？ ", 3),
+        ])
+        return crud
+
+    @pytest.fixture
+    def warmup_config(self):
+        """预热配置"""
+        return {
+            'warmup_concurrency': 2,
+            'warmup_time_budget': 5.0,
+            'warmup_max_provider_calls': 10,
+            'warmup_replay_delay': 0,
+            'warmup_startup_delay': 0,
+            'warmup_interval': 0
+        }
+
+    @pytest.fixture
+    def warmup_service(self, retrieval_service, qa_pair_crud, warmup_config):
+        """预热服务fixture"""
+        return CacheWarmupService(retrieval_service, warmup_config, qa_pair_crud=qa_pair_crud)
+
+    @pytest.mark.asyncio
+    async def test_collect_queries_merges_history_and_hot_queries(self, warmup_service, retrieval_service):
+        """测试合并问答历史和热点查询"""
+        retrieval_service.cache_service.get_hot_queries.return_value = [
+            {'query': '什么是RAG？', 'config': {'top_k': 5}, 'hits': 2},
+            {'query': '热点问题', 'config': {'top_k': 10, 'search_mode': 'hybrid'},
+             'kwargs': {'document_ids': ['doc1']}, 'hits': 4},
+        ]
+
+        queries = await warmup_service.collect_queries()
+
+        assert [q['query'] for q in queries] == ['什么是RAG？', '热点问题', '如何上传文档？']
+        assert queries[0]['hits'] == 5
+        assert queries[0]['config']['similarity_threshold'] == 0.5
+        assert queries[0]['config']['enable_cache'] is True
+        assert queries[1]['config']['search_mode'] == 'hybrid'
+        assert queries[1]['kwargs'] == {'document_ids': ['doc1']}
+
+    @pytest.mark.asyncio
+    async def test_collect_queries_history_failure(self, warmup_service, qa_pair_crud):
+        """测试读取历史失败时不影响预热"""
+        qa_pair_crud.get_frequent_questions.side_effect = Exception("db error")
+
+        assert await warmup_service.collect_queries() == []
+
+    @pytest.mark.asyncio
+    async def test_warm_up_replays_uncached_queries(self, warmup_service, retrieval_service):
+        """测试只重放未缓存的查询"""
+        retrieval_service.cache_service.is_cached.side_effect = lambda query, config, **kwargs: query == "如何上传文档？"
+
+        result = await warmup_service.warm_up()
+
+        assert result['candidates'] == 2
+        assert result['warmed'] == 1
+        assert result['already_cached'] == 1
+        assert result['provider_calls'] == 1
+        assert result['stopped_reason'] is None
+
+        query, config = retrieval_service.search_with_config.call_args[0]
+        assert query == "什么是RAG？"
+        assert config.enable_cache is True
+        assert warmup_service.get_status()['total_runs'] == 1
+
+    @pytest.mark.asyncio
+    async def test_warm_up_stops_at_provider_quota(self, warmup_service, retrieval_service):
+        """测试达到提供商调用配额时停止"""
+        warmup_service.max_provider_calls = 2
+        queries = [{'query': f"问题{i}", 'config': {}, 'hits': 1} for i in range(10)]
+
+        result = await warmup_service.warm_up(queries)
+
+        assert result['provider_calls'] == 2
+        assert retrieval_service.search_with_config.call_count == 2
+        assert result['stopped_reason'] == 'provider_quota'
+
+    @pytest.mark.asyncio
+    async def test_warm_up_stops_at_time_budget(self, warmup_service, retrieval_service):
+        """测试时间预算耗尽时停止"""
+        warmup_service.time_budget = 0.05
+        warmup_service.concurrency = 1
+
+        async def slow_search(*args, **kwargs):
+            await asyncio.sleep(0.03)
+            return []
+
+        retrieval_service.search_with_config.side_effect = slow_search
+        queries = [{'query': f"问题{i}", 'config': {}, 'hits': 1} for i in range(10)]
+
+        result = await warmup_service.warm_up(queries)
+
+        assert result['stopped_reason'] == 'time_budget'
+        assert result['warmed'] < 10
+
+    @pytest.mark.asyncio
+    async def test_warm_up_stops_after_consecutive_failures(self, warmup_service, retrieval_service):
+        """测试连续失败时停止（如提供商限流）"""
+        warmup_service.concurrency = 1
+        retrieval_service.search_with_config.side_effect = Exception("rate limited")
+        queries = [{'query': f"问题{i}", 'config': {}, 'hits': 1} for i in range(10)]
+
+        result = await warmup_service.warm_up(queries)
+
+        assert result['failed'] == warmup_service.max_consecutive_failures
+        assert result['stopped_reason'] == 'provider_errors'
+
+    @pytest.mark.asyncio
+    async def test_warm_up_skipped_when_cache_disabled(self, warmup_service, retrieval_service):
+        """测试缓存未启用时跳过预热"""
+        retrieval_service.cache_service.cache_enabled = False
+
+        result = await warmup_service.warm_up()
+
+        assert result['stopped_reason'] == 'cache_disabled'
+        retrieval_service.search_with_config.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_warm_up_yields_to_live_requests(self, warmup_service, retrieval_service):
+        """测试有在线问答请求时让出"""
+        warmup_service.yield_interval = 0.01
+        live_requests = get_single_flight("qa")
+        release = asyncio.Event()
+
+        async def live_question():
+            await release.wait()
+
+        live_task = asyncio.create_task(live_requests.do("live-question", live_question))
+        await asyncio.sleep(0)
+
+        warmup_task = asyncio.create_task(warmup_service.warm_up())
+        await asyncio.sleep(0.05)
+        retrieval_service.search_with_config.assert_not_called()
+
+        release.set()
+        await live_task
+        result = await warmup_task
+
+        assert result['warmed'] == 2
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop(self, warmup_service, retrieval_service):
+        """测试启动后执行预热并可停止"""
+        await warmup_service.start()
+        await asyncio.sleep(0.05)
+
+        assert warmup_service.is_running is True
+        assert retrieval_service.search_with_config.call_count == 2
+
+        await warmup_service.stop()
+
+        assert warmup_service.is_running is False
+        assert warmup_service.warmup_task is None
+
+    @pytest.mark.asyncio
+    async def test_initialize_reads_history_from_database(self, retrieval_service, warmup_config, tmp_path):
+        """测试未传入CRUD时按database_url建立会话并读取问答历史"""
+        service = CacheWarmupService(retrieval_service, {
+            **warmup_config,
+            'database_url': f"sqlite:///{tmp_path / 'history.db'}"
+        })
+        await service.initialize()
+        try:
+            assert isinstance(service.qa_pair_crud, QAPairCRUD)
+            session_id = str(uuid.uuid4())
+            for _ in range(2):
+                service.qa_pair_crud.create_qa_pair(QAPair(
+                    session_id=session_id, question="什么是RAG？", answer="检索增强生成"
+                ))
+
+            queries = await service.collect_queries()
+
+            assert [(query['query'], query['hits']) for query in queries] == [("什么是RAG？", 2)]
+        finally:
+            await service.cleanup()
+
+        assert service.db_session is None
+
+    @pytest.mark.asyncio
+    async def test_initialize_fails_loudly(self, retrieval_service, warmup_config, tmp_path):
+        """测试无法访问问答历史数据库时抛出异常"""
+        service = CacheWarmupService(retrieval_service, {
+            **warmup_config,
+            'database_url': f"sqlite:///{tmp_path / 'missing' / 'history.db'}"
+        })
+
+        with pytest.raises(DatabaseError):
+            await service.initialize()
+
+        assert service.qa_pair_crud is None
+
+
+class TestGlobalCacheWarmup:
+    """全局缓存预热测试"""
+
+    @pytest.fixture
+    def config(self, tmp_path):
+        """问答服务与预热共用的配置"""
+        return {
+            'enable_cache': True,
+            'retrieval_top_k': 3,
+            'similarity_threshold': 0.5,
+            'embedding_provider': 'mock',
+            'vector_store_path': str(tmp_path / "chroma"),
+            'database_url': f"sqlite:///{tmp_path / 'history.db'}",
+            'warmup_startup_delay': 3600,
+            'warmup_replay_delay': 0
+        }
+
+    @pytest.mark.asyncio
+    async def test_warmed_query_hits_qa_cache(self, config):
+        """测试预热写入的缓存在问答检索时命中"""
+        redis = FakeRedis()
+        hit = SearchResult(
+            chunk_id=str(uuid.uuid4()), document_id=str(uuid.uuid4()),
+            content="RAG是检索增强生成", similarity_score=0.9, metadata={}
+        )
+
+        with patch.object(EnhancedRetrievalService, 'initialize', new_callable=AsyncMock), \
+             patch.object(SearchModeRouter, 'search_with_mode', new_callable=AsyncMock,
+                          return_value=[hit]) as mock_search:
+            service = await start_global_cache_warmup(config)
+            try:
+                use_redis(service.retrieval_service, redis)
+                service.qa_pair_crud.create_qa_pair(QAPair(
+                    session_id=str(uuid.uuid4()), question="什么是RAG？", answer="检索增强生成"
+                ))
+
+                assert (await service.warm_up())['warmed'] == 1
+            finally:
+                await stop_global_cache_warmup()
+
+            qa_service = QAService(config)
+            use_redis(qa_service.retrieval_service, redis)
+            results = await qa_service.retrieve_context("什么是RAG？")
+
+        assert [result.chunk_id for result in results] == [hit.chunk_id]
+        mock_search.assert_awaited_once()
+        assert qa_service.retrieval_service.cache_service.cache_stats['hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_start_is_retried(self, config, tmp_path):
+        """测试启动失败时不保留全局实例并清理检索服务，下次调用重新启动"""
+        missing = {**config, 'database_url': f"sqlite:///{tmp_path / 'missing' / 'history.db'}"}
+
+        with patch.object(EnhancedRetrievalService, 'initialize', new_callable=AsyncMock), \
+             patch.object(EnhancedRetrievalService, 'cleanup', new_callable=AsyncMock) as mock_cleanup:
+            with pytest.raises(DatabaseError):
+                await start_global_cache_warmup(missing)
+
+            assert get_cache_warmup_service() is None
+            mock_cleanup.assert_awaited_once()
+
+            service = await start_global_cache_warmup(config)
+            try:
+                assert get_cache_warmup_service() is service
+                assert service.is_running
+            finally:
+                await stop_global_cache_warmup()
+
+    @pytest.mark.asyncio
+    async def test_requires_qa_cache(self, config):
+        """测试问答检索未启用缓存时不启动预热"""
+        with pytest.raises(ConfigurationError):
+            await start_global_cache_warmup({**config, 'enable_cache': False})
@@ -0,0 +1,217 @@
+"""
+文本块邻接表测试
+"""
+import gzip
+import json
+import uuid
+
+import pytest
+
+from rag_system.models.document import TextChunk
+from rag_system.services.chunk_adjacency import ChunkAdjacencyStore, compute_overlap
+
+
+def make_chunks(doc_id, contents, sections=None):
+    chunks = []
+    for i, content in enumerate(contents):
+        metadata = {}
+        if sections and sections[i]:
+            metadata['hierarchy_path'] = sections[i]
+        chunks.append(TextChunk(
+            id=str(uuid.uuid4()),
+            document_id=doc_id,
+            content=content,
+            chunk_index=i,
+            metadata=metadata
+        ))
+    return chunks
+
+
+def text_fetcher(chunks):
+    """按块ID批量读取内容的异步函数，记录每次调用的块ID"""
+    texts = {chunk.id: chunk.content for chunk in chunks}
+    calls = []
+
+    async def fetch(chunk_ids):
+        calls.append(list(chunk_ids))
+        return {chunk_id: texts[chunk_id] for chunk_id in chunk_ids if chunk_id in texts}
+
+    fetch.calls = calls
+    return fetch
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkAdjacencyStore(str(tmp_path / "adjacency"))
+
+
+class TestChunkAdjacencyStore:
+    """文本块邻接表存储测试"""
+
+    def test_save_and_load(self, store):
+        """保存后可查到前后相邻的块和所属章节"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["第一块", "第二块", "第三块"],
+                             [["概述"], ["概述"], ["概述", "细节"]])
+        store.save(doc_id, chunks)
+
+        table = store.load(doc_id)
+        assert len(table) == 3
+        assert table.previous(chunks[0].id) is None
+        assert table.next(chunks[0].id) == chunks[1].id
+        assert table.previous(chunks[2].id) == chunks[1].id
+        assert table.next(chunks[2].id) is None
+        assert table.section(chunks[1].id) == "概述"
+        assert table.section(chunks[2].id) == "概述 / 细节"
+
+    def test_table_keeps_no_content(self, store):
+        """邻接表文件只记录块ID、章节和重叠长度，不保存内容"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["不应写入邻接表的内容"])
+        store.save(doc_id, chunks)
+
+        with gzip.open(store._table_path(doc_id), 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f][1:]
+        assert rows == [[chunks[0].id, -1, 0]]
+
+    def test_load_version_1(self, store):
+        """兼容读取带内容列的旧格式邻接表"""
+        doc_id = str(uuid.uuid4())
+        store.base_dir.mkdir(parents=True, exist_ok=True)
+        with gzip.open(store._table_path(doc_id), 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'version': 1, 'document_id': doc_id}) + "\n")
+            f.write(json.dumps(["chunk-0", -1, 0, "内容"]) + "\n")
+
+        assert store.load(doc_id).chunk_ids == ["chunk-0"]
+
+    def test_load_missing(self, store):
+        """没有邻接表的文档返回None"""
+        assert store.load(str(uuid.uuid4())) is None
+
+    def test_writer_streams_batches(self, store):
+        """分批写入，提交前保留原有邻接表"""
+        doc_id = str(uuid.uuid4())
+        old_chunks = make_chunks(doc_id, ["旧内容"])
+        store.save(doc_id, old_chunks)
+        new_chunks = make_chunks(doc_id, ["新一", "新二", "新三"])
+
+        writer = store.open_writer(doc_id)
+        writer.add(new_chunks[:2])
+        writer.add(new_chunks[2:])
+        assert store.load(doc_id).chunk_ids == [old_chunks[0].id]
+
+        writer.commit()
+        assert store.load(doc_id).chunk_ids == [chunk.id for chunk in new_chunks]
+
+    def test_writer_abort(self, store):
+        """放弃写入时保留原有邻接表且不留下临时文件"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["原内容"])
+        store.save(doc_id, chunks)
+
+        writer = store.open_writer(doc_id)
+        writer.add(make_chunks(doc_id, ["新内容"]))
+        writer.abort()
+
+        assert store.load(doc_id).chunk_ids == [chunks[0].id]
+        assert list(store.base_dir.glob("*.tmp")) == []
+
+    def test_delete_and_rename(self, store):
+        """删除和转给别名文档"""
+        doc_id = str(uuid.uuid4())
+        alias_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["内容"])
+        store.save(doc_id, chunks)
+
+        assert store.rename(doc_id, alias_id) is True
+        assert store.load(doc_id) is None
+        assert store.load(alias_id).chunk_ids == [chunks[0].id]
+
+        assert store.delete(alias_id) is True
+        assert store.load(alias_id) is None
+        assert store.delete(alias_id) is False
+
+    @pytest.mark.asyncio
+    async def test_expand_neighbors(self, store):
+        """命中块扩展到两侧相邻的块，按文档顺序拼接"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["块0", "块1", "块2", "块3", "块4"])
+        store.save(doc_id, chunks)
+        fetch = text_fetcher(chunks)
+
+        expanded = await store.expand([(doc_id, chunks[2].id)], budget=100, fetch_texts=fetch, window=1)
+
+        content, chunk_ids = expanded[chunks[2].id]
+        assert content == "块1\n块2\n块3"
+        assert chunk_ids == [chunks[1].id, chunks[2].id, chunks[3].id]
+        # 命中块和候选相邻块的内容一次批量读取
+        assert fetch.calls == [[chunks[2].id, chunks[1].id, chunks[3].id]]
+
+    @pytest.mark.asyncio
+    async def test_expand_skips_missing_text(self, store):
+        """读取不到内容的相邻块跳过"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["块0", "块1", "块2"])
+        store.save(doc_id, chunks)
+        fetch = text_fetcher(chunks[1:])
+
+        expanded = await store.expand([(doc_id, chunks[1].id)], budget=100, fetch_texts=fetch, window=1)
+
+        assert expanded[chunks[1].id] == ("块1\n块2", [chunks[1].id, chunks[2].id])
+
+    @pytest.mark.asyncio
+    async def test_expand_respects_budget(self, store):
+        """相邻块按距离由近到远加入，超出预算的不加入"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["a" * 10, "b" * 10, "命中", "c" * 10, "d" * 10])
+        store.save(doc_id, chunks)
+        fetch = text_fetcher(chunks)
+
+        expanded = await store.expand([(doc_id, chunks[2].id)], budget=25, fetch_texts=fetch, window=2)
+
+        _, chunk_ids = expanded[chunks[2].id]
+        assert chunk_ids == [chunks[1].id, chunks[2].id, chunks[3].id]
+        assert await store.expand([(doc_id, chunks[2].id)], budget=5, fetch_texts=fetch, window=2) == {}
+
+    @pytest.mark.asyncio
+    async def test_expand_skips_other_hits(self, store):
+        """已命中的块不被其他命中块重复加入"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["块0", "块1", "块2", "块3"])
+        store.save(doc_id, chunks)
+        fetch = text_fetcher(chunks)
+
+        expanded = await store.expand([(doc_id, chunks[1].id), (doc_id, chunks[2].id)], budget=100, fetch_texts=fetch, window=1)
+
+        assert expanded[chunks[1].id][1] == [chunks[0].id, chunks[1].id]
+        assert expanded[chunks[2].id][1] == [chunks[2].id, chunks[3].id]
+
+    @pytest.mark.asyncio
+    async def test_expand_same_section(self, store):
+        """限定同一章节时不跨章节扩展"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["甲1", "甲2", "乙1"], [["甲"], ["甲"], ["乙"]])
+        store.save(doc_id, chunks)
+        fetch = text_fetcher(chunks)
+
+        expanded = await store.expand([(doc_id, chunks[1].id)], budget=100, fetch_texts=fetch, window=1, same_section=True)
+
+        assert expanded[chunks[1].id][1] == [chunks[0].id, chunks[1].id]
+
+    @pytest.mark.asyncio
+    async def test_expand_trims_overlap(self, store):
+        """拼接相邻块时去掉分割产生的重叠部分"""
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(doc_id, ["第一句话。第二句话。", "第二句话。第三句话。"])
+        store.save(doc_id, chunks)
+        fetch = text_fetcher(chunks)
+
+        expanded = await store.expand([(doc_id, chunks[0].id)], budget=100, fetch_texts=fetch, window=1)
+
+        assert expanded[chunks[0].id][0] == "第一句话。第二句话。\n第三句话。"
+
+    def test_compute_overlap(self):
+        """计算相邻块的重叠长度"""
+        assert compute_overlap("abcdef", "defgh") == 3
+        assert compute_overlap("abc", "xyz") == 0
+        assert compute_overlap("aaaa", "aab") == 2
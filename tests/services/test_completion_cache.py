@@ -0,0 +1,97 @@
+"""
+LLM补全缓存测试
+"""
+
+import pytest
+import json
+from unittest.mock import Mock, AsyncMock
+
+from rag_system.services.completion_cache import CompletionCache
+
+
+class TestCompletionCache:
+    """补全缓存测试类"""
+    
+    @pytest.fixture
+    def completion_cache(self):
+        """启用的补全缓存（仅进程内缓存）"""
+        cache = CompletionCache({'enable_completion_cache': True, 'completion_cache_ttl': 600})
+        cache.memory_cache.clear()
+        return cache
+    
+    @pytest.fixture
+    def redis_cache_service(self):
+        """提供Redis连接的缓存服务"""
+        service = Mock()
+        service.cache_enabled = True
+        service.redis_client = AsyncMock()
+        service.redis_client.get.return_value = None
+        return service
+    
+    def test_disabled_by_default(self):
+        """测试默认关闭"""
+        cache = CompletionCache()
+        
+        assert cache.is_cacheable(0.0) is False
+    
+    def test_sampling_bypassed_unless_allowed(self, completion_cache):
+        """测试温度大于0时默认跳过缓存"""
+        assert completion_cache.is_cacheable(0.0) is True
+        assert completion_cache.is_cacheable(None) is True
+        assert completion_cache.is_cacheable(0.7) is False
+        assert completion_cache.stats['bypassed'] == 1
+        
+        completion_cache.allow_sampling = True
+        assert completion_cache.is_cacheable(0.7) is True
+    
+    def test_generate_key_covers_all_parameters(self, completion_cache):
+        """测试缓存键包含提供商、模型、采样参数和提示词"""
+        base = dict(provider='openai', model='gpt', prompt='提示词', temperature=0.0, max_tokens=100)
+        key = completion_cache.generate_key(**base)
+        
+        assert key.startswith(CompletionCache.KEY_PREFIX)
+        assert key == completion_cache.generate_key(**base)
+        for field, value in [('provider', 'siliconflow'), ('model', 'other'), ('prompt', '提示词2'),
+                             ('temperature', 0.1), ('max_tokens', 200)]:
+            assert completion_cache.generate_key(**{**base, field: value}) != key
+    
+    @pytest.mark.asyncio
+    async def test_set_and_get_memory(self, completion_cache):
+        """测试进程内缓存读写"""
+        key = completion_cache.generate_key('mock', 'model', 'prompt-memory')
+        
+        assert await completion_cache.get(key) is None
+        await completion_cache.set(key, "答案")
+        
+        assert await completion_cache.get(key) == "答案"
+        assert completion_cache.stats['hits'] == 1
+        assert completion_cache.stats['misses'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_redis_tier(self, completion_cache, redis_cache_service):
+        """测试写入Redis并在进程内未命中时从Redis回填"""
+        completion_cache.cache_service = redis_cache_service
+        key = completion_cache.generate_key('mock', 'model', 'prompt-redis')
+        
+        await completion_cache.set(key, "答案")
+        
+        redis_cache_service.redis_client.setex.assert_called_once()
+        args = redis_cache_service.redis_client.setex.call_args[0]
+        assert args[0] == key
+        assert args[1] == 600
+        
+        # 模拟其他进程写入：清空进程内缓存后从Redis读取
+        completion_cache.memory_cache.clear()
+        redis_cache_service.redis_client.get.return_value = args[2]
+        
+        assert await completion_cache.get(key) == "答案"
+        assert completion_cache.memory_cache.get(key) == "答案"
+    
+    @pytest.mark.asyncio
+    async def test_redis_error_is_not_fatal(self, completion_cache, redis_cache_service):
+        """测试Redis错误不影响调用"""
+        completion_cache.cache_service = redis_cache_service
+        redis_cache_service.redis_client.get.side_effect = Exception("Redis不可用")
+        
+        assert await completion_cache.get(completion_cache.generate_key('mock', 'model', 'x')) is None
+        assert completion_cache.stats['errors'] == 1
@@ -7,6 +7,7 @@ import tempfile
 import os
 import uuid
 from pathlib import Path
+from unittest.mock import AsyncMock
 
 from rag_system.services.document_processor import DocumentProcessor, ProcessResult
 from rag_system.models.document import TextChunk
@@ -245,6 +246,56 @@ class TestDocumentProcessor:
         finally:
             os.unlink(temp_path)
     
+    @pytest.mark.asyncio
+    async def test_process_document_streams_to_sink(self, document_processor):
+        """测试流式处理：向量分批写入，结果中不保留文本块和向量"""
+        doc_id = str(uuid.uuid4())
+        document_processor.pipeline_batch_size = 2
+        test_content = "\n\n".join(f"## 第{i}节\n" + f"这是第{i}节的内容，用于测试流式写入。" * 20 for i in range(7))
+        
+        written = []
+        
+        async def sink(vectors):
+            written.append(len(vectors))
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
+            f.write(test_content)
+            temp_path = f.name
+        
+        try:
+            result = await document_processor.process_document(temp_path, doc_id, vector_sink=sink)
+            
+            assert result.success is True
+            assert result.chunks == [] and result.vectors == []
+            assert result.vector_count == result.chunk_count == sum(written)
+            assert len(written) > 1
+            assert max(written) <= 2
+            
+        finally:
+            os.unlink(temp_path)
+    
+    @pytest.mark.asyncio
+    async def test_process_document_sink_failure(self, document_processor):
+        """测试写入失败时处理失败且不会挂起"""
+        doc_id = str(uuid.uuid4())
+        document_processor.pipeline_batch_size = 1
+        
+        async def failing_sink(vectors):
+            raise RuntimeError("写入失败")
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write("\n\n".join(f"第{i}段测试内容，" * 20 for i in range(10)))
+            temp_path = f.name
+        
+        try:
+            result = await document_processor.process_document(temp_path, doc_id, vector_sink=failing_sink)
+            
+            assert result.success is False
+            assert "写入失败" in result.error_message
+            
+        finally:
+            os.unlink(temp_path)
+    
     @pytest.mark.asyncio
     async def test_process_document_nonexistent_file(self, document_processor):
         """测试处理不存在的文件"""
@@ -432,6 +483,44 @@ class TestDocumentProcessorConfiguration:
             
         finally:
             await processor.cleanup()
+    
+    @pytest.mark.asyncio
+    async def test_embedding_semantic_split(self):
+        """测试嵌入语义分割：文本块向量由句子向量合成，不再调用文本块向量化"""
+        config = {
+            'chunk_size': 200,
+            'chunk_overlap': 0,
+            'embedding_provider': 'mock',
+            'embedding_model': 'test-embedding-model',
+            'embedding_dimensions': 128,
+            'semantic_split_mode': 'embedding'
+        }
+        
+        processor = DocumentProcessor(config)
+        await processor.initialize()
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write("".join(f"这是第{i}句测试内容，用于验证语义分割。" for i in range(30)))
+            temp_path = f.name
+        
+        try:
+            assert processor.semantic_splitter is not None
+            processor.embedding_service.vectorize_chunks = AsyncMock()
+            
+            result = await processor.process_document(temp_path, str(uuid.uuid4()))
+            
+            assert result.success is True
+            assert result.chunk_count > 1
+            assert len(result.vectors) == len(result.chunks)
+            assert all(len(chunk.content) <= 200 for chunk in result.chunks)
+            assert all(vector.metadata['embedding_pooling'] == 'sentence_mean' for vector in result.vectors)
+            assert all(len(vector.embedding) == 128 for vector in result.vectors)
+            processor.embedding_service.vectorize_chunks.assert_not_called()
+            
+        finally:
+            os.unlink(temp_path)
+            processor.embedding_service._embedding_cache.clear()
+            await processor.cleanup()
 
 
 class TestDeprecatedInterface:
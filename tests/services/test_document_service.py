@@ -10,10 +10,11 @@ from pathlib import Path
 from unittest.mock import Mock, AsyncMock, patch
 from fastapi import UploadFile
 from io import BytesIO
+from datetime import datetime
 
 from rag_system.services.document_service import DocumentService
-from rag_system.models.document import DocumentInfo, DocumentStatus
-from rag_system.utils.exceptions import DocumentError, ProcessingError
+from rag_system.models.document import DocumentInfo, DocumentStatus, TextChunk
+from rag_system.utils.exceptions import DocumentError, ProcessingError, FileTooLargeError
 
 
 @pytest_asyncio.fixture
@@ -132,10 +133,41 @@ class TestDocumentService:
             assert doc_info.file_type == "txt"
             # 由于异步处理，状态可能已经更新为READY
             assert doc_info.status in [DocumentStatus.PROCESSING, DocumentStatus.READY]
+            assert doc_info.file_size == len(sample_upload_file.file.getvalue())
+            assert len(doc_info.content_hash) == 64
             
             # 验证数据库调用
             document_service.document_crud.create_document.assert_called_once()
     
+    @pytest.mark.asyncio
+    async def test_save_uploaded_file_streams_and_hashes(self, document_service):
+        """测试分块流式保存并增量计算SHA-256"""
+        import hashlib
+        content = "流式上传测试内容".encode('utf-8') * 1000
+        upload_file = UploadFile(filename="large.txt", file=BytesIO(content))
+        document_service.upload_chunk_size = 1024
+        
+        file_path, file_size, content_hash = await document_service._save_uploaded_file(upload_file, "doc1")
+        
+        assert file_path.read_bytes() == content
+        assert file_size == len(content)
+        assert content_hash == hashlib.sha256(content).hexdigest()
+        assert not (document_service.storage_dir / "doc1.txt.part").exists()
+    
+    @pytest.mark.asyncio
+    async def test_upload_document_too_large(self, document_service):
+        """测试超过大小上限时在写入过程中中止"""
+        document_service.max_file_size = 4096
+        document_service.upload_chunk_size = 1024
+        upload_file = UploadFile(filename="large.txt", file=BytesIO(b"x" * 10000))
+        
+        with pytest.raises(FileTooLargeError):
+            await document_service.upload_document(upload_file)
+        
+        # 没有残留文件，也没有创建文档记录
+        assert not any(p.is_file() for p in document_service.storage_dir.iterdir())
+        document_service.document_crud.create_document.assert_not_called()
+    
     @pytest.mark.asyncio
     async def test_upload_document_unsupported_format(self, document_service):
         """测试上传不支持的文件格式"""
@@ -524,6 +556,301 @@ class TestDocumentService:
             assert stats['vector_count'] == 10
             assert 'supported_formats' in stats
 
+    @pytest.mark.asyncio
+    async def test_upload_document_enqueues_ingestion_job(self, document_service, sample_upload_file):
+        """测试启用入库队列时上传立即返回，处理交给后台任务"""
+        queue = Mock()
+        queue.enqueue = AsyncMock(return_value={'id': 'job-1'})
+        document_service.ingestion_queue = queue
+
+        with patch.object(document_service.document_processor, 'process_document') as mock_process:
+            doc_info = await document_service.upload_document(sample_upload_file)
+
+            mock_process.assert_not_called()
+
+        assert doc_info.status == DocumentStatus.PROCESSING
+        assert doc_info.job_id == 'job-1'
+        document_id, payload = queue.enqueue.call_args[0]
+        assert document_id == doc_info.id
+        assert payload == {'file_path': doc_info.file_path, 'filename': "test_document.txt"}
+
+    @pytest.mark.asyncio
+    async def test_inline_processing_shares_global_limit(self, document_service):
+        """测试没有入库队列时各服务实例共享文档处理并发上限"""
+        import asyncio
+        from rag_system.services import document_service as document_service_module
+        
+        running = 0
+        max_running = 0
+        
+        async def process(doc_info):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+        
+        other_service = DocumentService({
+            'storage_dir': str(document_service.storage_dir), 'max_concurrent_processing': 2
+        })
+        docs = [Mock(id=str(i)) for i in range(6)]
+        with patch.object(document_service_module, '_processing_semaphore', None), \
+             patch.object(document_service, '_get_ingestion_queue', return_value=None), \
+             patch.object(other_service, '_get_ingestion_queue', return_value=None), \
+             patch.object(document_service, '_process_document_async', side_effect=process), \
+             patch.object(other_service, '_process_document_async', side_effect=process):
+            await asyncio.gather(*(
+                (document_service if i % 2 else other_service)._schedule_processing(doc)
+                for i, doc in enumerate(docs)
+            ))
+        
+        assert max_running == 2
+
+    @pytest.mark.asyncio
+    async def test_process_ingestion_job(self, document_service):
+        """测试处理入库任务：重试时不清空已有向量（由增量更新处理），失败时抛出异常"""
+        from rag_system.database.models import DocumentStatus as DBDocumentStatus
+
+        doc_id = str(uuid.uuid4())
+        file_path = document_service.storage_dir / f"{doc_id}.txt"
+        file_path.write_text("内容", encoding='utf-8')
+        document_service.document_crud.get_document.return_value = Mock(
+            id=doc_id, filename="test.txt", file_type="txt", file_size=100,
+            upload_time=datetime.now(), status=DBDocumentStatus.PROCESSING, chunk_count=0, error_message=""
+        )
+        job = {'id': 'job-1', 'document_id': doc_id, 'attempts': 2, 'payload': {'file_path': str(file_path)}}
+
+        mock_result = Mock(success=True, vectors=[], chunk_count=2, processing_time=1.0)
+        report_progress = AsyncMock()
+        with patch.object(document_service.document_processor, 'process_document', return_value=mock_result), \
+             patch.object(document_service.vector_service, 'delete_vectors', new_callable=AsyncMock) as mock_delete:
+            await document_service.process_ingestion_job(job, report_progress)
+
+            mock_delete.assert_not_called()
+
+        document_service.document_crud.update_document_status.assert_called_with(doc_id, DBDocumentStatus.READY)
+        document_service.document_crud.update_document_chunk_count.assert_called_with(doc_id, 2)
+        assert [c[0][1] for c in report_progress.call_args_list] == ["processing", "storing"]
+
+        failed_result = Mock(success=False, error_message="解析失败")
+        with patch.object(document_service.document_processor, 'process_document', return_value=failed_result):
+            with pytest.raises(ProcessingError):
+                await document_service.process_ingestion_job({**job, 'attempts': 1})
+
+        await document_service.handle_ingestion_failure(job, "解析失败")
+        document_service.document_crud.update_document_status.assert_called_with(
+            doc_id, DBDocumentStatus.ERROR, "解析失败"
+        )
+
+
+    @pytest.mark.asyncio
+    async def test_upload_duplicate_content_creates_alias(self, document_service, sample_upload_file):
+        """测试内容相同的文件作为已有文档的别名，不重复处理"""
+        import hashlib
+        from rag_system.database.models import DocumentStatus as DBDocumentStatus
+        
+        content_hash = hashlib.sha256(sample_upload_file.file.getvalue()).hexdigest()
+        original_id = str(uuid.uuid4())
+        document_service.document_crud.get_document_by_hash = Mock(return_value=Mock(
+            id=original_id, file_type="txt", chunk_count=3,
+            status=DBDocumentStatus.READY, content_hash=content_hash
+        ))
+        
+        with patch.object(document_service.vector_service, 'share_document_vectors',
+                          new_callable=AsyncMock, return_value=3) as mock_share, \
+             patch.object(document_service.document_processor, 'process_document') as mock_process:
+            doc_info = await document_service.upload_document(sample_upload_file)
+            
+            mock_process.assert_not_called()
+            mock_share.assert_called_once_with(original_id, doc_info.id)
+        
+        assert doc_info.alias_of == original_id
+        assert doc_info.status == DocumentStatus.READY
+        assert doc_info.chunk_count == 3
+        assert doc_info.file_path.endswith(f"{original_id}.txt")
+        # 重复的上传文件不保留
+        assert not (document_service.storage_dir / f"{doc_info.id}.txt").exists()
+        document_service.document_crud.create_document.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_filter_duplicate_chunks(self, document_service):
+        """测试已有向量的文本块只增加归属，不重复向量化"""
+        doc_id = str(uuid.uuid4())
+        chunks = [
+            TextChunk(document_id=doc_id, content="共享的段落", chunk_index=0),
+            TextChunk(document_id=doc_id, content="新的段落", chunk_index=1),
+            TextChunk(document_id=doc_id, content="  新的段落 ", chunk_index=2),
+        ]
+        
+        from rag_system.utils.helpers import compute_text_hash
+        shared_hash = compute_text_hash("共享的段落")
+        
+        with patch.object(document_service.vector_service, 'find_vectors_by_text_hash',
+                          new_callable=AsyncMock, return_value={shared_hash: 'vector-1'}), \
+             patch.object(document_service.vector_service, 'add_document_references',
+                          new_callable=AsyncMock) as mock_reference:
+            new_chunks = await document_service._filter_duplicate_chunks(doc_id, chunks)
+            
+            mock_reference.assert_called_once_with(['vector-1'], doc_id)
+        
+        assert [chunk.content for chunk in new_chunks] == ["新的段落"]
+        assert all('text_hash' in chunk.metadata for chunk in chunks)
+
+    
+    @pytest.mark.asyncio
+    async def test_reindex_embeds_only_changed_chunks(self, document_service):
+        """测试重新处理时只向量化变化的块并移除旧向量"""
+        doc_id = str(uuid.uuid4())
+        kept = TextChunk(document_id=doc_id, content="未修改的段落", chunk_index=1)
+        changed = TextChunk(document_id=doc_id, content="修改后的段落", chunk_index=0)
+        existing = {
+            kept.id: {'document_id': doc_id, 'chunk_index': 0},
+            'old-vector': {'document_id': doc_id, 'chunk_index': 1},
+        }
+        
+        vector_service = document_service.vector_service
+        with patch.object(vector_service, 'get_document_vectors', new_callable=AsyncMock, return_value=existing), \
+             patch.object(vector_service, 'find_vectors_by_text_hash', new_callable=AsyncMock, return_value={}), \
+             patch.object(vector_service, 'remove_vectors', new_callable=AsyncMock) as mock_remove, \
+             patch.object(vector_service, 'update_vector_metadata', new_callable=AsyncMock) as mock_update:
+            reindex = await document_service._begin_reindex(doc_id)
+            chunks_to_embed = await reindex.filter(doc_id, [changed, kept])
+            
+            mock_update.assert_called_once_with([kept.id], [{'chunk_index': 1}])
+            # 旧向量在全部批次处理完成后才移除
+            mock_remove.assert_not_called()
+            assert await reindex.finish() == 1
+            mock_remove.assert_called_once_with(doc_id, ['old-vector'])
+        
+        assert chunks_to_embed == [changed]
+    
+    @pytest.mark.asyncio
+    async def test_failed_ingest_removes_vectors_written_in_run(self, document_service, tmp_path):
+        """测试处理失败时移除本次已写入的向量，保留原有向量"""
+        from rag_system.models.vector import Vector
+        from rag_system.services.document_processor import ProcessResult
+        
+        doc_id = str(uuid.uuid4())
+        
+        def make_vector(chunk_id):
+            return Vector(
+                id=chunk_id, document_id=doc_id, chunk_id=chunk_id,
+                embedding=[0.1] * 384, metadata={'chunk_index': 0, 'content': chunk_id}
+            )
+        
+        vector_service = document_service.vector_service
+        old_id = str(uuid.uuid4())
+        await vector_service.add_vectors([make_vector(old_id)])
+        
+        async def partial_process(file_path, document_id, document_name, chunk_filter, vector_sink):
+            await vector_sink([make_vector(str(uuid.uuid4())), make_vector(str(uuid.uuid4()))])
+            return ProcessResult(success=False, chunks=[], vectors=[], error_message="向量化失败")
+        
+        doc_info = DocumentInfo(
+            id=doc_id, filename="test.txt", file_type="txt", file_size=100,
+            file_path=str(tmp_path / "test.txt"), upload_time=datetime.now(), status=DocumentStatus.PROCESSING
+        )
+        with patch.object(document_service.document_processor, 'process_document', side_effect=partial_process):
+            with pytest.raises(ProcessingError):
+                await document_service._ingest_document(doc_info)
+        
+        assert set(await vector_service.get_document_vectors(doc_id)) == {old_id}
+    
+    @pytest.mark.asyncio
+    async def test_reindex_records_chunk_adjacency(self, document_service):
+        """测试入库时按文档顺序记录文本块邻接表，处理失败时保留原有邻接表"""
+        doc_id = str(uuid.uuid4())
+        chunks = [
+            TextChunk(document_id=doc_id, content=f"第{i}个段落", chunk_index=i)
+            for i in range(3)
+        ]
+        
+        vector_service = document_service.vector_service
+        with patch.object(vector_service, 'get_document_vectors', new_callable=AsyncMock, return_value={}), \
+             patch.object(vector_service, 'find_vectors_by_text_hash', new_callable=AsyncMock, return_value={}):
+            reindex = await document_service._begin_reindex(doc_id)
+            await reindex.filter(doc_id, chunks[:2])
+            await reindex.filter(doc_id, chunks[2:])
+            await reindex.finish()
+            
+            failed = await document_service._begin_reindex(doc_id)
+            await failed.filter(doc_id, chunks[:1])
+            await failed.abort()
+        
+        table = document_service.chunk_adjacency.load(doc_id)
+        assert table.chunk_ids == [chunk.id for chunk in chunks]
+        assert table.next(chunks[0].id) == chunks[1].id
+        assert table.previous(chunks[2].id) == chunks[1].id
+
+    
+    @pytest.mark.asyncio
+    async def test_delete_documents_bulk(self, document_service):
+        """测试批量删除：向量按批删除，文件并行删除，数据库记录一次删除"""
+        doc_ids = [str(uuid.uuid4()) for _ in range(3)]
+        db_docs = [Mock(id=doc_id, file_type="txt") for doc_id in doc_ids]
+        for doc_id in doc_ids:
+            (document_service.storage_dir / f"{doc_id}.txt").write_text("内容")
+        missing_id = str(uuid.uuid4())
+        
+        crud = document_service.document_crud
+        crud.get_documents_by_ids = Mock(return_value=db_docs)
+        crud.get_aliases_of_documents = Mock(return_value=[])
+        crud.delete_documents = Mock(return_value=3)
+        document_service.delete_batch_size = 2
+        progress = AsyncMock()
+        
+        with patch.object(document_service.vector_service, 'delete_documents_vectors',
+                          new_callable=AsyncMock, return_value=True) as mock_delete_vectors:
+            summary = await document_service.delete_documents(doc_ids + [missing_id], report_progress=progress)
+        
+        assert summary == {"deleted_count": 3, "failed_count": 1, "failed_documents": [missing_id]}
+        assert [call.args[0] for call in mock_delete_vectors.call_args_list] == [doc_ids[:2], doc_ids[2:]]
+        crud.delete_documents.assert_called_once_with(doc_ids)
+        crud.delete_document.assert_not_called()
+        assert not any(document_service.storage_dir.glob("*.txt"))
+        assert progress.call_args_list[-1].args == (1.0, "completed")
+    
+    @pytest.mark.asyncio
+    async def test_delete_documents_promotes_surviving_alias(self, document_service):
+        """测试有别名不在删除范围内的原文档逐个删除并由别名接管"""
+        original_id = str(uuid.uuid4())
+        other_id = str(uuid.uuid4())
+        alias = Mock(id=str(uuid.uuid4()), alias_of=original_id)
+        
+        crud = document_service.document_crud
+        crud.get_documents_by_ids = Mock(return_value=[
+            Mock(id=original_id, file_type="txt"), Mock(id=other_id, file_type="txt")
+        ])
+        crud.get_aliases_of_documents = Mock(return_value=[alias])
+        crud.delete_documents = Mock(return_value=1)
+        
+        with patch.object(document_service.vector_service, 'delete_documents_vectors',
+                          new_callable=AsyncMock, return_value=True), \
+             patch.object(document_service, 'delete_document', new_callable=AsyncMock,
+                          return_value=True) as mock_delete_document:
+            summary = await document_service.delete_documents([original_id, other_id])
+        
+        assert summary["deleted_count"] == 2
+        crud.delete_documents.assert_called_once_with([other_id])
+        mock_delete_document.assert_called_once_with(original_id)
+    
+    @pytest.mark.asyncio
+    async def test_delete_documents_database_failure(self, document_service):
+        """测试数据库批量删除失败时全部计为失败"""
+        doc_ids = [str(uuid.uuid4()) for _ in range(2)]
+        
+        crud = document_service.document_crud
+        crud.get_documents_by_ids = Mock(return_value=[Mock(id=doc_id, file_type="txt") for doc_id in doc_ids])
+        crud.get_aliases_of_documents = Mock(return_value=[])
+        crud.delete_documents = Mock(side_effect=DocumentError("数据库错误"))
+        
+        with patch.object(document_service.vector_service, 'delete_documents_vectors',
+                          new_callable=AsyncMock, return_value=True):
+            summary = await document_service.delete_documents(doc_ids)
+        
+        assert summary["deleted_count"] == 0
+        assert summary["failed_documents"] == doc_ids
+
 
 class TestDocumentServiceIntegration:
     """文档服务集成测试"""
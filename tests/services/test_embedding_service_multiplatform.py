@@ -3,6 +3,7 @@
 """
 import pytest
 import asyncio
+import numpy as np
 from unittest.mock import Mock, AsyncMock, patch
 from typing import Dict, Any, List
 
@@ -442,6 +443,44 @@ class TestEmbeddingServiceMultiPlatform:
             mock_embedding.embed_query.assert_called_once_with(query)
             
             await embedding_service.cleanup()
+    
+    @pytest.mark.asyncio
+    async def test_vectorize_texts_with_cache(self, embedding_config):
+        """测试启用向量缓存后重复文本只向量化一次"""
+        embedding_config['cache_max_mb'] = 1
+        with patch.object(EmbeddingFactory, 'create_embedding') as mock_create_embedding:
+            mock_embedding = AsyncMock()
+            mock_embedding.initialize = AsyncMock()
+            mock_embedding.cleanup = AsyncMock()
+            mock_embedding.get_embedding_dimension = Mock(return_value=1024)
+            mock_embedding.embed_texts = AsyncMock(
+                side_effect=lambda texts: [[float(len(text))] * 1024 for text in texts]
+            )
+            
+            mock_create_embedding.return_value = mock_embedding
+            
+            embedding_service = EmbeddingService(embedding_config)
+            embedding_service._embedding_cache.clear()
+            await embedding_service.initialize()
+            
+            first = await embedding_service.vectorize_texts(["缓存文本一", "缓存文本二二", "缓存文本一"])
+            second = await embedding_service.vectorize_texts(["缓存文本二二", "缓存文本三三三"])
+            
+            # 验证结果与输入顺序一致
+            assert [emb[0] for emb in first] == [5.0, 6.0, 5.0]
+            assert [emb[0] for emb in second] == [6.0, 7.0]
+            
+            # 验证只对未命中的不同文本调用嵌入模型
+            assert mock_embedding.embed_texts.call_args_list[0].args[0] == ["缓存文本一", "缓存文本二二"]
+            assert mock_embedding.embed_texts.call_args_list[1].args[0] == ["缓存文本三三三"]
+            
+            # 验证向量以float32数组缓存并按字节数计量
+            cached = embedding_service._embedding_cache.get(embedding_service._embedding_cache_key("缓存文本一"))
+            assert cached.dtype == np.float32
+            assert embedding_service._embedding_cache.get_stats()['bytes'] == 3 * 1024 * 4
+            
+            embedding_service._embedding_cache.clear()
+            await embedding_service.cleanup()
 
 
 if __name__ == "__main__":
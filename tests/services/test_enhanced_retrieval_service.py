@@ -352,6 +352,43 @@ class TestEnhancedRetrievalService:
             assert "搜索失败" in result['error']
             assert result['test_query'] == "测试查询"
     
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_searches_coalesced(self, enhanced_service, mock_search_router, sample_results):
+        """测试相同查询的并发检索只执行一次"""
+        async def slow_search(**kwargs):
+            await asyncio.sleep(0.05)
+            return sample_results
+        
+        mock_search_router.search_with_mode.side_effect = slow_search
+        coalesced_before = enhanced_service.single_flight.stats['coalesced']
+        
+        with patch.object(enhanced_service, 'search_router', mock_search_router):
+            outcomes = await asyncio.gather(
+                *[enhanced_service.search_with_config("测试查询") for _ in range(5)]
+            )
+        
+        assert mock_search_router.search_with_mode.call_count == 1
+        assert all(results == sample_results for results in outcomes)
+        coalesced = enhanced_service.get_search_statistics()['single_flight_statistics']['coalesced']
+        assert coalesced - coalesced_before == 4
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_with_different_config_not_coalesced(self, enhanced_service, mock_search_router, sample_results):
+        """测试不同配置的并发检索分别执行"""
+        async def slow_search(**kwargs):
+            await asyncio.sleep(0.01)
+            return sample_results
+        
+        mock_search_router.search_with_mode.side_effect = slow_search
+        
+        with patch.object(enhanced_service, 'search_router', mock_search_router):
+            await asyncio.gather(
+                enhanced_service.search_with_config("测试查询", RetrievalConfig(top_k=5)),
+                enhanced_service.search_with_config("测试查询", RetrievalConfig(top_k=10))
+            )
+        
+        assert mock_search_router.search_with_mode.call_count == 2
+    
     @pytest.mark.asyncio
     async def test_search_with_config_failure(self, enhanced_service, mock_search_router):
         """测试配置化搜索失败"""
@@ -0,0 +1,280 @@
+"""
+文档入库任务队列测试
+"""
+
+import pytest
+import pytest_asyncio
+import asyncio
+import uuid
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from rag_system.database.models import DocumentStatus as DBDocumentStatus
+from rag_system.models.document import DocumentInfo, DocumentStatus
+from rag_system.services import ingestion_queue
+from rag_system.services.ingestion_queue import (
+    IngestionQueue, IngestionJobStore, JobStatus,
+    get_ingestion_queue, start_global_ingestion_queue, stop_global_ingestion_queue
+)
+
+
+@pytest.fixture
+def queue_url(tmp_path):
+    """任务数据库地址"""
+    return f"sqlite:///{tmp_path / 'jobs' / 'ingestion_jobs.db'}"
+
+
+@pytest.fixture
+def queue_config(queue_url):
+    """队列配置"""
+    return {
+        'ingestion_queue_url': queue_url,
+        'ingestion_workers': 2,
+        'ingestion_max_attempts': 3,
+        'ingestion_retry_backoff': 0.01,
+        'ingestion_poll_interval': 0.01
+    }
+
+
+async def wait_for_status(queue, job_id, expected, timeout=2.0):
+    """等待任务进入指定状态"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        job = await queue.get_job(job_id)
+        if job['status'] == expected:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"任务状态未变为{expected}: {job}")
+
+
+class TestIngestionJobStore:
+    """任务存储测试"""
+
+    @pytest_asyncio.fixture
+    async def store(self, queue_url):
+        store = IngestionJobStore(queue_url)
+        await store.initialize()
+        yield store
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_create_and_claim(self, store):
+        """测试登记和领取任务"""
+        job = await store.create_job("doc1", {'file_path': '/tmp/a.txt'}, max_attempts=3)
+
+        assert job['status'] == JobStatus.PENDING.value
+        assert job['payload'] == {'file_path': '/tmp/a.txt'}
+
+        claimed = await store.claim_next_job()
+        assert claimed['id'] == job['id']
+        assert claimed['status'] == JobStatus.RUNNING.value
+        assert claimed['attempts'] == 1
+
+        # 已领取的任务不会被再次领取
+        assert await store.claim_next_job() is None
+
+    @pytest.mark.asyncio
+    async def test_retry_delay_and_recovery(self, store):
+        """测试延迟重试和中断任务恢复"""
+        job = await store.create_job("doc1", {}, max_attempts=3)
+        await store.claim_next_job()
+
+        await store.mark_retry(job['id'], "error", delay=60)
+        assert await store.claim_next_job() is None
+
+        other = await store.create_job("doc2", {}, max_attempts=3)
+        await store.claim_next_job()
+        assert await store.recover_running_jobs() == 1
+
+        recovered = await store.get_job(other['id'])
+        assert recovered['status'] == JobStatus.PENDING.value
+        assert recovered['stage'] == "recovered"
+
+        counts = await store.count_by_status()
+        assert counts[JobStatus.PENDING.value] == 2
+        assert counts[JobStatus.RUNNING.value] == 0
+
+
+class TestIngestionQueue:
+    """入库队列测试"""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_and_process(self, queue_config):
+        """测试登记后由工作协程处理并上报进度"""
+        progress_seen = []
+
+        async def handler(job, report_progress):
+            await report_progress(0.5, "processing")
+            progress_seen.append(job['document_id'])
+
+        queue = IngestionQueue(queue_config, handler=handler)
+        await queue.initialize()
+        await queue.start()
+        try:
+            job = await queue.enqueue("doc1", {'filename': 'a.txt'})
+            done = await wait_for_status(queue, job['id'], JobStatus.SUCCEEDED.value)
+
+            assert progress_seen == ["doc1"]
+            assert done['progress'] == 1
+            assert done['stage'] == "completed"
+            assert (await queue.get_document_job("doc1"))['id'] == job['id']
+
+            stats = await queue.get_stats()
+            assert stats['succeeded'] == 1
+            assert stats['jobs'][JobStatus.SUCCEEDED.value] == 1
+        finally:
+            await queue.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_retry_then_succeed(self, queue_config):
+        """测试失败后按退避重试"""
+        handler = AsyncMock(side_effect=[Exception("embedding timeout"), None])
+
+        queue = IngestionQueue(queue_config, handler=handler)
+        await queue.initialize()
+        await queue.start()
+        try:
+            job = await queue.enqueue("doc1")
+            done = await wait_for_status(queue, job['id'], JobStatus.SUCCEEDED.value)
+
+            assert done['attempts'] == 2
+            assert handler.call_count == 2
+            assert queue.stats['retried'] == 1
+        finally:
+            await queue.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_failure_after_max_attempts(self, queue_config):
+        """测试重试耗尽后标记失败并回调"""
+        handler = AsyncMock(side_effect=Exception("bad file"))
+        failure_handler = AsyncMock()
+
+        queue = IngestionQueue(queue_config, handler=handler, failure_handler=failure_handler)
+        await queue.initialize()
+        await queue.start()
+        try:
+            job = await queue.enqueue("doc1")
+            failed = await wait_for_status(queue, job['id'], JobStatus.FAILED.value)
+
+            assert failed['attempts'] == 3
+            assert failed['error'] == "bad file"
+            failure_handler.assert_called_once()
+            assert failure_handler.call_args[0][1] == "bad file"
+        finally:
+            await queue.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_workers_process_concurrently(self, queue_config):
+        """测试多个工作协程并发处理"""
+        running = 0
+        max_running = 0
+
+        async def handler(job, report_progress):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+
+        queue = IngestionQueue(queue_config, handler=handler)
+        await queue.initialize()
+        await queue.start()
+        try:
+            jobs = [await queue.enqueue(f"doc{i}") for i in range(4)]
+            for job in jobs:
+                await wait_for_status(queue, job['id'], JobStatus.SUCCEEDED.value)
+
+            assert max_running == 2
+        finally:
+            await queue.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_restart_recovers_running_jobs(self, queue_config):
+        """测试重启后恢复上次中断的任务"""
+        started = asyncio.Event()
+
+        async def hanging_handler(job, report_progress):
+            started.set()
+            await asyncio.sleep(60)
+
+        queue = IngestionQueue(queue_config, handler=hanging_handler)
+        await queue.initialize()
+        await queue.start()
+        job = await queue.enqueue("doc1")
+        await asyncio.wait_for(started.wait(), timeout=2)
+        # 模拟进程中断：任务停留在运行中
+        await queue.cleanup()
+        assert (await queue.get_job(job['id']))['status'] == JobStatus.RUNNING.value
+
+        handler = AsyncMock()
+        restarted = IngestionQueue(queue_config, handler=handler)
+        await restarted.initialize()
+        await restarted.start()
+        try:
+            done = await wait_for_status(restarted, job['id'], JobStatus.SUCCEEDED.value)
+
+            assert restarted.stats['recovered'] == 1
+            assert done['attempts'] == 2
+            handler.assert_called_once()
+        finally:
+            await restarted.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_start_requires_handler(self, queue_config):
+        """测试未设置处理函数时无法启动"""
+        queue = IngestionQueue(queue_config)
+        await queue.initialize()
+
+        with pytest.raises(ValueError):
+            await queue.start()
+
+
+class TestGlobalIngestionQueue:
+    """全局入库队列测试"""
+
+    @pytest.mark.asyncio
+    async def test_start_global_queue_processes_documents(self, queue_config, tmp_path):
+        """测试全局队列使用SQLite文档记录启动，并把登记的文档处理为就绪"""
+        config = {
+            **queue_config,
+            'storage_dir': str(tmp_path / "documents"),
+            'vector_store_type': 'chroma',
+            'vector_store_path': str(tmp_path / "chroma"),
+            'collection_name': 'ingestion_queue',
+            'embedding_provider': 'mock',
+            'embedding_dimensions': 64,
+            'chunk_size': 200,
+            'chunk_overlap': 20,
+            'min_chunk_size': 10,
+            'process_pool_workers': 0,
+            'database_url': f"sqlite:///{tmp_path / 'db' / 'documents.db'}"
+        }
+        file_path = tmp_path / "intro.txt"
+        file_path.write_text("RAG系统把检索到的文档片段交给大模型生成答案。" * 20, encoding='utf-8')
+
+        queue = await start_global_ingestion_queue(config)
+        try:
+            assert get_ingestion_queue() is queue
+            assert queue.is_running
+
+            document_service = ingestion_queue._global_ingestion_document_service
+            doc_info = DocumentInfo(
+                id=str(uuid.uuid4()),
+                filename="intro.txt",
+                file_type="txt",
+                file_size=file_path.stat().st_size,
+                file_path=str(file_path),
+                upload_time=datetime.now(),
+                status=DocumentStatus.PROCESSING
+            )
+            document_service.document_crud.create_document(doc_info)
+            job = await queue.enqueue(doc_info.id, {'file_path': str(file_path), 'filename': "intro.txt"})
+
+            await wait_for_status(queue, job['id'], JobStatus.SUCCEEDED.value, timeout=30.0)
+            record = document_service.document_crud.get_document(doc_info.id)
+            assert record.status == DBDocumentStatus.READY
+            assert record.chunk_count > 0
+        finally:
+            await stop_global_ingestion_queue()
+
+        assert get_ingestion_queue() is None
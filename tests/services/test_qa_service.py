@@ -3,6 +3,7 @@
 """
 import pytest
 import pytest_asyncio
+import asyncio
 import tempfile
 import uuid
 from unittest.mock import Mock, AsyncMock, patch
@@ -348,6 +349,42 @@ class TestQAService:
         # 验证提示词长度被限制
         assert len(prompt) < len(long_content) + 200  # 应该比原始内容短很多
     
+    @pytest.mark.asyncio
+    async def test_expand_context_with_adjacent_chunks(self, qa_service, tmp_path):
+        """测试按邻接表把命中块扩展到相邻的块，且不超过上下文长度限制"""
+        from rag_system.models.document import TextChunk
+        from rag_system.services.chunk_adjacency import ChunkAdjacencyStore
+        
+        doc_id = str(uuid.uuid4())
+        chunks = [
+            TextChunk(document_id=doc_id, content=f"第{i}段：" + "内容" * 20, chunk_index=i)
+            for i in range(5)
+        ]
+        qa_service.chunk_adjacency = ChunkAdjacencyStore(str(tmp_path / "adjacency"))
+        qa_service.chunk_adjacency.save(doc_id, chunks)
+        texts = {chunk.id: chunk.content for chunk in chunks}
+        qa_service.retrieval_service.get_chunk_texts = AsyncMock(
+            side_effect=lambda chunk_ids: {chunk_id: texts[chunk_id] for chunk_id in chunk_ids}
+        )
+        hit = SearchResult(
+            chunk_id=chunks[2].id,
+            document_id=doc_id,
+            content=chunks[2].content,
+            similarity_score=0.9,
+            metadata={"chunk_index": 2}
+        )
+        
+        expanded = await qa_service._expand_context([hit])
+        
+        assert expanded[0].content == "\n".join(chunk.content for chunk in chunks[1:4])
+        assert expanded[0].metadata['expanded_chunk_ids'] == [chunk.id for chunk in chunks[1:4]]
+        assert hit.content == chunks[2].content
+        qa_service.retrieval_service.get_chunk_texts.assert_awaited_once()
+        
+        # 上下文长度只够命中块时不扩展
+        qa_service.max_context_length = len(hit.content) + 20
+        assert (await qa_service._expand_context([hit]))[0].content == hit.content
+    
     def test_post_process_answer(self, qa_service):
         """测试答案后处理"""
         # 测试去除前缀
@@ -573,4 +610,111 @@ class TestQAServiceIntegration:
             
         finally:
             import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
\ No newline at end of file
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestQAServiceSingleFlight:
+    """相同问题并发请求合并测试"""
+    
+    @pytest.fixture
+    def service(self):
+        """未初始化外部依赖的QA服务"""
+        service = QAService({'llm_provider': 'mock', 'llm_model': 'test-llm'})
+        service.no_answer_threshold = 0.5
+        return service
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_questions_coalesced(self, service, sample_search_results):
+        """测试相同问题的并发请求只执行一次检索和生成"""
+        async def slow_generate(question, context, **kwargs):
+            await asyncio.sleep(0.05)
+            return "共享答案"
+        
+        service.retrieve_context = AsyncMock(return_value=sample_search_results)
+        service.generate_answer = AsyncMock(side_effect=slow_generate)
+        
+        responses = await asyncio.gather(
+            *[service.answer_question("什么是人工智能？") for _ in range(4)]
+        )
+        
+        service.retrieve_context.assert_called_once()
+        service.generate_answer.assert_called_once()
+        assert all(response.answer == "共享答案" for response in responses)
+        # 每个请求获得独立的响应ID
+        assert len({response.id for response in responses}) == 4
+    
+    @pytest.mark.asyncio
+    async def test_different_llm_parameters_not_coalesced(self, service, sample_search_results):
+        """测试LLM参数不同的请求不合并"""
+        async def slow_generate(question, context, **kwargs):
+            await asyncio.sleep(0.01)
+            return "答案"
+        
+        service.retrieve_context = AsyncMock(return_value=sample_search_results)
+        service.generate_answer = AsyncMock(side_effect=slow_generate)
+        
+        await asyncio.gather(
+            service.answer_question("什么是人工智能？", temperature=0.1),
+            service.answer_question("什么是人工智能？", temperature=0.9)
+        )
+        
+        assert service.generate_answer.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_single_flight_disabled(self, service, sample_search_results):
+        """测试关闭请求合并"""
+        service.enable_single_flight = False
+        service.retrieve_context = AsyncMock(return_value=sample_search_results)
+        service.generate_answer = AsyncMock(return_value="答案")
+        
+        await asyncio.gather(
+            *[service.answer_question("什么是人工智能？") for _ in range(3)]
+        )
+        
+        assert service.generate_answer.call_count == 3
+
+
+
+class TestQAServiceCompletionCache:
+    """LLM补全缓存集成测试"""
+    
+    @pytest.fixture
+    def service(self):
+        """启用补全缓存的QA服务"""
+        service = QAService({
+            'llm_provider': 'mock',
+            'llm_model': 'completion-cache-test',
+            'llm_temperature': 0.0,
+            'enable_completion_cache': True
+        })
+        service.completion_cache.memory_cache.clear()
+        service.llm = Mock()
+        service.llm.generate_text = AsyncMock(return_value="缓存答案")
+        return service
+    
+    @pytest.mark.asyncio
+    async def test_identical_prompt_served_from_cache(self, service, sample_search_results):
+        """测试相同提示词只调用一次LLM"""
+        first = await service.generate_answer("什么是人工智能？", sample_search_results)
+        second = await service.generate_answer("什么是人工智能？", sample_search_results)
+        
+        assert first == second == "缓存答案"
+        service.llm.generate_text.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_sampling_temperature_bypasses_cache(self, service, sample_search_results):
+        """测试温度大于0时不使用缓存"""
+        await service.generate_answer("什么是人工智能？", sample_search_results, temperature=0.8)
+        await service.generate_answer("什么是人工智能？", sample_search_results, temperature=0.8)
+        
+        assert service.llm.generate_text.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_fallback_answer_not_cached(self, service, sample_search_results):
+        """测试LLM失败时的降级答案不写入缓存"""
+        service.enable_fallback = False
+        service.llm.generate_text.side_effect = Exception("LLM不可用")
+        
+        await service.generate_answer("什么是人工智能？", sample_search_results)
+        
+        assert len(service.completion_cache.memory_cache) == 0
@@ -0,0 +1,89 @@
+"""
+查询频率追踪器测试
+"""
+
+import pytest
+
+from rag_system.services.query_tracker import QueryFrequencyTracker
+
+
+class TestQueryFrequencyTracker:
+    """查询频率追踪器测试类"""
+    
+    @pytest.fixture
+    def tracker(self):
+        """追踪器fixture（关闭自动衰减）"""
+        return QueryFrequencyTracker(width=256, depth=4, capacity=3, decay_interval=0)
+    
+    def test_record_and_estimate(self, tracker):
+        """测试记录和估计访问次数"""
+        for _ in range(5):
+            tracker.record("q1")
+        tracker.record("q2")
+        
+        assert tracker.estimate("q1") == 5
+        assert tracker.estimate("q2") == 1
+        assert tracker.estimate("never-seen") == 0
+    
+    def test_top_orders_by_frequency(self, tracker):
+        """测试热点查询按频率降序返回"""
+        for key, count in [("a", 2), ("b", 7), ("c", 4)]:
+            for _ in range(count):
+                tracker.record(key, payload={'query': key})
+        
+        top = tracker.top(2)
+        
+        assert [item[0] for item in top] == ["b", "c"]
+        assert top[0][1] == 7
+        assert top[0][2] == {'query': "b"}
+    
+    def test_candidates_are_bounded(self, tracker):
+        """测试候选集合有界，高频查询替换低频查询"""
+        for key in ["a", "b", "c"]:
+            tracker.record(key)
+        for _ in range(5):
+            tracker.record("hot")
+        
+        keys = [item[0] for item in tracker.top(10)]
+        
+        assert len(keys) == 3
+        assert "hot" in keys
+        assert tracker.get_stats()['tracked_candidates'] == 3
+    
+    def test_memory_independent_of_distinct_queries(self, tracker):
+        """测试内存占用与不同查询数量无关"""
+        memory_before = tracker.get_stats()['memory_bytes']
+        for i in range(5000):
+            tracker.record(f"query-{i}")
+        
+        stats = tracker.get_stats()
+        assert stats['memory_bytes'] == memory_before
+        assert stats['tracked_candidates'] <= tracker.capacity
+        assert stats['total_records'] == 5000
+    
+    def test_decay(self, tracker):
+        """测试衰减降低历史计数并淘汰冷门候选"""
+        for _ in range(8):
+            tracker.record("hot")
+        tracker.record("cold")
+        
+        tracker.decay()
+        
+        assert tracker.estimate("hot") == 4
+        assert tracker.estimate("cold") == 0
+        assert [item[0] for item in tracker.top(10)] == ["hot"]
+    
+    def test_reset(self, tracker):
+        """测试清空计数"""
+        tracker.record("q1")
+        tracker.reset()
+        
+        assert tracker.estimate("q1") == 0
+        assert tracker.top(10) == []
+    
+    def test_invalid_parameters(self):
+        """测试无效参数"""
+        with pytest.raises(ValueError):
+            QueryFrequencyTracker(width=0)
+        with pytest.raises(ValueError):
+            QueryFrequencyTracker(decay_factor=1.5)
@@ -0,0 +1,96 @@
+"""
+进程内缓存持久化测试
+"""
+import gzip
+import json
+import pytest
+
+from rag_system.utils import memory_cache
+from rag_system.utils.cache_snapshot import (
+    SNAPSHOT_VERSION, compute_cache_fingerprint, save_cache_snapshot,
+    load_cache_snapshot, restore_cache_snapshot_in_background
+)
+from rag_system.utils.memory_cache import get_memory_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(monkeypatch):
+    """隔离全局内存缓存注册表"""
+    monkeypatch.setattr(memory_cache, '_global_memory_caches', {})
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """快照文件路径"""
+    return str(tmp_path / "cache" / "snapshot.json.gz")
+
+
+def _simulate_restart(monkeypatch):
+    """模拟进程重启：清空全局缓存"""
+    monkeypatch.setattr(memory_cache, '_global_memory_caches', {})
+
+
+class TestCacheSnapshot:
+    """缓存快照测试"""
+    
+    def test_fingerprint_depends_on_model_config(self):
+        """测试指纹随模型配置变化"""
+        config = {'embedding_model': 'bge-m3', 'llm_model': 'qwen', 'retrieval_top_k': 5}
+        fingerprint = compute_cache_fingerprint(config)
+        
+        assert fingerprint == compute_cache_fingerprint(dict(config))
+        assert fingerprint == compute_cache_fingerprint({**config, 'retrieval_top_k': 10})
+        assert fingerprint != compute_cache_fingerprint({**config, 'embedding_model': 'other'})
+    
+    def test_save_and_load(self, snapshot_path, monkeypatch):
+        """测试保存后在新进程中恢复"""
+        cache = get_memory_cache("llm_completion", max_entries=50, default_ttl=600)
+        cache.set("k1", "答案1")
+        cache.set("k2", {"nested": [1, 2]})
+        cache.set("skip", object())  # 不可序列化的值不持久化
+        
+        assert save_cache_snapshot(snapshot_path, "fp") == 2
+        with gzip.open(snapshot_path, 'rt', encoding='utf-8') as f:
+            assert json.load(f)['version'] == SNAPSHOT_VERSION
+        
+        _simulate_restart(monkeypatch)
+        assert load_cache_snapshot(snapshot_path, "fp") == 2
+        
+        restored = get_memory_cache("llm_completion")
+        assert restored.max_entries == 50
+        assert restored.default_ttl == 600
+        assert restored.get("k1") == "答案1"
+        assert restored.get("k2") == {"nested": [1, 2]}
+    
+    def test_fingerprint_mismatch_invalidates(self, snapshot_path, monkeypatch):
+        """测试指纹变化时快照失效"""
+        get_memory_cache("llm_completion").set("k1", "答案1")
+        save_cache_snapshot(snapshot_path, "old")
+        
+        _simulate_restart(monkeypatch)
+        
+        assert load_cache_snapshot(snapshot_path, "new") == 0
+        assert "llm_completion" not in memory_cache.get_memory_caches()
+    
+    def test_version_mismatch_and_corrupt_file(self, tmp_path):
+        """测试版本不匹配或文件损坏时忽略快照"""
+        with gzip.open(tmp_path / "v0.gz", 'wt', encoding='utf-8') as f:
+            json.dump({'version': SNAPSHOT_VERSION + 1, 'fingerprint': 'fp', 'caches': {}}, f)
+        assert load_cache_snapshot(str(tmp_path / "v0.gz"), "fp") == 0
+        
+        (tmp_path / "corrupt.gz").write_bytes(b"not gzip")
+        assert load_cache_snapshot(str(tmp_path / "corrupt.gz"), "fp") == 0
+        
+        assert load_cache_snapshot(str(tmp_path / "missing.gz"), "fp") == 0
+    
+    @pytest.mark.asyncio
+    async def test_restore_in_background(self, snapshot_path, monkeypatch):
+        """测试后台恢复"""
+        get_memory_cache("llm_completion").set("k1", "答案1")
+        save_cache_snapshot(snapshot_path, "fp")
+        _simulate_restart(monkeypatch)
+        
+        task = restore_cache_snapshot_in_background(snapshot_path, "fp")
+        
+        assert await task == 1
+        assert get_memory_cache("llm_completion").get("k1") == "答案1"
@@ -0,0 +1,154 @@
+"""
+按负载类型划分的线程池测试
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rag_system.utils.executors import (
+    PRIORITY_INTERACTIVE, PRIORITY_NORMAL, VECTOR_READ, WorkloadExecutor,
+    get_executor, get_executor_stats
+)
+
+
+@pytest.fixture
+def executor():
+    executor = WorkloadExecutor("test", max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def block(executor):
+    """占住单线程线程池，返回放行事件"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def wait():
+        started.set()
+        release.wait(5)
+
+    executor.submit(wait)
+    started.wait(5)
+    return release
+
+
+class TestWorkloadExecutor:
+    """具名线程池测试"""
+
+    @pytest.mark.asyncio
+    async def test_run_returns_result(self, executor):
+        """测试执行同步函数并返回结果和异常"""
+        assert await executor.run(sum, [1, 2, 3]) == 6
+
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+
+        stats = executor.get_stats()
+        assert stats['completed'] == 1
+        assert stats['failed'] == 1
+
+    @pytest.mark.asyncio
+    async def test_run_in_executor_compatible(self, executor):
+        """测试可作为 run_in_executor 的线程池"""
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(executor, max, 3, 7) == 7
+
+    def test_interactive_tasks_run_first(self, executor):
+        """测试排队中的交互任务先于普通任务执行"""
+        order = []
+        release = block(executor)
+
+        futures = [
+            executor.submit_with_priority(PRIORITY_NORMAL, order.append, "normal-1"),
+            executor.submit_with_priority(PRIORITY_NORMAL, order.append, "normal-2"),
+            executor.submit_with_priority(PRIORITY_INTERACTIVE, order.append, "interactive"),
+        ]
+        release.set()
+        for future in futures:
+            future.result(5)
+
+        assert order == ["interactive", "normal-1", "normal-2"]
+
+    def test_queue_depth_and_wait_time(self, executor):
+        """测试记录队列深度和排队等待时间"""
+        release = block(executor)
+        futures = [executor.submit(time.sleep, 0) for _ in range(3)]
+
+        stats = executor.get_stats()
+        assert stats['queue_depth'] == 3
+        assert stats['active'] == 1
+
+        time.sleep(0.05)
+        release.set()
+        for future in futures:
+            future.result(5)
+
+        stats = executor.get_stats()
+        assert stats['queue_depth'] == 0
+        assert stats['peak_queue_depth'] == 3
+        assert stats['submitted'] == 4
+        assert stats['max_wait_ms'] >= 40
+
+    def test_background_yields_to_interactive(self):
+        """测试后台线程池在有交互任务进行时先让出"""
+        interactive = WorkloadExecutor("interactive", max_workers=1)
+        background = WorkloadExecutor("background", max_workers=1, background=True, background_yield=5)
+        order = []
+        try:
+            started = threading.Event()
+            release = threading.Event()
+
+            def search():
+                started.set()
+                release.wait(5)
+                order.append("search")
+
+            search_future = interactive.submit_with_priority(PRIORITY_INTERACTIVE, search)
+            started.wait(5)
+            write_future = background.submit(order.append, "write")
+
+            time.sleep(0.05)
+            assert order == []
+            release.set()
+            search_future.result(5)
+            write_future.result(5)
+
+            assert order == ["search", "write"]
+            assert background.get_stats()['yielded'] == 1
+        finally:
+            interactive.shutdown()
+            background.shutdown()
+
+    def test_max_workers(self):
+        """测试线程数不超过上限"""
+        executor = WorkloadExecutor("bounded", max_workers=2)
+        try:
+            futures = [executor.submit(time.sleep, 0.01) for _ in range(10)]
+            for future in futures:
+                future.result(5)
+            assert executor.get_stats()['threads'] == 2
+        finally:
+            executor.shutdown()
+
+    def test_shutdown_rejects_new_tasks(self, executor):
+        """测试关闭后拒绝提交"""
+        executor.shutdown()
+        with pytest.raises(RuntimeError):
+            executor.submit(time.sleep, 0)
+
+
+class TestGlobalExecutors:
+    """全局线程池测试"""
+
+    def test_get_executor_shared(self):
+        """测试同一负载类型共用一个线程池，线程数以首次创建为准"""
+        executor = get_executor(VECTOR_READ)
+        max_workers = executor.max_workers
+        assert get_executor(VECTOR_READ, max_workers=max_workers + 1) is executor
+        assert executor.max_workers == max_workers
+
+        stats = get_executor_stats()
+        assert VECTOR_READ in stats['executors']
+        assert 'queue_depth' in stats['executors'][VECTOR_READ]
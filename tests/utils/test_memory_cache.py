@@ -0,0 +1,107 @@
+"""
+进程内缓存测试
+"""
+import pytest
+import time
+
+from rag_system.utils.memory_cache import MemoryCache, get_memory_cache
+
+
+class TestMemoryCache:
+    """内存缓存测试"""
+    
+    def test_set_and_get(self):
+        """测试写入和读取"""
+        cache = MemoryCache(max_entries=10)
+        cache.set("key", {"value": 1})
+        
+        assert cache.get("key") == {"value": 1}
+        assert cache.get("missing") is None
+        assert cache.stats['hits'] == 1
+        assert cache.stats['misses'] == 1
+    
+    def test_lru_eviction(self):
+        """测试超出上限时淘汰最久未使用的条目"""
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # a成为最近使用
+        cache.set("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats['evictions'] == 1
+    
+    def test_byte_limit_eviction(self):
+        """测试按占用字节数淘汰和调整容量"""
+        cache = MemoryCache(max_entries=100, max_bytes=10, size_of=len)
+        cache.set("a", b"1234")
+        cache.set("b", b"5678")
+        cache.set("a", b"12")  # 覆盖时扣减旧值的字节数
+        cache.set("c", b"abcd")
+        
+        assert cache.get_stats()['bytes'] == 10
+        assert cache.stats['evictions'] == 0
+        
+        cache.set("d", b"xyz")
+        assert cache.get("b") is None
+        assert cache.get_stats()['bytes'] == 9
+        
+        cache.resize(max_bytes=4)
+        assert len(cache) == 1
+        assert cache.get("d") == b"xyz"
+    
+    def test_byte_limit_requires_size_of(self):
+        """测试按字节数限制时必须提供计算大小的函数"""
+        with pytest.raises(ValueError):
+            MemoryCache(max_bytes=10)
+    
+    def test_ttl_expiry(self):
+        """测试条目过期"""
+        cache = MemoryCache(max_entries=10, default_ttl=0.05)
+        cache.set("short", 1)
+        cache.set("long", 2, ttl=60)
+        
+        time.sleep(0.1)
+        
+        assert cache.get("short") is None
+        assert cache.get("long") == 2
+    
+    def test_delete_and_clear(self):
+        """测试删除和清空"""
+        cache = MemoryCache(max_entries=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        
+        assert cache.delete("a") is True
+        assert cache.delete("a") is False
+        assert cache.clear() == 1
+        assert len(cache) == 0
+    
+    def test_snapshot_and_restore(self):
+        """测试快照导出和恢复保持LRU顺序并跳过过期条目"""
+        cache = MemoryCache(max_entries=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("expired", 3, ttl=0.01)
+        cache.get("a")  # a成为最近使用
+        time.sleep(0.02)
+        
+        entries = cache.snapshot()
+        assert [entry[0] for entry in entries] == ["b", "a"]
+        
+        restored = MemoryCache(max_entries=2)
+        restored.set("a", 100)  # 启动后写入的值优先
+        assert restored.restore(entries + [("old", time.time() - 1, 4)]) == 1
+        # 恢复的条目排在启动后写入的条目之前
+        assert [entry[0] for entry in restored.snapshot()] == ["b", "a"]
+        assert restored.get("a") == 100
+        assert restored.get("b") == 2
+    
+    def test_get_memory_cache_shared_by_name(self):
+        """测试按名称共享全局缓存"""
+        cache = get_memory_cache("test_shared", max_entries=5)
+        
+        assert get_memory_cache("test_shared") is cache
+        assert cache.max_entries == 5
@@ -0,0 +1,108 @@
+"""
+请求合并（single-flight）测试
+"""
+import pytest
+import asyncio
+
+from rag_system.utils.single_flight import SingleFlight, get_single_flight
+
+
+class TestSingleFlight:
+    """请求合并测试"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """测试相同键的并发调用只执行一次"""
+        flight = SingleFlight()
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "result"
+        
+        outcomes = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+        
+        assert calls == 1
+        assert [result for result, _ in outcomes] == ["result"] * 5
+        assert [shared for _, shared in outcomes].count(False) == 1
+        assert flight.get_stats() == {'leaders': 1, 'coalesced': 4, 'inflight': 0}
+    
+    @pytest.mark.asyncio
+    async def test_different_keys_execute_separately(self):
+        """测试不同键分别执行"""
+        flight = SingleFlight()
+        
+        async def work_a():
+            await asyncio.sleep(0.01)
+            return "a"
+        
+        async def work_b():
+            await asyncio.sleep(0.01)
+            return "b"
+        
+        (result_a, shared_a), (result_b, shared_b) = await asyncio.gather(
+            flight.do("a", work_a), flight.do("b", work_b)
+        )
+        
+        assert (result_a, result_b) == ("a", "b")
+        assert not shared_a and not shared_b
+    
+    @pytest.mark.asyncio
+    async def test_sequential_calls_execute_again(self):
+        """测试完成后的调用重新执行"""
+        flight = SingleFlight()
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+        
+        assert await flight.do("key", work) == (1, False)
+        assert await flight.do("key", work) == (2, False)
+        assert flight.inflight_count() == 0
+    
+    @pytest.mark.asyncio
+    async def test_exception_propagates_to_all_waiters(self):
+        """测试leader的异常传递给所有等待者"""
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("失败")
+        
+        outcomes = await asyncio.gather(
+            *[flight.do("key", work) for _ in range(3)],
+            return_exceptions=True
+        )
+        
+        assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+        assert flight.inflight_count() == 0
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        """测试leader调用方被取消时follower仍能获得结果"""
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.05)
+            return "result"
+        
+        leader = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        
+        leader.cancel()
+        
+        assert await follower == ("result", True)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    
+    def test_get_single_flight_returns_shared_group(self):
+        """测试按名称获取共享的全局合并组"""
+        assert get_single_flight("shared") is get_single_flight("shared")
+        assert get_single_flight("shared") is not get_single_flight("other")
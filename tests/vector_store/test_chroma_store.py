@@ -9,6 +9,7 @@ import os
 import uuid
 from typing import List
 import asyncio
+from unittest.mock import patch
 
 from rag_system.models.config import VectorStoreConfig
 from rag_system.models.vector import Vector, SearchResult
@@ -205,6 +206,31 @@ class TestChromaVectorStore:
         assert len(results) == 1
         assert results[0].metadata.get("updated") is True
     
+    @pytest.mark.asyncio
+    async def test_update_vectors_incremental(self, chroma_store, sample_vectors):
+        """测试增量更新只写入新增向量、移除消失的向量"""
+        await chroma_store.add_vectors(sample_vectors)
+        document_id = sample_vectors[0].document_id
+        added = Vector(
+            id=str(uuid.uuid4()),
+            document_id=document_id,
+            chunk_id=str(uuid.uuid4()),
+            embedding=[0.5, 0.6, 0.7, 0.8],
+            metadata={"chunk_index": 3, "content": "new content"}
+        )
+        
+        with patch.object(chroma_store, 'add_vectors', wraps=chroma_store.add_vectors) as mock_add:
+            result = await chroma_store.update_vectors(document_id, sample_vectors[1:] + [added])
+            
+            assert result is True
+            mock_add.assert_called_once_with([added])
+        
+        existing = await chroma_store.get_document_vectors(document_id)
+        assert set(existing) == {sample_vectors[1].id, sample_vectors[2].id, added.id}
+        
+        assert await chroma_store.update_vector_metadata([added.id], [{"chunk_index": 0}]) == 1
+        assert (await chroma_store.get_document_vectors(document_id))[added.id]["chunk_index"] == 0
+    
     @pytest.mark.asyncio
     async def test_get_vector_count(self, chroma_store, sample_vectors):
         """测试获取向量数量"""
@@ -337,4 +363,287 @@ class TestChromaVectorStore:
         ]
         
         result = await chroma_store.add_vectors(invalid_vectors2)
-        assert result is False
\ No newline at end of file
+        assert result is False
+
+class TestChromaSharedVectors:
+    """共享向量（块级去重）测试"""
+    
+    @pytest.fixture
+    def shared_vectors(self):
+        """带文本哈希的向量"""
+        doc_id = str(uuid.uuid4())
+        return doc_id, [
+            Vector(
+                id=str(uuid.uuid4()),
+                document_id=doc_id,
+                chunk_id=str(uuid.uuid4()),
+                embedding=[0.1, 0.2, 0.3, float(i + 1)],
+                metadata={"content": f"shared content {i}", "text_hash": f"hash{i}"}
+            )
+            for i in range(2)
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_find_by_text_hashes(self, chroma_store, shared_vectors):
+        """测试按文本哈希查找已有向量"""
+        _, vectors = shared_vectors
+        await chroma_store.add_vectors(vectors)
+        
+        found = await chroma_store.find_by_text_hashes(["hash0", "missing"])
+        
+        assert found == {"hash0": vectors[0].id}
+        assert await chroma_store.find_by_text_hashes([]) == {}
+    
+    @pytest.mark.asyncio
+    async def test_shared_vector_survives_owner_deletion(self, chroma_store, shared_vectors):
+        """测试共享向量在原文档删除后仍归属其他文档"""
+        doc_id, vectors = shared_vectors
+        other_doc_id = str(uuid.uuid4())
+        await chroma_store.add_vectors(vectors)
+        
+        assert await chroma_store.add_document_references([vectors[0].id], other_doc_id) == 1
+        # 重复添加归属不会改变
+        assert await chroma_store.add_document_references([vectors[0].id], other_doc_id) == 0
+        
+        await chroma_store.delete_vectors(doc_id)
+        
+        assert await chroma_store.get_vector_count() == 1
+        results = await chroma_store.search_similar([0.5, 0.1, 0.3, 1.0], top_k=5)
+        assert results[0].document_id == other_doc_id
+        assert results[0].metadata["document_ids"] == other_doc_id
+        
+        await chroma_store.delete_vectors(other_doc_id)
+        assert await chroma_store.get_vector_count() == 0
+    
+    @pytest.mark.asyncio
+    async def test_share_document_vectors(self, chroma_store, shared_vectors):
+        """测试别名文档共享原文档的全部向量"""
+        doc_id, vectors = shared_vectors
+        alias_id = str(uuid.uuid4())
+        await chroma_store.add_vectors(vectors)
+        
+        assert await chroma_store.share_document_vectors(doc_id, alias_id) == 2
+        
+        # 删除别名只移除归属
+        await chroma_store.delete_vectors(alias_id)
+        assert await chroma_store.get_vector_count() == 2
+        results = await chroma_store.search_similar([0.5, 0.1, 0.3, 1.0], top_k=5)
+        assert all(result.metadata["document_ids"] == doc_id for result in results)
+
+    
+    @pytest.mark.asyncio
+    async def test_delete_documents_vectors(self, chroma_store, shared_vectors):
+        """测试批量删除多个文档的向量，共享向量在全部归属文档删除后才删除"""
+        doc_id, vectors = shared_vectors
+        other_doc_id = str(uuid.uuid4())
+        kept_doc_id = str(uuid.uuid4())
+        await chroma_store.add_vectors(vectors)
+        await chroma_store.add_document_references([vectors[0].id], other_doc_id)
+        await chroma_store.add_document_references([vectors[1].id], kept_doc_id)
+        
+        assert await chroma_store.delete_documents_vectors([doc_id, other_doc_id]) is True
+        
+        assert await chroma_store.get_vector_count() == 1
+        remaining = await chroma_store.get_document_vectors(kept_doc_id)
+        assert list(remaining) == [vectors[1].id]
+        metadata = remaining[vectors[1].id]
+        assert metadata["document_ids"] == kept_doc_id
+        assert f"doc_{doc_id}" not in metadata
+        assert chroma_store._text_store.count() == 1
+    
+    @pytest.mark.asyncio
+    async def test_delete_documents_vectors_in_batches(self, chroma_store, sample_vectors):
+        """测试按批查询删除，每批一次条件查询"""
+        doc_ids = [str(uuid.uuid4()) for _ in sample_vectors]
+        for vector, doc_id in zip(sample_vectors, doc_ids):
+            vector.document_id = doc_id
+        await chroma_store.add_vectors(sample_vectors)
+        
+        with patch('rag_system.vector_store.chroma_store.DELETE_DOCUMENTS_BATCH_SIZE', 2), \
+                patch.object(chroma_store._collection, 'get', wraps=chroma_store._collection.get) as mock_get:
+            await chroma_store.delete_documents_vectors(doc_ids + [str(uuid.uuid4())])
+        
+        assert mock_get.call_count == 2
+        assert await chroma_store.get_vector_count() == 0
+        assert await chroma_store.delete_documents_vectors([]) is True
+
+
+class TestChromaChunkTexts:
+    """文本块内容单独存储测试"""
+    
+    @pytest.mark.asyncio
+    async def test_content_stored_outside_index(self, chroma_store, sample_vectors):
+        """测试内容不写入向量索引，检索结果从内容存储读取"""
+        await chroma_store.add_vectors(sample_vectors)
+        
+        stored = chroma_store._collection.get(ids=[sample_vectors[1].id], include=["metadatas", "documents"])
+        assert "content" not in stored["metadatas"][0]
+        assert not stored["documents"][0]
+        
+        results = await chroma_store.search_similar([0.1, 0.2, 0.3, 0.4], top_k=3)
+        contents = {result.chunk_id: result.content for result in results}
+        assert contents[sample_vectors[1].id] == "test content 1"
+        assert all("content" not in result.metadata for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_threshold_applied_before_fetching_content(self, chroma_store, sample_vectors):
+        """测试只为通过阈值的结果读取内容"""
+        await chroma_store.add_vectors(sample_vectors[1:])
+        
+        with patch.object(chroma_store._text_store, 'get_many', wraps=chroma_store._text_store.get_many) as mock_get:
+            results = await chroma_store.search_similar([0.1, 0.2, 0.3, 0.4], top_k=2, similarity_threshold=0.99)
+            mock_get.assert_called_once()
+            assert len(mock_get.call_args.args[0]) == len(results)
+            
+            mock_get.reset_mock()
+            await chroma_store.search_similar([-0.1, -0.2, -0.3, -0.4], top_k=2, similarity_threshold=0.99)
+            mock_get.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_get_chunk_texts(self, chroma_store, sample_vectors):
+        """测试按块ID批量读取内容，不存在的块不出现在结果中"""
+        await chroma_store.add_vectors(sample_vectors)
+        
+        with patch.object(chroma_store._text_store, 'get_many', wraps=chroma_store._text_store.get_many) as mock_get:
+            texts = await chroma_store.get_chunk_texts([sample_vectors[0].id, sample_vectors[2].id, "missing"])
+            mock_get.assert_called_once()
+        
+        assert texts == {
+            sample_vectors[0].id: sample_vectors[0].metadata["content"],
+            sample_vectors[2].id: sample_vectors[2].metadata["content"]
+        }
+    
+    @pytest.mark.asyncio
+    async def test_legacy_vectors_fall_back_to_documents(self, chroma_store):
+        """测试内容单独存储之前写入的向量从documents字段读取内容"""
+        vector_id = str(uuid.uuid4())
+        chroma_store._collection.add(
+            ids=[vector_id],
+            embeddings=[[0.1, 0.2, 0.3, 0.4]],
+            metadatas=[{"document_id": str(uuid.uuid4()), "content": "旧版内容"}],
+            documents=["旧版内容"]
+        )
+        
+        results = await chroma_store.search_similar([0.1, 0.2, 0.3, 0.4], top_k=1)
+        
+        assert results[0].content == "旧版内容"
+    
+    @pytest.mark.asyncio
+    async def test_delete_removes_content(self, chroma_store, sample_vectors):
+        """测试删除向量时同时删除内容"""
+        await chroma_store.add_vectors(sample_vectors)
+        
+        await chroma_store.delete_vectors(sample_vectors[0].document_id)
+        
+        assert chroma_store._text_store.count() == 0
+
+
+class TestChromaBatchedWrites:
+    """向量分批写入测试"""
+    
+    @pytest.fixture
+    def many_vectors(self):
+        doc_id = str(uuid.uuid4())
+        return [
+            Vector(
+                id=str(uuid.uuid4()),
+                document_id=doc_id,
+                chunk_id=str(uuid.uuid4()),
+                embedding=[0.1, 0.2, 0.3, float(i + 1)],
+                metadata={"chunk_index": i, "content": f"content {i}"}
+            )
+            for i in range(5)
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_add_vectors_in_batches(self, chroma_store, many_vectors):
+        """测试按配置的批大小分批写入"""
+        chroma_store.config.write_batch_size = 2
+        
+        with patch.object(chroma_store._collection, 'add', wraps=chroma_store._collection.add) as mock_add:
+            assert await chroma_store.add_vectors(many_vectors) is True
+        
+        assert [len(call.kwargs["ids"]) for call in mock_add.call_args_list] == [2, 2, 1]
+        assert await chroma_store.get_vector_count() == 5
+    
+    @pytest.mark.asyncio
+    async def test_inflight_batches_bounded(self, chroma_store, many_vectors):
+        """测试同时进行的写入批数不超过上限"""
+        chroma_store.config.write_batch_size = 1
+        chroma_store.config.max_inflight_writes = 2
+        active = 0
+        peak = 0
+        
+        async def slow_write(*args):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+        
+        with patch.object(chroma_store, '_write_batch', side_effect=slow_write) as mock_write:
+            await chroma_store.add_vectors(many_vectors)
+        
+        assert mock_write.call_count == 5
+        assert peak == 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_retried(self, chroma_store, many_vectors):
+        """测试单批写入失败时重试该批"""
+        chroma_store.config.write_batch_size = 2
+        chroma_store.config.write_retry_delay = 0
+        original_add = chroma_store._collection.add
+        failures = iter([True])
+        
+        def flaky_add(**kwargs):
+            if next(failures, False):
+                raise RuntimeError("临时错误")
+            return original_add(**kwargs)
+        
+        with patch.object(chroma_store._collection, 'add', side_effect=flaky_add) as mock_add:
+            assert await chroma_store.add_vectors(many_vectors) is True
+        
+        assert mock_add.call_count == 4
+        assert await chroma_store.get_vector_count() == 5
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_keeps_written_batches(self, chroma_store, many_vectors):
+        """测试重试后仍失败的批次报错，其他批次已写入的向量保留"""
+        chroma_store.config.write_batch_size = 2
+        chroma_store.config.write_retries = 1
+        chroma_store.config.write_retry_delay = 0
+        original_add = chroma_store._collection.add
+        failing_id = many_vectors[2].id
+        
+        def add(**kwargs):
+            if failing_id in kwargs["ids"]:
+                raise RuntimeError("写入失败")
+            return original_add(**kwargs)
+        
+        with patch.object(chroma_store._collection, 'add', side_effect=add):
+            with pytest.raises(VectorStoreError, match="已写入 3 个向量"):
+                await chroma_store.add_vectors(many_vectors)
+        
+        assert await chroma_store.get_vector_count() == 3
+    
+    @pytest.mark.asyncio
+    async def test_search_not_blocked_by_writes(self, chroma_store, sample_vectors):
+        """测试写入线程池占满时检索仍可进行"""
+        import threading
+        
+        await chroma_store.add_vectors(sample_vectors)
+        release = threading.Event()
+        loop = asyncio.get_running_loop()
+        blocked = [
+            loop.run_in_executor(chroma_store._write_executor, release.wait)
+            for _ in range(chroma_store.config.write_workers)
+        ]
+        
+        try:
+            results = await asyncio.wait_for(
+                chroma_store.search_similar([0.1, 0.2, 0.3, 0.4], top_k=2), timeout=5
+            )
+            assert len(results) == 2
+        finally:
+            release.set()
+            await asyncio.gather(*blocked)
@@ -0,0 +1,64 @@
+"""
+文本块内容存储测试
+"""
+import pytest
+
+from rag_system.vector_store.chunk_text_store import ChunkTextStore
+
+
+@pytest.fixture
+def text_store(tmp_path):
+    store = ChunkTextStore(str(tmp_path / "chunk_texts.sqlite3"))
+    yield store
+    store.close()
+
+
+class TestChunkTextStore:
+    """文本块内容存储测试"""
+    
+    def test_put_and_get(self, text_store):
+        """测试写入后按ID批量读取"""
+        assert text_store.put_many([("a", "第一段内容"), ("b", "second chunk")]) == 2
+        
+        assert text_store.get_many(["a", "b", "missing"]) == {"a": "第一段内容", "b": "second chunk"}
+        assert text_store.count() == 2
+    
+    def test_put_replaces(self, text_store):
+        """测试相同ID覆盖旧内容"""
+        text_store.put_many([("a", "旧内容")])
+        text_store.put_many([("a", "新内容")])
+        
+        assert text_store.get_many(["a"]) == {"a": "新内容"}
+        assert text_store.count() == 1
+    
+    def test_large_batches(self, text_store):
+        """测试超过SQL参数上限的批量读取和删除"""
+        items = [(f"id{i}", f"内容{i}") for i in range(1200)]
+        text_store.put_many(items)
+        
+        found = text_store.get_many([chunk_id for chunk_id, _ in items])
+        assert len(found) == 1200
+        assert found["id1199"] == "内容1199"
+        
+        assert text_store.delete_many([chunk_id for chunk_id, _ in items[:1100]]) == 1100
+        assert text_store.count() == 100
+    
+    def test_compressed(self, text_store):
+        """测试内容压缩存储"""
+        text = "重复的文本内容。" * 200
+        text_store.put_many([("a", text)])
+        
+        assert text_store.get_stats()["compressed_bytes"] < len(text.encode("utf-8")) / 5
+    
+    def test_persistence_and_clear(self, tmp_path):
+        """测试重新打开后内容仍在，清空后为空"""
+        path = str(tmp_path / "chunk_texts.sqlite3")
+        store = ChunkTextStore(path)
+        store.put_many([("a", "持久化内容")])
+        store.close()
+        
+        store = ChunkTextStore(path)
+        assert store.get_many(["a"]) == {"a": "持久化内容"}
+        store.clear()
+        assert store.count() == 0
+        store.close()